@@ -0,0 +1,837 @@
+"""
+Provedor de LLM plugável: APIs reais, respostas roteirizadas, gravação e reprodução
+
+Selecionado por LLM_PROVIDER em utils.config:
+- "live":   APIs reais (OpenAI, Anthropic, Google, HuggingFace)
+- "fake":   respostas determinísticas locais (regras + roteiro do agente SQL)
+- "record": APIs reais, gravando cada resposta no arquivo de fixtures
+- "replay": reproduz as respostas gravadas (roteiro local quando não houver gravação)
+
+Nos modos offline o grafo inteiro roda sem rede, inclusive o agente SQL:
+o modelo falso emite tool calls (listar tabelas → schema → query) e as
+ferramentas reais executam no SQLite, de forma que o overhead do próprio
+sistema pode ser medido em CI. Latência sintética é configurável.
+
+Nos modos live/record os chat models passam pelo agendador de rate limit
+(utils.rate_limiter) antes de cada chamada; chamadas não agênticas podem usar
+hedging com um modelo secundário (utils.hedging).
+"""
+import asyncio
+import atexit
+import glob
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, AsyncIterator, List, Optional
+
+try:
+    import fcntl as _fcntl
+except ImportError:  # Windows: worker único (pool solo), sem lock entre processos
+    _fcntl = None
+
+from langchain_core.language_models.chat_models import BaseChatModel, agenerate_from_stream, generate_from_stream
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from utils.config import (
+    LLM_PROVIDER,
+    LLM_FIXTURES_PATH,
+    LLM_RATE_LIMIT_ENABLED,
+    LLM_HEDGING_ENABLED,
+    TEMPERATURE,
+    OPENAI_MODELS,
+    ANTHROPIC_MODELS,
+    GOOGLE_MODELS,
+    FAKE_LLM_LATENCY_MS,
+    FAKE_LLM_LATENCY_JITTER_MS,
+    is_offline_llm
+)
+
+# Respostas roteirizadas padrão para os prompts do sistema (regex → resposta, aceita \1 etc.)
+DEFAULT_SCRIPT_RULES = [
+    # TestValidator
+    {"match": r"RESPONDA EXATAMENTE NESTE FORMATO:\s*PONTUAÇÃO:",
+     "response": "PONTUAÇÃO: 100\nVÁLIDA: True\nRAZÃO: Resposta simulada pelo provedor offline"},
+    # Refinamento de pergunta
+    {"match": r"PERGUNTA ORIGINAL:\s*(.*?)\s*CONTEXTO DOS DADOS:.*PERGUNTA_REFINADA:",
+     "response": "PERGUNTA_REFINADA: \\1\nMUDANÇAS: Nenhuma mudança significativa\nJUSTIFICATIVA: Pergunta mantida pelo provedor offline"},
+    # Seleção de tipo de gráfico
+    {"match": r"Responda apenas o número \(1-10\)",
+     "response": "1"},
+    # Processing Agent
+    {"match": r"Opção de querySQL: \[QuerySQL\]",
+     "response": "Opção de querySQL: SELECT * FROM tabela LIMIT 10;\nObservações: Query simulada pelo provedor offline"},
+    # Refinamento de resposta (hf_client)
+    {"match": r"Resposta gerada pelo agente SQL:\s*(.*?)\s*Sua tarefa é refinar",
+     "response": "\\1"},
+]
+
+# Ferramentas do agente SQL (langchain_community SQLDatabaseToolkit)
+_SQL_LIST_TOOL = "sql_db_list_tables"
+_SQL_SCHEMA_TOOL = "sql_db_schema"
+_SQL_QUERY_TOOL = "sql_db_query"
+
+# ==================== FIXTURES ====================
+
+class FixtureStore:
+    """
+    Arquivo JSON com regras roteirizadas e respostas gravadas
+
+    Formato:
+        {"rules": [{"match": "<regex>", "response": "<texto>"}],
+         "recordings": {"<fingerprint>": {"model": ..., "content": ..., "tool_calls": [...]}}}
+
+    Gravações novas são anexadas a um journal JSONL do próprio processo
+    (<path>.journal.<pid>.jsonl), uma linha por chamada. flush() (ao sair do
+    processo ou do processo filho do Celery), sob lock de arquivo, relê o JSON
+    do disco, junta os journals de todos os processos e reescreve o JSON;
+    apenas o journal do próprio processo é removido.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self._lock = threading.Lock()
+        self._data: Dict[str, Any] = {"rules": [], "recordings": {}}
+        self._compiled_rules: List[Any] = []
+        self._recorded: Dict[str, Any] = {}
+        self._owner_pid = os.getpid()
+        self._flush_registered = False
+        self._load()
+
+    @property
+    def journal_path(self) -> str:
+        """Journal do processo atual (filhos do prefork não escrevem no journal do pai)"""
+        return f"{self.path}.journal.{os.getpid()}.jsonl"
+
+    def _journal_paths(self) -> List[str]:
+        """Journals de todos os processos (inclusive os interrompidos antes do flush)"""
+        return sorted(glob.glob(f"{glob.escape(self.path)}.journal.*.jsonl"))
+
+    @staticmethod
+    def _read_journal(journal_path: str) -> Dict[str, Any]:
+        """Gravações de um journal (ignora linhas truncadas)"""
+        recordings = {}
+        try:
+            with open(journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Linha truncada (processo interrompido durante a escrita)
+                    recordings[record["fingerprint"]] = record["entry"]
+        except FileNotFoundError:
+            pass  # Consolidado e removido pelo dono entretanto
+        return recordings
+
+    def _read_disk(self) -> Dict[str, Any]:
+        """JSON do disco com as gravações de todos os journals aplicadas"""
+        data = {"rules": [], "recordings": {}}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+            data["rules"] = loaded.get("rules", [])
+            data["recordings"] = loaded.get("recordings", {})
+        for journal_path in self._journal_paths():
+            data["recordings"].update(self._read_journal(journal_path))
+        return data
+
+    def _load(self):
+        """Carrega fixtures do disco e journals pendentes (arquivo ausente = vazio)"""
+        try:
+            self._data = self._read_disk()
+            logging.info(f"[LLM_PROVIDER] Fixtures carregadas de {self.path}: {len(self._data['recordings'])} gravações, {len(self._data['rules'])} regras")
+        except Exception as e:
+            logging.error(f"[LLM_PROVIDER] Erro ao carregar fixtures {self.path}: {e}")
+
+        self._compiled_rules = [
+            (re.compile(rule["match"], re.DOTALL), rule)
+            for rule in self._data["rules"] + DEFAULT_SCRIPT_RULES
+        ]
+
+    def get_recording(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Retorna resposta gravada para o fingerprint"""
+        return self._data["recordings"].get(fingerprint)
+
+    def match_rule(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        Retorna a primeira regra que casa com o prompt (resposta já expandida)
+
+        Args:
+            prompt: Texto do último prompt do usuário
+        """
+        for pattern, rule in self._compiled_rules:
+            match = pattern.search(prompt)
+            if match:
+                return {**rule, "response": match.expand(rule.get("response", ""))}
+        return None
+
+    def _check_fork(self):
+        """Processo filho (fork) começa sem gravações próprias e sem flush registrado"""
+        if self._owner_pid != os.getpid():
+            self._owner_pid = os.getpid()
+            self._recorded = {}
+            self._flush_registered = False
+
+    def add_recording(self, fingerprint: str, entry: Dict[str, Any]):
+        """Grava resposta anexando uma linha ao journal do processo (O(1) por chamada)"""
+        with self._lock:
+            self._check_fork()
+            self._data["recordings"][fingerprint] = entry
+
+            if not self._recorded:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._register_flush()
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"fingerprint": fingerprint, "entry": entry}, ensure_ascii=False, default=str) + "\n")
+            self._recorded[fingerprint] = entry
+
+    def _register_flush(self):
+        """Consolida o journal ao sair do processo"""
+        if not self._flush_registered:
+            atexit.register(self.flush)
+            self._flush_registered = True
+
+    def flush(self):
+        """
+        Consolida as gravações no arquivo JSON (escrita atômica)
+
+        Sob lock de arquivo, junta o JSON atual do disco, os journals de todos os
+        processos e as gravações deste processo; só o journal deste processo é
+        removido (os dos demais continuam até o flush de cada um).
+        """
+        with self._lock:
+            self._check_fork()
+            if not self._recorded:
+                return
+
+            with open(self.lock_path, "a") as lock_file:
+                if _fcntl is not None:
+                    _fcntl.flock(lock_file.fileno(), _fcntl.LOCK_EX)
+                try:
+                    data = self._read_disk()
+                    data["recordings"].update(self._recorded)
+
+                    tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                    with open(tmp_path, "w", encoding="utf-8") as f:
+                        json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+                    os.replace(tmp_path, self.path)
+                    if os.path.exists(self.journal_path):
+                        os.remove(self.journal_path)
+                finally:
+                    if _fcntl is not None:
+                        _fcntl.flock(lock_file.fileno(), _fcntl.LOCK_UN)
+
+            self._data["recordings"].update(data["recordings"])
+            logging.info(f"[LLM_PROVIDER] {len(self._recorded)} gravações consolidadas em {self.path}")
+            self._recorded = {}
+
+_fixture_store: Optional[FixtureStore] = None
+_fixture_store_lock = threading.Lock()
+
+def get_fixture_store() -> FixtureStore:
+    """Retorna instância singleton do arquivo de fixtures"""
+    global _fixture_store
+    if _fixture_store is None:
+        with _fixture_store_lock:
+            if _fixture_store is None:
+                _fixture_store = FixtureStore(LLM_FIXTURES_PATH)
+    return _fixture_store
+
+def flush_fixture_store():
+    """Consolida as gravações do processo, se o arquivo de fixtures já foi aberto (ex: shutdown do worker)"""
+    if _fixture_store is not None:
+        try:
+            _fixture_store.flush()
+        except Exception as e:
+            logging.error(f"[LLM_PROVIDER] Erro ao consolidar fixtures: {e}")
+
+# ==================== FINGERPRINT E SERIALIZAÇÃO ====================
+
+def _tool_names(tools: Optional[List[Dict[str, Any]]]) -> List[str]:
+    """Nomes das ferramentas vinculadas (formato OpenAI)"""
+    return [tool.get("function", {}).get("name", "") for tool in (tools or [])]
+
+def compute_fingerprint(model_id: str, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]] = None) -> str:
+    """
+    Gera chave estável para uma chamada de LLM (ignora IDs aleatórios de tool calls)
+
+    Args:
+        model_id: ID do modelo
+        messages: Mensagens enviadas
+        tools: Ferramentas vinculadas
+
+    Returns:
+        Hash SHA-256 em hexadecimal
+    """
+    payload = {
+        "model": model_id,
+        "tools": sorted(_tool_names(tools)),
+        "messages": [
+            {
+                "type": message.type,
+                "content": message.content,
+                "tool_calls": [
+                    {"name": call.get("name"), "args": call.get("args")}
+                    for call in (getattr(message, "tool_calls", None) or [])
+                ]
+            }
+            for message in messages
+        ]
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def _message_to_entry(model_id: str, message: Any) -> Dict[str, Any]:
+    """Serializa resposta do modelo para fixture"""
+    if isinstance(message, str):
+        return {"model": model_id, "content": message, "tool_calls": []}
+    return {
+        "model": model_id,
+        "content": message.content,
+        "tool_calls": [
+            {"name": call["name"], "args": call["args"]}
+            for call in (getattr(message, "tool_calls", None) or [])
+        ]
+    }
+
+def _entry_to_message(entry: Dict[str, Any], fingerprint: str) -> AIMessage:
+    """Reconstrói AIMessage a partir de fixture (IDs de tool call determinísticos)"""
+    tool_calls = [
+        {"name": call["name"], "args": call.get("args", {}), "id": f"call_{fingerprint[:12]}_{index}", "type": "tool_call"}
+        for index, call in enumerate(entry.get("tool_calls") or [])
+    ]
+    return AIMessage(content=entry.get("content", ""), tool_calls=tool_calls)
+
+def _last_human_index(messages: List[BaseMessage]) -> int:
+    """Índice da última mensagem do usuário (-1 se não houver)"""
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            return index
+    return -1
+
+def _message_text(message: BaseMessage) -> str:
+    """Conteúdo textual de uma mensagem (blocos concatenados)"""
+    content = message.content
+    if isinstance(content, list):
+        return "".join(item.get("text", "") if isinstance(item, dict) else str(item) for item in content)
+    return str(content)
+
+# ==================== MODELO FALSO ====================
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model determinístico com suporte a tool calls e streaming
+
+    Ordem de resolução: gravação (fingerprint) → regra roteirizada → roteiro
+    do agente SQL (quando as ferramentas SQL estão vinculadas) → eco.
+    """
+
+    model_id: str = "fake"
+    streaming: bool = False
+    latency_ms: int = FAKE_LLM_LATENCY_MS
+    latency_jitter_ms: int = FAKE_LLM_LATENCY_JITTER_MS
+
+    @property
+    def _llm_type(self) -> str:
+        return "agentgraph-fake"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_id": self.model_id}
+
+    def bind_tools(self, tools: List[Any], **kwargs: Any):
+        """Vincula ferramentas no formato OpenAI (usado pelos agentes tool-calling)"""
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _latency_seconds(self, fingerprint: str) -> float:
+        """Latência sintética determinística por chamada"""
+        if not self.latency_ms and not self.latency_jitter_ms:
+            return 0.0
+        jitter = random.Random(fingerprint).uniform(-self.latency_jitter_ms, self.latency_jitter_ms)
+        return max(0.0, (self.latency_ms + jitter) / 1000)
+
+    def _resolve(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]]) -> tuple:
+        """Resolve a resposta da chamada; retorna (AIMessage, fingerprint)"""
+        store = get_fixture_store()
+        fingerprint = compute_fingerprint(self.model_id, messages, tools)
+
+        recorded = store.get_recording(fingerprint)
+        if recorded:
+            return _entry_to_message(recorded, fingerprint), fingerprint
+
+        if LLM_PROVIDER == "replay":
+            logging.warning(f"[LLM_PROVIDER] Gravação não encontrada ({fingerprint[:12]}), usando roteiro local")
+
+        human_index = _last_human_index(messages)
+        prompt = _message_text(messages[human_index]) if human_index >= 0 else ""
+        tool_names = _tool_names(tools)
+
+        if _SQL_QUERY_TOOL in tool_names:
+            entry = self._script_sql_agent(messages[human_index + 1:], tool_names)
+            return _entry_to_message(entry, fingerprint), fingerprint
+
+        rule = store.match_rule(prompt)
+        if rule:
+            entry = {"content": rule["response"], "tool_calls": rule.get("tool_calls", [])}
+            return _entry_to_message(entry, fingerprint), fingerprint
+
+        return AIMessage(content=f"Resposta simulada: {prompt[:200]}"), fingerprint
+
+    def _script_sql_agent(self, turn_messages: List[BaseMessage], tool_names: List[str]) -> Dict[str, Any]:
+        """
+        Roteiro do agente SQL: lista tabelas → schema → query → resposta final
+
+        Args:
+            turn_messages: Mensagens após a última pergunta do usuário
+            tool_names: Ferramentas disponíveis
+        """
+        calls = [
+            call
+            for message in turn_messages
+            for call in (getattr(message, "tool_calls", None) or [])
+        ]
+        called = {call.get("name") for call in calls}
+        outputs = {
+            message.tool_call_id: _message_text(message)
+            for message in turn_messages if isinstance(message, ToolMessage)
+        }
+
+        if _SQL_LIST_TOOL in tool_names and _SQL_LIST_TOOL not in called:
+            return {"content": "", "tool_calls": [{"name": _SQL_LIST_TOOL, "args": {"tool_input": ""}}]}
+
+        table = "tabela"
+        list_call = next((call for call in calls if call.get("name") == _SQL_LIST_TOOL), None)
+        if list_call:
+            listed = [name.strip() for name in outputs.get(list_call.get("id"), "").split(",") if name.strip()]
+            table = listed[0] if listed else table
+
+        if _SQL_SCHEMA_TOOL in tool_names and _SQL_SCHEMA_TOOL not in called:
+            return {"content": "", "tool_calls": [{"name": _SQL_SCHEMA_TOOL, "args": {"table_names": table}}]}
+
+        query_call = next((call for call in calls if call.get("name") == _SQL_QUERY_TOOL), None)
+        if query_call is None:
+            query = f'SELECT * FROM "{table}" LIMIT 5;'
+            return {"content": "", "tool_calls": [{"name": _SQL_QUERY_TOOL, "args": {"query": query}}]}
+
+        result = outputs.get(query_call.get("id"), "")
+        return {
+            "content": f"Consulta executada: {query_call['args'].get('query', '')}\n\nResultado: {result[:2000]}",
+            "tool_calls": []
+        }
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        message, fingerprint = self._resolve(messages, kwargs.get("tools"))
+        delay = self._latency_seconds(fingerprint)
+        if delay:
+            time.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        message, fingerprint = self._resolve(messages, kwargs.get("tools"))
+        delay = self._latency_seconds(fingerprint)
+        if delay:
+            await asyncio.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, message: AIMessage) -> List[AIMessageChunk]:
+        """Divide a resposta em chunks (palavras ou um chunk de tool calls)"""
+        if message.tool_calls:
+            return [AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": index}
+                    for index, call in enumerate(message.tool_calls)
+                ]
+            )]
+        tokens = re.findall(r"\S+\s*|\s+", _message_text(message)) or [""]
+        return [AIMessageChunk(content=token) for token in tokens]
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        message, fingerprint = self._resolve(messages, kwargs.get("tools"))
+        delay = self._latency_seconds(fingerprint)
+        if delay:
+            time.sleep(delay)
+        for chunk in self._chunks(message):
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager and chunk.content:
+                run_manager.on_llm_new_token(chunk.content, chunk=generation)
+            yield generation
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        message, fingerprint = self._resolve(messages, kwargs.get("tools"))
+        delay = self._latency_seconds(fingerprint)
+        if delay:
+            await asyncio.sleep(delay)
+        for chunk in self._chunks(message):
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager and chunk.content:
+                await run_manager.on_llm_new_token(chunk.content, chunk=generation)
+            yield generation
+
+# ==================== GRAVADOR ====================
+
+class RecordingChatModel(BaseChatModel):
+    """
+    Encaminha chamadas ao modelo real e grava as respostas como fixtures
+    """
+
+    model_id: str = "live"
+    delegate: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "agentgraph-recorder"
+
+    def bind_tools(self, tools: List[Any], **kwargs: Any):
+        """Vincula ferramentas no formato OpenAI (repassadas ao modelo real)"""
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _runnable(self, tools: Optional[List[Dict[str, Any]]]):
+        """Modelo real com as ferramentas vinculadas"""
+        return self.delegate.bind_tools(tools) if tools else self.delegate
+
+    def _record(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]], response: Any) -> AIMessage:
+        """Grava a resposta e a normaliza para AIMessage"""
+        fingerprint = compute_fingerprint(self.model_id, messages, tools)
+        try:
+            get_fixture_store().add_recording(fingerprint, _message_to_entry(self.model_id, response))
+        except Exception as e:
+            logging.error(f"[LLM_PROVIDER] Erro ao gravar fixture {fingerprint[:12]}: {e}")
+        return AIMessage(content=response) if isinstance(response, str) else response
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        tools = kwargs.get("tools")
+        response = self._runnable(tools).invoke(messages, stop=stop)
+        return ChatResult(generations=[ChatGeneration(message=self._record(messages, tools, response))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        tools = kwargs.get("tools")
+        response = await self._runnable(tools).ainvoke(messages, stop=stop)
+        return ChatResult(generations=[ChatGeneration(message=self._record(messages, tools, response))])
+
+# ==================== RATE LIMIT ====================
+
+def _usage_tokens(message: Any) -> Optional[int]:
+    """Total de tokens informado pelo provedor (None se ausente)"""
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("total_tokens") or None
+
+class RateLimitedChatModel(BaseChatModel):
+    """
+    Encaminha chamadas ao modelo real após liberação do agendador de rate limit
+    (utils.rate_limiter); a vaga fica reservada até o fim da resposta
+    """
+
+    model_id: str = "live"
+    provider: str = "openai"
+    delegate: Any = None
+    streaming: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "agentgraph-rate-limited"
+
+    def bind_tools(self, tools: List[Any], **kwargs: Any):
+        """Vincula ferramentas no formato OpenAI (repassadas ao modelo real)"""
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _runnable(self, tools: Optional[List[Dict[str, Any]]]):
+        """Modelo real com as ferramentas vinculadas"""
+        return self.delegate.bind_tools(tools) if tools else self.delegate
+
+    def _estimate(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]]) -> int:
+        """Tokens estimados da chamada (mensagens, ferramentas e resposta)"""
+        from utils.rate_limiter import estimate_tokens
+
+        prompt = "".join(_message_text(message) for message in messages)
+        if tools:
+            prompt += json.dumps(tools, default=str)
+        return estimate_tokens(prompt, getattr(self.delegate, "max_tokens", None))
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        from utils.rate_limiter import get_llm_scheduler
+
+        if self.streaming:
+            return generate_from_stream(self._stream(messages, stop, run_manager, **kwargs))
+        tools = kwargs.get("tools")
+        with get_llm_scheduler().slot(self.provider, self.model_id, self._estimate(messages, tools)) as ticket:
+            response = self._runnable(tools).invoke(messages, stop=stop)
+            if ticket:
+                ticket.usage = _usage_tokens(response)
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        from utils.rate_limiter import get_llm_scheduler
+
+        if self.streaming:
+            return await agenerate_from_stream(self._astream(messages, stop, run_manager, **kwargs))
+        tools = kwargs.get("tools")
+        async with get_llm_scheduler().aslot(self.provider, self.model_id, self._estimate(messages, tools)) as ticket:
+            response = await self._runnable(tools).ainvoke(messages, stop=stop)
+            if ticket:
+                ticket.usage = _usage_tokens(response)
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        from utils.rate_limiter import get_llm_scheduler
+
+        tools = kwargs.get("tools")
+        with get_llm_scheduler().slot(self.provider, self.model_id, self._estimate(messages, tools)) as ticket:
+            final = None
+            for chunk in self._runnable(tools).stream(messages, stop=stop):
+                final = chunk if final is None else final + chunk
+                generation = ChatGenerationChunk(message=chunk)
+                if run_manager and chunk.content:
+                    run_manager.on_llm_new_token(_message_text(chunk), chunk=generation)
+                yield generation
+            if ticket:
+                ticket.usage = _usage_tokens(final)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        from utils.rate_limiter import get_llm_scheduler
+
+        tools = kwargs.get("tools")
+        async with get_llm_scheduler().aslot(self.provider, self.model_id, self._estimate(messages, tools)) as ticket:
+            final = None
+            async for chunk in self._runnable(tools).astream(messages, stop=stop):
+                final = chunk if final is None else final + chunk
+                generation = ChatGenerationChunk(message=chunk)
+                if run_manager and chunk.content:
+                    await run_manager.on_llm_new_token(_message_text(chunk), chunk=generation)
+                yield generation
+            if ticket:
+                ticket.usage = _usage_tokens(final)
+
+# ==================== HEDGING ====================
+
+class HedgedChatModel(BaseChatModel):
+    """
+    Chama o modelo principal e, se ele demorar além do percentil configurado
+    ou falhar, um modelo secundário de outro provedor (utils.hedging)
+    """
+
+    model_id: str = "live"
+    secondary_id: str = ""
+    primary: Any = None
+    secondary: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "agentgraph-hedged"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        from utils.hedging import run_hedged_sync
+
+        response = run_hedged_sync(
+            self.model_id, self.secondary_id,
+            lambda: self.primary.invoke(messages, stop=stop),
+            lambda: self.secondary.invoke(messages, stop=stop)
+        )
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        from utils.hedging import run_hedged
+
+        response = await run_hedged(
+            self.model_id, self.secondary_id,
+            lambda: self.primary.ainvoke(messages, stop=stop),
+            lambda: self.secondary.ainvoke(messages, stop=stop)
+        )
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+def create_live_chat_model(model_id: str, temperature: Optional[float] = None, max_tokens: Optional[int] = None):
+    """
+    Cria o chat model real de um modelo de AVAILABLE_MODELS (SDK importado apenas para o provedor usado)
+
+    Args:
+        model_id: ID do modelo
+        temperature: Temperatura (ignorada no o3-mini)
+        max_tokens: Limite de tokens da resposta
+
+    Returns:
+        Chat model do provedor
+    """
+    if model_id in OPENAI_MODELS:
+        from langchain_openai import ChatOpenAI
+
+        params = {"model": model_id}
+        if model_id != "o3-mini" and temperature is not None:
+            params["temperature"] = temperature
+        if max_tokens:
+            params["max_tokens"] = max_tokens
+        return ChatOpenAI(**params)
+
+    if model_id in ANTHROPIC_MODELS:
+        from langchain_anthropic import ChatAnthropic
+
+        return ChatAnthropic(
+            model=model_id,
+            temperature=temperature if temperature is not None else TEMPERATURE,
+            max_tokens=max_tokens or 4096,
+            max_retries=2,
+            timeout=60.0
+        )
+
+    if model_id in GOOGLE_MODELS:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        return ChatGoogleGenerativeAI(
+            model=model_id,
+            temperature=temperature if temperature is not None else TEMPERATURE,
+            max_tokens=max_tokens or 4096,
+            max_retries=2,
+            timeout=60.0
+        )
+
+    raise ValueError(f"Modelo {model_id} não suportado como chat model")
+
+def _build_hedged_model(model_id: str, live_model: Any, primary: Any):
+    """Combina o modelo principal com o secundário de LLM_HEDGE_FALLBACKS (ou devolve o principal)"""
+    from utils.hedging import get_hedge_model
+
+    secondary_id = get_hedge_model(model_id)
+    if not secondary_id or not isinstance(live_model, BaseChatModel):
+        return primary
+
+    try:
+        temperature = getattr(live_model, "temperature", None)
+        max_tokens = getattr(live_model, "max_tokens", None)
+        secondary = build_chat_model(
+            secondary_id,
+            lambda: create_live_chat_model(secondary_id, temperature, max_tokens)
+        )
+    except Exception as e:
+        logging.warning(f"[LLM_PROVIDER] Hedge de {model_id} para {secondary_id} desabilitado: {e}")
+        return primary
+
+    return HedgedChatModel(model_id=model_id, secondary_id=secondary_id, primary=primary, secondary=secondary)
+
+# ==================== FÁBRICA ====================
+
+def build_chat_model(model_id: str, live_factory: Callable[[], Any], streaming: bool = False,
+                     hedge: bool = False):
+    """
+    Cria o modelo conforme LLM_PROVIDER
+
+    Args:
+        model_id: ID do modelo (chave das gravações)
+        live_factory: Cria o modelo real (só chamada nos modos live/record)
+        streaming: Habilita streaming de tokens no modelo falso
+        hedge: Usa hedging com modelo secundário (chamadas não agênticas, requer LLM_HEDGING_ENABLED)
+
+    Returns:
+        Chat model pronto para uso
+    """
+    from utils.metrics import attach_llm_metrics, get_llm_provider
+
+    if is_offline_llm():
+        return attach_llm_metrics(FakeChatModel(model_id=model_id, streaming=streaming), model_id)
+
+    raw_model = live_model = live_factory()
+    if LLM_PROVIDER == "record":
+        live_model = RecordingChatModel(model_id=model_id, delegate=live_model)
+    # Métricas no modelo real: a latência registrada não inclui a espera na fila
+    live_model = attach_llm_metrics(live_model, model_id)
+
+    if LLM_RATE_LIMIT_ENABLED and isinstance(live_model, BaseChatModel):
+        live_model = RateLimitedChatModel(
+            model_id=model_id,
+            provider=get_llm_provider(model_id),
+            delegate=live_model,
+            streaming=bool(getattr(live_model, "streaming", False))
+        )
+
+    if hedge and LLM_HEDGING_ENABLED:
+        live_model = _build_hedged_model(model_id, raw_model, live_model)
+    return live_model
+
+def _record_text_completion(model_id: str, prompt: str, response: str):
+    """Grava a resposta de complete_text/acomplete_text no modo record"""
+    if LLM_PROVIDER != "record":
+        return
+    fingerprint = compute_fingerprint(model_id, [HumanMessage(content=prompt)])
+    try:
+        get_fixture_store().add_recording(fingerprint, _message_to_entry(model_id, response))
+    except Exception as e:
+        logging.error(f"[LLM_PROVIDER] Erro ao gravar fixture {fingerprint[:12]}: {e}")
+
+def complete_text(model_id: str, prompt: str, live_call: Callable[[], str]) -> str:
+    """
+    Completa um prompt de texto em clientes que não são chat models (ex: hf_client)
+
+    Args:
+        model_id: ID do modelo
+        prompt: Prompt enviado
+        live_call: Executa a chamada real e retorna o texto
+
+    Returns:
+        Texto da resposta
+    """
+    from utils.metrics import get_llm_provider, record_llm_call
+    from utils.rate_limiter import estimate_tokens, get_llm_scheduler
+
+    if is_offline_llm():
+        return build_chat_model(model_id, lambda: None).invoke([HumanMessage(content=prompt)]).content
+
+    provider = get_llm_provider(model_id)
+    with get_llm_scheduler().slot(provider, model_id, estimate_tokens(prompt)):
+        start_time = time.perf_counter()
+        try:
+            response = live_call()
+        except Exception:
+            record_llm_call(provider, model_id, time.perf_counter() - start_time, "error")
+            raise
+        record_llm_call(provider, model_id, time.perf_counter() - start_time)
+    _record_text_completion(model_id, prompt, response)
+    return response
+
+async def acomplete_text(model_id: str, prompt: str, live_call: Callable[[], str]) -> str:
+    """
+    Versão assíncrona de complete_text (não bloqueia o event loop)
+
+    A espera pela vaga usa aslot e a chamada síncrona do cliente roda em uma
+    thread (asyncio.to_thread).
+
+    Args:
+        model_id: ID do modelo
+        prompt: Prompt enviado
+        live_call: Executa a chamada real e retorna o texto
+
+    Returns:
+        Texto da resposta
+    """
+    from utils.metrics import get_llm_provider, record_llm_call
+    from utils.rate_limiter import estimate_tokens, get_llm_scheduler
+
+    if is_offline_llm():
+        return (await build_chat_model(model_id, lambda: None).ainvoke([HumanMessage(content=prompt)])).content
+
+    provider = get_llm_provider(model_id)
+    async with get_llm_scheduler().aslot(provider, model_id, estimate_tokens(prompt)):
+        start_time = time.perf_counter()
+        try:
+            response = await asyncio.to_thread(live_call)
+        except Exception:
+            record_llm_call(provider, model_id, time.perf_counter() - start_time, "error")
+            raise
+        record_llm_call(provider, model_id, time.perf_counter() - start_time)
+    _record_text_completion(model_id, prompt, response)
+    return response
@@ -4,11 +4,7 @@ Agente de processamento de contexto inicial para sugestão de queries SQL
 import logging
 import asyncio
 from typing import Optional, Dict, Any
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_community.llms import HuggingFaceEndpoint
-from langchain.schema import HumanMessage
+from langchain_core.messages import HumanMessage
 
 from utils.config import (
     TEMPERATURE,
@@ -18,6 +14,7 @@ from utils.config import (
     GOOGLE_MODELS,
     REFINEMENT_MODELS
 )
+from agents.llm_provider import build_chat_model
 
 
 class ProcessingAgentManager:
@@ -40,51 +37,60 @@ class ProcessingAgentManager:
             if model_id not in AVAILABLE_MODELS.values():
                 model_id = REFINEMENT_MODELS.get(self.model_name, model_id)
             
-            # Cria o modelo LLM baseado no provedor
+            # Cria o modelo LLM baseado no provedor (SDK importado apenas para o provedor usado)
             if model_id in OPENAI_MODELS:
+                from langchain_openai import ChatOpenAI
+
                 # Configurações específicas para modelos OpenAI
                 if model_id == "o3-mini":
                     # o3-mini não suporta temperature
-                    self.llm = ChatOpenAI(model=model_id)
+                    self.llm = build_chat_model(model_id, lambda: ChatOpenAI(model=model_id), hedge=True)
                 else:
                     # GPT-4o e GPT-4o-mini suportam temperature
-                    self.llm = ChatOpenAI(model=model_id, temperature=TEMPERATURE)
+                    self.llm = build_chat_model(model_id, lambda: ChatOpenAI(model=model_id, temperature=TEMPERATURE), hedge=True)
                     
             elif model_id in ANTHROPIC_MODELS:
+                from langchain_anthropic import ChatAnthropic
+
                 # Claude com tool-calling e configurações para rate limiting
-                self.llm = ChatAnthropic(
+                self.llm = build_chat_model(model_id, lambda: ChatAnthropic(
                     model=model_id,
                     temperature=TEMPERATURE,
                     max_tokens=4096,
                     max_retries=2,
                     timeout=60.0
-                )
+                ), hedge=True)
 
             elif model_id in GOOGLE_MODELS:
+                from langchain_google_genai import ChatGoogleGenerativeAI
+
                 # Gemini com configurações otimizadas
-                self.llm = ChatGoogleGenerativeAI(
+                self.llm = build_chat_model(model_id, lambda: ChatGoogleGenerativeAI(
                     model=model_id,
                     temperature=TEMPERATURE,
                     max_tokens=4096,
                     max_retries=2,
                     timeout=60.0
-                )
+                ), hedge=True)
 
             else:
+                from langchain_community.llms import HuggingFaceEndpoint
+
                 # Modelos HuggingFace (refinement models)
-                self.llm = HuggingFaceEndpoint(
+                self.llm = build_chat_model(model_id, lambda: HuggingFaceEndpoint(
                     endpoint_url=f"https://api-inference.huggingface.co/models/{model_id}",
                     temperature=TEMPERATURE,
                     max_new_tokens=1024,
                     timeout=120
-                )
+                ))
                 
             logging.info(f"Processing Agent inicializado com modelo {model_id}")
             
         except Exception as e:
             logging.error(f"Erro ao inicializar Processing Agent: {e}")
             # Fallback para GPT-4o-mini
-            self.llm = ChatOpenAI(model="gpt-4o-mini", temperature=TEMPERATURE)
+            from langchain_openai import ChatOpenAI
+            self.llm = build_chat_model("gpt-4o-mini", lambda: ChatOpenAI(model="gpt-4o-mini", temperature=TEMPERATURE))
             logging.warning("Usando GPT-4o-mini como fallback")
     
     def recreate_llm(self, new_model: str):
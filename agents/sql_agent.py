@@ -5,12 +5,9 @@ import logging
 import time
 import asyncio
 from typing import Optional, Dict, Any, List
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_community.agent_toolkits import create_sql_agent
 from langchain_community.utilities import SQLDatabase
-from langchain.callbacks.base import BaseCallbackHandler
+from langchain.callbacks.base import BaseCallbackHandler, BaseCallbackManager
 from langchain.schema import AgentAction, AgentFinish
 
 
@@ -20,8 +17,10 @@ from utils.config import (
     AVAILABLE_MODELS,
     OPENAI_MODELS,
     ANTHROPIC_MODELS,
-    GOOGLE_MODELS
+    GOOGLE_MODELS,
+    STREAMING_ENABLED
 )
+from agents.llm_provider import build_chat_model
 
 class SQLQueryCaptureHandler(BaseCallbackHandler):
     """
@@ -105,7 +104,11 @@ async def retry_with_backoff(func, max_retries=3, base_delay=1.0):
     """
     for attempt in range(max_retries + 1):
         try:
-            return func()
+            result = func()
+            # Suporta funções que retornam corrotinas (ex: invoke executado em thread)
+            if asyncio.iscoroutine(result):
+                result = await result
+            return result
         except Exception as e:
             error_str = str(e)
 
@@ -160,45 +163,76 @@ def create_sql_agent_executor(db: SQLDatabase, model_name: str = "gpt-4o-mini",
         # Obtém o ID real do modelo
         model_id = AVAILABLE_MODELS.get(model_name, model_name)
 
-        # Cria o modelo LLM baseado no provedor
+        # Cria o modelo LLM baseado no provedor (SDK importado apenas para o provedor usado)
         if model_id in OPENAI_MODELS:
+            from langchain_openai import ChatOpenAI
+
             # Configurações específicas para modelos OpenAI
             if model_id == "o3-mini":
                 # o3-mini não suporta temperature
-                llm = ChatOpenAI(model=model_id)
+                llm = build_chat_model(
+                    model_id,
+                    lambda: ChatOpenAI(model=model_id, streaming=STREAMING_ENABLED),
+                    streaming=STREAMING_ENABLED
+                )
             else:
                 # GPT-4o e GPT-4o-mini suportam temperature
-                llm = ChatOpenAI(model=model_id, temperature=TEMPERATURE)
+                llm = build_chat_model(
+                    model_id,
+                    lambda: ChatOpenAI(model=model_id, temperature=TEMPERATURE, streaming=STREAMING_ENABLED),
+                    streaming=STREAMING_ENABLED
+                )
 
             agent_type = "openai-tools"
 
         elif model_id in ANTHROPIC_MODELS:
+            from langchain_anthropic import ChatAnthropic
+
             # Claude com tool-calling e configurações para rate limiting
-            llm = ChatAnthropic(
-                model=model_id,
-                temperature=TEMPERATURE,
-                max_tokens=4096,
-                max_retries=2,  # Retry interno do cliente
-                timeout=60.0    # Timeout mais longo
+            llm = build_chat_model(
+                model_id,
+                lambda: ChatAnthropic(
+                    model=model_id,
+                    temperature=TEMPERATURE,
+                    max_tokens=4096,
+                    max_retries=2,  # Retry interno do cliente
+                    timeout=60.0,   # Timeout mais longo
+                    streaming=STREAMING_ENABLED
+                ),
+                streaming=STREAMING_ENABLED
             )
             agent_type = "tool-calling"  # Claude usa tool-calling
 
         elif model_id in GOOGLE_MODELS:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
             # Gemini com tool-calling e configurações otimizadas
-            llm = ChatGoogleGenerativeAI(
-                model=model_id,
-                temperature=TEMPERATURE,
-                max_tokens=4096,
-                max_retries=2,
-                timeout=60.0
+            llm = build_chat_model(
+                model_id,
+                lambda: ChatGoogleGenerativeAI(
+                    model=model_id,
+                    temperature=TEMPERATURE,
+                    max_tokens=4096,
+                    max_retries=2,
+                    timeout=60.0,
+                    streaming=STREAMING_ENABLED
+                ),
+                streaming=STREAMING_ENABLED
             )
             agent_type = "tool-calling"  # Gemini usa tool-calling
 
         else:
+            from langchain_openai import ChatOpenAI
+
             # Fallback para OpenAI
-            llm = ChatOpenAI(
-                model="gpt-4o-mini",
-                temperature=TEMPERATURE
+            llm = build_chat_model(
+                "gpt-4o-mini",
+                lambda: ChatOpenAI(
+                    model="gpt-4o-mini",
+                    temperature=TEMPERATURE,
+                    streaming=STREAMING_ENABLED
+                ),
+                streaming=STREAMING_ENABLED
             )
             agent_type = "openai-tools"
             logging.warning(f"Modelo {model_name} não reconhecido, usando gpt-4o-mini como fallback")
@@ -306,12 +340,17 @@ class SQLAgentManager:
             logging.warning(f"Erro ao extrair texto da resposta: {e}")
             return str(output)
 
-    async def execute_query(self, instruction: str) -> dict:
+    async def execute_query(self, instruction: str, callbacks=None) -> dict:
         """
         Executa uma query através do agente SQL com retry para rate limiting
 
+        O agente roda em uma thread separada para não bloquear o event loop,
+        permitindo que os tokens sejam transmitidos enquanto a query executa.
+
         Args:
             instruction: Instrução para o agente
+            callbacks: Callbacks adicionais (lista de handlers ou CallbackManager
+                do nó do grafo, usado para streaming de eventos)
 
         Returns:
             Resultado da execução
@@ -322,6 +361,19 @@ class SQLAgentManager:
             # Criar handler para capturar SQL
             sql_handler = SQLQueryCaptureHandler()
 
+            # Combina o handler de captura com os callbacks recebidos (streaming)
+            if isinstance(callbacks, BaseCallbackManager):
+                run_callbacks = callbacks.copy()
+                run_callbacks.add_handler(sql_handler, inherit=True)
+            else:
+                run_callbacks = list(callbacks or []) + [sql_handler]
+
+            def invoke_agent():
+                return self.agent.invoke(
+                    {"input": instruction},
+                    {"callbacks": run_callbacks}
+                )
+
             # Verifica se é agente Claude ou Gemini para aplicar retry
             model_id = getattr(self, 'model_name', '')
             is_claude = any(claude_model in model_id for claude_model in ANTHROPIC_MODELS)
@@ -330,19 +382,13 @@ class SQLAgentManager:
             if is_claude or is_gemini:
                 # Usa retry com backoff para Claude e Gemini
                 response = await retry_with_backoff(
-                    lambda: self.agent.invoke(
-                        {"input": instruction},
-                        {"callbacks": [sql_handler]}
-                    ),
+                    lambda: asyncio.to_thread(invoke_agent),
                     max_retries=3,
                     base_delay=2.0
                 )
             else:
                 # Execução normal para outros modelos
-                response = self.agent.invoke(
-                    {"input": instruction},
-                    {"callbacks": [sql_handler]}
-                )
+                response = await asyncio.to_thread(invoke_agent)
 
             # Extrai e limpa a resposta
             raw_output = response.get("output", "Erro ao obter a resposta do agente.")
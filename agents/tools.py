@@ -5,12 +5,7 @@ import time
 import logging
 import re
 from typing import Dict, Any, Optional, List
-from huggingface_hub import InferenceClient
-from langchain_community.utilities import SQLDatabase
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
 import pandas as pd
-import sqlalchemy as sa
 
 from utils.config import (
     HUGGINGFACE_API_KEY,
@@ -25,28 +20,44 @@ from utils.config import (
     HUGGINGFACE_MODELS
 )
 
-# Cliente HuggingFace
-hf_client = InferenceClient(
-    provider="together",
-    api_key=HUGGINGFACE_API_KEY
-)
-
-# Cliente OpenAI
-openai_client = None
-if OPENAI_API_KEY:
-    openai_client = ChatOpenAI(
-        api_key=OPENAI_API_KEY,
-        temperature=0
-    )
-
-# Cliente Anthropic
-anthropic_client = None
-if ANTHROPIC_API_KEY:
-    anthropic_client = ChatAnthropic(
-        model="claude-3-5-sonnet-20241022",
-        api_key=ANTHROPIC_API_KEY,
-        temperature=0
-    )
+# Clientes criados no primeiro uso (importar o módulo não carrega os SDKs)
+_hf_client = None
+_openai_client = None
+_anthropic_client = None
+
+def get_hf_client():
+    """Retorna cliente HuggingFace (singleton)"""
+    global _hf_client
+    if _hf_client is None:
+        from huggingface_hub import InferenceClient
+        _hf_client = InferenceClient(
+            provider="together",
+            api_key=HUGGINGFACE_API_KEY
+        )
+    return _hf_client
+
+def get_openai_client():
+    """Retorna cliente OpenAI (singleton) ou None sem API key"""
+    global _openai_client
+    if _openai_client is None and OPENAI_API_KEY:
+        from langchain_openai import ChatOpenAI
+        _openai_client = ChatOpenAI(
+            api_key=OPENAI_API_KEY,
+            temperature=0
+        )
+    return _openai_client
+
+def get_anthropic_client():
+    """Retorna cliente Anthropic (singleton) ou None sem API key"""
+    global _anthropic_client
+    if _anthropic_client is None and ANTHROPIC_API_KEY:
+        from langchain_anthropic import ChatAnthropic
+        _anthropic_client = ChatAnthropic(
+            model="claude-3-5-sonnet-20241022",
+            api_key=ANTHROPIC_API_KEY,
+            temperature=0
+        )
+    return _anthropic_client
 
 # Função generate_initial_context removida - era redundante
 
@@ -263,7 +274,7 @@ def prepare_processing_context(user_query: str, columns_data: dict, connection_t
 
     return context.strip()
 
-def prepare_sql_context(user_query: str, db_sample: pd.DataFrame, suggested_query: str = "", query_observations: str = "") -> str:
+def prepare_sql_context(user_query: str, db_sample: pd.DataFrame, suggested_query: str = "", query_observations: str = "", relevant_tables: list = None) -> str:
     """
     Prepara o contexto inicial para ser enviado diretamente ao agentSQL
 
@@ -272,6 +283,7 @@ def prepare_sql_context(user_query: str, db_sample: pd.DataFrame, suggested_quer
         db_sample: Amostra dos dados do banco
         suggested_query: Query SQL sugerida pelo Processing Agent (opcional)
         query_observations: Observações sobre a query sugerida (opcional)
+        relevant_tables: Tabelas mais relevantes para a pergunta segundo o índice de schema (opcional)
 
     Returns:
         Contexto formatado para o agentSQL
@@ -300,8 +312,17 @@ def prepare_sql_context(user_query: str, db_sample: pd.DataFrame, suggested_quer
     else:
         logging.info(f"[SQL CONTEXT] ℹ️ Contexto do SQL Agent preparado SEM sugestão de query")
 
+    # Restringe a inspeção de schema às tabelas relevantes (evita sql_db_schema em todas as tabelas)
+    contexto_tabelas = ""
+    if relevant_tables:
+        contexto_tabelas = (
+            f"Tabelas mais relevantes para esta pergunta: {', '.join(relevant_tables)}\n"
+            "Consulte o schema (sql_db_schema) apenas dessas tabelas, a menos que precise de outra.\n\n"
+        )
+        logging.info(f"[SQL CONTEXT] 🎯 {len(relevant_tables)} tabelas relevantes incluídas no contexto")
+
     # Monta contexto final
-    context = contexto_base + contexto_opcao_query + f"Pergunta do usuário: \n{user_query}"
+    context = contexto_base + contexto_tabelas + contexto_opcao_query + f"Pergunta do usuário: \n{user_query}"
 
     return context
 
@@ -333,13 +354,18 @@ async def refine_response_with_llm(
     logging.info(f"[DEBUG] Prompt enviado ao modelo de refinamento:\n{prompt}\n")
 
     try:
-        response = hf_client.chat.completions.create(
-            model=REFINEMENT_MODELS["LLaMA 70B"],
-            messages=[{"role": "system", "content": prompt}],
-            max_tokens=1200,
-            stream=False
-        )
-        improved_response = response["choices"][0]["message"]["content"]
+        from agents.llm_provider import acomplete_text
+
+        def _call_hf():
+            response = get_hf_client().chat.completions.create(
+                model=REFINEMENT_MODELS["LLaMA 70B"],
+                messages=[{"role": "system", "content": prompt}],
+                max_tokens=1200,
+                stream=False
+            )
+            return response["choices"][0]["message"]["content"]
+
+        improved_response = await acomplete_text(REFINEMENT_MODELS["LLaMA 70B"], prompt, _call_hf)
         logging.info(f"[DEBUG] Resposta do modelo de refinamento:\n{improved_response}\n")
         return improved_response + ("\n\n" + chart_md if chart_md else "")
 
@@ -389,7 +415,8 @@ class CacheManager:
 
 # ==================== FUNÇÕES DE GRÁFICOS ====================
 
-def generate_graph_type_context(user_query: str, sql_query: str, df_columns: List[str], df_sample: pd.DataFrame) -> str:
+def generate_graph_type_context(user_query: str, sql_query: str, df_columns: List[str], df_sample: pd.DataFrame,
+                                column_stats: Optional[List[Dict[str, Any]]] = None) -> str:
     """
     Gera contexto para LLM escolher o tipo de gráfico mais adequado
 
@@ -398,10 +425,14 @@ def generate_graph_type_context(user_query: str, sql_query: str, df_columns: Lis
         sql_query: Query SQL gerada pelo agente
         df_columns: Lista de colunas retornadas pela query
         df_sample: Amostra dos dados para análise
+        column_stats: Estatísticas do resultado completo (utils.column_stats); min/max e
+            valores únicos usam essas estatísticas em vez da amostra
 
     Returns:
         Contexto formatado para a LLM
     """
+    stats_by_column = {col_stats["column"]: col_stats for col_stats in column_stats or []}
+
     # Criar uma descrição detalhada dos dados para ajudar a LLM a entender melhor a estrutura
     data_description = ""
     if not df_sample.empty:
@@ -436,7 +467,8 @@ def generate_graph_type_context(user_query: str, sql_query: str, df_columns: Lis
         data_description += df_sample.head(3).to_string(index=False)
 
         # Adicionar análise detalhada dos tipos de dados
-        data_description += f"\n\nAnálise dos dados ({len(df_sample)} linhas total):"
+        total_rows = stats_by_column[df_sample.columns[0]]["row_count"] if stats_by_column else len(df_sample)
+        data_description += f"\n\nAnálise dos dados ({total_rows} linhas total):"
         data_description += f"\n- Total de colunas: {len(df_sample.columns)}"
 
         if numeric_cols:
@@ -444,7 +476,9 @@ def generate_graph_type_context(user_query: str, sql_query: str, df_columns: Lis
             # Adiciona informação sobre valores numéricos
             for col in numeric_cols[:2]:  # Máximo 2 colunas para não ficar muito longo
                 try:
-                    if df_sample[col].dtype == 'object':
+                    if stats_by_column.get(col, {}).get("min_value") is not None:
+                        min_val, max_val = stats_by_column[col]["min_value"], stats_by_column[col]["max_value"]
+                    elif df_sample[col].dtype == 'object':
                         # Converte strings para números
                         numeric_values = pd.to_numeric(df_sample[col].astype(str).str.replace(',', '.'), errors='coerce')
                         min_val, max_val = numeric_values.min(), numeric_values.max()
@@ -461,7 +495,7 @@ def generate_graph_type_context(user_query: str, sql_query: str, df_columns: Lis
             data_description += f"\n- Colunas CATEGÓRICAS ({len(categorical_cols)}): {', '.join(categorical_cols)}"
             # Adiciona informação sobre categorias únicas
             for col in categorical_cols[:3]:  # Máximo 3 colunas
-                unique_count = df_sample[col].nunique()
+                unique_count = stats_by_column[col]["distinct_count"] if col in stats_by_column else df_sample[col].nunique()
                 data_description += f"\n  • {col}: {unique_count} valores únicos"
 
             # Destaque especial para múltiplas categóricas importantes
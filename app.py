@@ -8,6 +8,7 @@ import logging
 import gradio as gr
 import tempfile
 import os
+import shutil
 import subprocess
 import threading
 import time
@@ -15,10 +16,9 @@ import uuid
 import json
 from typing import Dict, Any, Optional, List, Tuple
 import atexit
+from collections import OrderedDict
 from typing import List, Tuple, Optional, Dict
-from PIL import Image
 
-from graphs.main_graph import initialize_graph, get_graph_manager
 from utils.config import (
     AVAILABLE_MODELS,
     REFINEMENT_MODELS,
@@ -34,17 +34,30 @@ from utils.config import (
     CELERY_RESULT_BACKEND,
     CELERY_WORKER_CONCURRENCY,
     CELERY_WORKER_COUNT,
+    CELERY_QUEUE_INTERACTIVE,
+    CELERY_QUEUE_BULK,
+    CELERY_QUEUE_INGESTION,
+    CELERY_BULK_CONCURRENCY,
+    CELERY_INGESTION_CONCURRENCY,
+    CELERY_AFFINITY_ENABLED,
+    CELERY_AFFINITY_SLOTS,
+    CELERY_AFFINITY_POOL,
     FLOWER_PORT,
     is_docker_environment,
     get_environment_info,
     get_redis_connection_url,
     REDIS_HOST,
-    REDIS_PORT
+    REDIS_PORT,
+    STREAMING_ENABLED,
+    METRICS_PORT,
+    CELERY_METRICS_PORT
 )
 from utils.object_manager import get_object_manager
 from utils.session_manager import get_session_manager
 from utils.session_paths import get_session_paths
 from utils.session_cleanup import start_cleanup_service, get_cleanup_service
+from utils.session_affinity import get_slot_queue
+from utils.metrics import start_metrics_server
 
 # Configuração de logging
 logging.basicConfig(
@@ -70,8 +83,28 @@ redis_process = None
 celery_enabled = False
 redis_available = False
 
-# Variável global para armazenar a última SQL query (para criação de tabelas)
-_last_sql_query = None
+# Última query de cada sessão (chave: current_session_id ou "global", a mesma do ResultPager):
+# - sql_query: query original (criação de tabelas)
+# - result_query: query sem LIMIT (paginação e exportação do resultado completo)
+# - engine: engine que a executou (o engine_id global muda com uploads/conexões de outras sessões)
+_last_queries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_LAST_QUERIES_MAX = 256  # Sessões mais antigas saem primeiro
+
+def _last_query_key() -> str:
+    return current_session_id or "global"
+
+def _get_last_query() -> Dict[str, Any]:
+    """Última query da sessão atual (vazio se nenhuma)"""
+    return _last_queries.get(_last_query_key(), {})
+
+def _set_last_query(**values):
+    """Atualiza a última query da sessão atual"""
+    key = _last_query_key()
+    entry = _last_queries.pop(key, {})
+    entry.update(values)
+    _last_queries[key] = entry
+    while len(_last_queries) > _LAST_QUERIES_MAX:
+        _last_queries.popitem(last=False)
 
 def initialize_session_system():
     """Inicializa o sistema de sessões temporárias"""
@@ -112,12 +145,9 @@ def get_or_create_session() -> str:
         if not initialize_session_system():
             raise Exception("Falha ao inicializar sistema de sessões")
 
-    # Verifica se sessão ainda é válida
+    # Verifica se sessão ainda é válida e renova (um único round-trip no Redis)
     if session_manager and current_session_id:
-        session_data = session_manager.get_session(current_session_id)
-        if session_data:
-            # Renova sessão
-            session_manager.renew_session(current_session_id)
+        if session_manager.renew_session(current_session_id):
             return current_session_id
 
     # Cria nova sessão se necessário
@@ -126,12 +156,14 @@ def get_or_create_session() -> str:
 
     return current_session_id
 
-def update_session_config(updates: Dict[str, Any]) -> bool:
+def update_session_config(updates: Dict[str, Any], increments: Optional[Dict[str, int]] = None, session_id: Optional[str] = None) -> bool:
     """
     Atualiza configurações da sessão atual
 
     Args:
         updates: Dicionário com atualizações
+        increments: Contadores a incrementar (ex: {"total_queries": 1})
+        session_id: Sessão já resolvida (evita nova renovação no Redis)
 
     Returns:
         True se atualizou com sucesso
@@ -139,14 +171,14 @@ def update_session_config(updates: Dict[str, Any]) -> bool:
     global session_manager, current_session_id
 
     try:
-        session_id = get_or_create_session()
+        session_id = session_id or get_or_create_session()
 
         # Se sessões não estão disponíveis, apenas loga e retorna True
         if session_id == "default" or not session_manager:
             logging.info(f"[SESSION] Configuração ignorada (sessões não disponíveis): {list(updates.keys())}")
             return True
 
-        return session_manager.update_session(session_id, updates)
+        return session_manager.update_session(session_id, updates, increments=increments)
     except Exception as e:
         logging.warning(f"[SESSION] Erro ao atualizar configuração: {e}")
         return True  # Não falha a aplicação
@@ -258,11 +290,10 @@ def check_redis_availability():
     global redis_available
 
     try:
-        import redis
+        from utils.redis_client import get_redis_client
 
-        # Usa configurações dinâmicas baseadas no ambiente
-        redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0)
-        redis_client.ping()
+        # Usa configurações dinâmicas baseadas no ambiente (pool compartilhado)
+        get_redis_client(0).ping()
         redis_available = True
 
         env_info = get_environment_info()
@@ -293,32 +324,62 @@ def start_celery_worker():
             # Pool baseado na variável de ambiente ou padrão
             pool_type = os.getenv("CELERY_POOL", "prefork")
 
+            # Workers dedicados por fila: interativa (chat), bulk (testes) e ingestão
+            # (filas, concurrency, pool, slot de afinidade)
+            if CELERY_AFFINITY_ENABLED:
+                # Cada slot consome sua fila dedicada + a compartilhada (fallback) em um único processo:
+                # com mais filhos por worker as tasks da sessão se espalhariam entre registries diferentes.
+                # Com prefork os limites de tempo e a reciclagem de processos continuam valendo
+                worker_specs = [
+                    (f"{get_slot_queue(slot)},{CELERY_QUEUE_INTERACTIVE}", 1, CELERY_AFFINITY_POOL, slot)
+                    for slot in range(CELERY_AFFINITY_SLOTS)
+                ]
+            else:
+                worker_specs = [(CELERY_QUEUE_INTERACTIVE, CELERY_WORKER_CONCURRENCY, pool_type, None)] * CELERY_WORKER_COUNT
+            worker_specs.append((CELERY_QUEUE_BULK, CELERY_BULK_CONCURRENCY, pool_type, None))
+            if CELERY_INGESTION_CONCURRENCY > 0:
+                worker_specs.append((CELERY_QUEUE_INGESTION, CELERY_INGESTION_CONCURRENCY, pool_type, None))
+
             # Inicia múltiplos workers
             celery_worker_processes = []
 
-            for worker_id in range(CELERY_WORKER_COUNT):
-                worker_name_multi = f"worker-{worker_id}-{int(time.time())}@agentgraph"
+            for worker_id, (queue_name, queue_concurrency, worker_pool, affinity_slot) in enumerate(worker_specs):
+                worker_name_multi = f"worker-{queue_name.split(',')[0]}-{worker_id}-{int(time.time())}@agentgraph"
+
+                worker_env = os.environ.copy()
+                if affinity_slot is not None:
+                    worker_env["AGENTGRAPH_AFFINITY_SLOT"] = str(affinity_slot)
+
+                # Endpoint de métricas por worker; no prefork os processos filhos agregam via diretório compartilhado
+                worker_env["AGENTGRAPH_METRICS_PORT"] = str(CELERY_METRICS_PORT + worker_id)
+                if worker_pool == "prefork":
+                    metrics_dir = os.path.join(tempfile.gettempdir(), "agentgraph_metrics", f"worker_{worker_id}")
+                    shutil.rmtree(metrics_dir, ignore_errors=True)
+                    os.makedirs(metrics_dir, exist_ok=True)
+                    worker_env["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
 
                 cmd = [
                     sys.executable, "-m", "celery",
                     "-A", "tasks",
                     "worker",
-                    f"--concurrency={CELERY_WORKER_CONCURRENCY}",
+                    f"--queues={queue_name}",
+                    f"--concurrency={queue_concurrency}",
                     f"--hostname={worker_name_multi}",
                     "--loglevel=INFO",
-                    f"--pool={pool_type}",  # Pool dinâmico
+                    f"--pool={worker_pool}",  # Pool dinâmico
                     "--without-gossip",  # Desabilita gossip
                     "--without-mingle",  # Desabilita mingle
                     "--events"  # Habilita events explicitamente
                 ]
 
-                logging.info(f"[CELERY] Iniciando worker {worker_id+1}/{CELERY_WORKER_COUNT}: {worker_name_multi}")
+                logging.info(f"[CELERY] Iniciando worker {worker_id+1}/{len(worker_specs)} (fila {queue_name}, concurrency {queue_concurrency}): {worker_name_multi}")
 
                 process = subprocess.Popen(
                     cmd,
                     stdout=subprocess.PIPE,
                     stderr=subprocess.STDOUT,
                     cwd=os.getcwd(),
+                    env=worker_env,
                     text=True,
                     bufsize=1,
                     universal_newlines=True
@@ -330,14 +391,20 @@ def start_celery_worker():
             celery_worker_process = celery_worker_processes[0] if celery_worker_processes else None
 
             logging.info(f"[CELERY] Pool configurado: {pool_type}")
-            logging.info(f"[CELERY] Total: {CELERY_WORKER_COUNT} workers x {CELERY_WORKER_CONCURRENCY} concurrency = {CELERY_WORKER_COUNT * CELERY_WORKER_CONCURRENCY} processos")
+            if CELERY_AFFINITY_ENABLED:
+                logging.info(f"[CELERY] Fila {CELERY_QUEUE_INTERACTIVE}: afinidade de sessão com {CELERY_AFFINITY_SLOTS} slots de 1 processo (pool {CELERY_AFFINITY_POOL})")
+            else:
+                logging.info(f"[CELERY] Fila {CELERY_QUEUE_INTERACTIVE}: {CELERY_WORKER_COUNT} workers x {CELERY_WORKER_CONCURRENCY} concurrency = {CELERY_WORKER_COUNT * CELERY_WORKER_CONCURRENCY} processos")
+            logging.info(f"[CELERY] Fila {CELERY_QUEUE_BULK}: {CELERY_BULK_CONCURRENCY} | Fila {CELERY_QUEUE_INGESTION}: {CELERY_INGESTION_CONCURRENCY}")
 
         else:
             # Configuração para Windows - single worker com solo pool
+            # Consome todas as filas; a ordem de -Q e a prioridade favorecem a interativa
             cmd = [
                 sys.executable, "-m", "celery",
                 "-A", "tasks",
                 "worker",
+                f"--queues={CELERY_QUEUE_INTERACTIVE},{CELERY_QUEUE_INGESTION},{CELERY_QUEUE_BULK}",
                 f"--concurrency={CELERY_WORKER_CONCURRENCY}",
                 f"--hostname={worker_name}",  # Nome único também no Windows
                 "--loglevel=INFO",
@@ -626,7 +693,8 @@ async def initialize_app():
         logging.info(f"[INIT] Status final celery_enabled: {celery_enabled}")
         logging.info(f"[INIT] CELERY_ENABLED config: {CELERY_ENABLED}")
 
-        # Inicializa o grafo
+        # Inicializa o grafo (import adiado: Redis e workers do Celery já sobem em paralelo)
+        from graphs.main_graph import initialize_graph
         graph_manager = await initialize_graph()
 
         # Inicializa como conectado (base padrão já carregada)
@@ -659,6 +727,44 @@ def run_async(coro):
     
     return loop.run_until_complete(coro)
 
+def run_async_stream(agen):
+    """Consome um gerador assíncrono de forma síncrona (para handlers geradores do Gradio)"""
+    try:
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(agen.aclose())
+
+# Rótulos de progresso exibidos no chat durante o streaming
+NODE_PROGRESS_LABELS = {
+    "validate_input": "Validando pergunta",
+    "check_cache": "Verificando cache",
+    "question_refinement": "Refinando pergunta",
+    "connection_selection": "Selecionando conexão",
+    "postgresql_connection": "Conectando ao PostgreSQL",
+    "csv_processing": "Processando CSV",
+    "create_database": "Criando banco de dados",
+    "load_database": "Carregando banco de dados",
+    "process_initial_context": "Analisando contexto",
+    "prepare_context": "Preparando contexto",
+    "get_db_sample": "Obtendo amostra dos dados",
+    "process_query": "Consultando o banco",
+    "celery_dispatch": "Consultando o banco",
+    "graph_selection": "Selecionando gráfico",
+    "graph_generation": "Gerando gráfico",
+    "refine_response": "Refinando resposta",
+    "format_response": "Formatando resposta",
+}
+
 def chatbot_response(user_input: str, selected_model: str, advanced_mode: bool = False, processing_enabled: bool = False, processing_model: str = "GPT-4o-mini", connection_type: str = "csv", postgresql_config: Optional[Dict] = None, selected_table: str = None, single_table_mode: bool = False, top_k: int = 10) -> Tuple[str, Optional[str]]:
     """
     Processa resposta do chatbot usando LangGraph
@@ -684,80 +790,155 @@ def chatbot_response(user_input: str, selected_model: str, advanced_mode: bool =
         return "❌ Sistema não inicializado. Tente recarregar a página.", None
 
     try:
-        # Obtém sessão atual
-        session_id = get_or_create_session()
+        query_params = _prepare_chatbot_query(user_input, selected_model, advanced_mode, processing_enabled, processing_model, connection_type, postgresql_config, selected_table, single_table_mode, top_k)
 
-        # Atualiza configurações da sessão
-        session_updates = {
-            "selected_model": selected_model,
-            "advanced_mode": advanced_mode,
-            "processing_enabled": processing_enabled,
-            "processing_model": processing_model,
-            "connection_type": connection_type,
-            "single_table_mode": single_table_mode,
-            "selected_table": selected_table,
-            "top_k": top_k,
-            "total_queries": session_manager.get_session(session_id).get("total_queries", 0) + 1
-        }
+        # Processa query através do LangGraph com session_id
+        result = run_async(graph_manager.process_query(**query_params))
 
-        if postgresql_config:
-            session_updates["postgresql_config"] = postgresql_config
+        return _build_chatbot_output(result, connection_type)
 
-        update_session_config(session_updates)
+    except Exception as e:
+        error_msg = f"Erro no chatbot: {e}"
+        logging.error(error_msg)
+        logging.error(f"Detalhes do erro: {type(e).__name__}: {str(e)}")
+        return error_msg, None
 
-        # Log simples
-        logging.info(f"[CHATBOT] Sessão: {session_id}")
-        logging.info(f"[CHATBOT] Usando Celery: {celery_enabled}")
-        logging.info(f"[CHATBOT] 📊 TOP_K para LangGraph: {top_k}")
+def chatbot_response_stream(user_input: str, selected_model: str, advanced_mode: bool = False, processing_enabled: bool = False, processing_model: str = "GPT-4o-mini", connection_type: str = "csv", postgresql_config: Optional[Dict] = None, selected_table: str = None, single_table_mode: bool = False, top_k: int = 10):
+    """
+    Versão em streaming de chatbot_response
 
-        # Processa query através do LangGraph com session_id
-        result = run_async(graph_manager.process_query(
-            user_input=user_input,
-            session_id=session_id,
-            selected_model=selected_model,
-            advanced_mode=advanced_mode,
-            processing_enabled=processing_enabled,
-            processing_model=processing_model,
-            connection_type=connection_type,
-            postgresql_config=postgresql_config,
-            selected_table=selected_table,
-            single_table_mode=single_table_mode,
-            top_k=top_k,
-            use_celery=celery_enabled
-        ))
+    Yields:
+        ("partial", texto_parcial) durante o processamento e, ao final,
+        ("final", (resposta_texto, caminho_imagem_grafico, update_botao_tabela))
+    """
+    global graph_manager
 
-        response_text = result.get("response", "Erro ao processar resposta")
-        graph_image_path = None
-        show_create_table_btn = False
-
-        # Captura SQL query para uso posterior na criação de tabelas
-        sql_query = result.get("sql_query_extracted") or result.get("sql_query")
-        if sql_query and connection_type == "postgresql":
-            # Armazena a SQL query globalmente para uso no modal
-            global _last_sql_query
-            _last_sql_query = sql_query
-            show_create_table_btn = True
-            logging.info(f"[RESPOND] ✅ SQL query capturada para criação de tabela: {sql_query[:50]}...")
-            logging.info(f"[RESPOND] ✅ Botão de criar tabela será mostrado")
-        else:
-            logging.info(f"[RESPOND] ❌ Botão de criar tabela não será mostrado (SQL: {bool(sql_query)}, Conn: {connection_type})")
+    if not graph_manager:
+        yield "final", ("❌ Sistema não inicializado. Tente recarregar a página.", None, gr.update(visible=False))
+        return
 
-        # Verifica se foi gerado um gráfico
-        if result.get("graph_generated", False) and result.get("graph_image_id"):
-            graph_image_path = save_graph_image_to_temp(result["graph_image_id"])
+    try:
+        query_params = _prepare_chatbot_query(user_input, selected_model, advanced_mode, processing_enabled, processing_model, connection_type, postgresql_config, selected_table, single_table_mode, top_k)
+
+        streamed_text = ""
+        progress = ""
+        result = None
+
+        for event in run_async_stream(graph_manager.stream_query(**query_params)):
+            if event["type"] == "node":
+                label = NODE_PROGRESS_LABELS.get(event["node"])
+                if not label:
+                    continue
+                progress = f"⏳ _{label}..._"
+            elif event["type"] == "token":
+                streamed_text += event["content"]
+            elif event["type"] == "final":
+                result = event["result"]
+                continue
 
-            # Adiciona informação sobre o gráfico na resposta
-            if graph_image_path:
-                graph_type = result.get("graph_type", "gráfico")
-                response_text += f"\n\n📊 **Gráfico gerado**: {graph_type.replace('_', ' ').title()}"
+            yield "partial", f"{progress}\n\n{streamed_text}" if streamed_text else progress
 
-        return response_text, graph_image_path, gr.update(visible=show_create_table_btn)
+        yield "final", _build_chatbot_output(result or {}, connection_type)
 
     except Exception as e:
         error_msg = f"Erro no chatbot: {e}"
         logging.error(error_msg)
         logging.error(f"Detalhes do erro: {type(e).__name__}: {str(e)}")
-        return error_msg, None
+        yield "final", (error_msg, None, gr.update(visible=False))
+
+def _prepare_chatbot_query(user_input: str, selected_model: str, advanced_mode: bool, processing_enabled: bool, processing_model: str, connection_type: str, postgresql_config: Optional[Dict], selected_table: str, single_table_mode: bool, top_k: int) -> Dict[str, Any]:
+    """
+    Atualiza a sessão e monta os parâmetros da query para o LangGraph
+
+    Returns:
+        Dicionário de parâmetros para process_query/stream_query
+    """
+    # Obtém sessão atual
+    session_id = get_or_create_session()
+
+    # Atualiza configurações da sessão
+    session_updates = {
+        "selected_model": selected_model,
+        "advanced_mode": advanced_mode,
+        "processing_enabled": processing_enabled,
+        "processing_model": processing_model,
+        "connection_type": connection_type,
+        "single_table_mode": single_table_mode,
+        "selected_table": selected_table,
+        "top_k": top_k
+    }
+
+    if postgresql_config:
+        session_updates["postgresql_config"] = postgresql_config
+
+    # HSET parcial + incremento de total_queries em um único round-trip
+    update_session_config(session_updates, increments={"total_queries": 1}, session_id=session_id)
+
+    # Log simples
+    logging.info(f"[CHATBOT] Sessão: {session_id}")
+    logging.info(f"[CHATBOT] Usando Celery: {celery_enabled}")
+    logging.info(f"[CHATBOT] 📊 TOP_K para LangGraph: {top_k}")
+
+    return {
+        "user_input": user_input,
+        "session_id": session_id,
+        "selected_model": selected_model,
+        "advanced_mode": advanced_mode,
+        "processing_enabled": processing_enabled,
+        "processing_model": processing_model,
+        "connection_type": connection_type,
+        "postgresql_config": postgresql_config,
+        "selected_table": selected_table,
+        "single_table_mode": single_table_mode,
+        "top_k": top_k,
+        "use_celery": celery_enabled
+    }
+
+def _build_chatbot_output(result: Dict[str, Any], connection_type: str):
+    """
+    Converte o resultado do LangGraph na saída do chat
+
+    Returns:
+        Tupla com (resposta_texto, caminho_imagem_grafico, update_botao_tabela)
+    """
+    response_text = result.get("response", "Erro ao processar resposta")
+    graph_image_path = None
+    show_create_table_btn = False
+
+    # Captura SQL query para uso posterior na criação de tabelas
+    sql_query = result.get("sql_query_extracted") or result.get("sql_query")
+    if sql_query:
+        from utils.postgresql_table_creator import remove_limit_from_query
+        from utils.result_set import get_result_pager
+
+        # Nova query: o cursor da paginação anterior deixa de valer
+        _set_last_query(
+            result_query=remove_limit_from_query(sql_query),
+            engine=_resolve_query_engine(result)
+        )
+        get_result_pager().close(_last_query_key())
+    if sql_query and connection_type == "postgresql":
+        # Armazena a SQL query da sessão para uso no modal
+        _set_last_query(sql_query=sql_query)
+        show_create_table_btn = True
+        logging.info(f"[RESPOND] ✅ SQL query capturada para criação de tabela: {sql_query[:50]}...")
+        logging.info(f"[RESPOND] ✅ Botão de criar tabela será mostrado")
+    else:
+        logging.info(f"[RESPOND] ❌ Botão de criar tabela não será mostrado (SQL: {bool(sql_query)}, Conn: {connection_type})")
+
+    # Verifica se foi gerado um gráfico
+    if result.get("graph_generated", False) and result.get("graph_image_id"):
+        graph_image_path = save_graph_image_to_temp(result["graph_image_id"])
+
+        # Adiciona informação sobre o gráfico na resposta
+        if graph_image_path:
+            graph_type = result.get("graph_type", "gráfico")
+            response_text += f"\n\n📊 **Gráfico gerado**: {graph_type.replace('_', ' ').title()}"
+            graph_data = result.get("graph_data") or {}
+            if graph_data.get("truncated"):
+                response_text += f" (primeiras {graph_data.get('rows')} linhas do resultado)"
+
+    return response_text, graph_image_path, gr.update(visible=show_create_table_btn)
 
 def save_graph_image_to_temp(graph_image_id: str) -> Optional[str]:
     """
@@ -770,6 +951,8 @@ def save_graph_image_to_temp(graph_image_id: str) -> Optional[str]:
         Caminho do arquivo temporário ou None se falhar
     """
     try:
+        from PIL import Image
+
         obj_manager = get_object_manager()
         graph_image = obj_manager.get_object(graph_image_id)
 
@@ -850,8 +1033,21 @@ def handle_csv_upload(file) -> str:
         session_upload_dir = session_paths.get_session_upload_dir(session_id)
         session_csv_path = os.path.join(session_upload_dir, os.path.basename(file.name))
 
+        # Arquivo com mesmo nome será sobrescrito: reserva só a diferença de tamanho
+        previous_size = os.path.getsize(session_csv_path) if os.path.exists(session_csv_path) else 0
+        size_delta = file_size - previous_size
+
+        # Reserva espaço antes de gravar (cotas por sessão e global)
+        quota = session_manager.reserve_session_space(session_id, size_delta)
+        if not quota["allowed"]:
+            return f"❌ {quota['message']}"
+
         import shutil
-        shutil.copy2(file.name, session_csv_path)
+        try:
+            shutil.copy2(file.name, session_csv_path)
+        except Exception:
+            session_manager.record_disk_usage(session_id, -size_delta)
+            raise
         logging.info(f"[UPLOAD] Arquivo copiado para sessão: {session_csv_path}")
 
         # Processa upload através do CustomNodeManager usando caminho da sessão
@@ -1168,6 +1364,37 @@ def respond(message: str, chat_history: List[Dict[str, str]], selected_model: st
 
     return "", chat_history, graph_image_path, create_table_btn_update
 
+def respond_stream(message: str, chat_history: List[Dict[str, str]], selected_model: str, advanced_mode: bool, processing_enabled: bool = False, processing_model: str = "GPT-4o-mini", connection_type: str = "csv", postgresql_config: Optional[Dict] = None, selected_table: str = None, single_table_mode: bool = False, top_k: int = 10):
+    """
+    Versão em streaming de respond: atualiza a mensagem do assistente
+    conforme o progresso dos nós e os tokens chegam
+
+    Yields:
+        Tupla com (mensagem_vazia, histórico_atualizado, imagem_grafico, update_botao_tabela)
+    """
+    logging.info(f"[GRADIO RESPOND] ===== NOVA REQUISIÇÃO (STREAMING) =====")
+    logging.info(f"[GRADIO RESPOND] Message: {message}")
+    logging.info(f"[GRADIO RESPOND] Selected model: {selected_model}")
+    logging.info(f"[GRADIO RESPOND] 📊 TOP_K recebido: {top_k}")
+
+    if not message.strip():
+        yield "", chat_history, None, gr.update()
+        return
+
+    # Mensagem do assistente é preenchida incrementalmente
+    chat_history.append({"role": "user", "content": message})
+    chat_history.append({"role": "assistant", "content": "⏳ _Processando..._"})
+    yield "", chat_history, None, gr.update()
+
+    for kind, payload in chatbot_response_stream(message, selected_model, advanced_mode, processing_enabled, processing_model, connection_type, postgresql_config, selected_table, single_table_mode, top_k):
+        if kind == "partial":
+            chat_history[-1]["content"] = payload
+            yield "", chat_history, None, gr.update()
+        else:
+            response, graph_image_path, create_table_btn_update = payload
+            chat_history[-1]["content"] = response
+            yield "", chat_history, graph_image_path, create_table_btn_update
+
 def handle_csv_and_clear_chat(file):
     """
     Processa csv e limpa chat com indicador de carregamento melhorado
@@ -1347,8 +1574,6 @@ def hide_create_table_modal():
 
 def create_table_from_sql(table_name, pg_host, pg_port, pg_db, pg_user, pg_pass):
     """Cria nova tabela no PostgreSQL baseada na SQL query"""
-    global _last_sql_query
-
     try:
         from utils.postgresql_table_creator import create_table_from_query, validate_table_name
 
@@ -1359,8 +1584,9 @@ def create_table_from_sql(table_name, pg_host, pg_port, pg_db, pg_user, pg_pass)
         if not validate_table_name(table_name.strip()):
             return gr.update(visible=False), "❌ Nome da tabela inválido. Use apenas letras, números e underscore, começando com letra."
 
-        # Recupera a SQL query do estado global
-        if not _last_sql_query:
+        # Recupera a SQL query da sessão
+        last_query = _get_last_query()
+        if not last_query.get("sql_query"):
             return gr.update(visible=False), "❌ Nenhuma query SQL disponível. Execute uma consulta primeiro."
 
         # Prepara configuração PostgreSQL
@@ -1372,11 +1598,15 @@ def create_table_from_sql(table_name, pg_host, pg_port, pg_db, pg_user, pg_pass)
             "password": pg_pass
         }
 
+        # Base onde a query foi executada (cópia em streaming se o destino for outra base)
+        source_engine = last_query.get("engine")
+
         # Cria a tabela (função assíncrona executada de forma síncrona)
         result = run_async(create_table_from_query(
             table_name.strip(),
-            _last_sql_query,
-            postgresql_config
+            last_query["sql_query"],
+            postgresql_config,
+            source_engine=source_engine
         ))
 
         return gr.update(visible=False), result["message"]
@@ -1384,6 +1614,72 @@ def create_table_from_sql(table_name, pg_host, pg_port, pg_db, pg_user, pg_pass)
     except Exception as e:
         return gr.update(visible=False), f"❌ Erro ao criar tabela: {str(e)}"
 
+def _resolve_query_engine(result: Dict[str, Any]):
+    """Engine que executou a query do resultado (engine_id do estado final do grafo)"""
+    engine_id = result.get("engine_id") or (graph_manager.engine_id if graph_manager else None)
+    return get_object_manager().get_engine(engine_id) if engine_id else None
+
+def _get_result_engine():
+    """Engine da base consultada pela última query da sessão (None se indisponível)"""
+    last_query = _get_last_query()
+    if not last_query.get("result_query"):
+        return None
+    return last_query.get("engine")
+
+def show_result_page(page: int):
+    """
+    Exibe uma página do resultado completo da última query
+
+    Returns:
+        Tupla com (tabela, info_pagina, página_atual)
+    """
+    try:
+        from utils.result_set import get_result_pager
+
+        engine = _get_result_engine()
+        if engine is None:
+            return gr.update(value=None), "ℹ️ Nenhuma consulta SQL executada ainda.", 0
+
+        page = max(0, int(page or 0))
+        result = get_result_pager().get_page(_last_query_key(), engine, _get_last_query()["result_query"], page)
+        data = result["data"]
+
+        if data.empty and page > 0:
+            return gr.update(), f"ℹ️ Fim do resultado (página {page})", page - 1
+
+        first_row = result["first_row"] + 1 if len(data) else 0
+        info = f"Página {page + 1} · linhas {first_row}–{result['first_row'] + len(data)}"
+        if result["has_next"]:
+            info += " · há mais linhas"
+        return data, info, page
+
+    except Exception as e:
+        logging.error(f"[RESULT_PAGE] Erro ao carregar página: {e}")
+        return gr.update(), f"❌ Erro ao carregar página: {e}", page
+
+def export_result_csv():
+    """
+    Exporta o resultado completo da última query para CSV (direto do cursor)
+
+    Returns:
+        Tupla com (arquivo, info)
+    """
+    try:
+        from utils.result_set import export_csv
+
+        engine = _get_result_engine()
+        if engine is None:
+            return gr.update(visible=False), "ℹ️ Nenhuma consulta SQL executada ainda."
+
+        temp_file = tempfile.NamedTemporaryFile(delete=False, prefix="resultado_", suffix=".csv")
+        temp_file.close()
+        rows = export_csv(engine, _get_last_query()["result_query"], temp_file.name)
+        return gr.update(value=temp_file.name, visible=True), f"✅ {rows} linhas exportadas"
+
+    except Exception as e:
+        logging.error(f"[RESULT_EXPORT] Erro ao exportar CSV: {e}")
+        return gr.update(visible=False), f"❌ Erro ao exportar CSV: {e}"
+
 # Interface Gradio
 def create_interface():
     """Cria interface Gradio"""
@@ -1728,6 +2024,18 @@ def create_interface():
 
                     create_table_status = gr.Markdown("", visible=False)
 
+                # Resultado completo da última query (páginas lidas do cursor sob demanda)
+                with gr.Accordion("📄 Resultado completo (sem LIMIT)", open=False):
+                    with gr.Row():
+                        result_first_btn = gr.Button("⏮ Primeira", size="sm", scale=1)
+                        result_prev_btn = gr.Button("◀ Anterior", size="sm", scale=1)
+                        result_next_btn = gr.Button("Próxima ▶", size="sm", scale=1)
+                        result_export_btn = gr.Button("⬇️ Exportar CSV", size="sm", scale=1)
+                    result_page_info = gr.Markdown("")
+                    result_table = gr.Dataframe(interactive=False, wrap=True)
+                    result_file = gr.File(visible=False, label="CSV exportado")
+                    result_page = gr.State(0)
+
                 download_file = gr.File(visible=False)
 
 
@@ -1750,7 +2058,8 @@ def create_interface():
                 error_msg = "⚠️ **Aguarde**: Configure e conecte a uma fonte de dados antes de fazer perguntas."
                 chat_history.append({"role": "user", "content": message})
                 chat_history.append({"role": "assistant", "content": error_msg})
-                return "", chat_history, gr.update(visible=False)
+                yield "", chat_history, gr.update(visible=False), gr.update(visible=False)
+                return
 
             # Prepara configuração postgresql se necessário
             postgresql_config = None
@@ -1765,13 +2074,19 @@ def create_interface():
 
             # Converte top_k_value para int se necessário
             top_k = int(top_k_value) if top_k_value else 10
-            empty_msg, updated_history, graph_path, create_table_btn_update = respond(message, chat_history, model, advanced, processing_enabled, processing_model, conn_type, postgresql_config, pg_table, pg_single_mode, top_k)
 
-            # Controla visibilidade do componente de gráfico
-            if graph_path:
-                return empty_msg, updated_history, gr.update(value=graph_path, visible=True), create_table_btn_update
+            if STREAMING_ENABLED:
+                # Streaming: chat atualizado a cada nó/token
+                responses = respond_stream(message, chat_history, model, advanced, processing_enabled, processing_model, conn_type, postgresql_config, pg_table, pg_single_mode, top_k)
             else:
-                return empty_msg, updated_history, gr.update(visible=False), create_table_btn_update
+                responses = [respond(message, chat_history, model, advanced, processing_enabled, processing_model, conn_type, postgresql_config, pg_table, pg_single_mode, top_k)]
+
+            for empty_msg, updated_history, graph_path, create_table_btn_update in responses:
+                # Controla visibilidade do componente de gráfico
+                if graph_path:
+                    yield empty_msg, updated_history, gr.update(value=graph_path, visible=True), create_table_btn_update
+                else:
+                    yield empty_msg, updated_history, gr.update(visible=False), create_table_btn_update
 
         def toggle_processing_agent(enabled):
             """Controla visibilidade do seletor de modelo do Processing Agent"""
@@ -2009,6 +2324,29 @@ def create_interface():
             outputs=[create_table_modal, create_table_status]
         )
 
+        # Event handlers da paginação e exportação do resultado completo
+        result_first_btn.click(
+            lambda: show_result_page(0),
+            outputs=[result_table, result_page_info, result_page]
+        )
+
+        result_prev_btn.click(
+            lambda page: show_result_page(max(0, page - 1)),
+            inputs=result_page,
+            outputs=[result_table, result_page_info, result_page]
+        )
+
+        result_next_btn.click(
+            lambda page: show_result_page(page + 1),
+            inputs=result_page,
+            outputs=[result_table, result_page_info, result_page]
+        )
+
+        result_export_btn.click(
+            export_result_csv,
+            outputs=[result_file, result_page_info]
+        )
+
     return demo
 
 async def main():
@@ -2020,6 +2358,9 @@ async def main():
         logging.error("Falha na inicialização. Encerrando aplicação.")
         return
 
+    # Endpoint de métricas do processo da aplicação
+    start_metrics_server(METRICS_PORT, attempts=5)
+
     # Cria e lança interface
     demo = create_interface()
 
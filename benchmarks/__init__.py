@@ -0,0 +1,23 @@
+"""
+Benchmarks do AgentGraph
+
+Mede o custo de cada etapa (ingestão de CSV, detecção de tipos, carga no
+SQLite, amostragem, geração de gráficos e overhead do grafo completo com
+LLM falso) e emite resultados em JSON para acompanhar regressões entre commits.
+O perfil de import (cold start) de cada processo fica em import_time.
+"""
+import os
+import subprocess
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def get_git_commit() -> str:
+    """Retorna o hash do commit atual (ou 'unknown')"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
@@ -0,0 +1,124 @@
+"""
+Geradores de dados sintéticos para os benchmarks
+
+Todos os geradores são determinísticos (seed fixa) e retornam DataFrames
+com colunas em texto, como o csv_processing_node lê os arquivos (dtype=str).
+"""
+import numpy as np
+import pandas as pd
+
+DEFAULT_SEED = 42
+
+_CATEGORIES = ["Norte", "Nordeste", "Centro-Oeste", "Sudeste", "Sul"]
+_PRODUCTS = ["Notebook", "Celular", "Monitor", "Teclado", "Mouse", "Impressora", "Tablet", "Roteador"]
+
+def _random_dates(rng: np.random.Generator, rows: int) -> pd.Series:
+    """Datas aleatórias entre 2020 e 2024"""
+    start = np.datetime64("2020-01-01")
+    offsets = rng.integers(0, 5 * 365, size=rows)
+    return pd.Series(start + offsets.astype("timedelta64[D]"))
+
+def generate_long(rows: int = 100_000, seed: int = DEFAULT_SEED) -> pd.DataFrame:
+    """
+    Dataset longo e estreito (poucas colunas, muitas linhas) em formato ISO
+
+    Args:
+        rows: Número de linhas
+        seed: Seed do gerador
+
+    Returns:
+        DataFrame com colunas em texto
+    """
+    rng = np.random.default_rng(seed)
+    dates = _random_dates(rng, rows)
+
+    return pd.DataFrame({
+        "id_pedido": np.arange(1, rows + 1).astype(str),
+        "data_pedido": dates.dt.strftime("%Y-%m-%d"),
+        "regiao": rng.choice(_CATEGORIES, size=rows),
+        "produto": rng.choice(_PRODUCTS, size=rows),
+        "quantidade": rng.integers(1, 50, size=rows).astype(str),
+        "valor_total": np.round(rng.uniform(10, 5000, size=rows), 2).astype(str),
+        "dias_atraso": rng.integers(0, 30, size=rows).astype(str),
+    })
+
+def generate_wide(rows: int = 10_000, columns: int = 200, seed: int = DEFAULT_SEED) -> pd.DataFrame:
+    """
+    Dataset largo (muitas colunas) misturando inteiros, decimais, datas e texto
+
+    Args:
+        rows: Número de linhas
+        columns: Número de colunas
+        seed: Seed do gerador
+
+    Returns:
+        DataFrame com colunas em texto
+    """
+    rng = np.random.default_rng(seed)
+    data = {}
+
+    for index in range(columns):
+        kind = index % 4
+        if kind == 0:
+            data[f"inteiro_{index}"] = rng.integers(0, 100_000, size=rows).astype(str)
+        elif kind == 1:
+            data[f"decimal_{index}"] = np.round(rng.normal(1000, 250, size=rows), 3).astype(str)
+        elif kind == 2:
+            data[f"data_{index}"] = _random_dates(rng, rows).dt.strftime("%Y-%m-%d")
+        else:
+            data[f"texto_{index}"] = rng.choice(_PRODUCTS, size=rows)
+
+    return pd.DataFrame(data)
+
+def generate_brazilian(rows: int = 100_000, seed: int = DEFAULT_SEED) -> pd.DataFrame:
+    """
+    Dataset no formato brasileiro: datas dd/mm/aaaa, decimais com vírgula e
+    texto acentuado (gravado em Latin-1 pelo benchmark, como exportações de ERP)
+
+    Args:
+        rows: Número de linhas
+        seed: Seed do gerador
+
+    Returns:
+        DataFrame com colunas em texto
+    """
+    rng = np.random.default_rng(seed)
+    dates = _random_dates(rng, rows)
+    prices = np.round(rng.uniform(1, 10_000, size=rows), 2)
+    freight = np.round(rng.uniform(5, 300, size=rows), 2)
+
+    return pd.DataFrame({
+        "codigo": np.arange(1, rows + 1).astype(str),
+        "data_emissao": dates.dt.strftime("%d/%m/%Y"),
+        "data_entrega": (dates + pd.to_timedelta(rng.integers(1, 20, size=rows), unit="D")).dt.strftime("%d/%m/%Y"),
+        "uf": rng.choice(["SP", "RJ", "MG", "RS", "BA", "PE", "PR", "SC"], size=rows),
+        "municipio": rng.choice(["São Paulo", "Niterói", "Belo Horizonte", "Porto Alegre", "Salvador", "Recife", "Maringá", "Florianópolis"], size=rows),
+        "preco_unitario": pd.Series(prices).map(lambda value: f"{value:.2f}".replace(".", ",")),
+        "valor_frete": pd.Series(freight).map(lambda value: f"{value:.2f}".replace(".", ",")),
+        "quantidade": rng.integers(1, 100, size=rows).astype(str),
+    })
+
+def generate_chart_frame(rows: int = 24, seed: int = DEFAULT_SEED) -> pd.DataFrame:
+    """
+    Resultado típico de query para gráficos: data, categoria e dois valores
+
+    Args:
+        rows: Número de linhas
+        seed: Seed do gerador
+
+    Returns:
+        DataFrame já tipado (como retornado pelo SQLite)
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "mes": pd.date_range("2023-01-01", periods=rows, freq="MS"),
+        "regiao": [_CATEGORIES[index % len(_CATEGORIES)] for index in range(rows)],
+        "vendas": np.round(rng.uniform(1000, 50_000, size=rows), 2),
+        "pedidos": rng.integers(10, 500, size=rows),
+    })
+
+DATASETS = {
+    "long": generate_long,
+    "wide": generate_wide,
+    "brazilian": generate_brazilian,
+}
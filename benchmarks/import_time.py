@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Perfil de tempo de import (cold start) dos processos do AgentGraph
+
+Executa `python -X importtime -c "import <módulo>"` em subprocessos limpos para
+o processo web (app), o worker do Celery (tasks) e o executor de testes
+(testes.test_runner), compara com as metas de startup e lista os módulos
+mais lentos de cada um. O resultado é salvo em JSON com o commit atual.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --repeat 5 --top 30 --check
+    python -m benchmarks.import_time --target worker=1.0 --compare benchmarks/results/import_anterior.json
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+from benchmarks import RESULTS_DIR, get_git_commit
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Processo -> módulo importado na inicialização
+PROCESSES = {
+    "web": "app",
+    "worker": "tasks",
+    "test_runner": "testes.test_runner"
+}
+
+# Metas de tempo de import em segundos (mediana, cache de bytecode quente)
+STARTUP_TARGETS = {
+    "web": 4.0,
+    "worker": 1.5,
+    "test_runner": 3.0
+}
+
+def parse_importtime(stderr: str) -> Dict[str, Any]:
+    """
+    Interpreta a saída de -X importtime
+
+    Returns:
+        Total (soma dos imports de primeiro nível) e tempo cumulativo por módulo, em segundos
+    """
+    modules = {}
+    total_us = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|", 2)
+            cumulative_us = int(cumulative.strip())
+        except ValueError:
+            continue  # Cabeçalho
+
+        # Indentação do nome indica aninhamento: apenas o primeiro nível soma no total
+        if not name[1:].startswith(" "):
+            total_us += cumulative_us
+        module = name.strip()
+        modules[module] = max(modules.get(module, 0), cumulative_us)
+
+    return {
+        "total_s": total_us / 1_000_000,
+        "modules": {name: us / 1_000_000 for name, us in modules.items()}
+    }
+
+def profile_process(module: str, repeat: int) -> Dict[str, Any]:
+    """
+    Mede o import de um módulo em subprocessos novos
+
+    Args:
+        module: Módulo importado na inicialização do processo
+        repeat: Execuções medidas (após uma execução de aquecimento)
+
+    Returns:
+        Tempos de import, wall clock e módulos mais lentos da execução mediana
+    """
+    env = dict(os.environ)
+    env.setdefault("LLM_PROVIDER", "fake")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    command = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+
+    runs = []
+    for attempt in range(repeat + 1):
+        start = time.perf_counter()
+        completed = subprocess.run(command, cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+        wall = time.perf_counter() - start
+
+        if completed.returncode != 0:
+            error_lines = [line for line in completed.stderr.splitlines() if not line.startswith("import time:")]
+            return {"error": "\n".join(error_lines[-5:]) or f"código de saída {completed.returncode}"}
+
+        if attempt == 0:
+            continue  # Aquecimento: gera bytecode (.pyc) e cache do sistema de arquivos
+
+        parsed = parse_importtime(completed.stderr)
+        parsed["wall_s"] = wall
+        runs.append(parsed)
+
+    runs.sort(key=lambda run: run["total_s"])
+    median_run = runs[len(runs) // 2]
+
+    return {
+        "module": module,
+        "runs": len(runs),
+        "import_median_s": round(statistics.median(run["total_s"] for run in runs), 4),
+        "import_min_s": round(runs[0]["total_s"], 4),
+        "wall_median_s": round(statistics.median(run["wall_s"] for run in runs), 4),
+        "modules": median_run["modules"]
+    }
+
+def slowest_modules(modules: Dict[str, float], top: int) -> List[Dict[str, Any]]:
+    """Módulos de terceiros/projeto com maior tempo cumulativo (apenas pacotes raiz)"""
+    roots = {name: seconds for name, seconds in modules.items() if "." not in name}
+    ranked = sorted(roots.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"module": name, "cumulative_s": round(seconds, 4)} for name, seconds in ranked]
+
+def parse_targets(overrides: List[str]) -> Dict[str, float]:
+    """Aplica metas passadas como processo=segundos"""
+    targets = dict(STARTUP_TARGETS)
+    for override in overrides or []:
+        name, _, value = override.partition("=")
+        if name not in PROCESSES or not value:
+            raise SystemExit(f"Meta inválida: {override} (use {'|'.join(PROCESSES)}=segundos)")
+        targets[name] = float(value)
+    return targets
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil de tempo de import do AgentGraph")
+    parser.add_argument("--processes", nargs="+", default=list(PROCESSES), choices=list(PROCESSES))
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções por processo")
+    parser.add_argument("--top", type=int, default=15, help="Módulos mais lentos listados por processo")
+    parser.add_argument("--target", action="append", help="Meta por processo (ex: worker=1.0)")
+    parser.add_argument("--check", action="store_true", help="Sai com código 1 se alguma meta for excedida")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: benchmarks/results/import_<commit>_<timestamp>.json)")
+    parser.add_argument("--compare", help="JSON anterior para comparação")
+    args = parser.parse_args()
+
+    targets = parse_targets(args.target)
+    results = {}
+    exceeded = []
+
+    for name in args.processes:
+        print(f"⏱️ Import do processo '{name}' ({PROCESSES[name]})...")
+        profile = profile_process(PROCESSES[name], max(1, args.repeat))
+        if "error" in profile:
+            print(f"  ❌ Falha no import: {profile['error']}")
+            results[name] = profile
+            exceeded.append(name)
+            continue
+
+        profile["target_s"] = targets[name]
+        profile["within_target"] = profile["import_median_s"] <= targets[name]
+        profile["slowest"] = slowest_modules(profile.pop("modules"), args.top)
+        results[name] = profile
+
+        flag = "✅" if profile["within_target"] else "⚠️"
+        print(f"  {flag} import {profile['import_median_s']:.3f}s (meta {targets[name]:.1f}s), processo {profile['wall_median_s']:.3f}s")
+        for item in profile["slowest"][:5]:
+            print(f"     {item['module']}: {item['cumulative_s']:.3f}s")
+        if not profile["within_target"]:
+            exceeded.append(name)
+
+    report = {
+        "commit": get_git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results
+    }
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"import_{report['commit']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ Resultados salvos em {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Comparação com {baseline.get('commit', '?')} → {report['commit']}")
+        for name, profile in results.items():
+            before = baseline.get("results", {}).get(name, {}).get("import_median_s")
+            if before and "import_median_s" in profile:
+                print(f"  {name}: {before:.3f}s → {profile['import_median_s']:.3f}s ({profile['import_median_s'] / before:.2f}x)")
+
+    if args.check and exceeded:
+        print(f"❌ Metas de startup excedidas: {', '.join(exceeded)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
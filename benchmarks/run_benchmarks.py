@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Benchmark por etapa do AgentGraph
+
+Mede ingestão de CSV, detecção de tipos, processamento genérico, carga no
+SQLite, amostragem do banco, geração de cada tipo de gráfico e o overhead do
+grafo completo (process_query com LLM falso, sem rede). O resultado é salvo
+em JSON com o commit atual para comparação entre versões.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --rows 200000 --repeat 5 --datasets long brazilian
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/anterior.json
+"""
+import os
+import sys
+
+# Configuração antes de importar o projeto: LLM falso e logs reduzidos
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("STATE_SIZE_TRACKING", "true")
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import json
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from benchmarks import RESULTS_DIR, get_git_commit
+from benchmarks.datasets import DATASETS, generate_chart_frame
+
+CHART_TYPES = [
+    "line_simple", "multiline", "area",
+    "bar_vertical", "bar_horizontal", "bar_grouped", "bar_stacked",
+    "pie", "donut", "pie_multiple"
+]
+
+# Encoding do CSV gravado por dataset (padrão UTF-8)
+DATASET_ENCODINGS = {"brazilian": "latin-1"}
+
+async def measure(func: Callable, setup: Optional[Callable] = None, repeat: int = 3) -> Dict[str, Any]:
+    """
+    Executa uma etapa várias vezes e retorna estatísticas de tempo
+
+    Args:
+        func: Função (sync ou async) a medir
+        setup: Prepara os argumentos de cada execução (fora da medição)
+        repeat: Número de execuções
+
+    Returns:
+        Estatísticas em segundos
+    """
+    timings = []
+    try:
+        for _ in range(repeat):
+            args = setup() if setup else ()
+            start = time.perf_counter()
+            result = func(*args)
+            if asyncio.iscoroutine(result):
+                await result
+            timings.append(time.perf_counter() - start)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}", "runs": len(timings)}
+
+    return {
+        "runs": len(timings),
+        "min_s": round(min(timings), 6),
+        "median_s": round(statistics.median(timings), 6),
+        "mean_s": round(statistics.mean(timings), 6),
+        "max_s": round(max(timings), 6)
+    }
+
+async def benchmark_dataset(name: str, df: pd.DataFrame, workdir: str, repeat: int) -> Dict[str, Any]:
+    """
+    Mede as etapas de ingestão para um dataset
+
+    Args:
+        name: Nome do dataset
+        df: DataFrame em texto (como lido do CSV)
+        workdir: Diretório temporário
+        repeat: Execuções por etapa
+    """
+    from nodes.csv_processing_node import detect_column_types, optimize_dataframe_dtypes, process_dataframe_generic
+    from nodes.database_node import get_database_sample_node
+    from utils.csv_reader import read_csv_file, sniff_csv
+    from utils.database import create_engine_from_processed_dataframe
+    from utils.object_manager import get_object_manager
+
+    stages = {}
+
+    # 1. Leitura do CSV: detecção de dialeto e leitura com cada engine
+    csv_path = os.path.join(workdir, f"{name}.csv")
+    df.to_csv(csv_path, sep=";", index=False, encoding=DATASET_ENCODINGS.get(name, "utf-8"))
+    stages["csv_sniff"] = await measure(lambda: sniff_csv(csv_path), repeat=repeat)
+    for engine in ("pandas", "pyarrow"):
+        stages[f"csv_read.{engine}"] = await measure(lambda engine=engine: read_csv_file(csv_path, engine=engine), repeat=repeat)
+
+    # 2. Detecção de tipos
+    stages["detect_column_types"] = await measure(lambda: detect_column_types(df), repeat=repeat)
+    column_info = await detect_column_types(df)
+
+    # 3. Processamento genérico (cópia fora da medição: a função altera o DataFrame)
+    stages["process_dataframe_generic"] = await measure(
+        lambda frame: process_dataframe_generic(frame, column_info),
+        setup=lambda: (df.copy(),),
+        repeat=repeat
+    )
+    processed_df = await process_dataframe_generic(df.copy(), column_info)
+
+    # 3b. Tipos compactos (mesma ordem do csv_processing_node: antes da carga no SQLite)
+    stages["optimize_dataframe_dtypes"] = await measure(
+        lambda frame: optimize_dataframe_dtypes(frame, column_info),
+        setup=lambda: (processed_df.copy(),),
+        repeat=repeat
+    )
+    memory_report = optimize_dataframe_dtypes(processed_df, column_info)
+
+    # 4. Carga no SQLite
+    db_path = os.path.join(workdir, f"{name}.db")
+    stages["sqlite_load"] = await measure(
+        lambda: create_engine_from_processed_dataframe(processed_df, column_info["sql_types"], db_path),
+        repeat=repeat
+    )
+
+    # 5. Amostra do banco (nó do grafo)
+    engine = create_engine_from_processed_dataframe(processed_df, column_info["sql_types"], db_path)
+    session_id = f"benchmark_{uuid.uuid4().hex[:8]}"
+    engine_id = get_object_manager().store_engine_session(session_id, engine)
+    stages["get_database_sample_node"] = await measure(
+        lambda: get_database_sample_node({"engine_id": engine_id, "session_id": session_id, "connection_type": "csv"}),
+        repeat=repeat
+    )
+    get_object_manager().clear_session(session_id)
+    engine.dispose()
+
+    return {
+        "rows": len(df),
+        "columns": len(df.columns),
+        "date_columns": len(column_info["date_columns"]),
+        "numeric_columns": len(column_info["numeric_columns"]),
+        "memory_before_mb": memory_report["memory_before_mb"],
+        "memory_after_mb": memory_report["memory_after_mb"],
+        "stages": stages
+    }
+
+async def benchmark_charts(repeat: int) -> Dict[str, Any]:
+    """Mede cada tipo de gráfico (preparação dos dados + renderização)"""
+    from nodes.graph_generation_node import generate_graph
+
+    frame = generate_chart_frame()
+    return {
+        graph_type: await measure(
+            lambda graph_type=graph_type: generate_graph(frame.copy(), graph_type, f"Benchmark {graph_type}", "vendas por mês e região"),
+            repeat=repeat
+        )
+        for graph_type in CHART_TYPES
+    }
+
+async def benchmark_graph(repeat: int, question: str) -> Dict[str, Any]:
+    """
+    Mede o overhead do grafo completo com LLM falso
+
+    Args:
+        repeat: Número de queries
+        question: Pergunta enviada
+    """
+    from utils.config import LLM_PROVIDER, is_offline_llm
+
+    if not is_offline_llm():
+        return {"skipped": f"LLM_PROVIDER={LLM_PROVIDER} faria chamadas reais"}
+
+    from graphs.main_graph import AgentGraphManager
+    from utils.metrics import get_state_size_report
+
+    start = time.perf_counter()
+    try:
+        manager = AgentGraphManager()
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    init_time = time.perf_counter() - start
+
+    # Descarta medições da inicialização: o relatório cobre apenas as queries
+    get_state_size_report(reset=True)
+
+    def clear_cache():
+        # Sem limpar, a mesma pergunta sai do cache a partir da 2ª execução
+        cache_manager = manager.object_manager.get_cache_manager(manager.cache_id)
+        if cache_manager:
+            cache_manager.clear_cache()
+        return ()
+
+    process_query = await measure(
+        lambda: manager.process_query(
+            user_input=question,
+            session_id="benchmark",
+            workload="bulk"
+        ),
+        setup=clear_cache,
+        repeat=repeat
+    )
+
+    return {
+        "llm_provider": LLM_PROVIDER,
+        "init_s": round(init_time, 6),
+        "process_query": process_query,
+        # Tamanho do estado por nó (bytes): comparar entre commits via --compare
+        "state_size": get_state_size_report(reset=True)
+    }
+
+def compare_results(current: Dict[str, Any], baseline_path: str) -> List[str]:
+    """
+    Compara medianas com um resultado anterior
+
+    Returns:
+        Linhas do relatório (razão atual/anterior por etapa)
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    def _flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+        flat = {}
+        for key, value in results.items():
+            if isinstance(value, dict) and "median_s" in value:
+                flat[f"{prefix}{key}"] = value["median_s"]
+            elif isinstance(value, dict):
+                flat.update(_flatten(value, f"{prefix}{key}."))
+        return flat
+
+    before = _flatten(baseline.get("results", {}))
+    after = _flatten(current.get("results", {}))
+
+    lines = [f"Comparação com {baseline.get('commit', '?')} → {current.get('commit', '?')}"]
+    for key in sorted(after):
+        if key in before and before[key] > 0:
+            ratio = after[key] / before[key]
+            flag = " ⚠️" if ratio > 1.2 else ""
+            lines.append(f"  {key}: {before[key]:.4f}s → {after[key]:.4f}s ({ratio:.2f}x){flag}")
+
+    # Tamanho médio do estado por nó (bytes)
+    sizes_before = baseline.get("results", {}).get("graph", {}).get("state_size", {})
+    sizes_after = current.get("results", {}).get("graph", {}).get("state_size", {})
+    for node in sorted(sizes_after):
+        if node in sizes_before and sizes_before[node].get("avg_bytes"):
+            old, new = sizes_before[node]["avg_bytes"], sizes_after[node]["avg_bytes"]
+            lines.append(f"  state_size.{node}: {old} B → {new} B ({new / old:.2f}x)")
+    return lines
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Executa os benchmarks selecionados"""
+    results: Dict[str, Any] = {"datasets": {}}
+    workdir = tempfile.mkdtemp(prefix="agentgraph_bench_")
+
+    try:
+        for name in args.datasets:
+            rows = args.rows // 10 if name == "wide" else args.rows
+            print(f"📊 Dataset '{name}' ({rows} linhas)...")
+            df = DATASETS[name](rows=rows, seed=args.seed)
+            results["datasets"][name] = await benchmark_dataset(name, df, workdir, args.repeat)
+
+        if not args.skip_charts:
+            print("📈 Gráficos...")
+            results["charts"] = await benchmark_charts(args.repeat)
+
+        if not args.skip_graph:
+            print("🔄 Grafo completo (LLM falso)...")
+            results["graph"] = await benchmark_graph(args.repeat, args.question)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "commit": get_git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "parameters": {
+            "rows": args.rows,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "datasets": args.datasets
+        },
+        "results": results
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks por etapa do AgentGraph")
+    parser.add_argument("--rows", type=int, default=100_000, help="Linhas por dataset (wide usa rows/10)")
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções por etapa")
+    parser.add_argument("--seed", type=int, default=42, help="Seed dos geradores")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS), choices=list(DATASETS))
+    parser.add_argument("--question", default="Quais são os 5 registros mais recentes?", help="Pergunta do benchmark do grafo")
+    parser.add_argument("--skip-charts", action="store_true", help="Não mede gráficos")
+    parser.add_argument("--skip-graph", action="store_true", help="Não mede o grafo completo")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: benchmarks/results/<commit>_<timestamp>.json)")
+    parser.add_argument("--compare", help="JSON anterior para comparação")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{report['commit']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    print(f"✅ Resultados salvos em {output}")
+
+    if args.compare:
+        print("\n".join(compare_results(report, args.compare)))
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,11 @@
 Grafo principal do LangGraph para o AgentGraph
 """
 import logging
-from typing import Dict, Any, Optional
+import os
+import time
+import uuid
+from typing import Dict, Any, Optional, AsyncIterator
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
 
 from nodes.agent_node import (
     AgentState,
@@ -40,7 +42,6 @@ from nodes.cache_node import (
     update_history_node
 )
 from nodes.graph_selection_node import graph_selection_node
-from nodes.graph_generation_node import graph_generation_node
 from nodes.custom_nodes import CustomNodeManager
 from nodes.connection_selection_node import (
     connection_selection_node,
@@ -55,8 +56,48 @@ from nodes.question_refinement_node import question_refinement_node, route_after
 from agents.sql_agent import SQLAgentManager
 from agents.tools import CacheManager
 from utils.database import create_sql_database
-from utils.config import get_active_csv_path, SQL_DB_PATH
+from utils.config import get_active_csv_path, SQL_DB_PATH, BOOTSTRAP_CACHE_ENABLED, SINGLE_FLIGHT_ENABLED
 from utils.object_manager import get_object_manager
+from utils.metrics import timed_node
+from utils.rate_limiter import set_llm_session, reset_llm_session
+from utils.stream_relay import SQL_TOKEN_EVENT
+
+# Nós cujos tokens de LLM compõem a resposta final exibida no chat
+STREAMING_TOKEN_NODES = ("process_query", "celery_dispatch")
+
+# Configuração de execução do grafo (limite de recursão aumentado para polling do Celery)
+GRAPH_RUN_CONFIG = {"recursion_limit": 100}
+
+def _extract_chunk_text(chunk: Any) -> str:
+    """
+    Extrai texto de um chunk de streaming (string ou blocos de conteúdo do Claude/Gemini)
+
+    Args:
+        chunk: AIMessageChunk emitido pelo modelo
+
+    Returns:
+        Texto do chunk (vazio para chunks de tool call)
+    """
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            item.get("text", "") if isinstance(item, dict) else str(item)
+            for item in content
+            if isinstance(item, (dict, str))
+        )
+    return ""
+
+async def graph_generation_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Nó de geração de gráfico com import adiado
+
+    matplotlib e PIL só são carregados na primeira query que gera gráfico,
+    fora da inicialização da aplicação e do pool de testes.
+    """
+    from nodes.graph_generation_node import graph_generation_node as _graph_generation_node
+    return await _graph_generation_node(state)
 
 class AgentGraphManager:
     """
@@ -77,6 +118,7 @@ class AgentGraphManager:
         self.engine_id = None
         self.db_id = None
         self.cache_id = None
+        self.dataset_metadata = None  # Metadados persistidos da base padrão (origem do banco)
         self._initialize_system()
         self._build_graph()
     
@@ -88,15 +130,23 @@ class AgentGraphManager:
             import os
             from sqlalchemy import create_engine
 
-            # Verifica se banco existe
-            if os.path.exists(SQL_DB_PATH):
-                # Carrega banco existente
+            csv_path = get_active_csv_path()
+            if BOOTSTRAP_CACHE_ENABLED:
+                from utils.dataset_cache import load_cached_database
+                self.dataset_metadata = load_cached_database(csv_path, SQL_DB_PATH)
+
+            if self.dataset_metadata:
+                # CSV e banco inalterados desde a última inicialização
+                self.engine = create_engine(f"sqlite:///{SQL_DB_PATH}")
+                db = create_sql_database(self.engine)
+                logging.info(f"[BOOTSTRAP] Banco reutilizado para {os.path.basename(csv_path)} (CSV inalterado)")
+            elif os.path.exists(SQL_DB_PATH) and (not BOOTSTRAP_CACHE_ENABLED or not os.path.exists(csv_path)):
+                # Carrega banco existente (cache desabilitado ou sem CSV para comparar)
                 self.engine = create_engine(f"sqlite:///{SQL_DB_PATH}")
                 db = create_sql_database(self.engine)
                 logging.info("Banco existente carregado")
             else:
                 # Cria novo banco usando função síncrona temporária
-                csv_path = get_active_csv_path()
                 self.engine = self._create_engine_sync(csv_path)
                 db = create_sql_database(self.engine)
                 logging.info("Novo banco criado")
@@ -153,6 +203,13 @@ class AgentGraphManager:
             engine_id = db_result["engine_id"]
             engine = self.object_manager.get_engine(engine_id)
 
+            # Persiste a origem do banco para reutilizá-lo na próxima inicialização
+            if BOOTSTRAP_CACHE_ENABLED:
+                from utils.dataset_cache import save_database_metadata
+                if save_database_metadata(csv_path, SQL_DB_PATH, db_result.get("database_info", {})):
+                    from utils.dataset_cache import load_cached_database
+                    self.dataset_metadata = load_cached_database(csv_path, SQL_DB_PATH)
+
             return engine, engine_id, db_result["db_id"]
 
         # Executa de forma síncrona com verificação de event loop
@@ -183,43 +240,47 @@ class AgentGraphManager:
             # Cria o StateGraph
             workflow = StateGraph(AgentState)
 
+            # Todo nó é registrado com medição de latência (métricas por nó)
+            def add_node(name: str, node):
+                workflow.add_node(name, timed_node(name)(node))
+
             # Adiciona nós de validação e preparação
-            workflow.add_node("validate_input", validate_query_input_node)
-            workflow.add_node("check_cache", check_cache_node)
+            add_node("validate_input", validate_query_input_node)
+            add_node("check_cache", check_cache_node)
 
             # Adiciona nó de refinamento de pergunta
-            workflow.add_node("question_refinement", question_refinement_node)
+            add_node("question_refinement", question_refinement_node)
 
             # Adiciona nós de conexão
-            workflow.add_node("connection_selection", connection_selection_node)
-            workflow.add_node("validate_connection", validate_connection_input_node)
-            workflow.add_node("postgresql_connection", postgresql_connection_node)
-            workflow.add_node("csv_processing", csv_processing_node)
-            workflow.add_node("create_database", create_database_from_dataframe_node)
-            workflow.add_node("load_database", load_existing_database_node)
-
-            workflow.add_node("validate_processing", validate_processing_input_node)
-            workflow.add_node("process_initial_context", process_initial_context_node)
-            workflow.add_node("prepare_context", prepare_query_context_node)
-            workflow.add_node("get_db_sample", get_database_sample_node)
+            add_node("connection_selection", connection_selection_node)
+            add_node("validate_connection", validate_connection_input_node)
+            add_node("postgresql_connection", postgresql_connection_node)
+            add_node("csv_processing", csv_processing_node)
+            add_node("create_database", create_database_from_dataframe_node)
+            add_node("load_database", load_existing_database_node)
+
+            add_node("validate_processing", validate_processing_input_node)
+            add_node("process_initial_context", process_initial_context_node)
+            add_node("prepare_context", prepare_query_context_node)
+            add_node("get_db_sample", get_database_sample_node)
 
             # Adiciona nós de processamento
-            workflow.add_node("process_query", process_user_query_node)
+            add_node("process_query", process_user_query_node)
 
             # Adiciona nó do Celery (apenas dispatch)
-            workflow.add_node("celery_dispatch", celery_task_dispatch_node)
+            add_node("celery_dispatch", celery_task_dispatch_node)
 
             # Adiciona nós de gráficos
-            workflow.add_node("graph_selection", graph_selection_node)
-            workflow.add_node("graph_generation", graph_generation_node)
+            add_node("graph_selection", graph_selection_node)
+            add_node("graph_generation", graph_generation_node)
 
             # Adiciona nós de refinamento
-            workflow.add_node("refine_response", refine_response_node)
-            workflow.add_node("format_response", format_final_response_node)
+            add_node("refine_response", refine_response_node)
+            add_node("format_response", format_final_response_node)
 
             # Adiciona nós de cache e histórico
-            workflow.add_node("cache_response", cache_response_node)
-            workflow.add_node("update_history", update_history_node)
+            add_node("cache_response", cache_response_node)
+            add_node("update_history", update_history_node)
 
             # Define ponto de entrada
             workflow.set_entry_point("validate_input")
@@ -310,9 +371,9 @@ class AgentGraphManager:
             workflow.add_edge("cache_response", "update_history")
             workflow.add_edge("update_history", END)
 
-            # Compila o grafo
-            memory = MemorySaver()
-            self.app = workflow.compile(checkpointer=memory)
+            # Compila o grafo sem checkpointer: nenhum nó lê estado de execuções anteriores
+            # (histórico fica no CacheManager), então nenhum snapshot é retido em memória
+            self.app = workflow.compile()
 
             logging.info("Grafo LangGraph construído com sucesso")
 
@@ -320,6 +381,148 @@ class AgentGraphManager:
             logging.error(f"Erro ao construir grafo: {e}")
             raise
     
+    def _build_initial_state(
+        self,
+        user_input: str,
+        session_id: str,
+        selected_model: str,
+        advanced_mode: bool,
+        processing_enabled: bool,
+        processing_model: str,
+        question_refinement_enabled: bool,
+        connection_type: str,
+        postgresql_config: Optional[Dict],
+        selected_table: Optional[str],
+        single_table_mode: bool,
+        top_k: int,
+        use_celery: bool,
+        workload: str = "interactive"
+    ) -> Dict[str, Any]:
+        """
+        Prepara o estado inicial de uma query (compartilhado por process_query e stream_query)
+
+        Recria o agente SQL caso o modelo selecionado tenha mudado.
+
+        Returns:
+            Estado inicial do grafo
+        """
+        # Log simples
+        logging.info(f"[MAIN_GRAPH] Celery: {use_celery}")
+
+        # Verifica se precisa recriar agente SQL com modelo diferente
+        current_sql_agent = self.object_manager.get_sql_agent(self.agent_id)
+        if current_sql_agent and current_sql_agent.model_name != selected_model:
+            logging.info(f"Recriando agente SQL com modelo {selected_model}")
+
+            # Recupera banco de dados associado ao agente
+            db_id = self.object_manager.get_db_id_for_agent(self.agent_id)
+            if db_id:
+                db = self.object_manager.get_database(db_id)
+                if db:
+                    new_sql_agent = SQLAgentManager(db, selected_model, single_table_mode=False, selected_table=None, top_k=top_k)
+                    self.agent_id = self.object_manager.store_sql_agent(new_sql_agent, db_id)
+                    logging.info(f"Agente SQL recriado com sucesso para modelo {selected_model}")
+                else:
+                    logging.error("Banco de dados não encontrado para recriar agente")
+            else:
+                logging.error("ID do banco de dados não encontrado para o agente")
+
+        # Log dos parâmetros recebidos
+        logging.info(f"[MAIN GRAPH] ===== INICIANDO PROCESSAMENTO DE QUERY =====")
+        logging.info(f"[MAIN GRAPH] Session ID: {session_id}")
+        logging.info(f"[MAIN GRAPH] User input: {user_input}")
+        logging.info(f"[MAIN GRAPH] Selected model: {selected_model}")
+        logging.info(f"[MAIN GRAPH] Advanced mode: {advanced_mode}")
+        logging.info(f"[MAIN GRAPH] Processing enabled: {processing_enabled}")
+        logging.info(f"[MAIN GRAPH] Processing model: {processing_model}")
+        logging.info(f"[MAIN GRAPH] Connection type: {connection_type}")
+        if postgresql_config:
+            logging.info(f"[MAIN GRAPH] PostgreSQL config: {postgresql_config['host']}:{postgresql_config['port']}/{postgresql_config['database']}")
+        if selected_table:
+            logging.info(f"[MAIN GRAPH] Selected table: {selected_table}")
+        logging.info(f"[MAIN GRAPH] Single table mode: {single_table_mode}")
+
+        # Prepara estado inicial com IDs serializáveis e session_id
+        initial_state = {
+            "user_input": user_input,
+            "session_id": session_id,
+            "run_id": str(uuid.uuid4()),  # Escopo dos payloads desta execução
+            "selected_model": selected_model,
+            "response": "",
+            "advanced_mode": advanced_mode,
+            "execution_time": 0.0,
+            "error": None,
+            # Handles de payloads grandes no ObjectManager
+            "intermediate_steps_id": None,
+            "db_sample_id": None,
+            # IDs para recuperar objetos não-serializáveis (compatibilidade)
+            "agent_id": self.agent_id,
+            "engine_id": self.engine_id,
+            "db_id": self.db_id,
+            "cache_id": self.cache_id,
+            # Campos relacionados a gráficos
+            "query_type": "sql_query",  # Será atualizado pela detecção
+            "sql_query_extracted": None,
+            "graph_type": None,
+            "graph_data": None,
+            "graph_image_id": None,
+            "graph_generated": False,
+            "graph_error": None,
+            # Campos relacionados ao cache
+            "cache_hit": False,
+            # Campos relacionados ao Processing Agent
+            "processing_enabled": processing_enabled,
+            "processing_model": processing_model,
+            "processing_agent_id": None,
+            "suggested_query": None,
+            "query_observations": None,
+            "processing_result_id": None,
+            "processing_success": False,
+            "processing_error": None,
+            # Campos relacionados à poda de schema
+            "relevant_tables": None,
+            "schema_pruning": None,
+            # Campos relacionados ao Question Refinement
+            "question_refinement_enabled": question_refinement_enabled,
+            "original_user_input": None,
+            "refined_question": None,
+            "question_refinement_applied": False,
+            "question_refinement_changes": [],
+            "question_refinement_justification": None,
+            "question_refinement_success": False,
+            "question_refinement_error": None,
+            "question_refinement_has_significant_change": False,
+            # Campos relacionados ao refinamento
+            "refined": False,
+            "refinement_error": None,
+            "refinement_quality": None,
+            "quality_metrics": None,
+            # Campos relacionados ao contexto SQL
+            "sql_context_id": None,
+            "sql_result": None,
+            # Campos relacionados ao tipo de conexão
+            "connection_type": connection_type,
+            "postgresql_config": postgresql_config,
+            "selected_table": selected_table,
+            "single_table_mode": single_table_mode,
+            "connection_success": self.db_id is not None,  # True se já tem conexão
+            "connection_error": None,
+            "connection_info": None,
+            # Configuração do agente SQL
+            "top_k": top_k,
+            # Configuração do Celery
+            "use_celery": use_celery,
+            "ready_for_celery_dispatch": False,
+            "celery_task_id": None,
+            "celery_task_status": None,
+            "workload": workload
+        }
+
+        # Payloads desta execução não são removidos pelo limite até release_payloads
+        self.object_manager.pin_payloads(initial_state["run_id"])
+
+        return initial_state
+
     async def process_query(
         self,
         user_input: str,
@@ -335,11 +538,15 @@ class AgentGraphManager:
         single_table_mode: bool = False,
         top_k: int = 10,
         use_celery: bool = False,
-        thread_id: str = "default"
+        workload: str = "interactive",
+        coalesce: bool = True
     ) -> Dict[str, Any]:
         """
         Processa uma query do usuário através do grafo com suporte a sessões
 
+        Queries avulsas idênticas em andamento (mesma base, pergunta normalizada,
+        modelo e opções) são coalescidas: apenas a primeira executa o grafo.
+
         Args:
             user_input: Entrada do usuário
             session_id: ID da sessão do usuário
@@ -353,124 +560,103 @@ class AgentGraphManager:
             single_table_mode: Se deve usar apenas uma tabela (PostgreSQL)
             top_k: Número máximo de resultados (LIMIT) para queries SQL
             use_celery: Se deve usar Celery para processamento assíncrono
-            thread_id: ID da thread para checkpoint
+            workload: Tipo de carga para fila do Celery ("interactive", "bulk" ou "ingestion")
+            coalesce: Se False, sempre executa o grafo (ex: testes de consistência)
 
         Returns:
             Resultado do processamento
         """
-        try:
-            # Log simples
-            logging.info(f"[MAIN_GRAPH] Celery: {use_celery}")
-
-            # Verifica se precisa recriar agente SQL com modelo diferente
-            current_sql_agent = self.object_manager.get_sql_agent(self.agent_id)
-            if current_sql_agent and current_sql_agent.model_name != selected_model:
-                logging.info(f"Recriando agente SQL com modelo {selected_model}")
-
-                # Recupera banco de dados associado ao agente
-                db_id = self.object_manager.get_db_id_for_agent(self.agent_id)
-                if db_id:
-                    db = self.object_manager.get_database(db_id)
-                    if db:
-                        new_sql_agent = SQLAgentManager(db, selected_model, single_table_mode=False, selected_table=None, top_k=top_k)
-                        self.agent_id = self.object_manager.store_sql_agent(new_sql_agent, db_id)
-                        logging.info(f"Agente SQL recriado com sucesso para modelo {selected_model}")
-                    else:
-                        logging.error("Banco de dados não encontrado para recriar agente")
-                else:
-                    logging.error("ID do banco de dados não encontrado para o agente")
-
-            # Log dos parâmetros recebidos
-            logging.info(f"[MAIN GRAPH] ===== INICIANDO PROCESSAMENTO DE QUERY =====")
-            logging.info(f"[MAIN GRAPH] Session ID: {session_id}")
-            logging.info(f"[MAIN GRAPH] User input: {user_input}")
-            logging.info(f"[MAIN GRAPH] Selected model: {selected_model}")
-            logging.info(f"[MAIN GRAPH] Advanced mode: {advanced_mode}")
-            logging.info(f"[MAIN GRAPH] Processing enabled: {processing_enabled}")
-            logging.info(f"[MAIN GRAPH] Processing model: {processing_model}")
-            logging.info(f"[MAIN GRAPH] Connection type: {connection_type}")
-            if postgresql_config:
-                logging.info(f"[MAIN GRAPH] PostgreSQL config: {postgresql_config['host']}:{postgresql_config['port']}/{postgresql_config['database']}")
-            if selected_table:
-                logging.info(f"[MAIN GRAPH] Selected table: {selected_table}")
-            logging.info(f"[MAIN GRAPH] Single table mode: {single_table_mode}")
-
-            # Prepara estado inicial com IDs serializáveis e session_id
-            initial_state = {
-                "user_input": user_input,
-                "session_id": session_id,
-                "selected_model": selected_model,
-                "response": "",
+        def run():
+            return self._run_query(
+                user_input, session_id, selected_model, advanced_mode,
+                processing_enabled, processing_model, question_refinement_enabled,
+                connection_type, postgresql_config, selected_table,
+                single_table_mode, top_k, use_celery, workload
+            )
+
+        if not (coalesce and SINGLE_FLIGHT_ENABLED):
+            return await run()
+
+        from utils.single_flight import build_flight_key, get_single_flight
+
+        flight_key = build_flight_key(
+            self._get_dataset_fingerprint(session_id, connection_type, postgresql_config, selected_table, single_table_mode),
+            user_input,
+            selected_model,
+            {
                 "advanced_mode": advanced_mode,
-                "execution_time": 0.0,
-                "error": None,
-                "intermediate_steps": [],
-                "db_sample_dict": {},
-                # IDs para recuperar objetos não-serializáveis (compatibilidade)
-                "agent_id": self.agent_id,
-                "engine_id": self.engine_id,
-                "db_id": self.db_id,
-                "cache_id": self.cache_id,
-                # Campos relacionados a gráficos
-                "query_type": "sql_query",  # Será atualizado pela detecção
-                "sql_query_extracted": None,
-                "graph_type": None,
-                "graph_data": None,
-                "graph_image_id": None,
-                "graph_generated": False,
-                "graph_error": None,
-                # Campos relacionados ao cache
-                "cache_hit": False,
-                # Campos relacionados ao Processing Agent
                 "processing_enabled": processing_enabled,
-                "processing_model": processing_model,
-                "processing_agent_id": None,
-                "suggested_query": None,
-                "query_observations": None,
-                "processing_result": None,
-                "processing_success": False,
-                "processing_error": None,
-                # Campos relacionados ao Question Refinement
+                "processing_model": processing_model if processing_enabled else None,
                 "question_refinement_enabled": question_refinement_enabled,
-                "original_user_input": None,
-                "refined_question": None,
-                "question_refinement_applied": False,
-                "question_refinement_changes": [],
-                "question_refinement_justification": None,
-                "question_refinement_success": False,
-                "question_refinement_error": None,
-                "question_refinement_has_significant_change": False,
-                # Campos relacionados ao refinamento
-                "refined": False,
-                "refinement_error": None,
-                "refinement_quality": None,
-                "quality_metrics": None,
-                # Campos relacionados ao contexto SQL
-                "sql_context": None,
-                "sql_result": None,
-                # Campos relacionados ao tipo de conexão
-                "connection_type": connection_type,
-                "postgresql_config": postgresql_config,
-                "selected_table": selected_table,
-                "single_table_mode": single_table_mode,
-                "connection_success": self.db_id is not None,  # True se já tem conexão
-                "connection_error": None,
-                "connection_info": None,
-                # Configuração do agente SQL
-                "top_k": top_k,
-                # Configuração do Celery
-                "use_celery": use_celery,
-                "ready_for_celery_dispatch": False,
-                "celery_task_id": None,
-                "celery_task_status": None
+                "top_k": top_k
             }
+        )
+        return await get_single_flight().run(flight_key, run)
+
+    def _get_dataset_fingerprint(
+        self,
+        session_id: str,
+        connection_type: str,
+        postgresql_config: Optional[Dict],
+        selected_table: Optional[str],
+        single_table_mode: bool
+    ) -> str:
+        """
+        Identifica a base consultada para a chave de coalescência
+
+        SQLite: caminho, tamanho e mtime do banco da sessão (ou do banco padrão,
+        se a sessão ainda não fez upload); muda a cada upload.
+        PostgreSQL: usuário/host/porta/database e tabela do modo tabela única
+        (usuários diferentes podem ter permissões diferentes).
+        """
+        if connection_type == "postgresql" and postgresql_config:
+            table = selected_table if single_table_mode else "*"
+            return (
+                f"postgresql://{postgresql_config.get('username')}@{postgresql_config.get('host')}:"
+                f"{postgresql_config.get('port')}/{postgresql_config.get('database')}|{table}"
+            )
+
+        from utils.session_paths import get_session_paths
+        db_path = os.path.abspath(get_session_paths().get_session_db_path(session_id)) if session_id else None
+        if not db_path or not os.path.exists(db_path):
+            engine = self.object_manager.get_engine(self.engine_id)
+            db_path = os.path.abspath(engine.url.database if engine is not None and engine.url.database else SQL_DB_PATH)
+        try:
+            stat = os.stat(db_path)
+            return f"sqlite://{db_path}|{stat.st_size}|{stat.st_mtime_ns}"
+        except OSError:
+            return f"sqlite://{db_path}"
+
+    async def _run_query(
+        self,
+        user_input: str,
+        session_id: str,
+        selected_model: str,
+        advanced_mode: bool,
+        processing_enabled: bool,
+        processing_model: str,
+        question_refinement_enabled: bool,
+        connection_type: str,
+        postgresql_config: Optional[Dict],
+        selected_table: Optional[str],
+        single_table_mode: bool,
+        top_k: int,
+        use_celery: bool,
+        workload: str
+    ) -> Dict[str, Any]:
+        """Executa o grafo para uma query (sem coalescência)"""
+        initial_state = None
+        session_token = set_llm_session(session_id)
+        try:
+            initial_state = self._build_initial_state(
+                user_input, session_id, selected_model, advanced_mode,
+                processing_enabled, processing_model, question_refinement_enabled,
+                connection_type, postgresql_config, selected_table,
+                single_table_mode, top_k, use_celery, workload
+            )
         
             # Executa o grafo com limite de recursão aumentado
-            config = {
-                "configurable": {"thread_id": thread_id},
-                "recursion_limit": 100  # Aumenta limite para polling do Celery
-            }
-            result = await self.app.ainvoke(initial_state, config=config)
+            result = await self.app.ainvoke(initial_state, config=GRAPH_RUN_CONFIG)
             
             logging.info(f"Query processada com sucesso: {user_input[:50]}...")
             return result
@@ -484,6 +670,108 @@ class AgentGraphManager:
                 "error": error_msg,
                 "execution_time": 0.0
             }
+        finally:
+            reset_llm_session(session_token)
+            if initial_state:
+                get_object_manager().release_payloads(initial_state["run_id"])
+
+    async def stream_query(
+        self,
+        user_input: str,
+        session_id: str,
+        selected_model: str = "GPT-4o-mini",
+        advanced_mode: bool = False,
+        processing_enabled: bool = False,
+        processing_model: str = "GPT-4o-mini",
+        question_refinement_enabled: bool = False,
+        connection_type: str = "csv",
+        postgresql_config: Optional[Dict] = None,
+        selected_table: str = None,
+        single_table_mode: bool = False,
+        top_k: int = 10,
+        use_celery: bool = False,
+        workload: str = "interactive"
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Processa uma query emitindo eventos em tempo real via astream_events
+
+        Eventos emitidos (dicionários):
+            {"type": "node", "node": nome}              - início de um nó do grafo
+            {"type": "token", "node": nome, "content": t} - token da resposta do agente SQL
+            {"type": "final", "result": estado_final}   - resultado final (mesmo formato de process_query)
+
+        Tokens do agente SQL executado no Celery chegam via Redis pub/sub
+        e são reemitidos pelo nó celery_dispatch como eventos customizados.
+
+        Args:
+            Mesmos parâmetros de process_query
+
+        Yields:
+            Eventos de progresso, tokens e resultado final
+        """
+        initial_state = None
+        session_token = set_llm_session(session_id)
+        try:
+            initial_state = self._build_initial_state(
+                user_input, session_id, selected_model, advanced_mode,
+                processing_enabled, processing_model, question_refinement_enabled,
+                connection_type, postgresql_config, selected_table,
+                single_table_mode, top_k, use_celery, workload
+            )
+
+            result = None
+            first_token_time = None
+            start_time = time.time()
+
+            async for event in self.app.astream_events(initial_state, config=GRAPH_RUN_CONFIG, version="v2"):
+                kind = event.get("event")
+                node = event.get("metadata", {}).get("langgraph_node")
+
+                if kind == "on_chain_start" and node and event.get("name") == node:
+                    yield {"type": "node", "node": node}
+
+                elif kind == "on_chat_model_stream" and node in STREAMING_TOKEN_NODES:
+                    text = _extract_chunk_text(event.get("data", {}).get("chunk"))
+                    if text:
+                        if first_token_time is None:
+                            first_token_time = time.time() - start_time
+                            logging.info(f"[STREAM] Primeiro token em {first_token_time:.2f}s")
+                        yield {"type": "token", "node": node, "content": text}
+
+                elif kind == "on_custom_event" and event.get("name") == SQL_TOKEN_EVENT:
+                    text = (event.get("data") or {}).get("content", "")
+                    if text:
+                        if first_token_time is None:
+                            first_token_time = time.time() - start_time
+                            logging.info(f"[STREAM] Primeiro token (Celery) em {first_token_time:.2f}s")
+                        yield {"type": "token", "node": node or "celery_dispatch", "content": text}
+
+                elif kind == "on_chain_end" and not event.get("parent_ids"):
+                    # Evento raiz: saída final do grafo
+                    result = event.get("data", {}).get("output")
+
+            if not isinstance(result, dict):
+                result = {}
+
+            logging.info(f"Query processada com sucesso (streaming): {user_input[:50]}...")
+            yield {"type": "final", "result": result}
+
+        except Exception as e:
+            error_msg = f"Erro ao processar query: {e}"
+            logging.error(error_msg)
+            yield {
+                "type": "final",
+                "result": {
+                    "user_input": user_input,
+                    "response": error_msg,
+                    "error": error_msg,
+                    "execution_time": 0.0
+                }
+            }
+        finally:
+            reset_llm_session(session_token)
+            if initial_state:
+                get_object_manager().release_payloads(initial_state["run_id"])
 
 # Instância global do gerenciador
 _graph_manager: Optional[AgentGraphManager] = None
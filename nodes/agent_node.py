@@ -8,15 +8,16 @@ class AgentState(TypedDict):
     """Estado do agente LangGraph - apenas dados serializáveis"""
     user_input: str
     session_id: str  # ID da sessão temporária
+    run_id: str  # ID da execução (escopo dos payloads no ObjectManager)
     selected_model: str
     response: str
     advanced_mode: bool
     execution_time: float
     error: Optional[str]
-    intermediate_steps: list
+    intermediate_steps_id: Optional[str]  # Handle dos passos do agente SQL
 
-    # Dados serializáveis do banco
-    db_sample_dict: dict
+    # Handle da amostra do banco (payload no ObjectManager)
+    db_sample_id: Optional[str]
 
     # IDs para recuperar objetos não-serializáveis
     agent_id: str
@@ -38,7 +39,7 @@ class AgentState(TypedDict):
     query_type: str  # 'sql_query', 'sql_query_graphic', 'prediction'
     sql_query_extracted: Optional[str]  # Query SQL extraída da resposta do agente
     graph_type: Optional[str]  # Tipo de gráfico escolhido pela LLM
-    graph_data: Optional[dict]  # Dados preparados para o gráfico (serializável)
+    graph_data: Optional[dict]  # Handle (data_id), colunas e número de linhas do gráfico
     graph_image_id: Optional[str]  # ID da imagem do gráfico no ObjectManager
     graph_generated: bool  # Se o gráfico foi gerado com sucesso
     graph_error: Optional[str]  # Erro na geração de gráfico
@@ -52,9 +53,13 @@ class AgentState(TypedDict):
     processing_agent_id: Optional[str]  # ID do Processing Agent no ObjectManager
     suggested_query: Optional[str]  # Query SQL sugerida pelo Processing Agent
     query_observations: Optional[str]  # Observações sobre a query sugerida
-    processing_result: Optional[dict]  # Resultado completo do Processing Agent
+    processing_result_id: Optional[str]  # Handle do resultado completo do Processing Agent
     processing_success: bool  # Se o processamento foi bem-sucedido
     processing_error: Optional[str]  # Erro no processamento
+
+    # Campos relacionados à poda de schema
+    relevant_tables: Optional[list]  # Tabelas mais relevantes para a pergunta (índice de schema)
+    schema_pruning: Optional[dict]  # Relatório da poda (tabelas/colunas, tokens economizados, latência)
     
     # Campos relacionados ao refinamento
     refined: bool  # Se a resposta foi refinada
@@ -63,7 +68,7 @@ class AgentState(TypedDict):
     quality_metrics: Optional[dict]  # Métricas de qualidade
     
     # Campos relacionados ao contexto SQL
-    sql_context: Optional[str]  # Contexto preparado para o agente SQL
+    sql_context_id: Optional[str]  # Handle do contexto preparado para o agente SQL
     sql_result: Optional[dict]  # Resultado do agente SQL
 
     # Campos relacionados ao tipo de conexão
@@ -80,6 +85,7 @@ class AgentState(TypedDict):
     ready_for_celery_dispatch: Optional[bool]  # Se está pronto para dispatch Celery
     celery_task_id: Optional[str]  # ID da task Celery disparada
     celery_task_status: Optional[str]  # Status da task Celery
+    workload: Optional[str]  # Tipo de carga para fila do Celery (interactive, bulk, ingestion)
 
 
 def should_refine_response(state: Dict[str, Any]) -> str:
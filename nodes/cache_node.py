@@ -5,6 +5,7 @@ import logging
 from typing import Dict, Any, List
 
 from utils.object_manager import get_object_manager
+from utils.metrics import record_cache_event
 
 async def update_history_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -216,9 +217,11 @@ async def check_cache_node(state: Dict[str, Any]) -> Dict[str, Any]:
             state["response"] = cached_response
             state["execution_time"] = 0.0
             state["error"] = None
+            record_cache_event("response", "hit")
             logging.info(f"[CACHE] Hit para: {user_input[:50]}...")
         else:
             state["cache_hit"] = False
+            record_cache_event("response", "miss")
             logging.info(f"[CACHE] Miss para: {user_input[:50]}...")
         
     except Exception as e:
@@ -4,20 +4,29 @@ Nó para polling de tasks do Celery
 import asyncio
 import logging
 import time
-from typing import Dict, Any
+import uuid
+from typing import Dict, Any, Optional
+from langchain_core.runnables import RunnableConfig
 
-async def celery_task_dispatch_node(state: Dict[str, Any]) -> Dict[str, Any]:
+from utils.config import STREAMING_ENABLED
+from utils.object_manager import get_object_manager, get_payload_scope
+
+async def celery_task_dispatch_node(state: Dict[str, Any], config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """
     Nó para disparar task do Celery para processamento SQL
+
+    Com streaming habilitado, os tokens publicados pelo worker via Redis
+    pub/sub são reemitidos como eventos do grafo enquanto a task executa.
     
     Args:
         state: Estado atual do LangGraph
+        config: Configuração do LangGraph (callbacks usados para streaming)
         
     Returns:
         Estado atualizado com task_id
     """
     try:
-        from tasks import process_sql_query_task, save_session_config_to_redis
+        from tasks import dispatch_sql_query_task, save_session_config_to_redis
 
         # Debug: Log do estado recebido
         logging.info(f"[CELERY_DISPATCH] Estado recebido: {list(state.keys())}")
@@ -39,7 +48,8 @@ async def celery_task_dispatch_node(state: Dict[str, Any]) -> Dict[str, Any]:
         state_top_k = state.get('top_k', 10)
         logging.info(f"[CELERY_DISPATCH] 📊 TOP_K da sessão: {state_top_k}")
 
-        # Preparar configuração da sessão para o Redis
+        # Preparar configuração da sessão para o Redis (payloads materializados a partir dos handles)
+        obj_manager = get_object_manager()
         session_config = {
             'session_id': session_id,
             'tenant_id': state.get('tenant_id', 'default'),
@@ -53,12 +63,11 @@ async def celery_task_dispatch_node(state: Dict[str, Any]) -> Dict[str, Any]:
             'single_table_mode': state.get('single_table_mode', False),
             'selected_table': state.get('selected_table'),
             # Adicionar contexto SQL
-            'sql_context': state.get('sql_context', ''),
+            'sql_context': obj_manager.get_payload(state.get('sql_context_id'), ''),
             'suggested_query': state.get('suggested_query', ''),
             'query_observations': state.get('query_observations', ''),
-            'processing_result': state.get('processing_result', ''),
-            # Metadados da sessão
-            'version': state.get('version', 1),
+            'processing_result': obj_manager.get_payload(state.get('processing_result_id'), ''),
+            # Metadados da sessão ("version" é mantida pelo SessionManager no hash da sessão)
             'last_query': user_input[:100]
         }
 
@@ -102,17 +111,35 @@ async def celery_task_dispatch_node(state: Dict[str, Any]) -> Dict[str, Any]:
         # Disparar task do Celery e aguardar resultado
         logging.info(f"[CELERY_DISPATCH] Executando task síncrona...")
 
-        task = process_sql_query_task.delay(session_id, user_input)
-        task_id = task.id
+        # ID gerado antes do dispatch para assinar o canal de streaming sem perder tokens
+        task_id = str(uuid.uuid4())
+        pubsub = None
+        if STREAMING_ENABLED:
+            from utils.stream_relay import subscribe_stream
+            pubsub = subscribe_stream(task_id)
+
+        # Fila/prioridade conforme o tipo de carga (testes em massa não atrasam o chat)
+        workload = state.get('workload') or 'interactive'
+        dispatch_time = time.time()
+        task = dispatch_sql_query_task(session_id, user_input, workload=workload, task_id=task_id)
 
         logging.info(f"[CELERY_DISPATCH] Task {task_id} disparada para sessão {session_id}, aguardando resultado...")
 
         # Aguardar resultado direto (timeout de 15 minutos para produção)
         try:
-            result = task.get(timeout=900)
+            if pubsub is not None:
+                from utils.stream_relay import relay_task_stream
+                await relay_task_stream(task, pubsub, config=config, timeout=900)
+
+            # Aguarda em thread para não bloquear o event loop do grafo
+            result = await asyncio.to_thread(task.get, timeout=900)
 
             logging.info(f"[CELERY_DISPATCH] ✅ Task concluída com sucesso!")
 
+            # Espera = tempo total menos a execução no worker (fila + overhead)
+            from utils.metrics import record_celery_wait
+            record_celery_wait(workload, time.time() - dispatch_time - (result.get('execution_time') or 0))
+
             # Atualizar estado com resultado final
             state.update({
                 'response': result.get('response', ''),
@@ -120,9 +147,11 @@ async def celery_task_dispatch_node(state: Dict[str, Any]) -> Dict[str, Any]:
                 'sql_result': {
                     'output': result.get('response', ''),
                     'success': result.get('status') == 'success',
-                    'sql_query': result.get('sql_query'),
-                    'intermediate_steps': result.get('intermediate_steps', [])
+                    'sql_query': result.get('sql_query')
                 },
+                'intermediate_steps_id': obj_manager.store_payload(
+                    get_payload_scope(state), 'intermediate_steps', result.get('intermediate_steps', [])
+                ),
                 'execution_time': result.get('execution_time', 0),
                 'error': None,
                 'celery_task_id': task_id,
@@ -132,6 +161,13 @@ async def celery_task_dispatch_node(state: Dict[str, Any]) -> Dict[str, Any]:
             if result.get('sql_query'):
                 logging.info(f"[CELERY_DISPATCH] Query SQL extraída: {result.get('sql_query')}")
 
+        except asyncio.CancelledError:
+            # Execução do grafo cancelada: não deixa a task ocupando o worker
+            from tasks import revoke_sql_query_task
+            logging.info(f"[CELERY_DISPATCH] Execução cancelada, revogando task {task_id}")
+            revoke_sql_query_task(task_id)
+            raise
+
         except Exception as e:
             error_msg = f"Erro na task Celery: {e}"
             logging.error(f"[CELERY_DISPATCH] ❌ {error_msg}")
@@ -142,8 +178,7 @@ async def celery_task_dispatch_node(state: Dict[str, Any]) -> Dict[str, Any]:
                 'sql_result': {
                     'output': error_msg,
                     'success': False,
-                    'sql_query': None,
-                    'intermediate_steps': []
+                    'sql_query': None
                 },
                 'celery_task_id': task_id,
                 'celery_task_status': 'FAILURE'
@@ -232,9 +267,11 @@ async def celery_task_polling_node(state: Dict[str, Any]) -> Dict[str, Any]:
                 'sql_result': {
                     'output': result.get('response', ''),
                     'success': result.get('status') == 'success',
-                    'sql_query': result.get('sql_query'),
-                    'intermediate_steps': result.get('intermediate_steps', [])
+                    'sql_query': result.get('sql_query')
                 },
+                'intermediate_steps_id': get_object_manager().store_payload(
+                    get_payload_scope(state), 'intermediate_steps', result.get('intermediate_steps', [])
+                ),
                 'execution_time': result.get('execution_time', 0),
                 'error': None
             })
@@ -251,8 +288,7 @@ async def celery_task_polling_node(state: Dict[str, Any]) -> Dict[str, Any]:
                 'sql_result': {
                     'output': error_msg,
                     'success': False,
-                    'sql_query': None,
-                    'intermediate_steps': []
+                    'sql_query': None
                 }
             })
             
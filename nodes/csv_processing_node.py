@@ -9,10 +9,8 @@ import pandas as pd
 import numpy as np
 from typing import Dict, Any, TypedDict, List, Optional
 from sqlalchemy.types import DateTime, Integer, Float, String, Boolean
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
-import multiprocessing as mp
 
-from utils.config import UPLOADED_CSV_PATH
+from utils.config import UPLOADED_CSV_PATH, DTYPE_OPTIMIZATION_ENABLED, CATEGORY_MAX_UNIQUE_RATIO
 from utils.object_manager import get_object_manager
 import numpy as np
 
@@ -252,8 +250,8 @@ async def detect_column_types(df: pd.DataFrame, sample_size: int = 1000) -> Dict
                 column_info["processing_rules"][col] = "keep_as_float"
             continue
 
-        # Para colunas de texto (object), detecta datas e números
-        if sample_col.dtype == 'object':
+        # Para colunas de texto (object ou string[pyarrow]), detecta datas e números
+        if sample_col.dtype == 'object' or isinstance(sample_col.dtype, pd.StringDtype):
             # Primeiro, tenta detectar datas
             sample_values = sample_col.dropna().head(20)
             date_success_count = 0
@@ -380,7 +378,16 @@ async def process_dataframe_generic(df: pd.DataFrame, column_info: Dict[str, Any
         else:
             processing_groups['text'].append((col, rule))
 
-    # OTIMIZAÇÃO 3: Processamento paralelo por grupos
+    # OTIMIZAÇÃO 3: Datas e conversões numéricas em pool de processos (por coluna e bloco de linhas)
+    from utils.parallel_conversion import convert_columns_in_process_pool
+
+    remaining = await convert_columns_in_process_pool(
+        processed_df, processing_groups['dates'] + processing_groups['convert_numeric']
+    )
+    processing_groups['dates'] = [item for item in processing_groups['dates'] if item in remaining]
+    processing_groups['convert_numeric'] = [item for item in processing_groups['convert_numeric'] if item in remaining]
+
+    # OTIMIZAÇÃO 4: Demais grupos (e fallback local) no processo atual
     await process_groups_parallel(processed_df, processing_groups)
 
     total_time = time.time() - start_time
@@ -623,6 +630,76 @@ def convert_to_float_ultra_optimized(series: pd.Series) -> pd.Series:
         logging.debug(f"Tipo da serie: {series.dtype}, Primeiros valores: {series.head()}")
         return series
 
+def _downcast_integer(series: pd.Series) -> Optional[str]:
+    """Menor inteiro nullable que comporta a coluna (None se não reduz)"""
+    valid = series.dropna()
+    if len(valid) == 0:
+        return "Int8"
+    low, high = int(valid.min()), int(valid.max())
+    for dtype in ("Int8", "Int16", "Int32"):
+        info = np.iinfo(dtype.lower())
+        if info.min <= low and high <= info.max:
+            return dtype
+    return None
+
+def _can_downcast_float(series: pd.Series) -> bool:
+    """Verifica se a coluna float64 cabe em float32 sem perda (ida e volta exata)"""
+    values = series.to_numpy(dtype="float64")
+    with np.errstate(over="ignore"):
+        roundtrip = values.astype("float32").astype("float64")
+    return bool(np.array_equal(values, roundtrip, equal_nan=True))
+
+def optimize_dataframe_dtypes(df: pd.DataFrame, column_info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduz a memória do DataFrame processado, alterando-o in-place
+
+    Texto com baixa cardinalidade (status, UF, filial) vira category; inteiros
+    e decimais são reduzidos apenas quando a conversão não perde valores.
+
+    Args:
+        df: DataFrame já processado
+        column_info: Informações dos tipos detectados
+
+    Returns:
+        Relatório com memória antes/depois (MB) e colunas convertidas
+    """
+    start_time = time.time()
+    memory_before = df.memory_usage(deep=True).sum()
+    converted = {}
+
+    text_columns = set(column_info.get("text_columns", []))
+    for col in df.columns:
+        series = df[col]
+        try:
+            if col in text_columns:
+                if len(series) > 0 and series.nunique(dropna=True) <= len(series) * CATEGORY_MAX_UNIQUE_RATIO:
+                    df[col] = series.astype("category")
+                    converted[col] = "category"
+            elif pd.api.types.is_integer_dtype(series):
+                target = _downcast_integer(series)
+                if target and str(series.dtype) != target:
+                    df[col] = series.astype(target)
+                    converted[col] = target
+            elif str(series.dtype) == "float64" and _can_downcast_float(series):
+                df[col] = series.astype("float32")
+                converted[col] = "float32"
+        except Exception as e:
+            logging.warning(f"[DTYPE_OPTIMIZATION] Coluna {col} mantida como {series.dtype}: {e}")
+
+    memory_after = df.memory_usage(deep=True).sum()
+    report = {
+        "memory_before_mb": round(memory_before / 1024 / 1024, 2),
+        "memory_after_mb": round(memory_after / 1024 / 1024, 2),
+        "reduction_percent": round((1 - memory_after / memory_before) * 100, 1) if memory_before else 0.0,
+        "converted_columns": converted,
+        "optimization_time": round(time.time() - start_time, 3)
+    }
+    logging.info(
+        f"[DTYPE_OPTIMIZATION] Memória {report['memory_before_mb']} MB -> {report['memory_after_mb']} MB "
+        f"(-{report['reduction_percent']}%), {len(converted)} colunas convertidas em {report['optimization_time']:.2f}s"
+    )
+    return report
+
 def process_dates_vectorized(series: pd.Series) -> pd.Series:
     """
     Processamento vetorizado ULTRA-OTIMIZADO de datas
@@ -673,34 +750,12 @@ async def csv_processing_node(state: CSVProcessingState) -> CSVProcessingState:
         shutil.copy(file_path, UPLOADED_CSV_PATH)
         logging.info(f"[CSV_PROCESSING] Arquivo copiado para: {UPLOADED_CSV_PATH}")
         
-        # OTIMIZAÇÃO EXTREMA: Leitura de CSV ultra-otimizada
-        separators = [';', ',', '\t', '|']
-        df = None
-        used_separator = None
+        # OTIMIZAÇÃO EXTREMA: Dialeto detectado em uma passada + leitor multithread do pyarrow
+        from utils.csv_reader import read_csv_file
+
+        df, read_info = read_csv_file(file_path)
+        used_separator = read_info["delimiter"]
 
-        # Detecta separador com amostra mínima
-        for sep in separators:
-            try:
-                test_df = pd.read_csv(file_path, sep=sep, nrows=3, engine='c')  # Engine C é mais rápido
-                if len(test_df.columns) > 1:
-                    # OTIMIZAÇÃO: Lê com configurações de performance máxima
-                    df = pd.read_csv(
-                        file_path,
-                        sep=sep,
-                        encoding='utf-8',
-                        on_bad_lines="skip",
-                        engine='c',  # Engine C para máxima performance
-                        low_memory=False,  # Evita warnings de tipos mistos
-                        dtype=str  # Lê tudo como string primeiro (mais rápido)
-                    )
-                    used_separator = sep
-                    break
-            except:
-                continue
-        
-        if df is None:
-            raise ValueError("Não foi possível detectar o formato do CSV")
-        
         logging.info(f"[CSV_PROCESSING] CSV lido com separador '{used_separator}', {len(df)} linhas, {len(df.columns)} colunas")
         
         # Detecta tipos de colunas automaticamente
@@ -708,6 +763,9 @@ async def csv_processing_node(state: CSVProcessingState) -> CSVProcessingState:
         
         # Processa DataFrame
         processed_df = await process_dataframe_generic(df, column_info)
+
+        # Tipos compactos antes de armazenar o DataFrame e gravar o banco
+        memory_report = optimize_dataframe_dtypes(processed_df, column_info) if DTYPE_OPTIMIZATION_ENABLED else {}
         
         # Estatísticas do processamento
         processing_stats = {
@@ -716,9 +774,12 @@ async def csv_processing_node(state: CSVProcessingState) -> CSVProcessingState:
             "original_columns": len(df.columns),
             "processed_columns": len(processed_df.columns),
             "separator_used": used_separator,
+            "encoding_used": read_info["encoding"],
+            "reader_engine": read_info["engine"],
             "date_columns_detected": len(column_info["date_columns"]),
             "numeric_columns_detected": len(column_info["numeric_columns"]),
-            "text_columns_detected": len(column_info["text_columns"])
+            "text_columns_detected": len(column_info["text_columns"]),
+            "memory": memory_report
         }
         
         # Amostra dos dados para o estado
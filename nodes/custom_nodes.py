@@ -493,6 +493,9 @@ class CustomNodeManager:
             original_sql_path = utils.config.SQL_DB_PATH
             utils.config.SQL_DB_PATH = db_path
 
+            # Tamanho anterior do SQLite (o banco é recriado a cada upload)
+            previous_db_size = os.path.getsize(db_path) if os.path.exists(db_path) else 0
+
             try:
                 db_result = await create_database_from_dataframe_node(csv_result)
                 if not db_result["success"]:
@@ -504,6 +507,7 @@ class CustomNodeManager:
                     }
             finally:
                 utils.config.SQL_DB_PATH = original_sql_path
+                self._record_session_db_usage(session_id, db_path, previous_db_size)
 
             # Recupera objetos criados
             engine_id = db_result["engine_id"]
@@ -526,3 +530,21 @@ class CustomNodeManager:
                 "engine_id": None,
                 "db_id": None
             }
+
+    def _record_session_db_usage(self, session_id: str, db_path: str, previous_size: int):
+        """
+        Contabiliza no Redis a variação de tamanho do SQLite da sessão
+
+        Args:
+            session_id: ID da sessão
+            db_path: Caminho do banco SQLite da sessão
+            previous_size: Tamanho do arquivo antes da recriação (bytes)
+        """
+        try:
+            from utils.session_manager import get_session_manager
+
+            current_size = os.path.getsize(db_path) if os.path.exists(db_path) else 0
+            get_session_manager().record_disk_usage(session_id, current_size - previous_size)
+
+        except Exception as e:
+            logging.warning(f"[CUSTOM_NODES] Uso de disco do SQLite não contabilizado para sessão {session_id}: {e}")
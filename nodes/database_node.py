@@ -7,9 +7,9 @@ import pandas as pd
 from typing import Dict, Any, TypedDict, Optional
 from sqlalchemy import create_engine
 
-from utils.config import SQL_DB_PATH
+from utils.config import SQL_DB_PATH, COLUMN_STATS_ENABLED
 from utils.database import create_sql_database, validate_database
-from utils.object_manager import get_object_manager
+from utils.object_manager import get_object_manager, get_payload_scope
 
 class DatabaseState(TypedDict):
     """Estado para operações de banco de dados"""
@@ -58,6 +58,11 @@ async def create_database_from_dataframe_node(state: Dict[str, Any]) -> Dict[str
         )
         
         logging.info(f"[DATABASE] Banco criado com {len(processed_df)} registros")
+
+        # Estatísticas de colunas calculadas uma vez sobre o DataFrame completo
+        if COLUMN_STATS_ENABLED:
+            from utils.column_stats import compute_dataframe_stats, save_column_stats
+            save_column_stats(engine, "tabela", compute_dataframe_stats(processed_df))
         
         # Cria objeto SQLDatabase do LangChain
         db = create_sql_database(engine)
@@ -233,12 +238,18 @@ async def get_database_sample_node(state: Dict[str, Any]) -> Dict[str, Any]:
                         raise ValueError("Nenhuma tabela encontrada no banco PostgreSQL")
 
                     # Tenta encontrar uma tabela com dados
+                    from utils.column_stats import get_column_stats
+
                     table_name = None
                     for table in available_tables:
                         try:
-                            # Verifica se a tabela tem dados
-                            count_result = conn.execute(sa.text(f"SELECT COUNT(*) FROM {table} LIMIT 1"))
-                            count = count_result.scalar()
+                            # Verifica se a tabela tem dados (estatísticas da ingestão evitam o COUNT)
+                            table_stats = get_column_stats(engine, table)
+                            if table_stats:
+                                count = table_stats[0]["row_count"]
+                            else:
+                                count_result = conn.execute(sa.text(f"SELECT COUNT(*) FROM {table} LIMIT 1"))
+                                count = count_result.scalar()
                             if count > 0:
                                 table_name = table
                                 logging.info(f"[DATABASE] PostgreSQL - usando tabela '{table_name}' para amostra ({count} registros)")
@@ -270,16 +281,21 @@ async def get_database_sample_node(state: Dict[str, Any]) -> Dict[str, Any]:
             sample_df = pd.DataFrame()
         
         # Converte para formato serializável
+        from utils.column_stats import get_column_stats
+
         db_sample_dict = {
             "data": sample_df.to_dict('records'),
             "columns": list(sample_df.columns),
             "dtypes": sample_df.dtypes.astype(str).to_dict(),
-            "shape": sample_df.shape
+            "shape": sample_df.shape,
+            "table_name": table_name,
+            # Estatísticas da tabela inteira (None se ainda não calculadas)
+            "column_stats": get_column_stats(engine, table_name)
         }
         
-        # Atualiza estado preservando session_id
+        # Amostra fica no ObjectManager; o estado guarda apenas o handle
         state.update({
-            "db_sample_dict": db_sample_dict
+            "db_sample_id": obj_manager.store_payload(get_payload_scope(state), "db_sample", db_sample_dict)
         })
 
         logging.info(f"[DATABASE] Amostra obtida: {sample_df.shape[0]} registros")
@@ -288,8 +304,34 @@ async def get_database_sample_node(state: Dict[str, Any]) -> Dict[str, Any]:
         error_msg = f"Erro ao obter amostra do banco: {e}"
         logging.error(f"[DATABASE] {error_msg}")
         state.update({
-            "db_sample_dict": {},
+            "db_sample_id": None,
             "error": error_msg
         })
 
     return state
+
+async def load_db_sample_dict(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Materializa a amostra do banco referenciada por db_sample_id
+
+    Se o payload não estiver mais disponível (execução já liberada), a
+    amostra é obtida novamente da engine.
+
+    Args:
+        state: Estado do grafo
+
+    Returns:
+        Dicionário da amostra (vazio se indisponível)
+    """
+    obj_manager = get_object_manager()
+    db_sample_dict = obj_manager.get_payload(state.get("db_sample_id"))
+    if db_sample_dict is not None:
+        return db_sample_dict
+
+    if not state.get("engine_id"):
+        return {}
+
+    logging.info("[DATABASE] Amostra não encontrada pelo handle, obtendo novamente")
+    refreshed = await get_database_sample_node(dict(state))
+    state["db_sample_id"] = refreshed.get("db_sample_id")
+    return obj_manager.get_payload(state["db_sample_id"], {})
@@ -51,7 +51,7 @@ async def graph_generation_node(state: Dict[str, Any]) -> Dict[str, Any]:
         
         # Recupera DataFrame dos dados
         obj_manager = get_object_manager()
-        df = obj_manager.get_object(data_id)
+        df = obj_manager.get_payload(data_id)
         
         if df is None or df.empty:
             error_msg = "Dados do gráfico não encontrados ou vazios"
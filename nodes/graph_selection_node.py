@@ -3,16 +3,15 @@ Nó para seleção do tipo de gráfico usando LLM - REFATORADO COMPLETO
 """
 import logging
 import re
-import pandas as pd
 from typing import Dict, Any, Optional
 
 from agents.tools import (
     generate_graph_type_context,
     extract_sql_query_from_response
 )
-from utils.config import OPENAI_API_KEY
-from langchain_openai import ChatOpenAI
-from utils.object_manager import get_object_manager
+from utils.config import OPENAI_API_KEY, RESULT_CHART_MAX_ROWS, is_offline_llm
+from utils.object_manager import get_object_manager, get_payload_scope
+from utils.result_set import read_first_rows
 
 # Mapeamento DIRETO no arquivo para evitar problemas externos
 GRAPH_TYPE_MAPPING = {
@@ -64,9 +63,11 @@ async def graph_selection_node(state: Dict[str, Any]) -> Dict[str, Any]:
             state.update({"graph_error": "Engine não encontrada", "graph_generated": False})
             return state
 
-        # 4. Executar query
+        # 4. Executar query (apenas as primeiras linhas: gráficos não usam o resultado inteiro)
         try:
-            df_result = pd.read_sql_query(sql_query, engine)
+            df_result, truncated = read_first_rows(engine, sql_query, RESULT_CHART_MAX_ROWS)
+            if truncated:
+                logging.warning(f"[GRAPH_SELECTION_NEW] Resultado truncado em {RESULT_CHART_MAX_ROWS} linhas para o gráfico")
             if df_result.empty:
                 logging.error("[GRAPH_SELECTION_NEW] ❌ Dados vazios")
                 state.update({"graph_error": "Dados vazios", "graph_generated": False})
@@ -79,7 +80,11 @@ async def graph_selection_node(state: Dict[str, Any]) -> Dict[str, Any]:
         # 5. Preparar contexto
         user_query = state.get("user_input", "")
         df_sample = df_result.head(3)
-        graph_context = generate_graph_type_context(user_query, sql_query, df_result.columns.tolist(), df_sample)
+        # Estatísticas vetorizadas sobre as linhas lidas (faixas e valores únicos reais)
+        from utils.column_stats import compute_dataframe_stats
+
+        column_stats = compute_dataframe_stats(df_result)
+        graph_context = generate_graph_type_context(user_query, sql_query, df_result.columns.tolist(), df_sample, column_stats)
 
         # 6. Chamar LLM de forma LIMPA
         graph_type = await call_llm_for_graph_selection(graph_context, user_query)
@@ -87,14 +92,14 @@ async def graph_selection_node(state: Dict[str, Any]) -> Dict[str, Any]:
         logging.error(f"🎯 [RESULTADO_FINAL] Tipo selecionado: '{graph_type}'")
 
         # 7. Armazenar resultado
-        graph_data_id = obj_manager.store_object(df_result, "graph_data")
+        graph_data_id = obj_manager.store_payload(get_payload_scope(state), "graph_data", df_result)
         state.update({
             "graph_type": graph_type,
             "graph_data": {
                 "data_id": graph_data_id,
                 "columns": df_result.columns.tolist(),
                 "rows": len(df_result),
-                "sample": df_sample.to_dict()
+                "truncated": truncated
             },
             "graph_error": None
         })
@@ -113,18 +118,21 @@ async def call_llm_for_graph_selection(graph_context: str, user_query: str) -> s
     logging.error("🔥 [LLM_CALL] Iniciando chamada LIMPA da LLM")
 
     # Verificação básica
-    if not OPENAI_API_KEY:
+    if not OPENAI_API_KEY and not is_offline_llm():
         logging.error("🔥 [LLM_CALL] OpenAI não configurada")
         return "line_simple"
 
     try:
         # Criar LLM com configuração limpa
-        llm = ChatOpenAI(
+        from agents.llm_provider import build_chat_model
+        from langchain_openai import ChatOpenAI
+
+        llm = build_chat_model("gpt-4o", lambda: ChatOpenAI(
             model="gpt-4o",
             temperature=0,
             max_tokens=5,
             timeout=30
-        )
+        ), hedge=True)
 
         # Log do contexto
         logging.error("🔥 [LLM_CALL] Contexto enviado:")
@@ -160,6 +160,15 @@ async def postgresql_connection_node(state: Dict[str, Any]) -> Dict[str, Any]:
             "db_id": db_id
         })
         
+        # Schema pode ter mudado desde a última conexão a este banco
+        from utils.schema_index import clear_schema_indexes
+        clear_schema_indexes(engine)
+
+        # Estatísticas de colunas: relidas do sidecar; ausentes ou expiradas são calculadas em segundo plano
+        from utils.column_stats import clear_column_stats_cache, schedule_profiling
+        clear_column_stats_cache(engine)
+        schedule_profiling(engine, table_names)
+
         logging.info(f"[POSTGRESQL_CONNECTION] Conexão PostgreSQL estabelecida com sucesso")
         logging.info(f"[POSTGRESQL_CONNECTION] Informações: {connection_info}")
         
@@ -1,13 +1,16 @@
 """
 Nó para processamento de contexto inicial usando Processing Agent
 """
+import time
 import logging
 import pandas as pd
 from typing import Dict, Any
 
 from agents.processing_agent import ProcessingAgentManager
 from agents.tools import prepare_processing_context
-from utils.object_manager import get_object_manager
+from utils.config import SCHEMA_PRUNING_ENABLED, SCHEMA_PRUNING_TOP_TABLES, SCHEMA_PRUNING_TOP_COLUMNS
+from utils.object_manager import get_object_manager, get_payload_scope
+from utils.schema_index import get_schema_index, prune_columns_data
 
 
 async def process_initial_context_node(state: Dict[str, Any]) -> Dict[str, Any]:
@@ -119,6 +122,8 @@ async def process_initial_context_node(state: Dict[str, Any]) -> Dict[str, Any]:
 
             # NOVA IMPLEMENTAÇÃO: Cria dados das colunas baseado no tipo de conexão
             columns_data = {}
+            schema_index = None
+            schema_start_time = time.time()
             import sqlalchemy as sa
 
             if engine_dialect == "postgresql":
@@ -128,6 +133,20 @@ async def process_initial_context_node(state: Dict[str, Any]) -> Dict[str, Any]:
                     logging.info(f"[PROCESSING NODE] PostgreSQL - Modo tabela única: {selected_table}")
                     columns_data[selected_table] = _extract_table_columns_info(engine, selected_table)
 
+                elif SCHEMA_PRUNING_ENABLED:
+                    # Modo multi-tabela com poda - amostra apenas as tabelas relevantes para a pergunta
+                    logging.info(f"[PROCESSING NODE] PostgreSQL - Modo multi-tabela (poda de schema ativa)")
+
+                    schema_index = get_schema_index(engine)
+                    relevant_tables = schema_index.select_tables(user_input, SCHEMA_PRUNING_TOP_TABLES)
+                    logging.info(f"[PROCESSING NODE] Tabelas relevantes ({len(relevant_tables)}/{len(schema_index.catalog)}): {relevant_tables}")
+
+                    for table_name in relevant_tables:
+                        columns_data[table_name] = _extract_table_columns_info(engine, table_name)
+                    schema_index.update_tables(columns_data)
+
+                    state["relevant_tables"] = relevant_tables
+
                 else:
                     # Modo multi-tabela - processa TODAS as tabelas disponíveis
                     logging.info(f"[PROCESSING NODE] PostgreSQL - Modo multi-tabela")
@@ -144,7 +163,7 @@ async def process_initial_context_node(state: Dict[str, Any]) -> Dict[str, Any]:
 
                     logging.info(f"[PROCESSING NODE] Tabelas encontradas: {available_tables}")
 
-                    # Processa cada tabela (máximo 5 para performance)
+                    # Processa cada tabela (máximo 20 para performance)
                     for table_name in available_tables[:20]:
                         columns_data[table_name] = _extract_table_columns_info(engine, table_name)
 
@@ -155,6 +174,21 @@ async def process_initial_context_node(state: Dict[str, Any]) -> Dict[str, Any]:
 
             logging.info(f"[PROCESSING NODE] ✅ Dados das colunas extraídos para {len(columns_data)} tabela(s)")
 
+            # Poda de colunas irrelevantes para a pergunta + relatório de economia
+            if SCHEMA_PRUNING_ENABLED:
+                columns_data, schema_pruning = prune_columns_data(
+                    user_input, columns_data, SCHEMA_PRUNING_TOP_COLUMNS, schema_index
+                )
+                schema_pruning["latency_ms"] = round((time.time() - schema_start_time) * 1000, 1)
+                state["schema_pruning"] = schema_pruning
+
+                logging.info(
+                    f"[SCHEMA_PRUNING] Tabelas {schema_pruning['tables_selected']}/{schema_pruning['tables_total']}, "
+                    f"colunas {schema_pruning['columns_selected']}/{schema_pruning['columns_total']}, "
+                    f"tokens ~{schema_pruning['tokens_pruned_estimate']} (economia ~{schema_pruning['tokens_saved_estimate']}) "
+                    f"em {schema_pruning['latency_ms']}ms"
+                )
+
         except Exception as e:
             logging.error(f"[PROCESSING NODE] ❌ Erro ao acessar banco de dados: {e}")
             logging.error(f"[PROCESSING NODE] Detalhes do erro: {str(e)}")
@@ -235,7 +269,7 @@ async def process_initial_context_node(state: Dict[str, Any]) -> Dict[str, Any]:
             state.update({
                 "suggested_query": suggested_query,
                 "query_observations": query_observations,
-                "processing_result": processing_result,
+                "processing_result_id": obj_manager.store_payload(get_payload_scope(state), "processing_result", processing_result),
                 "processing_success": True
             })
             
@@ -255,7 +289,7 @@ async def process_initial_context_node(state: Dict[str, Any]) -> Dict[str, Any]:
             state.update({
                 "suggested_query": "",
                 "query_observations": "",
-                "processing_result": processing_result,
+                "processing_result_id": obj_manager.store_payload(get_payload_scope(state), "processing_result", processing_result),
                 "processing_success": False,
                 "processing_error": error_msg
             })
@@ -352,10 +386,17 @@ def _extract_table_columns_info(engine, table_name: str) -> list:
     """
     import sqlalchemy as sa
     import pandas as pd
+    from utils.column_stats import get_column_stats, stats_to_columns_info
 
     try:
         logging.info(f"[PROCESSING NODE] Extraindo informações da tabela: {table_name}")
 
+        # Estatísticas da ingestão (tabela inteira) dispensam a amostra
+        table_stats = get_column_stats(engine, table_name)
+        if table_stats:
+            logging.info(f"[PROCESSING NODE] ✅ Tabela {table_name}: {len(table_stats)} colunas com estatísticas da ingestão")
+            return stats_to_columns_info(table_stats)
+
         with engine.connect() as conn:
             # Primeiro, tenta obter dados da tabela (máximo 5 linhas)
             try:
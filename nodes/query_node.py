@@ -4,11 +4,15 @@ Nó para processamento de consultas SQL
 import time
 import logging
 import pandas as pd
-from typing import Dict, Any, TypedDict
+from typing import Dict, Any, TypedDict, Optional
+from langchain_core.runnables import RunnableConfig
 
 from agents.tools import is_greeting, detect_query_type, prepare_sql_context
 from agents.sql_agent import SQLAgentManager
-from utils.object_manager import get_object_manager
+from utils.config import SCHEMA_PRUNING_ENABLED, SCHEMA_PRUNING_TOP_TABLES
+from nodes.database_node import load_db_sample_dict
+from utils.object_manager import get_object_manager, get_payload_scope
+from utils.schema_index import get_schema_index
 
 class QueryState(TypedDict):
     """Estado para processamento de consultas"""
@@ -17,17 +21,18 @@ class QueryState(TypedDict):
     response: str
     execution_time: float
     error: str
-    intermediate_steps: list
+    intermediate_steps_id: Optional[str]
     llama_instruction: str
     sql_result: dict
 
-async def process_user_query_node(state: Dict[str, Any]) -> Dict[str, Any]:
+async def process_user_query_node(state: Dict[str, Any], config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """
     Nó principal para processar consulta do usuário
     AGORA USA CELERY PARA TODAS AS QUERIES SQL
 
     Args:
         state: Estado atual com entrada do usuário
+        config: Configuração do LangGraph (callbacks usados para streaming de tokens)
 
     Returns:
         Estado atualizado - dispara task Celery em vez de execução direta
@@ -73,7 +78,7 @@ async def process_user_query_node(state: Dict[str, Any]) -> Dict[str, Any]:
                 return state
         
         # Converte amostra do banco para DataFrame
-        db_sample_dict = state.get("db_sample_dict", {})
+        db_sample_dict = await load_db_sample_dict(state)
         if not db_sample_dict:
             raise ValueError("Amostra do banco não disponível")
         
@@ -91,9 +96,12 @@ async def process_user_query_node(state: Dict[str, Any]) -> Dict[str, Any]:
             suggested_query = state.get("suggested_query", "")
             query_observations = state.get("query_observations", "")
 
+            # Tabelas relevantes para a pergunta (PostgreSQL multi-tabela)
+            relevant_tables = _get_relevant_tables(state, user_input)
+
             # Prepara contexto para envio direto ao agentSQL
-            sql_context = prepare_sql_context(user_input, db_sample, suggested_query, query_observations)
-            state["sql_context"] = sql_context
+            sql_context = prepare_sql_context(user_input, db_sample, suggested_query, query_observations, relevant_tables)
+            state["sql_context_id"] = obj_manager.store_payload(get_payload_scope(state), "sql_context", sql_context)
 
             logging.info(f"[DEBUG] Tipo de query detectado: {query_type}")
             if suggested_query:
@@ -185,7 +193,10 @@ async def process_user_query_node(state: Dict[str, Any]) -> Dict[str, Any]:
         logging.info(f"[QUERY] Modo tradicional - Executando diretamente")
 
         # Executa query no agente SQL com contexto direto
-        sql_result = await sql_agent.execute_query(state["sql_context"])
+        sql_result = await sql_agent.execute_query(
+            obj_manager.get_payload(state.get("sql_context_id"), ""),
+            callbacks=(config or {}).get("callbacks")
+        )
 
         # Log da resposta do agente SQL
         logging.info(f"[AGENT SQL] ===== RESPOSTA DO AGENTE SQL =====")
@@ -206,9 +217,11 @@ async def process_user_query_node(state: Dict[str, Any]) -> Dict[str, Any]:
             # Captura query SQL do resultado do agente
             sql_query_captured = sql_result.get("sql_query")
 
+            # Passos do agente (mensagens/observações completas) ficam fora do estado
+            intermediate_steps = sql_result.pop("intermediate_steps", [])
             state.update({
                 "response": sql_result["output"],
-                "intermediate_steps": sql_result["intermediate_steps"],
+                "intermediate_steps_id": obj_manager.store_payload(get_payload_scope(state), "intermediate_steps", intermediate_steps),
                 "sql_result": sql_result,
                 "sql_query_extracted": sql_query_captured,  # ← Query SQL capturada
                 "error": None
@@ -237,6 +250,48 @@ async def process_user_query_node(state: Dict[str, Any]) -> Dict[str, Any]:
     
     return state
 
+def _get_relevant_tables(state: Dict[str, Any], user_input: str) -> list:
+    """
+    Obtém as tabelas mais relevantes para a pergunta via índice de schema
+
+    Reaproveita a seleção feita pelo Processing Agent quando disponível.
+
+    Args:
+        state: Estado atual
+        user_input: Pergunta do usuário
+
+    Returns:
+        Lista de tabelas (vazia se poda desativada ou não aplicável)
+    """
+    if not SCHEMA_PRUNING_ENABLED:
+        return []
+    if state.get("connection_type", "csv") != "postgresql" or state.get("single_table_mode", False):
+        return []
+    if state.get("relevant_tables"):
+        return state["relevant_tables"]
+
+    try:
+        obj_manager = get_object_manager()
+        engine_id = state.get("engine_id")
+        session_id = state.get("session_id")
+        engine = obj_manager.get_engine_session(session_id, engine_id) if session_id else None
+        if not engine:
+            engine = obj_manager.get_engine(engine_id)
+        if not engine:
+            return []
+
+        start_time = time.time()
+        schema_index = get_schema_index(engine)
+        relevant_tables = schema_index.select_tables(user_input, SCHEMA_PRUNING_TOP_TABLES)
+        state["relevant_tables"] = relevant_tables
+
+        logging.info(f"[SCHEMA_PRUNING] Tabelas relevantes ({len(relevant_tables)}/{len(schema_index.catalog)}) em {(time.time() - start_time) * 1000:.0f}ms: {relevant_tables}")
+        return relevant_tables
+
+    except Exception as e:
+        logging.warning(f"[SCHEMA_PRUNING] Erro ao selecionar tabelas relevantes: {e}")
+        return []
+
 async def validate_query_input_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Nó para validar entrada da consulta
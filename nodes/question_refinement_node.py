@@ -5,9 +5,9 @@ import logging
 import re
 from typing import Dict, Any, Optional
 
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage
-from utils.config import OPENAI_API_KEY
+from langchain_core.messages import HumanMessage
+from utils.config import OPENAI_API_KEY, is_offline_llm
+from agents.llm_provider import build_chat_model
 from utils.object_manager import get_object_manager
 
 
@@ -55,7 +55,7 @@ async def question_refinement_node(state: Dict[str, Any]) -> Dict[str, Any]:
             return state
         
         # Verifica se OpenAI API está disponível
-        if not OPENAI_API_KEY:
+        if not OPENAI_API_KEY and not is_offline_llm():
             error_msg = "OpenAI API Key não configurada para Question Refinement"
             logging.error(f"[QUESTION_REFINEMENT] {error_msg}")
             state.update({
@@ -67,7 +67,9 @@ async def question_refinement_node(state: Dict[str, Any]) -> Dict[str, Any]:
             return state
         
         # Obtém informações de contexto dos dados
-        db_sample_dict = state.get("db_sample_dict", {})
+        from nodes.database_node import load_db_sample_dict
+
+        db_sample_dict = await load_db_sample_dict(state)
         context_info = _build_context_info(db_sample_dict)
         
         # Executa refinamento
@@ -126,12 +128,27 @@ def _build_context_info(db_sample_dict: Dict[str, Any]) -> str:
     Constrói informações de contexto sobre os dados para o refinamento
     
     Args:
-        db_sample_dict: Dicionário com amostra dos dados
+        db_sample_dict: Dicionário com amostra dos dados (e column_stats, se disponíveis)
         
     Returns:
         String com informações de contexto
     """
     try:
+        # Estatísticas da ingestão: tipos, nulos, faixas e valores frequentes da tabela inteira
+        column_stats = (db_sample_dict or {}).get("column_stats")
+        if column_stats:
+            from utils.column_stats import format_column_stats, format_examples
+
+            context_parts = [f"Tabela com {column_stats[0]['row_count']} registros e {len(column_stats)} colunas"]
+            for col_stats in column_stats[:10]:  # Limita a 10 colunas
+                context_parts.append(
+                    f"- {col_stats['column']} ({col_stats['kind']}): {format_column_stats(col_stats)}; "
+                    f"exemplos: {format_examples(col_stats)}"
+                )
+            if len(column_stats) > 10:
+                context_parts.append(f"(e mais {len(column_stats) - 10} colunas)")
+            return "\n".join(context_parts)
+
         if not db_sample_dict or not db_sample_dict.get("data"):
             return "Dados tabulares genéricos"
         
@@ -172,13 +189,15 @@ async def _refine_question_with_gpt4o(original_question: str, context_info: str)
         Resultado do refinamento
     """
     try:
-        # Inicializa LLM
-        llm = ChatOpenAI(
+        # Inicializa LLM (SDK da OpenAI importado apenas no primeiro uso)
+        from langchain_openai import ChatOpenAI
+
+        llm = build_chat_model("gpt-4o", lambda: ChatOpenAI(
             model="gpt-4o",
             temperature=0.1,  # Baixa temperatura para consistência
             max_tokens=500,   # Perguntas refinadas devem ser concisas
             api_key=OPENAI_API_KEY
-        )
+        ), hedge=True)
         
         # Prompt especializado para refinamento
         refinement_prompt = f"""
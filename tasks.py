@@ -1,16 +1,32 @@
 """
 Tasks do Celery para processamento de queries SQL
 """
+import os
 import logging
+import threading
 import time
 import json
-import pandas as pd
 from typing import Dict, Any, Optional
 from celery import Celery
+from celery.signals import worker_ready, worker_shutdown, worker_process_shutdown
+from kombu import Exchange, Queue
 from sqlalchemy import create_engine, text
 
 # Importa configurações
-from utils.config import CELERY_BROKER_URL, CELERY_RESULT_BACKEND, is_docker_environment, get_environment_info
+from utils.config import (
+    CELERY_BROKER_URL,
+    CELERY_RESULT_BACKEND,
+    CELERY_QUEUE_INTERACTIVE,
+    CELERY_QUEUE_BULK,
+    CELERY_QUEUE_INGESTION,
+    CELERY_AFFINITY_ENABLED,
+    CELERY_METRICS_PORT,
+    STREAMING_ENABLED,
+    is_docker_environment,
+    get_environment_info,
+    get_celery_queue,
+    get_celery_priority
+)
 
 # Log informações do ambiente no worker
 env_info = get_environment_info()
@@ -101,8 +117,29 @@ else:
     )
     logging.info("[CELERY_CONFIG] Configuração Windows estendida aplicada (60min timeout)")
 
+# Filas nomeadas e roteamento (comum a ambos os ambientes)
+celery_app.conf.update(
+    task_queues=(
+        Queue(CELERY_QUEUE_INTERACTIVE, Exchange(CELERY_QUEUE_INTERACTIVE), routing_key=CELERY_QUEUE_INTERACTIVE),
+        Queue(CELERY_QUEUE_BULK, Exchange(CELERY_QUEUE_BULK), routing_key=CELERY_QUEUE_BULK),
+        Queue(CELERY_QUEUE_INGESTION, Exchange(CELERY_QUEUE_INGESTION), routing_key=CELERY_QUEUE_INGESTION),
+    ),
+    task_default_queue=CELERY_QUEUE_INTERACTIVE,
+    task_routes={
+        'process_sql_query': {'queue': CELERY_QUEUE_INTERACTIVE},
+    },
+
+    # Prioridades no Redis: cada fila é dividida em sub-filas por prioridade
+    broker_transport_options={
+        'priority_steps': list(range(10)),
+        'sep': ':',
+        'queue_order_strategy': 'priority',
+    },
+    task_default_priority=get_celery_priority("interactive"),
+)
+logging.info(f"[CELERY_CONFIG] Filas: {CELERY_QUEUE_INTERACTIVE}, {CELERY_QUEUE_BULK}, {CELERY_QUEUE_INGESTION}")
+
 # Log configuração aplicada
-env_info = get_environment_info()
 logging.info(f"[CELERY_CONFIG] Configuração aplicada para {env_info['environment']}")
 logging.info(f"[CELERY_CONFIG] Pool será definido pelo comando do worker")
 
@@ -116,6 +153,58 @@ logging.basicConfig(
 _AGENT_REGISTRY = {}  # session_id -> {cache_key -> agent}
 _DB_REGISTRY = {}     # session_id -> {cache_key -> database}
 
+# Métricas locais dos registries (hits/misses deste processo)
+_REGISTRY_METRICS = {"agent_hit": 0, "agent_miss": 0, "db_hit": 0, "db_miss": 0}
+
+# Protege registries e métricas (pool threads/solo executa tasks concorrentes no mesmo processo)
+_REGISTRY_LOCK = threading.Lock()
+# Um lock por chave: o mesmo agente/banco é construído uma única vez, sem bloquear outras chaves
+_BUILD_LOCKS: Dict[tuple, threading.Lock] = {}
+
+# Slot de afinidade deste worker (definido pelo app.py ao iniciar o worker)
+_AFFINITY_SLOT = os.getenv("AGENTGRAPH_AFFINITY_SLOT")
+
+@worker_ready.connect
+def _on_worker_ready(sender=None, **kwargs):
+    """Registra o slot de afinidade do worker no anel de hash consistente e publica métricas"""
+    from utils.metrics import start_metrics_server
+    start_metrics_server(int(os.getenv("AGENTGRAPH_METRICS_PORT", CELERY_METRICS_PORT)), attempts=10)
+
+    if _AFFINITY_SLOT is not None and CELERY_AFFINITY_ENABLED:
+        from utils.session_affinity import start_affinity_heartbeat
+        start_affinity_heartbeat(int(_AFFINITY_SLOT), hostname=getattr(sender, 'hostname', ''))
+
+@worker_shutdown.connect
+def _on_worker_shutdown(sender=None, **kwargs):
+    """Remove o slot do anel para que as sessões sejam redistribuídas imediatamente"""
+    if _AFFINITY_SLOT is not None and CELERY_AFFINITY_ENABLED:
+        from utils.session_affinity import stop_affinity_heartbeat
+        stop_affinity_heartbeat(int(_AFFINITY_SLOT))
+
+    # Pools solo/threads: as tasks rodam neste processo
+    from agents.llm_provider import flush_fixture_store
+    flush_fixture_store()
+
+@worker_process_shutdown.connect
+def _on_worker_process_shutdown(**kwargs):
+    """Consolida as fixtures gravadas pelo processo filho (o prefork não executa atexit nos filhos)"""
+    from agents.llm_provider import flush_fixture_store
+    flush_fixture_store()
+
+def _record_registry_outcome(registry: str, outcome: str) -> None:
+    """Contabiliza hit/miss do registry localmente e no Redis (agregado entre workers)"""
+    with _REGISTRY_LOCK:
+        _REGISTRY_METRICS[f"{registry}_{outcome}"] += 1
+
+    from utils.metrics import record_cache_event
+    record_cache_event(registry, outcome)
+
+    try:
+        from utils.session_affinity import record_registry_metrics
+        record_registry_metrics({registry: outcome}, slot=_AFFINITY_SLOT)
+    except Exception as e:
+        logging.debug(f"[CACHE] Métricas não registradas: {e}")
+
 def _key_fingerprint(key_tuple: tuple) -> str:
     """Retorna um fingerprint seguro da chave de cache (SHA1) sem expor segredos."""
     try:
@@ -206,24 +295,71 @@ def _generate_cache_key(agent_config: Dict[str, Any]) -> tuple:
     return (session_id, tenant_id, selected_model, connection_type, db_uri_or_path, include_tables_key, sqlite_fp, top_k, version)
 
 
+def _get_build_lock(registry: str, cache_key: tuple) -> threading.Lock:
+    """Lock de construção de uma chave do registry (criado sob demanda)"""
+    with _REGISTRY_LOCK:
+        return _BUILD_LOCKS.setdefault((registry,) + cache_key, threading.Lock())
+
+
+def _registry_lookup(registry: Dict[str, Dict[tuple, Any]], session_id: str, cache_key: tuple,
+                     version: Optional[int] = None):
+    """
+    Busca uma entrada do registry da sessão
+
+    Args:
+        registry: _AGENT_REGISTRY ou _DB_REGISTRY
+        session_id: ID da sessão
+        cache_key: Chave de cache
+        version: Versão da configuração (entradas de outra versão são descartadas)
+
+    Returns:
+        Objeto em cache ou None
+    """
+    with _REGISTRY_LOCK:
+        session_cache = registry.setdefault(session_id, {})
+        cached = session_cache.get(cache_key)
+        if cached is not None and version is not None:
+            cached_version = getattr(cached, '_config_version', 1)
+            if cached_version != version:
+                logging.info(f"[CACHE] Versão mudou ({cached_version} → {version}), forçando cache miss para sessão {session_id}")
+                del session_cache[cache_key]
+                return None
+        return cached
+
+
+def _registry_store(registry: Dict[str, Dict[tuple, Any]], session_id: str, cache_key: tuple, value: Any):
+    """Armazena uma entrada no registry da sessão"""
+    with _REGISTRY_LOCK:
+        registry.setdefault(session_id, {})[cache_key] = value
+
+
 def _get_or_create_database(agent_config: Dict[str, Any]):
     """Obtém ou cria SQLDatabase usando db_uri, com cache por sessão."""
-    from utils.database import create_sql_database
-
     session_id = agent_config.get('session_id', 'global')
     cache_key = _generate_cache_key(agent_config)
 
-    # Inicializa cache da sessão se não existir
-    if session_id not in _DB_REGISTRY:
-        _DB_REGISTRY[session_id] = {}
+    db = _registry_lookup(_DB_REGISTRY, session_id, cache_key)
+    if db is None:
+        with _get_build_lock("DB", cache_key):
+            # Outra thread pode ter construído enquanto esperávamos o lock
+            db = _registry_lookup(_DB_REGISTRY, session_id, cache_key)
+            if db is None:
+                _record_registry_outcome("db", "miss")
+                db = _create_database(agent_config)
+                _registry_store(_DB_REGISTRY, session_id, cache_key, db)
+                logging.info(f"[CACHE] cache_miss DB para sessão {session_id}; armazenado para chave {_key_fingerprint(cache_key)}")
+                return db
+
+    logging.info(f"[CACHE] cache_hit DB para sessão {session_id}, chave {_key_fingerprint(cache_key)}")
+    _record_registry_outcome("db", "hit")
+    return db
 
-    session_cache = _DB_REGISTRY[session_id]
 
-    if cache_key in session_cache:
-        logging.info(f"[CACHE] cache_hit DB para sessão {session_id}, chave {_key_fingerprint(cache_key)}")
-        return session_cache[cache_key]
+def _create_database(agent_config: Dict[str, Any]):
+    """Abre o banco da configuração (cache miss)"""
+    from utils.database import create_sql_database
 
-    # cache miss
+    session_id = agent_config.get('session_id', 'global')
     db_uri = _build_db_uri_or_path(agent_config)
     logging.info(f"[DB_URI] Abrindo banco via db_uri para sessão {session_id}: {db_uri}")
 
@@ -260,10 +396,7 @@ def _get_or_create_database(agent_config: Dict[str, Any]):
         logging.error(f"[DB_URI] Falha ao conectar em {db_uri}: {e}")
         raise
 
-    db = create_sql_database(engine)
-    session_cache[cache_key] = db
-    logging.info(f"[CACHE] cache_miss DB para sessão {session_id}; armazenado para chave {_key_fingerprint(cache_key)}")
-    return db
+    return create_sql_database(engine)
 
 
 def _get_or_create_sql_agent(agent_config: Dict[str, Any]):
@@ -272,46 +405,39 @@ def _get_or_create_sql_agent(agent_config: Dict[str, Any]):
 
     session_id = agent_config.get('session_id', 'global')
     cache_key = _generate_cache_key(agent_config)
-
-    # Inicializa cache da sessão se não existir
-    if session_id not in _AGENT_REGISTRY:
-        _AGENT_REGISTRY[session_id] = {}
-
-    session_cache = _AGENT_REGISTRY[session_id]
-
-    if cache_key in session_cache:
-        # Verifica se a versão mudou - se sim, força cache miss
-        cached_agent = session_cache[cache_key]
-        current_version = agent_config.get('version', 1)
-        cached_version = getattr(cached_agent, '_config_version', 1)
-
-        if current_version != cached_version:
-            logging.info(f"[CACHE] Versão mudou ({cached_version} → {current_version}), forçando cache miss para sessão {session_id}")
-            del session_cache[cache_key]
-        else:
-            logging.info(f"[CACHE] cache_hit AGENT para sessão {session_id}, chave {_key_fingerprint(cache_key)}")
-            return session_cache[cache_key]
-
-    # cache miss: cria DB (via cache) e agente
-    db = _get_or_create_database(agent_config)
-    single_table_mode = agent_config.get('single_table_mode', False)
-    selected_table = agent_config.get('selected_table')
-    selected_model = agent_config.get('selected_model', 'gpt-4o-mini')
-    top_k = agent_config.get('top_k', 10)
-
-    agent = SQLAgentManager(
-        db=db,
-        model_name=selected_model,
-        single_table_mode=single_table_mode,
-        selected_table=selected_table,
-        top_k=top_k
-    )
-
-    # Armazena versão da configuração no agente para controle de cache
-    agent._config_version = agent_config.get('version', 1)
-
-    session_cache[cache_key] = agent
-    logging.info(f"[CACHE] cache_miss AGENT para sessão {session_id}; agente criado e armazenado para chave {_key_fingerprint(cache_key)}")
+    current_version = agent_config.get('version', 1)
+
+    agent = _registry_lookup(_AGENT_REGISTRY, session_id, cache_key, current_version)
+    if agent is None:
+        with _get_build_lock("AGENT", cache_key):
+            agent = _registry_lookup(_AGENT_REGISTRY, session_id, cache_key, current_version)
+            if agent is None:
+                _record_registry_outcome("agent", "miss")
+
+                # cache miss: cria DB (via cache) e agente
+                db = _get_or_create_database(agent_config)
+                single_table_mode = agent_config.get('single_table_mode', False)
+                selected_table = agent_config.get('selected_table')
+                selected_model = agent_config.get('selected_model', 'gpt-4o-mini')
+                top_k = agent_config.get('top_k', 10)
+
+                agent = SQLAgentManager(
+                    db=db,
+                    model_name=selected_model,
+                    single_table_mode=single_table_mode,
+                    selected_table=selected_table,
+                    top_k=top_k
+                )
+
+                # Armazena versão da configuração no agente para controle de cache
+                agent._config_version = current_version
+
+                _registry_store(_AGENT_REGISTRY, session_id, cache_key, agent)
+                logging.info(f"[CACHE] cache_miss AGENT para sessão {session_id}; agente criado e armazenado para chave {_key_fingerprint(cache_key)}")
+                return agent
+
+    logging.info(f"[CACHE] cache_hit AGENT para sessão {session_id}, chave {_key_fingerprint(cache_key)}")
+    _record_registry_outcome("agent", "hit")
     return agent
 
 @celery_app.task(bind=True, name='process_sql_query')
@@ -385,7 +511,7 @@ def process_sql_query_task(self, session_id: str, user_input: str) -> Dict[str,
         )
 
         # 3. Executar pipeline do AgentSQL
-        result = execute_sql_pipeline(sql_agent, user_input, session_config)
+        result = execute_sql_pipeline(sql_agent, user_input, session_config, task_id=self.request.id)
 
         # Atualiza status
         self.update_state(
@@ -438,46 +564,81 @@ def process_sql_query_task(self, session_id: str, user_input: str) -> Dict[str,
         # Levanta a exceção corretamente para o Celery
         raise Exception(error_msg) from e
 
-def load_session_config_from_redis(session_id: str) -> Optional[Dict[str, Any]]:
+def dispatch_sql_query_task(session_id: str, user_input: str, workload: str = "interactive", task_id: Optional[str] = None):
     """
-    Carrega configuração da sessão do Redis
+    Dispara process_sql_query_task na fila e prioridade do tipo de carga
 
     Args:
         session_id: ID da sessão
+        user_input: Pergunta do usuário
+        workload: Tipo de carga ("interactive", "bulk" ou "ingestion")
+        task_id: ID pré-definido da task (opcional)
 
     Returns:
-        Dicionário com configurações ou None se não encontrado
+        AsyncResult da task
+    """
+    queue = get_celery_queue(workload)
+    priority = get_celery_priority(workload)
+
+    # Afinidade: mesma sessão no mesmo worker (fallback para fila compartilhada)
+    if workload == "interactive" and CELERY_AFFINITY_ENABLED:
+        from utils.session_affinity import get_affinity_queue
+        queue = get_affinity_queue(session_id)
+
+    logging.info(f"[CELERY_DISPATCH] Fila: {queue} | Prioridade: {priority} | Carga: {workload}")
+
+    return process_sql_query_task.apply_async(
+        args=[session_id, user_input],
+        task_id=task_id,
+        queue=queue,
+        priority=priority
+    )
+
+def revoke_sql_query_task(task_id: str, terminate: bool = True) -> bool:
     """
-    import redis
-    from utils.config import REDIS_HOST, REDIS_PORT
+    Revoga uma task SQL (cancelamento propagado do grafo para o Celery)
+
+    Tasks ainda na fila são descartadas pelo worker; com terminate=True, tasks
+    em execução são interrompidas (pool prefork; no pool de threads apenas
+    tasks ainda não iniciadas são descartadas).
 
+    Args:
+        task_id: ID da task
+        terminate: Interrompe a task se já estiver em execução
+
+    Returns:
+        True se a revogação foi enviada
+    """
     try:
-        # Log informações de ambiente para debug
-        env_info = get_environment_info()
-        logging.info(f"[REDIS] Worker ambiente: {env_info['environment']}")
-        logging.info(f"[REDIS] Conectando ao Redis para carregar sessão {session_id}...")
-        logging.info(f"[REDIS] Host: {REDIS_HOST}, Port: {REDIS_PORT}")
+        celery_app.control.revoke(task_id, terminate=terminate)
+        logging.info(f"[CELERY_DISPATCH] Task {task_id} revogada (terminate={terminate})")
+        return True
+    except Exception as e:
+        logging.error(f"[CELERY_DISPATCH] Erro ao revogar task {task_id}: {e}")
+        return False
 
-        # Usa DB 2 para sessões (mesmo do SessionManager)
-        redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=2, decode_responses=True)
+def load_session_config_from_redis(session_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Carrega configuração da sessão do Redis (hash da sessão, um round-trip)
+
+    Args:
+        session_id: ID da sessão
 
-        # Testa conexão
-        redis_client.ping()
-        logging.info(f"[REDIS] Conexão com Redis estabelecida")
+    Returns:
+        Dicionário com configurações ou None se não encontrado
+    """
+    from utils.redis_client import get_redis_client, load_json_hash
 
-        # Busca configuração da sessão no Redis
+    try:
+        # Usa DB 2 para sessões (mesmo do SessionManager), via pool compartilhado
         session_key = f"session:{session_id}"
-        logging.info(f"[REDIS] Buscando chave: {session_key}")
-        session_data = redis_client.get(session_key)
+        session_config = load_json_hash(get_redis_client(2), session_key)
 
-        if not session_data:
+        if not session_config:
             logging.error(f"[REDIS] ❌ Configuração da sessão não encontrada: {session_id}")
             logging.error(f"[REDIS] Chave buscada: {session_key}")
             return None
 
-        # Deserializa configuração
-        logging.info(f"[REDIS] Dados encontrados, deserializando...")
-        session_config = json.loads(session_data)
         logging.info(f"[REDIS] ✅ Configuração da sessão carregada para {session_id}: {list(session_config.keys())}")
 
         return session_config
@@ -490,33 +651,25 @@ def save_session_config_to_redis(session_id: str, config: Dict[str, Any]) -> boo
     """
     Salva configuração da sessão no Redis
 
+    Usa SessionManager.update_session: HSET parcial dos campos recebidos,
+    versão incrementada só quando a configuração muda, TTL renovado e score
+    do índice sessions:index atualizado no mesmo script.
+
     Args:
         session_id: ID da sessão
         config: Configurações a serem salvas
 
     Returns:
-        True se salvou com sucesso, False caso contrário
+        True se salvou com sucesso, False caso contrário (ex: sessão inexistente)
     """
-    import redis
-    from utils.config import REDIS_HOST, REDIS_PORT
+    from utils.session_manager import get_session_manager
 
     try:
-        # Log informações de ambiente para debug
-        env_info = get_environment_info()
-        logging.info(f"[REDIS] Worker ambiente: {env_info['environment']}")
-        logging.info(f"[REDIS] Salvando configuração para sessão {session_id}...")
-        logging.info(f"[REDIS] Host: {REDIS_HOST}, Port: {REDIS_PORT}")
-
-        # Usa DB 2 para sessões
-        redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=2, decode_responses=True)
-
-        # Serializa e salva configuração
-        session_key = f"session:{session_id}"
-        config_data = json.dumps(config, default=str)
+        if not get_session_manager().update_session(session_id, config):
+            logging.warning(f"[REDIS] Configuração da sessão não salva para {session_id} (sessão inexistente ou expirada)")
+            return False
 
-        redis_client.set(session_key, config_data)
         logging.info(f"[REDIS] Configuração da sessão salva para {session_id}")
-
         return True
 
     except Exception as e:
@@ -534,17 +687,13 @@ def cleanup_session_cache(session_id: str) -> bool:
         True se removido com sucesso
     """
     try:
-        removed_count = 0
-
-        # Remove cache de agentes da sessão
-        if session_id in _AGENT_REGISTRY:
-            removed_count += len(_AGENT_REGISTRY[session_id])
-            del _AGENT_REGISTRY[session_id]
+        with _REGISTRY_LOCK:
+            # Remove cache de agentes e databases da sessão
+            removed_count = len(_AGENT_REGISTRY.pop(session_id, {})) + len(_DB_REGISTRY.pop(session_id, {}))
 
-        # Remove cache de databases da sessão
-        if session_id in _DB_REGISTRY:
-            removed_count += len(_DB_REGISTRY[session_id])
-            del _DB_REGISTRY[session_id]
+            # Locks de construção da sessão (session_id é o primeiro campo da chave)
+            for lock_key in [key for key in _BUILD_LOCKS if key[1] == session_id]:
+                del _BUILD_LOCKS[lock_key]
 
         if removed_count > 0:
             logging.info(f"[CACHE_CLEANUP] {removed_count} objetos removidos do cache da sessão {session_id}")
@@ -563,14 +712,26 @@ def get_cache_stats() -> Dict[str, Any]:
         Dicionário com estatísticas
     """
     try:
+        # Snapshot sob lock: outras threads do worker alteram os registries
+        with _REGISTRY_LOCK:
+            metrics = dict(_REGISTRY_METRICS)
+            agent_counts = {session_id: len(cache) for session_id, cache in _AGENT_REGISTRY.items()}
+            db_counts = {session_id: len(cache) for session_id, cache in _DB_REGISTRY.items()}
+
         stats = {
-            "total_sessions": len(_AGENT_REGISTRY),
-            "sessions": {}
+            "total_sessions": len(agent_counts),
+            "sessions": {},
+            "metrics": metrics,
+            "affinity_slot": _AFFINITY_SLOT
         }
 
-        for session_id in _AGENT_REGISTRY.keys():
-            agent_count = len(_AGENT_REGISTRY.get(session_id, {}))
-            db_count = len(_DB_REGISTRY.get(session_id, {}))
+        for registry in ("agent", "db"):
+            hits = metrics[f"{registry}_hit"]
+            total = hits + metrics[f"{registry}_miss"]
+            stats["metrics"][f"{registry}_hit_rate"] = round(hits / total, 4) if total else 0.0
+
+        for session_id, agent_count in agent_counts.items():
+            db_count = db_counts.get(session_id, 0)
 
             stats["sessions"][session_id] = {
                 "agents": agent_count,
@@ -594,34 +755,18 @@ def load_agent_config_from_redis(agent_id: str) -> Optional[Dict[str, Any]]:
     Returns:
         Dicionário com configurações ou None se não encontrado
     """
-    import redis
-    from utils.config import REDIS_HOST, REDIS_PORT
+    from utils.redis_client import get_redis_client
 
     try:
-        # Log informações de ambiente para debug
-        env_info = get_environment_info()
-        logging.info(f"[REDIS] Worker ambiente: {env_info['environment']}")
-        logging.info(f"[REDIS] Conectando ao Redis para carregar {agent_id}...")
-        logging.info(f"[REDIS] Host: {REDIS_HOST}, Port: {REDIS_PORT}")
-
-        redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=1, decode_responses=True)
-
-        # Testa conexão
-        redis_client.ping()
-        logging.info(f"[REDIS] Conexão com Redis estabelecida")
-
-        # Busca configuração no Redis
+        # Busca configuração no Redis (DB 1, pool compartilhado)
         config_key = f"agent_config:{agent_id}"
-        logging.info(f"[REDIS] Buscando chave: {config_key}")
-        config_data = redis_client.get(config_key)
+        config_data = get_redis_client(1).get(config_key)
 
         if not config_data:
             logging.error(f"[REDIS] ❌ Configuração não encontrada para agent_id: {agent_id}")
             logging.error(f"[REDIS] Chave buscada: {config_key}")
             return None
 
-        # Deserializa configuração
-        logging.info(f"[REDIS] Dados encontrados, deserializando...")
         agent_config = json.loads(config_data)
         logging.info(f"[REDIS] ✅ Configuração carregada para {agent_id}: {list(agent_config.keys())}")
 
@@ -642,23 +787,14 @@ def save_agent_config_to_redis(agent_id: str, config: Dict[str, Any]) -> bool:
     Returns:
         True se salvou com sucesso, False caso contrário
     """
-    import redis
-    from utils.config import REDIS_HOST, REDIS_PORT
+    from utils.redis_client import get_redis_client
 
     try:
-        # Log informações de ambiente para debug
-        env_info = get_environment_info()
-        logging.info(f"[REDIS] Worker ambiente: {env_info['environment']}")
-        logging.info(f"[REDIS] Salvando configuração para {agent_id}...")
-        logging.info(f"[REDIS] Host: {REDIS_HOST}, Port: {REDIS_PORT}")
-
-        redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=1, decode_responses=True)
-
-        # Serializa e salva configuração
+        # Serializa e salva configuração (DB 1, pool compartilhado)
         config_key = f"agent_config:{agent_id}"
         config_data = json.dumps(config, default=str)
 
-        redis_client.set(config_key, config_data)
+        get_redis_client(1).set(config_key, config_data)
         logging.info(f"[REDIS] Configuração salva para {agent_id}")
 
         return True
@@ -712,7 +848,7 @@ def create_engine_from_postgresql(pg_config: Dict[str, Any]):
         logging.error(f"[PG_ENGINE] Erro ao criar engine: {e}")
         raise
 
-def execute_sql_pipeline(sql_agent, user_input: str, agent_config: Dict[str, Any]) -> Dict[str, Any]:
+def execute_sql_pipeline(sql_agent, user_input: str, agent_config: Dict[str, Any], task_id: Optional[str] = None) -> Dict[str, Any]:
     """
     Executa o pipeline do AgentSQL
 
@@ -720,6 +856,7 @@ def execute_sql_pipeline(sql_agent, user_input: str, agent_config: Dict[str, Any
         sql_agent: Instância do SQLAgentManager
         user_input: Pergunta do usuário
         agent_config: Configurações do agente
+        task_id: ID da task Celery (habilita streaming de tokens via Redis pub/sub)
 
     Returns:
         Resultado da execução
@@ -734,6 +871,12 @@ def execute_sql_pipeline(sql_agent, user_input: str, agent_config: Dict[str, Any
         if sql_context:
             logging.info(f"[SQL_PIPELINE] Usando contexto SQL: {len(str(sql_context))} chars")
 
+        # Publica tokens no canal da task para o grafo retransmitir ao chat
+        stream_publisher = None
+        if task_id and STREAMING_ENABLED:
+            from utils.stream_relay import RedisStreamPublisher
+            stream_publisher = RedisStreamPublisher(task_id)
+
         # Executa query de forma assíncrona
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
@@ -757,10 +900,16 @@ def execute_sql_pipeline(sql_agent, user_input: str, agent_config: Dict[str, Any
             if query_observations:
                 instruction += f"\n\nObservações: {query_observations}"
 
-            # Executar query
-            result = loop.run_until_complete(sql_agent.execute_query(instruction))
+            # Executar query (chamadas de LLM atribuídas à sessão na fila de rate limit)
+            from utils.rate_limiter import llm_session
+
+            callbacks = [stream_publisher] if stream_publisher else None
+            with llm_session(agent_config.get('session_id')):
+                result = loop.run_until_complete(sql_agent.execute_query(instruction, callbacks=callbacks))
         finally:
             loop.close()
+            if stream_publisher:
+                stream_publisher.publish_end()
 
         if result['success']:
             logging.info(f"[SQL_PIPELINE] Execução bem-sucedida")
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Pool de AgentGraphManager pré-inicializados para testes massivos
+
+Cada instância do pool roda em uma thread própria com um event loop
+persistente: o AgentGraphManager (banco, agente SQL e grafo compilado) é
+criado uma única vez e reaproveitado pelos testes, que fazem checkout e
+devolvem a instância ao terminar. O cache de respostas é limpo na
+devolução, de forma que cada teste execute o pipeline completo.
+"""
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Coroutine, Dict, Optional
+
+from graphs.main_graph import AgentGraphManager
+
+class PooledGraphManager:
+    """
+    AgentGraphManager com thread e event loop dedicados
+    """
+
+    def __init__(self, index: int):
+        """
+        Cria a instância e aguarda a inicialização na thread dedicada
+
+        Args:
+            index: Índice da instância no pool
+        """
+        self.index = index
+        self.graph_manager: Optional[AgentGraphManager] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.tests_executed = 0
+        self._current_task: Optional[asyncio.Task] = None
+        self._ready = threading.Event()
+        self._error: Optional[Exception] = None
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"graph-pool-{index}")
+        self._thread.start()
+        self._ready.wait()
+
+        if self._error:
+            raise self._error
+
+    def _run(self):
+        """Inicializa o AgentGraphManager e mantém o event loop rodando"""
+        try:
+            # Criado antes do loop rodar: a inicialização do sistema usa asyncio.run
+            self.graph_manager = AgentGraphManager()
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def submit(self, coro: Coroutine) -> Future:
+        """
+        Agenda uma corrotina no event loop da instância
+
+        Args:
+            coro: Corrotina a executar
+
+        Returns:
+            Future thread-safe com o resultado
+        """
+        async def _tracked():
+            self._current_task = asyncio.current_task()
+            try:
+                return await coro
+            finally:
+                self._current_task = None
+
+        return asyncio.run_coroutine_threadsafe(_tracked(), self.loop)
+
+    def cancel_current(self):
+        """
+        Cancela a execução em andamento na instância (thread-safe)
+
+        A task é cancelada dentro do loop da instância, de forma que o
+        CancelledError percorra o grafo. O Future de submit() não é cancelado:
+        ele termina quando a corrotina realmente encerra.
+        """
+        def _cancel():
+            if self._current_task and not self._current_task.done():
+                self._current_task.cancel()
+
+        if self.loop and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(_cancel)
+
+    def reset(self):
+        """Isola o próximo teste: limpa cache de respostas e histórico"""
+        try:
+            cache_manager = self.graph_manager.object_manager.get_cache_manager(self.graph_manager.cache_id)
+            if cache_manager:
+                cache_manager.clear_cache()
+        except Exception as e:
+            logging.warning(f"[GRAPH_POOL] Erro ao limpar cache da instância {self.index}: {e}")
+
+    def close(self):
+        """Para o event loop e encerra a thread"""
+        if self.loop and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+
+class GraphManagerPool:
+    """
+    Pool limitado de AgentGraphManager com checkout/checkin
+    """
+
+    def __init__(self, size: int):
+        """
+        Args:
+            size: Número máximo de instâncias (normalmente max_workers do runner)
+        """
+        self.size = max(1, size)
+        self._idle: "queue.Queue[PooledGraphManager]" = queue.Queue()
+        self._instances = []
+        self._pending = 0  # Instâncias em criação
+        self._lock = threading.Lock()
+        self.stats = {
+            'created': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'init_time': 0.0
+        }
+
+    def _reserve_slot(self) -> bool:
+        """Reserva vaga para criar nova instância, respeitando o limite do pool"""
+        with self._lock:
+            if len(self._instances) + self._pending >= self.size:
+                return False
+            self._pending += 1
+            return True
+
+    def _create_instance(self) -> PooledGraphManager:
+        """Cria nova instância em vaga já reservada (bloqueante)"""
+        start_time = time.time()
+        try:
+            instance = PooledGraphManager(self.stats['created'])
+        finally:
+            with self._lock:
+                self._pending -= 1
+        elapsed = time.time() - start_time
+
+        with self._lock:
+            self._instances.append(instance)
+            self.stats['created'] += 1
+            self.stats['init_time'] += elapsed
+
+        logging.info(f"[GRAPH_POOL] Instância {instance.index} inicializada em {elapsed:.2f}s")
+        return instance
+
+    async def warm_up(self, count: Optional[int] = None) -> int:
+        """
+        Pré-inicializa instâncias antes dos testes começarem
+
+        A primeira instância é criada sozinha (pode gerar o SQLite a partir do
+        CSV padrão); as demais apenas carregam o banco existente.
+
+        Args:
+            count: Número de instâncias (padrão: tamanho do pool)
+
+        Returns:
+            Número de instâncias disponíveis
+        """
+        target = min(self.size, count or self.size)
+
+        while len(self._instances) < target and self._reserve_slot():
+            instance = await asyncio.to_thread(self._create_instance)
+            self._idle.put(instance)
+
+        print(f"🔥 Pool de grafos aquecido: {len(self._instances)} instâncias")
+        return len(self._instances)
+
+    async def acquire(self) -> PooledGraphManager:
+        """
+        Faz checkout de uma instância (cria sob demanda até o limite do pool)
+
+        Returns:
+            Instância exclusiva até ser devolvida com release()
+        """
+        try:
+            instance = self._idle.get_nowait()
+        except queue.Empty:
+            if self._reserve_slot():
+                instance = await asyncio.to_thread(self._create_instance)
+            else:
+                with self._lock:
+                    self.stats['waits'] += 1
+                instance = None
+                while instance is None:
+                    try:
+                        # Timeout curto: a thread auxiliar não fica presa se o teste for cancelado
+                        instance = await asyncio.to_thread(self._idle.get, True, 1.0)
+                    except queue.Empty:
+                        continue
+
+        with self._lock:
+            self.stats['checkouts'] += 1
+        return instance
+
+    def release(self, instance: PooledGraphManager):
+        """
+        Devolve a instância ao pool
+
+        Args:
+            instance: Instância obtida com acquire()
+        """
+        instance.tests_executed += 1
+        instance.reset()
+        self._idle.put(instance)
+
+    def close(self):
+        """Encerra todas as instâncias"""
+        with self._lock:
+            instances = list(self._instances)
+            self._instances.clear()
+
+        for instance in instances:
+            instance.close()
+
+        while not self._idle.empty():
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+
+        logging.info(f"[GRAPH_POOL] Pool encerrado: {self.get_stats()}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do pool"""
+        with self._lock:
+            return {
+                **self.stats,
+                'size': self.size,
+                'instances': len(self._instances),
+                'idle': self._idle.qsize()
+            }
@@ -6,7 +6,6 @@ import asyncio
 import logging
 import time
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 import uuid
@@ -19,7 +18,7 @@ os.environ["TESTING_MODE"] = "true"
 # Adiciona path do projeto
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from graphs.main_graph import AgentGraphManager
+from testes.graph_pool import GraphManagerPool
 from testes.test_validator import TestValidator
 from utils.config import AVAILABLE_MODELS
 
@@ -61,8 +60,9 @@ class MassiveTestRunner:
         self._lock = threading.Lock()
         self._cancel_event = threading.Event()
         self._test_timeout = 360  # 1.5 minutos timeout por teste
-        self._active_futures = {}  # {thread_id: future} para cancelamento real
-        self._cancel_events = {}  # {thread_id: Event} para cancelamento individual
+        self._cancel_events = {}  # {thread_id: asyncio.Event} para cancelamento individual
+        self._loop = None  # Event loop do runner (cancelamentos chegam de outras threads)
+        self._graph_pool = GraphManagerPool(max_workers)  # AgentGraphManagers reutilizados entre testes
         
     async def run_test_session(self, session: Dict[str, Any], validation_method: str = 'llm', expected_content: str = None) -> Dict[str, Any]:
         """
@@ -89,6 +89,8 @@ class MassiveTestRunner:
 
             logging.info(f"🚀 Iniciando sessão de testes: {session['id']}")
 
+            self._loop = asyncio.get_running_loop()
+
             # Atualiza status
             with self._lock:
                 self.status.update({
@@ -107,6 +109,9 @@ class MassiveTestRunner:
                 'total_tests': self.status['total_tests'],
                 'started_at': datetime.now().isoformat()
             }
+
+            # Pré-inicializa os grafos antes do primeiro teste (CSV/SQLite processados uma única vez)
+            await self._graph_pool.warm_up(min(self.max_workers, total_tests))
             
             # Executa grupos de teste
             group_results = []
@@ -159,6 +164,7 @@ class MassiveTestRunner:
             
             # Gera resumo final
             self._generate_summary()
+            self.results['session_info']['graph_pool'] = self._graph_pool.get_stats()
 
             with self._lock:
                 self.status['current_status'] = 'completed'
@@ -179,6 +185,9 @@ class MassiveTestRunner:
                 self.status['current_status'] = 'error'
                 self.status['errors'].append(str(e))
             raise
+
+        finally:
+            self._graph_pool.close()
     
     async def _run_group_tests(self, question: str, group: Dict[str, Any], validation_method: str, expected_content: str) -> Dict[str, Any]:
         """
@@ -217,13 +226,16 @@ class MassiveTestRunner:
                     print(f"🚫 Cancelamento detectado - parando criação de tasks")
                     break
 
-            task = self._run_single_test(
-                semaphore,
-                question,
-                group,
-                iteration + 1,
-                validation_method,
-                expected_content
+            task = asyncio.create_task(
+                self._run_single_test(
+                    semaphore,
+                    question,
+                    group,
+                    iteration + 1,
+                    validation_method,
+                    expected_content
+                ),
+                name=f"test_{group['id']}_{iteration + 1}"
             )
             tasks.append(task)
 
@@ -313,7 +325,7 @@ class MassiveTestRunner:
                 thread_id = f"test_{group['id']}_{iteration}_{uuid.uuid4().hex[:8]}"
 
                 # Cria Event individual para cancelamento deste teste
-                cancel_event = threading.Event()
+                cancel_event = asyncio.Event()
 
                 # Registra teste como em execução
                 with self._lock:
@@ -334,64 +346,29 @@ class MassiveTestRunner:
                     print(f"🚫 Teste {thread_id} cancelado antes de iniciar")
                     return self._create_cancelled_result(thread_id, group, iteration, start_time)
 
-                # Registra task para cancelamento (NOVO)
-                current_task = asyncio.current_task()
-                with self._lock:
-                    self._active_futures[thread_id] = current_task
-
-                # Executa em thread separada para paralelismo real (COMO ESTAVA ANTES)
-                loop = asyncio.get_event_loop()
+                # Checkout de um AgentGraphManager pré-inicializado (sem reprocessar CSV nem recompilar grafo)
+                pooled = await self._graph_pool.acquire()
 
-                def run_sync_test():
-                    """Executa teste de forma síncrona em thread separada COM VERIFICAÇÃO DE CANCELAMENTO"""
+                async def run_pooled_test():
+                    """Executa teste no event loop da instância do pool COM VERIFICAÇÃO DE CANCELAMENTO"""
                     try:
-                        # Verifica cancelamento antes de iniciar
+                        # Verifica cancelamento antes de processar
                         if cancel_event.is_set() or thread_id in self.status['cancelled_tests']:
-                            print(f"🚫 Teste {thread_id} cancelado antes de iniciar")
-                            return {'cancelled': True, 'reason': 'cancelled_before_start'}
-
-                        # Cria novo loop para esta thread
-                        new_loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(new_loop)
-
-                        try:
-                            # Inicializa AgentGraphManager para este teste
-                            graph_manager = AgentGraphManager()
-
-                            # Verifica cancelamento antes de processar
-                            if cancel_event.is_set() or thread_id in self.status['cancelled_tests']:
-                                print(f"🚫 Teste {thread_id} cancelado antes de processar query")
-                                return {'cancelled': True, 'reason': 'cancelled_before_processing'}
-
-                            # Executa query com timeout
-                            async def run_with_cancellation():
-                                # Verifica cancelamento durante execução
-                                if cancel_event.is_set() or thread_id in self.status['cancelled_tests']:
-                                    raise asyncio.CancelledError(f"Teste {thread_id} cancelado durante execução")
-
-                                return await graph_manager.process_query(
-                                    user_input=question,
-                                    selected_model=group['sql_model_name'],
-                                    processing_enabled=group['processing_enabled'],
-                                    processing_model=group['processing_model_name'] if group['processing_enabled'] else None,
-                                    question_refinement_enabled=group.get('question_refinement_enabled', False),
-                                    thread_id=thread_id
-                                )
-
-                            # Executa com timeout
-                            result = new_loop.run_until_complete(
-                                asyncio.wait_for(run_with_cancellation(), timeout=self._test_timeout)
-                            )
-
-                            # Verifica cancelamento após execução
-                            if cancel_event.is_set() or thread_id in self.status['cancelled_tests']:
-                                print(f"🚫 Teste {thread_id} cancelado após execução")
-                                return {'cancelled': True, 'reason': 'cancelled_after_execution'}
-
-                            return result
-
-                        finally:
-                            new_loop.close()
+                            print(f"🚫 Teste {thread_id} cancelado antes de processar query")
+                            return {'cancelled': True, 'reason': 'cancelled_before_processing'}
+
+                        # Executa query com timeout
+                        result = await asyncio.wait_for(
+                            self._process_pooled_query(pooled, question, group, thread_id),
+                            timeout=self._test_timeout
+                        )
+
+                        # Verifica cancelamento após execução
+                        if cancel_event.is_set() or thread_id in self.status['cancelled_tests']:
+                            print(f"🚫 Teste {thread_id} cancelado após execução")
+                            return {'cancelled': True, 'reason': 'cancelled_after_execution'}
+
+                        return result
 
                     except asyncio.TimeoutError:
                         print(f"⏰ Teste {thread_id} TIMEOUT após {self._test_timeout}s")
@@ -404,44 +381,46 @@ class MassiveTestRunner:
                         return {'cancelled': True, 'reason': 'asyncio_cancelled'}
                     except Exception as e:
                         print(f"❌ Erro em teste {thread_id}: {e}")
-                        logging.error(f"Erro em thread separada para {thread_id}: {e}")
+                        logging.error(f"Erro na instância {pooled.index} do pool para {thread_id}: {e}")
                         return {'error': str(e)}
 
-                # Executa em ThreadPoolExecutor para paralelismo real (COMO ESTAVA ANTES)
-                with ThreadPoolExecutor(max_workers=1) as executor:
-                    future = loop.run_in_executor(executor, run_sync_test)
+                # Executa no event loop dedicado da instância (paralelismo real entre instâncias)
+                pooled_future = pooled.submit(run_pooled_test())
+                # Devolve ao pool só quando a execução termina de fato (inclusive após cancelamento)
+                pooled_future.add_done_callback(lambda _: self._graph_pool.release(pooled))
+                future = asyncio.wrap_future(pooled_future)
 
-                    # Aguarda com verificação AGRESSIVA de cancelamento
-                    check_count = 0
-                    while not future.done():
-                        await asyncio.sleep(0.05)  # Verifica a cada 50ms (mais frequente)
-                        check_count += 1
+                # Aguarda conclusão OU cancelamento (orientado a eventos, sem polling)
+                cancel_waiter = asyncio.ensure_future(cancel_event.wait())
+                try:
+                    await asyncio.wait({future, cancel_waiter}, return_when=asyncio.FIRST_COMPLETED)
+                except asyncio.CancelledError:
+                    # Runner cancelado: propaga para o grafo em execução
+                    pooled.cancel_current()
+                    raise
+                finally:
+                    cancel_waiter.cancel()
 
-                        # Verifica cancelamento
-                        if (thread_id in self.status['cancelled_tests'] or
-                            cancel_event.is_set()):
+                if not future.done():
+                    print(f"🚫 CANCELAMENTO DETECTADO para {thread_id}")
 
-                            print(f"🚫 CANCELAMENTO DETECTADO para {thread_id} (check #{check_count})")
+                    # CancelledError percorre o grafo; o nó do Celery revoga a task no worker
+                    pooled.cancel_current()
 
-                            # Cancela future IMEDIATAMENTE
-                            if not future.cancelled():
-                                future.cancel()
-                                print(f"🚫 Future cancelada para {thread_id}")
+                    # Aguarda um pouco para o cancelamento propagar
+                    done, _ = await asyncio.wait({future}, timeout=2.0)
+                    if not done:
+                        print(f"🚫 Cancelamento forçado concluído para {thread_id}")
 
-                            # Sinaliza Event para parar processamento interno
-                            cancel_event.set()
+                    with self._lock:
+                        self.status['running_tests'].pop(thread_id, None)
+                        self._cancel_events.pop(thread_id, None)
+                        if self.status['current_test'] == thread_id:
+                            self.status['current_test'] = None
 
-                            # Aguarda um pouco para o cancelamento propagar
-                            try:
-                                await asyncio.wait_for(future, timeout=2.0)
-                            except (asyncio.TimeoutError, asyncio.CancelledError):
-                                print(f"🚫 Cancelamento forçado concluído para {thread_id}")
-                            except:
-                                pass
+                    return self._create_cancelled_result(thread_id, group, iteration, start_time, 'user_cancelled')
 
-                            return self._create_cancelled_result(thread_id, group, iteration, start_time, 'user_cancelled')
-
-                    result = await future
+                result = future.result()
 
                 execution_time = time.time() - start_time
 
@@ -451,8 +430,6 @@ class MassiveTestRunner:
                         del self.status['running_tests'][thread_id]
                     if self.status['current_test'] == thread_id:
                         self.status['current_test'] = None
-                    if thread_id in self._active_futures:
-                        del self._active_futures[thread_id]
                     if thread_id in self._cancel_events:
                         del self._cancel_events[thread_id]
                     # Remove da lista de cancelados também
@@ -713,19 +690,9 @@ class MassiveTestRunner:
         with self._lock:
             if thread_id:
                 if thread_id in self.status['running_tests']:
-                    self.status['cancelled_tests'].add(thread_id)
-
-                    # CANCELAMENTO FORÇADO - Sinaliza Event individual
-                    if thread_id in self._cancel_events:
-                        self._cancel_events[thread_id].set()
-                        print(f"🚫 Event de cancelamento ativado para {thread_id}")
 
-                    # CANCELAMENTO FORÇADO - Cancela future se existir
-                    if thread_id in self._active_futures:
-                        future = self._active_futures[thread_id]
-                        if not future.done():
-                            future.cancel()
-                            print(f"🚫 Future cancelada forçadamente para {thread_id}")
+                    # CANCELAMENTO FORÇADO - Acorda o teste e cancela a execução do grafo
+                    self._signal_cancel(thread_id)
 
                     print(f"🚫 Teste {thread_id} marcado para cancelamento FORÇADO")
                     logging.info(f"Teste {thread_id} cancelado FORÇADAMENTE pelo usuário")
@@ -738,25 +705,32 @@ class MassiveTestRunner:
                         key=lambda x: x[1]['start_time']
                     )
                     thread_id = oldest_test[0]
-                    self.status['cancelled_tests'].add(thread_id)
 
-                    # CANCELAMENTO FORÇADO - Sinaliza Event individual
-                    if thread_id in self._cancel_events:
-                        self._cancel_events[thread_id].set()
-                        print(f"🚫 Event de cancelamento ativado para {thread_id}")
-
-                    # CANCELAMENTO FORÇADO - Cancela future se existir
-                    if thread_id in self._active_futures:
-                        future = self._active_futures[thread_id]
-                        if not future.done():
-                            future.cancel()
-                            print(f"🚫 Future cancelada forçadamente para {thread_id}")
+                    # CANCELAMENTO FORÇADO - Acorda o teste e cancela a execução do grafo
+                    self._signal_cancel(thread_id)
 
                     print(f"🚫 Teste mais antigo {thread_id} marcado para cancelamento FORÇADO")
                     logging.info(f"Teste mais antigo {thread_id} cancelado FORÇADAMENTE pelo usuário")
                     return True
         return False
 
+    def _signal_cancel(self, thread_id: str):
+        """
+        Marca teste como cancelado e acorda sua espera no loop do runner
+
+        Pode ser chamado de qualquer thread (ex: requisições Flask); deve ser
+        chamado com self._lock adquirido.
+
+        Args:
+            thread_id: ID do teste
+        """
+        self.status['cancelled_tests'].add(thread_id)
+
+        cancel_event = self._cancel_events.get(thread_id)
+        if cancel_event and self._loop and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(cancel_event.set)
+            print(f"🚫 Event de cancelamento ativado para {thread_id}")
+
     def cancel_all_tests(self) -> int:
         """
         Cancela todos os testes em execução
@@ -767,7 +741,7 @@ class MassiveTestRunner:
         with self._lock:
             running_count = len(self.status['running_tests'])
             for thread_id in self.status['running_tests'].keys():
-                self.status['cancelled_tests'].add(thread_id)
+                self._signal_cancel(thread_id)
 
             print(f"🚫 {running_count} testes marcados para cancelamento")
             logging.info(f"{running_count} testes cancelados pelo usuário")
@@ -791,13 +765,34 @@ class MassiveTestRunner:
                 if current_time - test_info['start_time'] > max_duration:
                     if thread_id not in self.status['cancelled_tests']:
                         self.status['timeout_tests'].add(thread_id)
-                        self.status['cancelled_tests'].add(thread_id)
+                        self._signal_cancel(thread_id)
                         stuck_count += 1
                         print(f"⏰ Teste {thread_id} marcado como travado (>{max_duration}s)")
                         logging.warning(f"Teste {thread_id} travado - timeout após {max_duration}s")
 
         return stuck_count
 
+    def _process_pooled_query(self, pooled, question: str, group: Dict[str, Any], thread_id: str):
+        """
+        Corrotina da query de um teste na instância do pool
+
+        Args:
+            pooled: Instância do GraphManagerPool
+            question: Pergunta do teste
+            group: Configuração do grupo
+            thread_id: ID do teste (usado como sessão: isola histórico e coalescência)
+        """
+        return pooled.graph_manager.process_query(
+            user_input=question,
+            session_id=thread_id,
+            selected_model=group['sql_model_name'],
+            processing_enabled=group['processing_enabled'],
+            processing_model=group['processing_model_name'] if group['processing_enabled'] else None,
+            question_refinement_enabled=group.get('question_refinement_enabled', False),
+            workload="bulk",  # Fila de baixa prioridade no Celery
+            coalesce=False  # Cada iteração executa o grafo: mede a consistência real
+        )
+
     def _create_cancelled_result(self, thread_id: str, group: Dict[str, Any], iteration: int, start_time: float, reason: str = 'user_cancelled') -> Dict[str, Any]:
         """Cria resultado para teste cancelado"""
         execution_time = time.time() - start_time
@@ -181,6 +181,46 @@ async def test_runner_basic():
         print(f"  ❌ Erro no runner: {e}")
         return False
 
+async def test_pooled_run():
+    """Testa uma execução do grafo em uma instância do pool (mesma chamada dos testes massivos)"""
+    print("\n🔍 Testando execução no pool de grafos...")
+
+    try:
+        from utils.config import is_offline_llm, OPENAI_API_KEY
+
+        if not is_offline_llm() and not OPENAI_API_KEY:
+            print("  ⚠️ Sem LLM disponível, execução não testada")
+            print("  💡 Rode com LLM_PROVIDER=fake para testar sem APIs")
+            return True
+
+        from testes.test_runner import MassiveTestRunner
+
+        runner = MassiveTestRunner(max_workers=1)
+        group = {
+            'id': 1,
+            'sql_model_name': 'GPT-4o-mini',
+            'processing_enabled': False,
+            'processing_model_name': None
+        }
+
+        try:
+            pooled = await runner._graph_pool.acquire()
+            future = pooled.submit(runner._process_pooled_query(pooled, "Quantos registros existem?", group, "test_pooled_run"))
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout=120)
+            runner._graph_pool.release(pooled)
+        finally:
+            runner._graph_pool.close()
+
+        if result.get('error'):
+            print(f"  ❌ Execução no pool retornou erro: {result['error']}")
+            return False
+
+        print(f"  ✅ Execução no pool concluída: {str(result.get('response', ''))[:60]}")
+        return True
+    except Exception as e:
+        print(f"  ❌ Erro na execução no pool: {e}")
+        return False
+
 def test_flask_app():
     """Testa se o app Flask pode ser importado"""
     print("\n🔍 Testando Flask app...")
@@ -242,6 +282,7 @@ async def main():
         ("Validator", test_validator),
         ("Report Generator", test_report_generator),
         ("Runner Básico", test_runner_basic),
+        ("Execução no Pool", test_pooled_run),
         ("Flask App", test_flask_app),
         ("Integração AgentGraph", test_agentgraph_integration)
     ]
@@ -12,10 +12,9 @@ import os
 # Adiciona path do projeto
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain.schema import HumanMessage
+from langchain_core.messages import HumanMessage
 from utils.config import OPENAI_MODELS, ANTHROPIC_MODELS
+from agents.llm_provider import build_chat_model
 
 class TestValidator:
     """
@@ -36,25 +35,28 @@ class TestValidator:
         """Inicializa LLM para validação"""
         try:
             if self.validator_model in OPENAI_MODELS:
-                return ChatOpenAI(
+                from langchain_openai import ChatOpenAI
+                return build_chat_model(self.validator_model, lambda: ChatOpenAI(
                     model=self.validator_model,
                     temperature=0.1,  # Baixa temperatura para consistência
                     max_tokens=1000
-                )
+                ), hedge=True)
             elif self.validator_model in ANTHROPIC_MODELS:
-                return ChatAnthropic(
+                from langchain_anthropic import ChatAnthropic
+                return build_chat_model(self.validator_model, lambda: ChatAnthropic(
                     model=self.validator_model,
                     temperature=0.1,
                     max_tokens=1000
-                )
+                ), hedge=True)
             else:
                 # Fallback para GPT-4o-mini
                 logging.warning(f"Modelo {self.validator_model} não suportado, usando gpt-4o-mini")
-                return ChatOpenAI(
+                from langchain_openai import ChatOpenAI
+                return build_chat_model("gpt-4o-mini", lambda: ChatOpenAI(
                     model="gpt-4o-mini",
                     temperature=0.1,
                     max_tokens=1000
-                )
+                ), hedge=True)
         except Exception as e:
             logging.error(f"Erro ao inicializar LLM validador: {e}")
             return None
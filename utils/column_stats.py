@@ -0,0 +1,477 @@
+"""
+Estatísticas de colunas calculadas na ingestão
+
+Os construtores de prompt (processing_node, refinamento de pergunta, seleção
+de gráfico e amostra do banco) usavam 5-10 linhas amostradas a cada query
+para descobrir tipos, exemplos e min/max. Aqui as estatísticas são
+calculadas uma única vez por tabela:
+- CSV: vetorizadas sobre o DataFrame processado, antes de descartá-lo
+- PostgreSQL: agregações SQL em segundo plano, ao conectar
+
+e gravadas na tabela __column_stats de um SQLite separado: ao lado do banco
+para SQLite ({banco}.stats.db, sem alterar o arquivo do banco reutilizado na
+inicialização) e em COLUMN_STATS_DB_PATH para PostgreSQL, sem escrever no
+banco do cliente. Estatísticas de bancos externos expiram após
+COLUMN_STATS_TTL e são recalculadas em segundo plano; as de SQLite local são
+recalculadas na ingestão.
+"""
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from utils.config import COLUMN_STATS_ENABLED, COLUMN_STATS_DB_PATH, COLUMN_STATS_MAX_TABLES, COLUMN_STATS_TTL
+
+COLUMN_STATS_TABLE = "__column_stats"
+TOP_VALUES_LIMIT = 5
+
+# (fonte, tabela) → (estatísticas, momento do cálculo em epoch)
+_stats_cache: Dict[Tuple[str, str], Tuple[List[Dict[str, Any]], float]] = {}
+_stats_lock = threading.Lock()
+_profiling_in_progress = set()
+_storage_engines: Dict[str, Any] = {}
+
+def _source_key(engine) -> str:
+    """Identifica o banco sem expor a senha"""
+    return engine.url.render_as_string(hide_password=True) if hasattr(engine.url, "render_as_string") else str(engine.url)
+
+def _is_local(engine) -> bool:
+    """SQLite local (estatísticas recalculadas na ingestão, sem expiração)"""
+    return str(engine.dialect.name).lower() == "sqlite"
+
+def _get_storage_engine(engine):
+    """Banco onde as estatísticas são gravadas ({banco}.stats.db para SQLite ou o sidecar local)"""
+    if _is_local(engine):
+        database = engine.url.database
+        if not database or database == ":memory:":
+            return engine
+        path = f"{database}.stats.db"
+    else:
+        path = COLUMN_STATS_DB_PATH
+
+    with _stats_lock:
+        if path not in _storage_engines:
+            from sqlalchemy import create_engine
+            _storage_engines[path] = create_engine(f"sqlite:///{path}")
+        return _storage_engines[path]
+
+def _is_stale(engine, computed_at: float) -> bool:
+    """Estatísticas de banco externo mais antigas que COLUMN_STATS_TTL (0 = nunca expiram)"""
+    if _is_local(engine) or COLUMN_STATS_TTL <= 0:
+        return False
+    return time.time() - computed_at > COLUMN_STATS_TTL
+
+def _is_comparable(column_type) -> bool:
+    """Tipos com igualdade no banco (json, arrays e tipos desconhecidos não suportam DISTINCT/GROUP BY)"""
+    import sqlalchemy as sa
+    return not isinstance(column_type, (sa.JSON, sa.ARRAY, sa.types.NullType))
+
+def _to_text(value: Any) -> Optional[str]:
+    """Converte min/max/top para texto (datas em ISO)"""
+    if value is None or (not isinstance(value, (list, tuple)) and pd.isna(value)):
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+# ==================== CÁLCULO ====================
+
+def compute_dataframe_stats(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Calcula as estatísticas de todas as colunas de um DataFrame (vetorizado)
+
+    Args:
+        df: DataFrame completo
+
+    Returns:
+        Lista de estatísticas por coluna
+    """
+    row_count = len(df)
+    null_counts = df.isna().sum()
+    stats = []
+
+    for position, col in enumerate(df.columns):
+        series = df[col]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            kind = "date"
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            kind = "numeric"
+        else:
+            kind = "text"
+
+        col_stats = {
+            "column": col,
+            "position": position,
+            "data_type": str(series.dtype),
+            "kind": kind,
+            "row_count": row_count,
+            "null_count": int(null_counts[col]),
+            "null_rate": round(float(null_counts[col]) / row_count, 4) if row_count else 0.0,
+            "distinct_count": int(series.nunique(dropna=True)),
+            "min_value": None,
+            "max_value": None,
+            "top_values": []
+        }
+
+        if kind in ("numeric", "date") and col_stats["null_count"] < row_count:
+            col_stats["min_value"] = _to_text(series.min())
+            col_stats["max_value"] = _to_text(series.max())
+        else:
+            top = series.value_counts(dropna=True).head(TOP_VALUES_LIMIT)
+            col_stats["top_values"] = [[_to_text(value), int(count)] for value, count in top.items()]
+
+        stats.append(col_stats)
+
+    return stats
+
+def compute_table_stats(engine, table_name: str) -> List[Dict[str, Any]]:
+    """
+    Calcula as estatísticas de uma tabela com agregações SQL
+
+    Uma consulta agrega COUNT, COUNT(DISTINCT), MIN e MAX de todas as colunas;
+    os valores mais frequentes de colunas de texto vêm de um GROUP BY por coluna.
+    Colunas sem igualdade (json, arrays) ficam sem distintos e valores frequentes.
+
+    Args:
+        engine: Engine SQLAlchemy
+        table_name: Nome da tabela
+
+    Returns:
+        Lista de estatísticas por coluna
+    """
+    import sqlalchemy as sa
+
+    quote = engine.dialect.identifier_preparer.quote
+    table = quote(table_name)
+    columns = sa.inspect(engine).get_columns(table_name)
+
+    ordered_types = (sa.Integer, sa.Numeric, sa.Float, sa.Date, sa.DateTime, sa.Time)
+    date_types = (sa.Date, sa.DateTime, sa.Time)
+
+    select_parts = ["COUNT(*)"]
+    for column in columns:
+        name = quote(column["name"])
+        select_parts.append(f"COUNT({name})")
+        if _is_comparable(column["type"]):
+            select_parts.append(f"COUNT(DISTINCT {name})")
+        if isinstance(column["type"], ordered_types):
+            select_parts.extend([f"MIN({name})", f"MAX({name})"])
+
+    with engine.connect() as conn:
+        row = list(conn.execute(sa.text(f"SELECT {', '.join(select_parts)} FROM {table}")).fetchone())
+        row_count = int(row.pop(0) or 0)
+
+        stats = []
+        for position, column in enumerate(columns):
+            comparable = _is_comparable(column["type"])
+            non_null = int(row.pop(0) or 0)
+            distinct = int(row.pop(0) or 0) if comparable else None
+            ordered = isinstance(column["type"], ordered_types)
+            col_stats = {
+                "column": column["name"],
+                "position": position,
+                "data_type": str(column["type"]),
+                "kind": "date" if isinstance(column["type"], date_types) else ("numeric" if ordered else "text"),
+                "row_count": row_count,
+                "null_count": row_count - non_null,
+                "null_rate": round((row_count - non_null) / row_count, 4) if row_count else 0.0,
+                "distinct_count": distinct,
+                "min_value": _to_text(row.pop(0)) if ordered else None,
+                "max_value": _to_text(row.pop(0)) if ordered else None,
+                "top_values": []
+            }
+
+            if not ordered and comparable and non_null:
+                name = quote(column["name"])
+                top_result = conn.execute(sa.text(
+                    f"SELECT {name}, COUNT(*) AS total FROM {table} WHERE {name} IS NOT NULL "
+                    f"GROUP BY {name} ORDER BY total DESC LIMIT {TOP_VALUES_LIMIT}"
+                ))
+                col_stats["top_values"] = [[_to_text(value), int(count)] for value, count in top_result.fetchall()]
+
+            stats.append(col_stats)
+
+    return stats
+
+# ==================== PERSISTÊNCIA ====================
+
+def _ensure_stats_table(conn):
+    """Cria a tabela __column_stats se não existir"""
+    import sqlalchemy as sa
+
+    conn.execute(sa.text(f"""
+        CREATE TABLE IF NOT EXISTS {COLUMN_STATS_TABLE} (
+            source TEXT NOT NULL,
+            table_name TEXT NOT NULL,
+            column_name TEXT NOT NULL,
+            position INTEGER,
+            stats TEXT NOT NULL,
+            updated_at TEXT,
+            PRIMARY KEY (source, table_name, column_name)
+        )
+    """))
+
+def save_column_stats(engine, table_name: str, stats: List[Dict[str, Any]]) -> bool:
+    """
+    Grava as estatísticas de uma tabela (substitui as anteriores)
+
+    Args:
+        engine: Engine do banco analisado
+        table_name: Nome da tabela
+        stats: Estatísticas por coluna
+
+    Returns:
+        True se gravou
+    """
+    import sqlalchemy as sa
+
+    source = "local" if _is_local(engine) else _source_key(engine)
+    computed_at = time.time()
+    updated_at = datetime.fromtimestamp(computed_at).isoformat()
+
+    try:
+        with _get_storage_engine(engine).begin() as conn:
+            _ensure_stats_table(conn)
+            conn.execute(
+                sa.text(f"DELETE FROM {COLUMN_STATS_TABLE} WHERE source = :source AND table_name = :table_name"),
+                {"source": source, "table_name": table_name}
+            )
+            if stats:
+                conn.execute(
+                    sa.text(f"INSERT INTO {COLUMN_STATS_TABLE} VALUES (:source, :table_name, :column_name, :position, :stats, :updated_at)"),
+                    [
+                        {
+                            "source": source,
+                            "table_name": table_name,
+                            "column_name": col_stats["column"],
+                            "position": col_stats["position"],
+                            "stats": json.dumps(col_stats, ensure_ascii=False, default=str),
+                            "updated_at": updated_at
+                        }
+                        for col_stats in stats
+                    ]
+                )
+
+        with _stats_lock:
+            _stats_cache[(_source_key(engine), table_name)] = (stats, computed_at)
+
+        logging.info(f"[COLUMN_STATS] Estatísticas de {len(stats)} colunas gravadas para '{table_name}'")
+        return True
+
+    except Exception as e:
+        logging.warning(f"[COLUMN_STATS] Erro ao gravar estatísticas de '{table_name}': {e}")
+        return False
+
+def _load_persisted_stats(engine, table_names: List[str]) -> Dict[str, Tuple[List[Dict[str, Any]], float]]:
+    """
+    Lê as estatísticas gravadas das tabelas e as coloca no cache em memória
+
+    Args:
+        engine: Engine do banco analisado
+        table_names: Tabelas a ler
+
+    Returns:
+        Estatísticas e momento do cálculo por tabela (apenas as encontradas)
+    """
+    import sqlalchemy as sa
+
+    source = "local" if _is_local(engine) else _source_key(engine)
+    found: Dict[str, Tuple[List[Dict[str, Any]], float]] = {}
+    if not table_names:
+        return found
+
+    storage = _get_storage_engine(engine)
+    if not sa.inspect(storage).has_table(COLUMN_STATS_TABLE):
+        return found
+
+    with storage.connect() as conn:
+        result = conn.execute(
+            sa.text(
+                f"SELECT table_name, stats, updated_at FROM {COLUMN_STATS_TABLE} "
+                f"WHERE source = :source AND table_name IN :table_names ORDER BY table_name, position"
+            ).bindparams(sa.bindparam("table_names", expanding=True)),
+            {"source": source, "table_names": list(table_names)}
+        )
+        for table_name, stats_json, updated_at in result.fetchall():
+            try:
+                computed_at = datetime.fromisoformat(updated_at).timestamp() if updated_at else 0.0
+            except ValueError:
+                computed_at = 0.0
+            stats, _ = found.setdefault(table_name, ([], computed_at))
+            stats.append(json.loads(stats_json))
+
+    with _stats_lock:
+        for table_name, entry in found.items():
+            _stats_cache[(_source_key(engine), table_name)] = entry
+    return found
+
+def get_column_stats(engine, table_name: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Retorna as estatísticas gravadas de uma tabela
+
+    Não calcula nada no caminho da query: se não houver estatísticas, agenda o
+    cálculo em segundo plano e retorna None (o chamador usa a amostra). Se
+    estiverem expiradas, retorna as atuais e agenda o recálculo.
+
+    Args:
+        engine: Engine do banco
+        table_name: Nome da tabela
+
+    Returns:
+        Estatísticas por coluna ou None
+    """
+    if not COLUMN_STATS_ENABLED or engine is None:
+        return None
+
+    with _stats_lock:
+        entry = _stats_cache.get((_source_key(engine), table_name))
+
+    if entry is None:
+        try:
+            entry = _load_persisted_stats(engine, [table_name]).get(table_name)
+        except Exception as e:
+            logging.warning(f"[COLUMN_STATS] Erro ao ler estatísticas de '{table_name}': {e}")
+
+    if entry is None or _is_stale(engine, entry[1]):
+        schedule_profiling(engine, [table_name])
+    return entry[0] if entry else None
+
+def clear_column_stats_cache(engine=None):
+    """
+    Limpa o cache em memória (as estatísticas gravadas são relidas no próximo uso)
+
+    Args:
+        engine: Banco a limpar (None = todos)
+    """
+    with _stats_lock:
+        if engine is None:
+            _stats_cache.clear()
+            return
+        source = _source_key(engine)
+        for cache_key in [key for key in _stats_cache if key[0] == source]:
+            del _stats_cache[cache_key]
+
+# ==================== PERFIL EM SEGUNDO PLANO ====================
+
+def profile_tables(engine, table_names: List[str]) -> int:
+    """
+    Calcula e grava as estatísticas das tabelas com agregações SQL
+
+    Args:
+        engine: Engine do banco
+        table_names: Tabelas a analisar
+
+    Returns:
+        Número de tabelas analisadas
+    """
+    profiled = 0
+    for table_name in table_names:
+        start_time = time.time()
+        try:
+            if save_column_stats(engine, table_name, compute_table_stats(engine, table_name)):
+                profiled += 1
+                logging.info(f"[COLUMN_STATS] Tabela '{table_name}' analisada em {time.time() - start_time:.2f}s")
+        except Exception as e:
+            logging.warning(f"[COLUMN_STATS] Erro ao analisar tabela '{table_name}': {e}")
+    return profiled
+
+def schedule_profiling(engine, table_names: List[str]):
+    """
+    Agenda o perfil das tabelas em uma thread (uma execução por banco/tabela)
+
+    Tabelas com estatísticas válidas, em memória ou gravadas por um processo
+    anterior, não são analisadas de novo; a leitura das gravadas também roda
+    na thread, fora do caminho da conexão.
+
+    Args:
+        engine: Engine do banco
+        table_names: Tabelas a analisar (limitadas a COLUMN_STATS_MAX_TABLES)
+    """
+    if not COLUMN_STATS_ENABLED:
+        return
+
+    source = _source_key(engine)
+    with _stats_lock:
+        pending = [
+            table_name for table_name in table_names[:COLUMN_STATS_MAX_TABLES]
+            if (source, table_name) not in _profiling_in_progress
+            and ((source, table_name) not in _stats_cache or _is_stale(engine, _stats_cache[(source, table_name)][1]))
+        ]
+        _profiling_in_progress.update((source, table_name) for table_name in pending)
+
+    if not pending:
+        return
+
+    def _run():
+        try:
+            with _stats_lock:
+                unread = [table_name for table_name in pending if (source, table_name) not in _stats_cache]
+            try:
+                persisted = _load_persisted_stats(engine, unread)
+            except Exception as e:
+                logging.warning(f"[COLUMN_STATS] Erro ao ler estatísticas gravadas: {e}")
+                persisted = {}
+
+            with _stats_lock:
+                stale = [
+                    table_name for table_name in pending
+                    if (source, table_name) not in _stats_cache or _is_stale(engine, _stats_cache[(source, table_name)][1])
+                ]
+
+            if persisted:
+                logging.info(f"[COLUMN_STATS] {len(pending) - len(stale)} tabela(s) com estatísticas gravadas válidas")
+            if stale:
+                profile_tables(engine, stale)
+        finally:
+            with _stats_lock:
+                _profiling_in_progress.difference_update((source, table_name) for table_name in pending)
+
+    threading.Thread(target=_run, name="column-stats", daemon=True).start()
+    logging.info(f"[COLUMN_STATS] Perfil agendado para até {len(pending)} tabela(s)")
+
+# ==================== FORMATAÇÃO PARA PROMPTS ====================
+
+def format_column_stats(col_stats: Dict[str, Any]) -> str:
+    """
+    Resume as estatísticas de uma coluna em uma linha
+
+    Returns:
+        Ex: "Nulos: 2.0% | Distintos: 8 | Min: 1, Max: 99"
+    """
+    parts = [f"Nulos: {col_stats.get('null_rate', 0) * 100:.1f}%"]
+    if col_stats.get("distinct_count") is not None:
+        parts.append(f"Distintos: {col_stats['distinct_count']}")
+    if col_stats.get("min_value") is not None:
+        label = "Período" if col_stats.get("kind") == "date" else "Min/Max"
+        parts.append(f"{label}: {col_stats['min_value']} a {col_stats['max_value']}")
+    return " | ".join(parts)
+
+def format_examples(col_stats: Dict[str, Any], limit: int = 3) -> str:
+    """Valores mais frequentes (texto) ou faixa de valores (números e datas)"""
+    if col_stats.get("top_values"):
+        return ", ".join(str(value) for value, _ in col_stats["top_values"][:limit])
+    if col_stats.get("min_value") is not None:
+        return f"{col_stats['min_value']} ... {col_stats['max_value']}"
+    return "(sem dados)"
+
+def stats_to_columns_info(stats: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Converte as estatísticas para o formato de colunas dos prompts
+
+    Returns:
+        Lista com column, type, examples e stats (mesmo formato de
+        _extract_table_columns_info)
+    """
+    return [
+        {
+            "column": col_stats["column"],
+            "type": col_stats.get("data_type", ""),
+            "examples": format_examples(col_stats),
+            "stats": f" | {format_column_stats(col_stats)}"
+        }
+        for col_stats in stats
+    ]
@@ -69,6 +69,62 @@ else:
     REDIS_PORT = 6379
 
 FLOWER_PORT = int(os.getenv("FLOWER_PORT", "5555"))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))  # Por processo e por database
+
+# Filas do Celery por tipo de carga (interativo não disputa com testes em massa)
+CELERY_QUEUE_INTERACTIVE = os.getenv("CELERY_QUEUE_INTERACTIVE", "interactive")
+CELERY_QUEUE_BULK = os.getenv("CELERY_QUEUE_BULK", "bulk")
+CELERY_QUEUE_INGESTION = os.getenv("CELERY_QUEUE_INGESTION", "ingestion")
+
+# Concorrência por fila (a fila interativa usa CELERY_WORKER_CONCURRENCY)
+CELERY_BULK_CONCURRENCY = int(os.getenv("CELERY_BULK_CONCURRENCY", "2"))
+# Fila de ingestão reservada: nenhuma task é roteada para ela ainda, worker dedicado só com concurrency > 0
+CELERY_INGESTION_CONCURRENCY = int(os.getenv("CELERY_INGESTION_CONCURRENCY", "0"))
+
+# Prioridades por tipo de carga (broker Redis: 0 = maior prioridade, 9 = menor)
+CELERY_WORKLOAD_PRIORITIES = {
+    "interactive": int(os.getenv("CELERY_PRIORITY_INTERACTIVE", "0")),
+    "ingestion": int(os.getenv("CELERY_PRIORITY_INGESTION", "5")),
+    "bulk": int(os.getenv("CELERY_PRIORITY_BULK", "9")),
+}
+
+# Afinidade de sessão: tasks interativas da mesma sessão vão para o mesmo worker (agente SQL aquecido)
+CELERY_AFFINITY_ENABLED = os.getenv("CELERY_AFFINITY_ENABLED", "true").lower() == "true"
+# Um slot = um processo com um único registry (worker com concurrency 1); padrão: mesma capacidade sem afinidade
+CELERY_AFFINITY_SLOTS = int(os.getenv("CELERY_AFFINITY_SLOTS", str(CELERY_WORKER_COUNT * CELERY_WORKER_CONCURRENCY)))
+CELERY_AFFINITY_HEARTBEAT_TTL = int(os.getenv("CELERY_AFFINITY_HEARTBEAT_TTL", "30"))  # segundos
+# prefork (1 processo filho por slot): time limits e max_tasks_per_child valem;
+# threads também mantém um registry por slot, porém o Celery ignora esses limites nesse pool
+CELERY_AFFINITY_POOL = os.getenv("CELERY_AFFINITY_POOL", "prefork")
+
+def get_celery_queue(workload: str = "interactive") -> str:
+    """
+    Retorna a fila do Celery para um tipo de carga
+
+    Args:
+        workload: Tipo de carga ("interactive", "bulk" ou "ingestion")
+
+    Returns:
+        Nome da fila (interativa para tipos desconhecidos)
+    """
+    queues = {
+        "interactive": CELERY_QUEUE_INTERACTIVE,
+        "bulk": CELERY_QUEUE_BULK,
+        "ingestion": CELERY_QUEUE_INGESTION,
+    }
+    return queues.get(workload, CELERY_QUEUE_INTERACTIVE)
+
+def get_celery_priority(workload: str = "interactive") -> int:
+    """
+    Retorna a prioridade do Celery para um tipo de carga
+
+    Args:
+        workload: Tipo de carga ("interactive", "bulk" ou "ingestion")
+
+    Returns:
+        Prioridade da task
+    """
+    return CELERY_WORKLOAD_PRIORITIES.get(workload, CELERY_WORKLOAD_PRIORITIES["interactive"])
 
 # Configurações de arquivos e diretórios
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploaded_data")
@@ -76,6 +132,50 @@ DEFAULT_CSV_PATH = os.getenv("DEFAULT_CSV_PATH", "tabela.csv")
 SQL_DB_PATH = os.getenv("SQL_DB_PATH", "data.db")
 UPLOADED_CSV_PATH = os.path.join(UPLOAD_DIR, "tabela.csv")
 
+# Leitura de CSV: "auto" (pyarrow se instalado), "pyarrow" ou "pandas"
+CSV_READER_ENGINE = os.getenv("CSV_READER_ENGINE", "auto")
+CSV_SNIFF_BYTES = int(os.getenv("CSV_SNIFF_BYTES", "65536"))  # amostra para detectar separador/encoding
+
+# Tipos compactos no DataFrame processado (category para texto repetitivo, downcast sem perda)
+DTYPE_OPTIMIZATION_ENABLED = os.getenv("DTYPE_OPTIMIZATION_ENABLED", "true").lower() == "true"
+CATEGORY_MAX_UNIQUE_RATIO = float(os.getenv("CATEGORY_MAX_UNIQUE_RATIO", "0.5"))  # valores distintos / linhas
+
+# Estatísticas de colunas calculadas na ingestão (tabela __column_stats, fora do banco analisado) usadas nos prompts
+COLUMN_STATS_ENABLED = os.getenv("COLUMN_STATS_ENABLED", "true").lower() == "true"
+COLUMN_STATS_DB_PATH = os.getenv("COLUMN_STATS_DB_PATH", "column_stats.db")  # estatísticas de bancos PostgreSQL
+COLUMN_STATS_MAX_TABLES = int(os.getenv("COLUMN_STATS_MAX_TABLES", "20"))  # tabelas analisadas ao conectar
+COLUMN_STATS_TTL = int(os.getenv("COLUMN_STATS_TTL", "86400"))  # validade das estatísticas de bancos externos (s, 0 = sem expiração)
+
+# Coalescência de perguntas idênticas em execução (mesma base, pergunta e modelo)
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+SINGLE_FLIGHT_REDIS_ENABLED = os.getenv("SINGLE_FLIGHT_REDIS_ENABLED", "true").lower() == "true"  # entre processos
+SINGLE_FLIGHT_TIMEOUT = int(os.getenv("SINGLE_FLIGHT_TIMEOUT", "300"))  # espera máxima pelo líder (s)
+SINGLE_FLIGHT_RESULT_TTL = int(os.getenv("SINGLE_FLIGHT_RESULT_TTL", "30"))  # resultado publicado no Redis (s)
+SINGLE_FLIGHT_POLL_INTERVAL = float(os.getenv("SINGLE_FLIGHT_POLL_INTERVAL", "0.2"))
+
+# Criação de tabela a partir de query quando a origem é outra base (cópia em streaming)
+TABLE_CREATOR_CHUNK_ROWS = int(os.getenv("TABLE_CREATOR_CHUNK_ROWS", "50000"))
+
+# Leitura de resultados em blocos via cursor (paginação na interface, gráficos e exportação CSV)
+RESULT_CHUNK_ROWS = int(os.getenv("RESULT_CHUNK_ROWS", "10000"))  # linhas por leitura do cursor
+RESULT_PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", "100"))
+RESULT_CHART_MAX_ROWS = int(os.getenv("RESULT_CHART_MAX_ROWS", "5000"))  # linhas lidas para gráficos
+RESULT_CURSOR_IDLE_TTL = int(os.getenv("RESULT_CURSOR_IDLE_TTL", "60"))  # cursor PostgreSQL ocioso (s)
+RESULT_MAX_OPEN_CURSORS = int(os.getenv("RESULT_MAX_OPEN_CURSORS", "3"))  # cursores de paginação abertos (cada um prende uma conexão do pool)
+
+# Conversão de colunas do CSV em pool de processos (0 ou 1 = sempre no processo atual)
+CSV_PROCESS_WORKERS = int(os.getenv("CSV_PROCESS_WORKERS", str(min(os.cpu_count() or 1, 8))))
+CSV_PARALLEL_MIN_CELLS = int(os.getenv("CSV_PARALLEL_MIN_CELLS", "1000000"))  # linhas x colunas convertidas
+CSV_PARALLEL_BLOCK_ROWS = int(os.getenv("CSV_PARALLEL_BLOCK_ROWS", "250000"))  # linhas por task (números)
+
+# Reutiliza o SQLite da base padrão na inicialização se o CSV não mudou (metadados em <SQL_DB_PATH>.meta.json)
+BOOTSTRAP_CACHE_ENABLED = os.getenv("BOOTSTRAP_CACHE_ENABLED", "true").lower() == "true"
+
+# Cotas de disco das sessões (contabilizadas incrementalmente no Redis)
+SESSION_MAX_SIZE_MB = int(os.getenv("SESSION_MAX_SIZE_MB", "200"))  # Por sessão (CSV + SQLite)
+SESSIONS_MAX_TOTAL_SIZE_MB = int(os.getenv("SESSIONS_MAX_TOTAL_SIZE_MB", "102400"))  # Todas as sessões
+SESSION_DISK_RECONCILE_INTERVAL = int(os.getenv("SESSION_DISK_RECONCILE_INTERVAL", str(6 * 60 * 60)))  # segundos
+
 # Modelos disponíveis para seleção (usados no agentSQL)
 AVAILABLE_MODELS = {
     "GPT-o3-mini": "o3-mini",
@@ -141,6 +241,49 @@ MAX_ITERATIONS = int(os.getenv("MAX_ITERATIONS", "40"))
 TEMPERATURE = float(os.getenv("TEMPERATURE", "0"))
 DEFAULT_TOP_K = int(os.getenv("DEFAULT_TOP_K", "10"))
 
+# Configurações de poda do schema (seleciona tabelas/colunas relevantes para o prompt)
+SCHEMA_PRUNING_ENABLED = os.getenv("SCHEMA_PRUNING_ENABLED", "true").lower() == "true"
+SCHEMA_PRUNING_TOP_TABLES = int(os.getenv("SCHEMA_PRUNING_TOP_TABLES", "5"))
+SCHEMA_PRUNING_TOP_COLUMNS = int(os.getenv("SCHEMA_PRUNING_TOP_COLUMNS", "30"))
+SCHEMA_INDEX_TTL = int(os.getenv("SCHEMA_INDEX_TTL", "600"))  # segundos
+
+# Configurações de streaming (tokens e progresso dos nós enviados ao chat em tempo real)
+STREAMING_ENABLED = os.getenv("STREAMING_ENABLED", "true").lower() == "true"
+STREAM_CHANNEL_PREFIX = os.getenv("STREAM_CHANNEL_PREFIX", "agentgraph:stream")
+
+# Provedor de LLM (live = APIs reais, fake = respostas roteirizadas, record = grava respostas reais, replay = reproduz gravações)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "live").lower()
+LLM_FIXTURES_PATH = os.getenv("LLM_FIXTURES_PATH", "llm_fixtures.json")
+FAKE_LLM_LATENCY_MS = int(os.getenv("FAKE_LLM_LATENCY_MS", "0"))
+FAKE_LLM_LATENCY_JITTER_MS = int(os.getenv("FAKE_LLM_LATENCY_JITTER_MS", "0"))
+
+# Rate limit proativo das chamadas de LLM (token buckets por provedor/modelo)
+# LLM_RATE_LIMITS: JSON por "provedor" ou "provedor:modelo" com rpm, tpm e concurrency
+LLM_RATE_LIMIT_ENABLED = os.getenv("LLM_RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Limites somados entre app e workers do Celery (buckets no Redis); sem Redis, cada processo aplica os limites
+LLM_RATE_LIMIT_SHARED = os.getenv("LLM_RATE_LIMIT_SHARED", "true").lower() == "true"
+LLM_RATE_LIMITS = os.getenv("LLM_RATE_LIMITS", "{}")
+LLM_RATE_LIMIT_HEADROOM = float(os.getenv("LLM_RATE_LIMIT_HEADROOM", "0.9"))  # fração da cota usada
+LLM_RATE_LIMIT_MAX_WAIT = float(os.getenv("LLM_RATE_LIMIT_MAX_WAIT", "120"))  # espera máxima na fila (s)
+LLM_ESTIMATED_COMPLETION_TOKENS = int(os.getenv("LLM_ESTIMATED_COMPLETION_TOKENS", "1024"))
+
+# Hedging das chamadas não agênticas (Processing Agent, refinamento, seleção de gráfico, validação)
+# LLM_HEDGE_FALLBACKS: JSON modelo principal → secundário (sobrescreve os padrões de utils/hedging.py)
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+LLM_HEDGE_FALLBACKS = os.getenv("LLM_HEDGE_FALLBACKS", "")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))  # latência do principal que dispara o hedge
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "5"))  # s, até haver amostras suficientes
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5"))  # s
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))  # latências recentes por modelo
+
+# Métricas Prometheus/OpenMetrics (app na METRICS_PORT, workers a partir de CELERY_METRICS_PORT)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+CELERY_METRICS_PORT = int(os.getenv("CELERY_METRICS_PORT", "9101"))
+# Mede o tamanho serializado do estado ao final de cada nó (custo de pickle por passo)
+STATE_SIZE_TRACKING = os.getenv("STATE_SIZE_TRACKING", "false").lower() == "true"
+
 # Configurações do Gradio
 GRADIO_SHARE = os.getenv("GRADIO_SHARE", "False").lower() == "true"
 GRADIO_PORT = int(os.getenv("GRADIO_PORT", "7860"))
@@ -229,19 +372,32 @@ def get_postgresql_host_for_environment() -> str:
     else:
         return "localhost"
 
+def is_offline_llm() -> bool:
+    """
+    Verifica se o provedor de LLM roda sem APIs reais (fake/replay)
+
+    Returns:
+        True se nenhuma chamada de rede a LLMs deve ser feita
+    """
+    return LLM_PROVIDER in ("fake", "replay")
+
 def validate_config():
     """Valida se as configurações necessárias estão presentes."""
     errors = []
     warnings = []
 
-    if not HUGGINGFACE_API_KEY:
-        errors.append("HUGGINGFACE_API_KEY não configurada")
+    # Provedores offline não precisam de chaves de API
+    if not is_offline_llm():
+        if not HUGGINGFACE_API_KEY:
+            errors.append("HUGGINGFACE_API_KEY não configurada")
 
-    if not OPENAI_API_KEY:
-        errors.append("OPENAI_API_KEY não configurada")
+        if not OPENAI_API_KEY:
+            errors.append("OPENAI_API_KEY não configurada")
 
-    if not ANTHROPIC_API_KEY:
-        errors.append("ANTHROPIC_API_KEY não configurada")
+        if not ANTHROPIC_API_KEY:
+            errors.append("ANTHROPIC_API_KEY não configurada")
+    else:
+        warnings.append(f"LLM_PROVIDER={LLM_PROVIDER} - usando respostas locais ({LLM_FIXTURES_PATH})")
 
     if not os.path.exists(DEFAULT_CSV_PATH):
         errors.append(f"Arquivo CSV padrão não encontrado: {DEFAULT_CSV_PATH}")
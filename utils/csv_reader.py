@@ -0,0 +1,311 @@
+"""
+Leitura de arquivos CSV
+
+O dialeto (separador, aspas, encoding e cabeçalho) é detectado em uma única
+passada sobre uma amostra de bytes do início do arquivo, sem leituras de
+teste com pandas. A leitura completa usa o leitor CSV multithread do pyarrow,
+com colunas de texto em dtype Arrow (string[pyarrow]); sem pyarrow, ou se a
+leitura Arrow falhar, usa o engine C do pandas com o mesmo dialeto.
+
+Exportações em Latin-1/Windows-1252 (ERP, Excel) são lidas sem erro: o
+encoding é escolhido pela primeira decodificação válida da amostra e, se um
+byte inválido aparecer depois da amostra, a leitura é repetida com os
+encodings seguintes (cp1252, latin-1).
+"""
+import csv
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from utils.config import CSV_READER_ENGINE, CSV_SNIFF_BYTES
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    _ARROW_AVAILABLE = True
+except ImportError:
+    _ARROW_AVAILABLE = False
+
+CANDIDATE_DELIMITERS = [';', ',', '\t', '|']
+
+# Ordem de tentativa: Latin-1 decodifica qualquer byte, portanto é o último recurso
+CANDIDATE_ENCODINGS = ['utf-8', 'cp1252', 'latin-1']
+
+# Valores tratados como nulo (mesmos padrões do pandas.read_csv)
+NA_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+]
+
+_UTF8_BOM = b'\xef\xbb\xbf'
+_SNIFF_MAX_LINES = 50
+
+def _detect_encoding(sample: bytes, truncated: bool) -> Tuple[str, str]:
+    """
+    Detecta o encoding da amostra
+
+    Returns:
+        (encoding, texto decodificado)
+    """
+    if sample.startswith(_UTF8_BOM):
+        encoding_candidates = ['utf-8-sig'] + CANDIDATE_ENCODINGS[1:]
+    else:
+        encoding_candidates = CANDIDATE_ENCODINGS
+
+    # Amostra cortada no meio do arquivo pode terminar no meio de um caractere multibyte
+    if truncated and b'\n' in sample:
+        sample = sample[:sample.rfind(b'\n')]
+
+    for encoding in encoding_candidates:
+        try:
+            return encoding, sample.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+
+    return 'latin-1', sample.decode('latin-1')
+
+def _encoding_fallbacks(encoding: str) -> List[str]:
+    """Encoding detectado seguido dos candidatos posteriores (a amostra pode não conter o byte inválido)"""
+    base = 'utf-8' if encoding == 'utf-8-sig' else encoding
+    if base not in CANDIDATE_ENCODINGS:
+        return [encoding]
+    return [encoding] + CANDIDATE_ENCODINGS[CANDIDATE_ENCODINGS.index(base) + 1:]
+
+def _is_decode_error(error: Exception) -> bool:
+    """Erro de decodificação (pandas/codecs) ou UTF-8 inválido na conversão do pyarrow"""
+    if isinstance(error, UnicodeDecodeError):
+        return True
+    return _ARROW_AVAILABLE and isinstance(error, pa.ArrowInvalid) and "utf8" in str(error).lower().replace("-", "")
+
+def _detect_delimiter(text: str) -> Tuple[str, str]:
+    """
+    Detecta separador e caractere de aspas
+
+    Usa csv.Sniffer restrito aos separadores conhecidos; se ele falhar, escolhe
+    o separador presente em todas as linhas com a contagem mais frequente.
+
+    Returns:
+        (separador, aspas)
+    """
+    try:
+        dialect = csv.Sniffer().sniff(text, delimiters=''.join(CANDIDATE_DELIMITERS))
+        if dialect.delimiter in CANDIDATE_DELIMITERS:
+            return dialect.delimiter, dialect.quotechar or '"'
+    except csv.Error:
+        pass
+
+    lines = [line for line in text.splitlines() if line.strip()]
+    best_delimiter, best_score = None, 0
+    for delimiter in CANDIDATE_DELIMITERS:
+        counts = [line.count(delimiter) for line in lines]
+        if not counts or min(counts) == 0:
+            continue
+        most_common = max(set(counts), key=counts.count)
+        score = counts.count(most_common) * most_common
+        if score > best_score:
+            best_delimiter, best_score = delimiter, score
+
+    if best_delimiter is None:
+        raise ValueError("Não foi possível detectar o separador do CSV")
+    return best_delimiter, '"'
+
+def _looks_numeric(value: str) -> bool:
+    """Verifica se o valor é numérico (aceita vírgula decimal)"""
+    try:
+        float(value.strip().replace(',', '.'))
+        return True
+    except ValueError:
+        return False
+
+def _detect_header(rows: List[List[str]]) -> bool:
+    """
+    Verifica se a primeira linha é cabeçalho
+
+    A primeira linha é considerada dados apenas se tiver um valor numérico em
+    uma coluna que também é numérica na maioria das linhas seguintes.
+    """
+    if len(rows) < 2:
+        return True
+
+    first, body = rows[0], rows[1:]
+    for position, value in enumerate(first):
+        if not value.strip() or not _looks_numeric(value):
+            continue
+        column = [row[position] for row in body if position < len(row) and row[position].strip()]
+        if column and sum(_looks_numeric(item) for item in column) / len(column) > 0.8:
+            return False
+    return True
+
+def _build_column_names(first_row: List[str], has_header: bool) -> List[str]:
+    """Nomes de colunas únicos, seguindo o padrão do pandas (Unnamed: i, nome.1)"""
+    if not has_header:
+        return [f"coluna_{i + 1}" for i in range(len(first_row))]
+
+    names, seen = [], {}
+    for position, name in enumerate(first_row):
+        name = name or f"Unnamed: {position}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        seen.setdefault(name, 0)
+        names.append(name)
+    return names
+
+def sniff_csv(file_path: str, sample_bytes: int = None) -> Dict[str, Any]:
+    """
+    Detecta o dialeto de um CSV em uma única leitura de amostra
+
+    Args:
+        file_path: Caminho do CSV
+        sample_bytes: Tamanho da amostra (padrão: CSV_SNIFF_BYTES)
+
+    Returns:
+        Dicionário com delimiter, quotechar, encoding, has_header e columns
+    """
+    sample_bytes = sample_bytes or CSV_SNIFF_BYTES
+    with open(file_path, 'rb') as f:
+        sample = f.read(sample_bytes + 1)
+
+    truncated = len(sample) > sample_bytes
+    encoding, text = _detect_encoding(sample[:sample_bytes], truncated)
+    if not text.strip():
+        raise ValueError("Arquivo CSV vazio")
+
+    lines = text.splitlines()[:_SNIFF_MAX_LINES]
+    delimiter, quotechar = _detect_delimiter('\n'.join(lines))
+
+    rows = [row for row in csv.reader(lines, delimiter=delimiter, quotechar=quotechar) if row]
+    if not rows or len(rows[0]) < 2:
+        raise ValueError("Não foi possível detectar o formato do CSV")
+
+    has_header = _detect_header(rows)
+
+    return {
+        "delimiter": delimiter,
+        "quotechar": quotechar,
+        "encoding": encoding,
+        "has_header": has_header,
+        "columns": _build_column_names(rows[0], has_header)
+    }
+
+def _arrow_string_mapper(arrow_type):
+    """Mapeia texto Arrow para string[pyarrow] (sem materializar objetos Python)"""
+    if arrow_type in (pa.string(), pa.large_string()):
+        return pd.StringDtype("pyarrow")
+    return None
+
+def _read_with_arrow(file_path: str, dialect: Dict[str, Any]) -> Tuple[pd.DataFrame, int]:
+    """
+    Lê o CSV com o leitor multithread do pyarrow
+
+    Returns:
+        (DataFrame com colunas string[pyarrow], linhas inválidas ignoradas)
+    """
+    skipped = []
+
+    def _skip_invalid_row(row):
+        # Equivalente a on_bad_lines="skip" do pandas
+        skipped.append(row.number)
+        return "skip"
+
+    columns = dialect["columns"]
+    encoding = dialect["encoding"]
+
+    read_options = pacsv.ReadOptions(
+        use_threads=True,
+        column_names=columns,
+        skip_rows=1 if dialect["has_header"] else 0,
+        # Codecs diferentes de UTF-8 são transcodificados em streaming pelo pyarrow
+        encoding="utf8" if encoding in ("utf-8", "utf-8-sig") else encoding
+    )
+    parse_options = pacsv.ParseOptions(
+        delimiter=dialect["delimiter"],
+        quote_char=dialect["quotechar"],
+        invalid_row_handler=_skip_invalid_row
+    )
+    convert_options = pacsv.ConvertOptions(
+        # Tudo como texto: a detecção de tipos fica com detect_column_types
+        column_types={name: pa.string() for name in columns},
+        null_values=NA_VALUES,
+        strings_can_be_null=True,
+        quoted_strings_can_be_null=True
+    )
+
+    table = pacsv.read_csv(file_path, read_options=read_options,
+                           parse_options=parse_options, convert_options=convert_options)
+    return table.to_pandas(types_mapper=_arrow_string_mapper), len(skipped)
+
+def _read_with_pandas(file_path: str, dialect: Dict[str, Any]) -> pd.DataFrame:
+    """Lê o CSV com o engine C do pandas"""
+    return pd.read_csv(
+        file_path,
+        sep=dialect["delimiter"],
+        quotechar=dialect["quotechar"],
+        encoding=dialect["encoding"],
+        header=0 if dialect["has_header"] else None,
+        names=dialect["columns"],
+        on_bad_lines="skip",
+        engine='c',
+        low_memory=False,
+        dtype=str
+    )
+
+def read_csv_file(file_path: str, engine: Optional[str] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Lê um CSV com detecção automática de dialeto
+
+    Args:
+        file_path: Caminho do CSV
+        engine: "pyarrow", "pandas" ou "auto" (padrão: CSV_READER_ENGINE)
+
+    Returns:
+        (DataFrame com todas as colunas em texto, informações da leitura)
+    """
+    engine = (engine or CSV_READER_ENGINE).lower()
+    start_time = time.time()
+
+    dialect = sniff_csv(file_path)
+    info = {**dialect, "engine": "pandas", "skipped_rows": 0}
+    info.pop("columns")
+
+    encodings = _encoding_fallbacks(dialect["encoding"])
+
+    df = None
+    if engine in ("auto", "pyarrow") and _ARROW_AVAILABLE:
+        for encoding in encodings:
+            try:
+                df, info["skipped_rows"] = _read_with_arrow(file_path, {**dialect, "encoding": encoding})
+                info["engine"], info["encoding"] = "pyarrow", encoding
+                break
+            except Exception as e:
+                if _is_decode_error(e) and encoding != encodings[-1]:
+                    logging.warning(f"[CSV_READER] Byte inválido para {encoding} após a amostra, tentando próximo encoding")
+                    continue
+                logging.warning(f"[CSV_READER] Leitura com pyarrow falhou, usando pandas: {e}")
+                break
+    elif engine == "pyarrow":
+        logging.warning("[CSV_READER] pyarrow não instalado, usando pandas")
+
+    if df is None:
+        for encoding in encodings:
+            try:
+                df = _read_with_pandas(file_path, {**dialect, "encoding": encoding})
+                info["encoding"] = encoding
+                break
+            except UnicodeDecodeError:
+                if encoding == encodings[-1]:
+                    raise
+                logging.warning(f"[CSV_READER] Byte inválido para {encoding} após a amostra, tentando próximo encoding")
+
+    info["read_time"] = round(time.time() - start_time, 3)
+    logging.info(
+        f"[CSV_READER] {len(df)} linhas, {len(df.columns)} colunas com {info['engine']} "
+        f"(separador '{info['delimiter']}', encoding {info['encoding']}, cabeçalho: {info['has_header']}) "
+        f"em {info['read_time']:.2f}s"
+    )
+    if info["skipped_rows"]:
+        logging.warning(f"[CSV_READER] {info['skipped_rows']} linhas inválidas ignoradas")
+
+    return df, info
@@ -0,0 +1,139 @@
+"""
+Cache do banco da base padrão entre inicializações
+
+Na inicialização o AgentGraphManager converte o CSV ativo em SQLite (leitura,
+detecção de tipos e escrita). Este módulo grava, ao lado do banco, um arquivo
+de metadados com a impressão digital do CSV (tamanho, mtime e SHA-256) e a do
+próprio banco. Se nada mudou, o banco existente é reutilizado sem reprocessar
+o CSV.
+"""
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+# Incrementar quando o processamento do CSV mudar (invalida bancos gerados antes)
+# 2: tipos compactos no DataFrame processado (optimize_dataframe_dtypes)
+# 3: estatísticas de colunas em {banco}.stats.db, fora do banco reutilizado
+CACHE_VERSION = 3
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+def get_metadata_path(db_path: str) -> str:
+    """Retorna o caminho do arquivo de metadados do banco"""
+    return f"{db_path}.meta.json"
+
+def _file_stat(path: str) -> Dict[str, int]:
+    """Tamanho e mtime (ns) de um arquivo"""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def _file_hash(path: str) -> str:
+    """SHA-256 do conteúdo de um arquivo (leitura em blocos)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def compute_csv_fingerprint(csv_path: str) -> Dict[str, Any]:
+    """
+    Calcula a impressão digital de um CSV
+
+    Args:
+        csv_path: Caminho do CSV
+
+    Returns:
+        Caminho absoluto, tamanho, mtime e SHA-256
+    """
+    return {
+        "path": os.path.abspath(csv_path),
+        **_file_stat(csv_path),
+        "sha256": _file_hash(csv_path)
+    }
+
+def load_cached_database(csv_path: str, db_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Retorna os metadados do banco se ele foi gerado a partir do CSV atual
+
+    A comparação por tamanho e mtime evita ler o CSV; o hash só é calculado
+    quando o mtime mudou com tamanho igual (ex: arquivo copiado ou tocado).
+
+    Args:
+        csv_path: CSV ativo
+        db_path: Banco SQLite
+
+    Returns:
+        Metadados persistidos ou None se o banco precisa ser recriado
+    """
+    metadata_path = get_metadata_path(db_path)
+    if not (os.path.exists(csv_path) and os.path.exists(db_path) and os.path.exists(metadata_path)):
+        return None
+
+    try:
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+
+        if metadata.get("version") != CACHE_VERSION:
+            logging.info("[BOOTSTRAP] Metadados de versão anterior, banco será recriado")
+            return None
+
+        # Banco alterado depois da geração (upload, reset, edição manual)
+        if metadata.get("database") != _file_stat(db_path):
+            logging.info("[BOOTSTRAP] Banco modificado desde a última inicialização, será recriado")
+            return None
+
+        cached = metadata.get("csv", {})
+        current = _file_stat(csv_path)
+        if cached.get("path") != os.path.abspath(csv_path) or cached.get("size") != current["size"]:
+            logging.info("[BOOTSTRAP] CSV ativo mudou, banco será recriado")
+            return None
+
+        if cached.get("mtime_ns") != current["mtime_ns"]:
+            if cached.get("sha256") != _file_hash(csv_path):
+                logging.info("[BOOTSTRAP] Conteúdo do CSV mudou, banco será recriado")
+                return None
+
+            # Mesmo conteúdo com mtime novo: atualiza para evitar o hash na próxima vez
+            metadata["csv"]["mtime_ns"] = current["mtime_ns"]
+            _write_metadata(metadata_path, metadata)
+
+        return metadata
+
+    except Exception as e:
+        logging.warning(f"[BOOTSTRAP] Metadados do banco inválidos ({metadata_path}): {e}")
+        return None
+
+def save_database_metadata(csv_path: str, db_path: str, database_info: Dict[str, Any]) -> bool:
+    """
+    Persiste os metadados do banco recém-criado a partir do CSV
+
+    Args:
+        csv_path: CSV de origem
+        db_path: Banco SQLite gerado
+        database_info: Informações do banco retornadas pelo nó de criação
+
+    Returns:
+        True se os metadados foram gravados
+    """
+    try:
+        metadata = {
+            "version": CACHE_VERSION,
+            "csv": compute_csv_fingerprint(csv_path),
+            "database": _file_stat(db_path),
+            "database_info": database_info
+        }
+        _write_metadata(get_metadata_path(db_path), metadata)
+        logging.info(f"[BOOTSTRAP] Metadados do banco salvos em {get_metadata_path(db_path)}")
+        return True
+    except Exception as e:
+        logging.warning(f"[BOOTSTRAP] Erro ao salvar metadados do banco: {e}")
+        return False
+
+def _write_metadata(metadata_path: str, metadata: Dict[str, Any]):
+    """Grava os metadados de forma atômica"""
+    tmp_path = f"{metadata_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp_path, metadata_path)
@@ -0,0 +1,324 @@
+"""
+Hedging de chamadas de LLM não agênticas com fallback entre provedores
+
+Cada pergunta fica presa a um provedor: num período lento da API o usuário
+espera o timeout inteiro (60s para Claude/Gemini). Para as chamadas curtas
+e sem ferramentas (Processing Agent, refinamento de pergunta, seleção de
+gráfico e validação), opcionalmente (LLM_HEDGING_ENABLED):
+
+- A chamada vai ao modelo principal
+- Se ele não responder até o percentil LLM_HEDGE_PERCENTILE da própria
+  latência recente, uma chamada equivalente vai ao modelo secundário
+  configurado (LLM_HEDGE_FALLBACKS) e vale a primeira resposta
+- Se o principal falhar antes disso, o secundário é chamado na hora
+
+Cada chamada registra se o hedge disparou, quem venceu e a latência efetiva.
+A latência do principal é registrada quando ele termina com sucesso: se o
+secundário venceu, o principal continua em segundo plano até responder, de
+forma que o atraso do hedge e o ganho no p99 (get_hedging_report e
+Prometheus) usam a latência real, não o momento em que o secundário venceu.
+"""
+import asyncio
+import concurrent.futures
+import json
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from utils.config import (
+    OPENAI_API_KEY,
+    ANTHROPIC_API_KEY,
+    GOOGLE_API_KEY,
+    LLM_HEDGE_FALLBACKS,
+    LLM_HEDGE_PERCENTILE,
+    LLM_HEDGE_DEFAULT_DELAY,
+    LLM_HEDGE_MIN_DELAY,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_WINDOW
+)
+from utils.metrics import get_llm_provider, record_llm_hedge, record_llm_hedge_primary
+
+# Modelo secundário padrão de cada modelo principal (sempre de outro provedor)
+DEFAULT_HEDGE_FALLBACKS = {
+    "gpt-4o": "claude-3-5-sonnet-20241022",
+    "gpt-4o-mini": "gemini-2.0-flash",
+    "o3-mini": "gemini-2.0-flash",
+    "claude-3-5-sonnet-20241022": "gpt-4o",
+    "gemini-1.5-pro": "gpt-4o",
+    "gemini-2.0-flash": "gpt-4o-mini"
+}
+
+_PROVIDER_KEYS = {
+    "openai": OPENAI_API_KEY,
+    "anthropic": ANTHROPIC_API_KEY,
+    "google": GOOGLE_API_KEY
+}
+
+def _load_fallbacks() -> Dict[str, str]:
+    """Padrões sobrescritos por LLM_HEDGE_FALLBACKS (JSON principal → secundário)"""
+    fallbacks = dict(DEFAULT_HEDGE_FALLBACKS)
+    if LLM_HEDGE_FALLBACKS:
+        try:
+            fallbacks.update(json.loads(LLM_HEDGE_FALLBACKS))
+        except Exception as e:
+            logging.error(f"[HEDGING] LLM_HEDGE_FALLBACKS inválido, usando padrões: {e}")
+    return {primary: secondary for primary, secondary in fallbacks.items() if secondary}
+
+_fallbacks = _load_fallbacks()
+
+def get_hedge_model(model_id: str) -> Optional[str]:
+    """
+    Modelo secundário para hedge de model_id
+
+    Returns:
+        ID do secundário ou None (sem fallback configurado ou sem chave de API)
+    """
+    secondary = _fallbacks.get(model_id)
+    if not secondary or secondary == model_id:
+        return None
+    if not _PROVIDER_KEYS.get(get_llm_provider(secondary)):
+        logging.debug(f"[HEDGING] Sem chave de API para {secondary}, hedge de {model_id} desabilitado")
+        return None
+    return secondary
+
+def _percentile(values: List[float], percentile: float) -> Optional[float]:
+    """Percentil pelo método nearest-rank (None se vazio)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(percentile / 100 * len(ordered)) - 1)
+    return ordered[min(index, len(ordered) - 1)]
+
+class HedgeTracker:
+    """
+    Latências recentes e desfechos de hedge por modelo principal
+    """
+
+    def __init__(self):
+        self._primary: Dict[str, Deque[float]] = {}
+        self._effective: Dict[str, Deque[float]] = {}
+        self._outcomes: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def hedge_delay(self, model_id: str) -> float:
+        """Segundos de espera pelo principal antes de disparar o hedge"""
+        with self._lock:
+            samples = list(self._primary.get(model_id, ()))
+        if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DEFAULT_DELAY
+        return max(LLM_HEDGE_MIN_DELAY, _percentile(samples, LLM_HEDGE_PERCENTILE))
+
+    def record(self, model_id: str, secondary_id: str, outcome: str, effective: float):
+        """
+        Registra uma chamada
+
+        Args:
+            model_id: Modelo principal
+            secondary_id: Modelo secundário
+            outcome: "not_fired", "primary_won", "secondary_won", "primary_failed" ou "failed"
+            effective: Latência percebida pelo chamador (s)
+        """
+        with self._lock:
+            if outcome != "failed":
+                self._effective.setdefault(model_id, deque(maxlen=LLM_HEDGE_WINDOW)).append(effective)
+            outcomes = self._outcomes.setdefault(model_id, {})
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+        record_llm_hedge(model_id, outcome, effective)
+        if outcome in ("secondary_won", "primary_failed"):
+            logging.info(f"[HEDGING] {model_id} → resposta de {secondary_id} em {effective:.2f}s ({outcome})")
+
+    def record_primary(self, model_id: str, latency: float):
+        """
+        Registra a latência real de uma resposta bem-sucedida do principal
+
+        Args:
+            model_id: Modelo principal
+            latency: Tempo até a resposta (s), mesmo que o secundário tenha vencido
+        """
+        with self._lock:
+            self._primary.setdefault(model_id, deque(maxlen=LLM_HEDGE_WINDOW)).append(latency)
+        record_llm_hedge_primary(model_id, latency)
+
+    def report(self, reset: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Relatório por modelo principal
+
+        Returns:
+            {modelo: {"calls", "hedged", "hedge_rate", "secondary_wins", "fallbacks",
+                      "p99_primary", "p99_effective", "p99_improvement"}}
+        """
+        with self._lock:
+            report = {}
+            for model_id, outcomes in self._outcomes.items():
+                calls = sum(outcomes.values())
+                hedged = calls - outcomes.get("not_fired", 0)
+                p99_primary = _percentile(list(self._primary.get(model_id, ())), 99)
+                p99_effective = _percentile(list(self._effective.get(model_id, ())), 99)
+                report[model_id] = {
+                    "calls": calls,
+                    "hedged": hedged,
+                    "hedge_rate": round(hedged / calls, 4) if calls else 0.0,
+                    "secondary_wins": outcomes.get("secondary_won", 0),
+                    "fallbacks": outcomes.get("primary_failed", 0),
+                    "p99_primary": round(p99_primary, 3) if p99_primary is not None else None,
+                    "p99_effective": round(p99_effective, 3) if p99_effective is not None else None,
+                    "p99_improvement": (
+                        round(p99_primary - p99_effective, 3)
+                        if p99_primary is not None and p99_effective is not None else None
+                    )
+                }
+            if reset:
+                self._primary.clear()
+                self._effective.clear()
+                self._outcomes.clear()
+        return report
+
+# Instância global (singleton)
+_hedge_tracker: Optional[HedgeTracker] = None
+_hedge_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def get_hedge_tracker() -> HedgeTracker:
+    """Retorna o registro de latências e desfechos de hedge (singleton)"""
+    global _hedge_tracker
+    if _hedge_tracker is None:
+        _hedge_tracker = HedgeTracker()
+    return _hedge_tracker
+
+def get_hedging_report(reset: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Taxa de hedge e ganho no p99 por modelo principal (ver HedgeTracker.report)"""
+    return get_hedge_tracker().report(reset)
+
+def _get_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """Pool de threads das chamadas síncronas com hedge"""
+    global _hedge_executor
+    with _executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge")
+        return _hedge_executor
+
+# ==================== EXECUÇÃO ====================
+
+def _track_primary_latency(primary, tracker: HedgeTracker, model_id: str, start: float):
+    """Registra a latência do principal quando ele terminar com sucesso (Task ou Future)"""
+    def _done(future):
+        if not future.cancelled() and future.exception() is None:
+            tracker.record_primary(model_id, time.perf_counter() - start)
+    primary.add_done_callback(_done)
+
+async def run_hedged(model_id: str, secondary_id: str,
+                     primary_call: Callable[[], Awaitable[Any]],
+                     secondary_call: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Executa a chamada principal com hedge para o secundário
+
+    Se o principal vencer, o secundário é cancelado; se o secundário vencer, o
+    principal segue em segundo plano até responder (latência real no tracker).
+
+    Args:
+        model_id: Modelo principal
+        secondary_id: Modelo secundário
+        primary_call: Corrotina da chamada principal
+        secondary_call: Corrotina da chamada equivalente no secundário
+
+    Returns:
+        Primeira resposta bem-sucedida (exceção do principal se ambas falharem)
+    """
+    tracker = get_hedge_tracker()
+    delay = tracker.hedge_delay(model_id)
+    start = time.perf_counter()
+    primary = asyncio.ensure_future(primary_call())
+    _track_primary_latency(primary, tracker, model_id, start)
+    secondary = None
+    keep_primary = False
+
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done and primary.exception() is None:
+            elapsed = time.perf_counter() - start
+            tracker.record(model_id, secondary_id, "not_fired", elapsed)
+            return primary.result()
+
+        primary_failed = bool(done)
+        if primary_failed:
+            logging.warning(f"[HEDGING] {model_id} falhou ({primary.exception()}), chamando {secondary_id}")
+        else:
+            logging.info(f"[HEDGING] {model_id} sem resposta em {delay:.2f}s, disparando hedge para {secondary_id}")
+
+        secondary = asyncio.ensure_future(secondary_call())
+        pending = {secondary} if primary_failed else {primary, secondary}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task in done if task.exception() is None), None)
+            if winner is None:
+                continue
+
+            elapsed = time.perf_counter() - start
+            if winner is primary:
+                tracker.record(model_id, secondary_id, "primary_won", elapsed)
+            elif primary_failed:
+                tracker.record(model_id, secondary_id, "primary_failed", elapsed)
+            else:
+                tracker.record(model_id, secondary_id, "secondary_won", elapsed)
+                keep_primary = True
+            return winner.result()
+
+        tracker.record(model_id, secondary_id, "failed", time.perf_counter() - start)
+        raise primary.exception()
+
+    finally:
+        for task in (primary, secondary):
+            if task is not None and not task.done() and not (keep_primary and task is primary):
+                task.cancel()
+
+def run_hedged_sync(model_id: str, secondary_id: str,
+                    primary_call: Callable[[], Any],
+                    secondary_call: Callable[[], Any]) -> Any:
+    """
+    Versão síncrona de run_hedged (chamadas em threads)
+
+    Threads não são canceláveis: a chamada perdedora termina em segundo plano
+    e o resultado é descartado.
+    """
+    tracker = get_hedge_tracker()
+    delay = tracker.hedge_delay(model_id)
+    executor = _get_executor()
+    start = time.perf_counter()
+    primary = executor.submit(primary_call)
+    _track_primary_latency(primary, tracker, model_id, start)
+
+    done, _ = concurrent.futures.wait({primary}, timeout=delay)
+    if done and primary.exception() is None:
+        elapsed = time.perf_counter() - start
+        tracker.record(model_id, secondary_id, "not_fired", elapsed)
+        return primary.result()
+
+    primary_failed = bool(done)
+    if primary_failed:
+        logging.warning(f"[HEDGING] {model_id} falhou ({primary.exception()}), chamando {secondary_id}")
+    else:
+        logging.info(f"[HEDGING] {model_id} sem resposta em {delay:.2f}s, disparando hedge para {secondary_id}")
+
+    secondary = executor.submit(secondary_call)
+    pending = {secondary} if primary_failed else {primary, secondary}
+    while pending:
+        done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        winner = next((future for future in done if future.exception() is None), None)
+        if winner is None:
+            continue
+
+        elapsed = time.perf_counter() - start
+        if winner is primary:
+            tracker.record(model_id, secondary_id, "primary_won", elapsed)
+        elif primary_failed:
+            tracker.record(model_id, secondary_id, "primary_failed", elapsed)
+        else:
+            tracker.record(model_id, secondary_id, "secondary_won", elapsed)
+        return winner.result()
+
+    tracker.record(model_id, secondary_id, "failed", time.perf_counter() - start)
+    raise primary.exception()
@@ -0,0 +1,451 @@
+"""
+Métricas de latência e uso (Prometheus/OpenMetrics)
+
+Publica histogramas e contadores por nó do grafo, por chamada de LLM
+(provedor e modelo), cache, espera do Celery e tempo de banco. Cada processo
+(app Gradio e workers do Celery) expõe seu próprio endpoint HTTP.
+
+Sem prometheus_client instalado (ou com METRICS_ENABLED=false) todas as
+funções viram no-op. Com STATE_SIZE_TRACKING=true o tamanho serializado do
+estado ao final de cada nó também é medido (relatório em processo via
+get_state_size_report, mesmo sem Prometheus).
+"""
+import asyncio
+import functools
+import logging
+import os
+import pickle
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from utils.config import (
+    METRICS_ENABLED,
+    STATE_SIZE_TRACKING,
+    OPENAI_MODELS,
+    ANTHROPIC_MODELS,
+    GOOGLE_MODELS,
+    is_offline_llm
+)
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram, start_http_server
+    _PROMETHEUS_AVAILABLE = True
+except ImportError:
+    _PROMETHEUS_AVAILABLE = False
+
+_ENABLED = METRICS_ENABLED and _PROMETHEUS_AVAILABLE
+
+# Buckets em segundos: nós rápidos (ms) até chamadas longas de agente (minutos)
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+# Buckets em bytes: estado enxuto (poucos KB) até amostras/passos copiados (MB)
+_SIZE_BUCKETS = (512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+if _ENABLED:
+    NODE_LATENCY = Histogram(
+        "agentgraph_node_duration_seconds",
+        "Duração de cada nó do grafo",
+        ["node", "status"],
+        buckets=_LATENCY_BUCKETS
+    )
+    LLM_LATENCY = Histogram(
+        "agentgraph_llm_duration_seconds",
+        "Duração das chamadas de LLM",
+        ["provider", "model", "status"],
+        buckets=_LATENCY_BUCKETS
+    )
+    LLM_TOKENS = Counter(
+        "agentgraph_llm_tokens",
+        "Tokens consumidos nas chamadas de LLM",
+        ["provider", "model", "kind"]
+    )
+    LLM_QUEUE_WAIT = Histogram(
+        "agentgraph_llm_queue_wait_seconds",
+        "Espera na fila de rate limit antes da chamada de LLM",
+        ["provider", "model"],
+        buckets=_LATENCY_BUCKETS
+    )
+    LLM_HEDGE_EVENTS = Counter(
+        "agentgraph_llm_hedge_events",
+        "Desfecho das chamadas com hedge (not_fired, primary_won, secondary_won, primary_failed, failed)",
+        ["model", "outcome"]
+    )
+    LLM_HEDGED_LATENCY = Histogram(
+        "agentgraph_llm_hedged_duration_seconds",
+        "Latência das chamadas com hedge: efetiva e do modelo principal",
+        ["model", "path"],
+        buckets=_LATENCY_BUCKETS
+    )
+    LLM_QUEUE_DEPTH = Gauge(
+        "agentgraph_llm_queue_depth",
+        "Chamadas de LLM aguardando na fila de rate limit",
+        ["provider", "model"],
+        multiprocess_mode="livesum"
+    )
+    LLM_ACTIVE = Gauge(
+        "agentgraph_llm_active_calls",
+        "Chamadas de LLM liberadas pelo agendador e em andamento",
+        ["provider", "model"],
+        multiprocess_mode="livesum"
+    )
+    CACHE_EVENTS = Counter(
+        "agentgraph_cache_events",
+        "Eventos de cache (hit/miss)",
+        ["cache", "outcome"]
+    )
+    CELERY_WAIT = Histogram(
+        "agentgraph_celery_wait_seconds",
+        "Tempo de espera da task no Celery (fila e overhead, sem a execução)",
+        ["workload"],
+        buckets=_LATENCY_BUCKETS
+    )
+    DB_LATENCY = Histogram(
+        "agentgraph_db_query_duration_seconds",
+        "Duração das queries executadas via SQLAlchemy",
+        ["dialect", "status"],
+        buckets=_LATENCY_BUCKETS
+    )
+    if STATE_SIZE_TRACKING:
+        STATE_SIZE = Histogram(
+            "agentgraph_state_size_bytes",
+            "Tamanho serializado do estado do grafo ao final de cada nó",
+            ["node"],
+            buckets=_SIZE_BUCKETS
+        )
+
+_server_started = False
+_server_lock = threading.Lock()
+_db_instrumented = False
+_state_sizes: Dict[str, Dict[str, int]] = {}
+_state_sizes_lock = threading.Lock()
+
+def is_metrics_enabled() -> bool:
+    """Retorna True se as métricas estão ativas neste processo"""
+    return _ENABLED
+
+def get_llm_provider(model_id: str) -> str:
+    """
+    Identifica o provedor de um modelo
+
+    Args:
+        model_id: ID do modelo
+
+    Returns:
+        Nome do provedor ("openai", "anthropic", "google", "huggingface" ou "fake")
+    """
+    if is_offline_llm():
+        return "fake"
+    if model_id in OPENAI_MODELS:
+        return "openai"
+    if model_id in ANTHROPIC_MODELS:
+        return "anthropic"
+    if model_id in GOOGLE_MODELS:
+        return "google"
+    return "huggingface"
+
+# ==================== SERVIDOR ====================
+
+def start_metrics_server(port: int, attempts: int = 1) -> Optional[int]:
+    """
+    Inicia o endpoint HTTP de métricas deste processo (idempotente)
+
+    Args:
+        port: Porta inicial
+        attempts: Portas consecutivas a tentar se a porta estiver ocupada
+
+    Returns:
+        Porta utilizada ou None se não iniciado
+    """
+    global _server_started
+
+    if not _ENABLED:
+        if METRICS_ENABLED and not _PROMETHEUS_AVAILABLE:
+            logging.warning("[METRICS] prometheus_client não instalado - métricas desabilitadas")
+        return None
+
+    with _server_lock:
+        if _server_started:
+            return None
+
+        instrument_sqlalchemy()
+
+        registry = None
+        if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+            # Pool prefork: agrega as métricas dos processos filhos do worker
+            from prometheus_client import CollectorRegistry, multiprocess
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+
+        for offset in range(max(1, attempts)):
+            try:
+                if registry is not None:
+                    start_http_server(port + offset, registry=registry)
+                else:
+                    start_http_server(port + offset)
+                _server_started = True
+                logging.info(f"[METRICS] Endpoint de métricas em :{port + offset}/metrics")
+                return port + offset
+            except OSError as e:
+                logging.warning(f"[METRICS] Porta {port + offset} indisponível: {e}")
+
+    logging.error("[METRICS] Não foi possível iniciar o endpoint de métricas")
+    return None
+
+# ==================== NÓS DO GRAFO ====================
+
+def timed_node(node_name: str) -> Callable:
+    """
+    Decorator que mede a duração de um nó do grafo
+
+    O status é "error" quando o nó lança exceção ou devolve estado com
+    "error" preenchido. A assinatura original é preservada (functools.wraps),
+    de forma que o LangGraph continua injetando "config" nos nós que o aceitam.
+
+    Args:
+        node_name: Nome do nó registrado no grafo
+    """
+    def decorator(func: Callable) -> Callable:
+        if not _ENABLED and not STATE_SIZE_TRACKING:
+            return func
+
+        def _observe(start: float, result: Any, failed: bool):
+            if _ENABLED:
+                status = "error" if failed or (isinstance(result, dict) and result.get("error")) else "ok"
+                NODE_LATENCY.labels(node=node_name, status=status).observe(time.perf_counter() - start)
+            if STATE_SIZE_TRACKING and isinstance(result, dict):
+                record_state_size(node_name, result)
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                except BaseException:
+                    _observe(start, None, True)
+                    raise
+                _observe(start, result, False)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                _observe(start, None, True)
+                raise
+            _observe(start, result, False)
+            return result
+        return sync_wrapper
+
+    return decorator
+
+# ==================== TAMANHO DO ESTADO ====================
+
+def measure_state_size(state: Dict[str, Any]) -> int:
+    """
+    Tamanho do estado serializado em bytes (aproxima o custo de checkpoint por passo)
+
+    Args:
+        state: Estado do grafo
+
+    Returns:
+        Bytes do pickle (ou da representação em texto se não serializável)
+    """
+    try:
+        return len(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return len(repr(state).encode("utf-8"))
+
+def record_state_size(node_name: str, state: Dict[str, Any]):
+    """Registra o tamanho do estado devolvido por um nó"""
+    size = measure_state_size(state)
+    if _ENABLED:
+        STATE_SIZE.labels(node=node_name).observe(size)
+
+    with _state_sizes_lock:
+        stats = _state_sizes.setdefault(node_name, {"steps": 0, "total_bytes": 0, "max_bytes": 0})
+        stats["steps"] += 1
+        stats["total_bytes"] += size
+        stats["max_bytes"] = max(stats["max_bytes"], size)
+
+def get_state_size_report(reset: bool = False) -> Dict[str, Dict[str, int]]:
+    """
+    Relatório do tamanho do estado por nó (requer STATE_SIZE_TRACKING=true)
+
+    Args:
+        reset: Se deve zerar as medições após gerar o relatório
+
+    Returns:
+        {nó: {"steps", "avg_bytes", "max_bytes"}}
+    """
+    with _state_sizes_lock:
+        report = {
+            node: {
+                "steps": stats["steps"],
+                "avg_bytes": stats["total_bytes"] // max(1, stats["steps"]),
+                "max_bytes": stats["max_bytes"]
+            }
+            for node, stats in _state_sizes.items()
+        }
+        if reset:
+            _state_sizes.clear()
+    return report
+
+# ==================== LLM ====================
+
+def record_llm_call(provider: str, model: str, duration: float, status: str = "ok",
+                    prompt_tokens: int = 0, completion_tokens: int = 0):
+    """Registra uma chamada de LLM"""
+    if not _ENABLED:
+        return
+    LLM_LATENCY.labels(provider=provider, model=model, status=status).observe(duration)
+    if prompt_tokens:
+        LLM_TOKENS.labels(provider=provider, model=model, kind="prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(provider=provider, model=model, kind="completion").inc(completion_tokens)
+
+def record_llm_queue_wait(provider: str, model: str, seconds: float):
+    """Registra a espera de uma chamada na fila de rate limit"""
+    if _ENABLED:
+        LLM_QUEUE_WAIT.labels(provider=provider, model=model).observe(max(0.0, seconds))
+
+def set_llm_queue_depth(provider: str, model: str, queued: int, active: int):
+    """Atualiza profundidade da fila e chamadas em andamento de um provedor/modelo"""
+    if _ENABLED:
+        LLM_QUEUE_DEPTH.labels(provider=provider, model=model).set(queued)
+        LLM_ACTIVE.labels(provider=provider, model=model).set(active)
+
+def record_llm_hedge(model: str, outcome: str, effective: float):
+    """Registra o desfecho e a latência efetiva de uma chamada com hedge"""
+    if not _ENABLED:
+        return
+    LLM_HEDGE_EVENTS.labels(model=model, outcome=outcome).inc()
+    LLM_HEDGED_LATENCY.labels(model=model, path="effective").observe(effective)
+
+def record_llm_hedge_primary(model: str, latency: float):
+    """Registra a latência real do modelo principal em uma chamada com hedge"""
+    if not _ENABLED:
+        return
+    LLM_HEDGED_LATENCY.labels(model=model, path="primary").observe(latency)
+
+def _extract_token_usage(response: Any) -> Dict[str, int]:
+    """Extrai uso de tokens de um LLMResult (llm_output ou usage_metadata das mensagens)"""
+    usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+    if usage:
+        return {
+            "prompt": usage.get("prompt_tokens", 0) or 0,
+            "completion": usage.get("completion_tokens", 0) or 0
+        }
+
+    prompt_tokens = completion_tokens = 0
+    for generations in getattr(response, "generations", []) or []:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            prompt_tokens += metadata.get("input_tokens", 0) or 0
+            completion_tokens += metadata.get("output_tokens", 0) or 0
+    return {"prompt": prompt_tokens, "completion": completion_tokens}
+
+def attach_llm_metrics(llm: Any, model_id: str) -> Any:
+    """
+    Adiciona callback de métricas a um modelo LangChain
+
+    Args:
+        llm: Modelo (chat model ou LLM)
+        model_id: ID do modelo usado como label
+
+    Returns:
+        O mesmo modelo
+    """
+    if not _ENABLED:
+        return llm
+
+    try:
+        from langchain_core.callbacks import BaseCallbackHandler
+    except ImportError:
+        return llm
+
+    provider = get_llm_provider(model_id)
+
+    class LLMMetricsCallback(BaseCallbackHandler):
+        """Mede duração e tokens de cada chamada do modelo"""
+
+        def __init__(self):
+            super().__init__()
+            self._starts: Dict[Any, float] = {}
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self._starts[run_id] = time.perf_counter()
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self._starts[run_id] = time.perf_counter()
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            start = self._starts.pop(run_id, None)
+            if start is None:
+                return
+            usage = _extract_token_usage(response)
+            record_llm_call(provider, model_id, time.perf_counter() - start, "ok", usage["prompt"], usage["completion"])
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            start = self._starts.pop(run_id, None)
+            if start is not None:
+                record_llm_call(provider, model_id, time.perf_counter() - start, "error")
+
+    try:
+        llm.callbacks = list(llm.callbacks or []) + [LLMMetricsCallback()]
+    except Exception as e:
+        logging.debug(f"[METRICS] Callback de métricas não anexado ao modelo {model_id}: {e}")
+    return llm
+
+# ==================== CACHE, CELERY E BANCO ====================
+
+def record_cache_event(cache: str, outcome: str):
+    """
+    Registra hit/miss de cache
+
+    Args:
+        cache: Nome do cache ("response", "agent", "db")
+        outcome: "hit" ou "miss"
+    """
+    if _ENABLED:
+        CACHE_EVENTS.labels(cache=cache, outcome=outcome).inc()
+
+def record_celery_wait(workload: str, seconds: float):
+    """Registra tempo de espera de uma task no Celery"""
+    if _ENABLED:
+        CELERY_WAIT.labels(workload=workload).observe(max(0.0, seconds))
+
+def instrument_sqlalchemy():
+    """Mede todas as queries SQLAlchemy do processo via eventos do Engine (idempotente)"""
+    global _db_instrumented
+
+    if not _ENABLED or _db_instrumented:
+        return
+
+    try:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+    except ImportError:
+        return
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_metrics_start", []).append(time.perf_counter())
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("_metrics_start")
+        if starts:
+            DB_LATENCY.labels(dialect=conn.dialect.name, status="ok").observe(time.perf_counter() - starts.pop())
+
+    @event.listens_for(Engine, "handle_error")
+    def _on_error(exception_context):
+        conn = exception_context.connection
+        starts = conn.info.get("_metrics_start") if conn is not None else None
+        if starts:
+            DB_LATENCY.labels(dialect=conn.dialect.name, status="error").observe(time.perf_counter() - starts.pop())
+
+    _db_instrumented = True
@@ -5,9 +5,15 @@ Suporte completo a sessões temporárias
 """
 import uuid
 import json
+import threading
+from collections import OrderedDict
 from typing import Dict, Any, Optional, List
 import logging
 
+# Limite de payloads retidos (segurança caso uma execução não libere os seus);
+# payloads de execuções em andamento (escopos fixados) nunca são removidos
+MAX_PAYLOADS = 1000
+
 
 class ObjectManager:
     """
@@ -34,6 +40,11 @@ class ObjectManager:
         # Mapeamento de sessões para objetos
         self._session_mappings: Dict[str, Dict[str, str]] = {}  # session_id -> {type -> object_id}
 
+        # Payloads grandes referenciados no estado do grafo por handle (escopo = execução)
+        self._payloads: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # handle -> {scope, kind, payload}
+        self._pinned_scopes: set = set()  # Escopos de execuções em andamento
+        self._payload_lock = threading.Lock()
+
     def _ensure_session_structure(self, session_id: str):
         """Garante que estrutura da sessão existe"""
         if session_id not in self._session_objects:
@@ -516,10 +527,99 @@ class ObjectManager:
             return True
         return False
     
+    # ===== PAYLOADS DO ESTADO =====
+    # Dados grandes (amostra do banco, contexto SQL, passos do agente...) ficam fora
+    # do estado do LangGraph: o estado carrega apenas o handle, evitando cópia e
+    # checkpoint do payload a cada transição de nó.
+
+    def store_payload(self, scope: str, kind: str, payload: Any) -> str:
+        """
+        Armazena payload e retorna handle para o estado
+
+        Args:
+            scope: Escopo de liberação (run_id da execução)
+            kind: Tipo do payload (ex: "db_sample", "sql_context")
+            payload: Dados
+
+        Returns:
+            Handle do payload
+        """
+        handle = f"{kind}:{uuid.uuid4().hex}"
+        with self._payload_lock:
+            self._payloads[handle] = {"scope": scope, "kind": kind, "payload": payload}
+            if len(self._payloads) > MAX_PAYLOADS:
+                self._evict_unpinned_payloads()
+        return handle
+
+    def _evict_unpinned_payloads(self):
+        """Remove os payloads mais antigos de escopos não fixados até voltar ao limite (sob _payload_lock)"""
+        excess = len(self._payloads) - MAX_PAYLOADS
+        evicted = [
+            handle for handle, entry in self._payloads.items()
+            if entry["scope"] not in self._pinned_scopes
+        ][:excess]
+        for handle in evicted:
+            del self._payloads[handle]
+            logging.warning(f"[OBJECT_MANAGER] Payload removido por limite: {handle}")
+        if len(evicted) < excess:
+            logging.warning(
+                f"[OBJECT_MANAGER] {len(self._payloads)} payloads retidos (limite {MAX_PAYLOADS}): "
+                f"excedente pertence a {len(self._pinned_scopes)} execuções em andamento"
+            )
+
+    def pin_payloads(self, scope: str):
+        """
+        Fixa os payloads de um escopo até release_payloads (execução em andamento)
+
+        Args:
+            scope: Escopo usado em store_payload (run_id)
+        """
+        with self._payload_lock:
+            self._pinned_scopes.add(scope)
+
+    def get_payload(self, handle: Optional[str], default: Any = None) -> Any:
+        """
+        Materializa payload a partir do handle
+
+        Args:
+            handle: Handle retornado por store_payload
+            default: Valor se o handle não existir
+
+        Returns:
+            Payload ou default
+        """
+        if not handle:
+            return default
+        with self._payload_lock:
+            entry = self._payloads.get(handle)
+        return entry["payload"] if entry else default
+
+    def release_payloads(self, scope: str) -> int:
+        """
+        Libera todos os payloads de um escopo (e desfaz pin_payloads)
+
+        Args:
+            scope: Escopo usado em store_payload
+
+        Returns:
+            Número de payloads liberados
+        """
+        with self._payload_lock:
+            self._pinned_scopes.discard(scope)
+            handles = [handle for handle, entry in self._payloads.items() if entry["scope"] == scope]
+            for handle in handles:
+                del self._payloads[handle]
+        if handles:
+            logging.debug(f"[OBJECT_MANAGER] {len(handles)} payloads liberados do escopo {scope}")
+        return len(handles)
+
     def clear_all(self):
         """Limpa todos os objetos armazenados (globais e sessões)"""
         # Limpa objetos globais
         self._objects.clear()
+        with self._payload_lock:
+            self._payloads.clear()
+            self._pinned_scopes.clear()
         self._sql_agents.clear()
         self._engines.clear()
         self._databases.clear()
@@ -600,3 +700,15 @@ def reset_object_manager():
     if _object_manager:
         _object_manager.clear_all()
     _object_manager = ObjectManager()
+
+def get_payload_scope(state: Dict[str, Any]) -> str:
+    """
+    Retorna o escopo de liberação dos payloads de um estado do grafo
+
+    Args:
+        state: Estado do grafo
+
+    Returns:
+        run_id da execução (ou session_id quando o nó roda fora do grafo)
+    """
+    return state.get("run_id") or state.get("session_id") or "default"
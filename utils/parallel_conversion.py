@@ -0,0 +1,260 @@
+"""
+Conversão de colunas do CSV em pool de processos
+
+As conversões de process_dataframe_generic (inteiros, decimais e datas) são
+pandas/NumPy síncrono: executadas no event loop rodam uma após a outra em um
+único núcleo. Aqui cada coluna (e, para números, cada bloco de linhas) vira
+uma task de um ProcessPoolExecutor.
+
+Os dados não trafegam como Series serializadas com pickle:
+- Entrada: as colunas de texto são escritas uma única vez como stream Arrow IPC
+  em memória compartilhada; cada worker lê apenas a fatia (coluna, linhas) da
+  sua task, sem cópia do buffer.
+- Saída: o processo principal aloca, por coluna, um bloco de memória
+  compartilhada de tamanho fixo (int64/float64/datetime64[ns] + máscara de
+  nulos) onde os workers escrevem os resultados diretamente.
+
+Sem pyarrow, com poucas células ou dentro de processos daemon (pool prefork
+do Celery), a conversão continua no processo atual.
+"""
+import asyncio
+import logging
+import multiprocessing as mp
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.config import CSV_PROCESS_WORKERS, CSV_PARALLEL_MIN_CELLS, CSV_PARALLEL_BLOCK_ROWS
+
+try:
+    import pyarrow as pa
+    _ARROW_AVAILABLE = True
+except ImportError:
+    _ARROW_AVAILABLE = False
+
+# Regras executadas no pool e tipo do resultado escrito na memória compartilhada
+PARALLEL_RULES = {
+    "convert_text_to_int_safe": "int",
+    "convert_text_to_float_safe": "float",
+    "parse_dates_advanced": "datetime"
+}
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Retorna o pool de processos de conversão (singleton)
+
+    Usa forkserver/spawn: fork de um processo com threads (Gradio, Celery,
+    clientes HTTP) pode herdar locks em estado inconsistente.
+    """
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+            _process_pool = ProcessPoolExecutor(max_workers=CSV_PROCESS_WORKERS, mp_context=mp.get_context(method))
+            logging.info(f"[PARALLEL_CONVERSION] Pool de conversão criado com {CSV_PROCESS_WORKERS} processos ({method})")
+        return _process_pool
+
+def shutdown_process_pool():
+    """Encerra o pool de processos de conversão"""
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+
+def should_use_process_pool(rows: int, columns: int) -> bool:
+    """
+    Verifica se a conversão compensa o custo do pool
+
+    Args:
+        rows: Linhas do DataFrame
+        columns: Colunas a converter
+
+    Returns:
+        True se deve usar o pool de processos
+    """
+    return (
+        _ARROW_AVAILABLE
+        and CSV_PROCESS_WORKERS > 1
+        and columns > 0
+        and rows * columns >= CSV_PARALLEL_MIN_CELLS
+        and not mp.current_process().daemon
+    )
+
+# ==================== WORKER ====================
+
+def _read_block(input_name: str, position: int, start: int, stop: int) -> pd.Series:
+    """Lê uma fatia de coluna do stream Arrow em memória compartilhada"""
+    shm = shared_memory.SharedMemory(name=input_name)
+    try:
+        def _slice() -> pd.Series:
+            with pa.ipc.open_stream(pa.py_buffer(shm.buf)) as reader:
+                table = reader.read_all()
+            # to_pandas copia os valores: nenhuma referência ao buffer sobrevive
+            return table.column(position).slice(start, stop - start).to_pandas()
+        return _slice()
+    finally:
+        shm.close()
+
+def _convert_block(input_name: str, output_name: str, position: int, rule: str,
+                   start: int, stop: int, total_rows: int) -> bool:
+    """
+    Converte uma fatia de coluna e escreve o resultado na memória compartilhada
+
+    Returns:
+        False se a conversão não produziu o tipo esperado (o processo principal
+        refaz a coluna localmente)
+    """
+    from nodes.csv_processing_node import (
+        convert_to_int_ultra_optimized,
+        convert_to_float_ultra_optimized,
+        process_dates_vectorized
+    )
+
+    series = _read_block(input_name, position, start, stop)
+    kind = PARALLEL_RULES[rule]
+
+    if kind == "int":
+        result = convert_to_int_ultra_optimized(series)
+        if str(result.dtype) != "Int64":
+            return False
+        values = result.to_numpy(dtype="int64", na_value=0)
+    elif kind == "float":
+        result = convert_to_float_ultra_optimized(series)
+        if result.dtype != "float64":
+            return False
+        values = result.to_numpy()
+    else:
+        result = process_dates_vectorized(series)
+        if not pd.api.types.is_datetime64_dtype(result):
+            return False
+        values = result.astype("datetime64[ns]").to_numpy().view("int64")
+
+    nulls = result.isna().to_numpy()
+
+    shm = shared_memory.SharedMemory(name=output_name)
+    try:
+        out_values = np.ndarray((total_rows,), dtype=np.float64 if kind == "float" else np.int64, buffer=shm.buf)
+        out_nulls = np.ndarray((total_rows,), dtype=np.bool_, buffer=shm.buf, offset=total_rows * 8)
+        out_values[start:stop] = values
+        out_nulls[start:stop] = nulls
+        del out_values, out_nulls
+    finally:
+        shm.close()
+    return True
+
+# ==================== PROCESSO PRINCIPAL ====================
+
+def _write_arrow_input(df: pd.DataFrame, columns: List[str]) -> Tuple[shared_memory.SharedMemory, int]:
+    """Escreve as colunas como stream Arrow IPC em memória compartilhada"""
+    table = pa.Table.from_arrays(
+        [pa.array(df[col], from_pandas=True) for col in columns],
+        names=[f"c{i}" for i in range(len(columns))]
+    )
+
+    # Primeiro mede o tamanho do stream para alocar o bloco exato
+    sink = pa.MockOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    size = sink.size()
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, size))
+    buffer = pa.py_buffer(shm.buf)
+    try:
+        with pa.ipc.new_stream(pa.FixedSizeBufferWriter(buffer), table.schema) as writer:
+            writer.write_table(table)
+    finally:
+        del buffer
+    return shm, size
+
+def _read_output(shm: shared_memory.SharedMemory, kind: str, total_rows: int, index: pd.Index) -> pd.Series:
+    """Monta a coluna convertida a partir do bloco de saída"""
+    values = np.ndarray((total_rows,), dtype=np.float64 if kind == "float" else np.int64, buffer=shm.buf).copy()
+    nulls = np.ndarray((total_rows,), dtype=np.bool_, buffer=shm.buf, offset=total_rows * 8).copy()
+
+    if kind == "int":
+        return pd.Series(pd.arrays.IntegerArray(values, nulls), index=index)
+    if kind == "float":
+        return pd.Series(values, index=index)
+    return pd.Series(values.view("datetime64[ns]"), index=index)
+
+async def convert_columns_in_process_pool(df: pd.DataFrame, columns: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """
+    Converte colunas no pool de processos, alterando o DataFrame in-place
+
+    Números são divididos em blocos de CSV_PARALLEL_BLOCK_ROWS linhas; datas
+    são convertidas por coluna inteira (o formato é inferido da coluna toda,
+    como na conversão local).
+
+    Args:
+        df: DataFrame com as colunas em texto
+        columns: Pares (coluna, regra) com regras em PARALLEL_RULES
+
+    Returns:
+        Pares não convertidos no pool (para conversão local)
+    """
+    eligible = [(col, rule) for col, rule in columns if rule in PARALLEL_RULES]
+    remaining = [(col, rule) for col, rule in columns if rule not in PARALLEL_RULES]
+    total_rows = len(df)
+
+    if not should_use_process_pool(total_rows, len(eligible)):
+        return columns
+
+    input_shm = None
+    outputs: Dict[str, shared_memory.SharedMemory] = {}
+    converted = set()
+    try:
+        input_shm, input_size = _write_arrow_input(df, [col for col, _ in eligible])
+        pool = get_process_pool()
+        loop = asyncio.get_running_loop()
+        block_rows = max(1, CSV_PARALLEL_BLOCK_ROWS)
+
+        futures: Dict[str, List[Any]] = {}
+        for position, (col, rule) in enumerate(eligible):
+            outputs[col] = shared_memory.SharedMemory(create=True, size=max(1, total_rows * 9))
+            step = total_rows if PARALLEL_RULES[rule] == "datetime" else block_rows
+            futures[col] = [
+                asyncio.wrap_future(pool.submit(
+                    _convert_block, input_shm.name, outputs[col].name, position, rule,
+                    start, min(start + step, total_rows), total_rows
+                ), loop=loop)
+                for start in range(0, total_rows, max(1, step))
+            ]
+
+        logging.info(
+            f"[PARALLEL_CONVERSION] {sum(len(f) for f in futures.values())} tasks para {len(eligible)} colunas "
+            f"({input_size / 1024 / 1024:.1f} MB em Arrow)"
+        )
+
+        for col, rule in eligible:
+            results = await asyncio.gather(*futures[col], return_exceptions=True)
+            failures = [result for result in results if result is not True]
+            if failures:
+                logging.warning(f"[PARALLEL_CONVERSION] Coluna {col} será convertida localmente: {failures[0]}")
+                remaining.append((col, rule))
+                continue
+            df[col] = _read_output(outputs[col], PARALLEL_RULES[rule], total_rows, df.index)
+            converted.add(col)
+
+        return remaining
+
+    except Exception as e:
+        # Pool quebrado (BrokenProcessPool) ou falta de memória compartilhada: recria no próximo uso
+        logging.error(f"[PARALLEL_CONVERSION] Erro no pool de conversão, usando conversão local: {e}")
+        shutdown_process_pool()
+        return [(col, rule) for col, rule in columns if col not in converted]
+
+    finally:
+        for shm in list(outputs.values()) + ([input_shm] if input_shm else []):
+            try:
+                shm.close()
+                shm.unlink()
+            except Exception:
+                pass
@@ -1,11 +1,15 @@
 """
 Utilitário para criar tabelas no PostgreSQL baseadas em queries SQL
 """
+import asyncio
 import logging
 import re
 from typing import Dict, Any, Optional
 from sqlalchemy import create_engine, text
-import pandas as pd
+from sqlalchemy.engine import Engine
+
+from utils.config import TABLE_CREATOR_CHUNK_ROWS
+from utils.result_set import ResultSet
 
 
 def remove_limit_from_query(sql_query: str) -> str:
@@ -68,18 +72,149 @@ def validate_table_name(table_name: str) -> bool:
     )
 
 
+def _same_database(source_engine: Optional[Engine], target_engine: Engine) -> bool:
+    """Verifica se a query pode rodar na base de destino (mesmo servidor, porta e database)"""
+    if source_engine is None:
+        return True
+    source, target = source_engine.url, target_engine.url
+    return (
+        source.get_backend_name() == target.get_backend_name()
+        and source.host == target.host
+        and (source.port or 5432) == (target.port or 5432)
+        and source.database == target.database
+    )
+
+
+def _table_exists(conn, table_name: str) -> bool:
+    """Verifica se a tabela já existe no schema public"""
+    check_table_query = """
+    SELECT EXISTS (
+        SELECT FROM information_schema.tables 
+        WHERE table_schema = 'public' 
+        AND table_name = :table_name
+    );
+    """
+    return bool(conn.execute(text(check_table_query), {"table_name": table_name}).scalar())
+
+
+def _create_table_as(engine: Engine, table_name: str, query: str) -> Optional[int]:
+    """
+    Cria a tabela com CREATE TABLE AS, inteiramente no PostgreSQL
+
+    Verificação de existência, criação e contagem na mesma transação; se a
+    query não retornar linhas a transação é desfeita.
+
+    Returns:
+        Registros inseridos (0 se vazia) ou None se a tabela já existe
+    """
+    with engine.connect() as conn:
+        with conn.begin() as transaction:
+            if _table_exists(conn, table_name):
+                return None
+
+            quoted_name = conn.dialect.identifier_preparer.quote(table_name)
+            result = conn.execute(text(f"CREATE TABLE {quoted_name} AS {query}"))
+
+            # rowcount vem do status do comando ("SELECT n")
+            records_count = result.rowcount
+            if records_count is None or records_count < 0:
+                records_count = conn.execute(text(f"SELECT COUNT(*) FROM {quoted_name}")).scalar()
+
+            if not records_count:
+                transaction.rollback()
+                return 0
+    return records_count
+
+
+def _copy_table_streaming(source_engine: Engine, target_engine: Engine, table_name: str, query: str) -> Optional[int]:
+    """
+    Copia o resultado de outra base em blocos (cursor do lado do servidor na origem)
+
+    Apenas um bloco de TABLE_CREATOR_CHUNK_ROWS linhas fica em memória; a
+    inserção no destino roda em uma única transação.
+
+    Returns:
+        Registros inseridos (0 se vazia) ou None se a tabela já existe
+    """
+    records_count = 0
+    with ResultSet(source_engine, query, chunk_rows=TABLE_CREATOR_CHUNK_ROWS) as result:
+        with target_engine.begin() as target_conn:
+            if _table_exists(target_conn, table_name):
+                return None
+
+            for chunk in result.iter_chunks():
+                chunk.to_sql(
+                    table_name,
+                    target_conn,
+                    if_exists='fail' if records_count == 0 else 'append',
+                    index=False,
+                    method='multi',  # Inserção em lote para performance
+                    chunksize=1000
+                )
+                records_count += len(chunk)
+                logging.info(f"[TABLE_CREATOR] {records_count} registros copiados...")
+    return records_count
+
+
+def _create_table(table_name: str, clean_query: str, postgresql_config: Dict[str, Any],
+                  source_engine: Optional[Engine]) -> Dict[str, Any]:
+    """Cria a tabela de forma síncrona (executada fora do event loop)"""
+    connection_uri = f"postgresql://{postgresql_config['username']}:{postgresql_config['password']}@{postgresql_config['host']}:{postgresql_config['port']}/{postgresql_config['database']}"
+    engine = create_engine(connection_uri)
+
+    try:
+        if _same_database(source_engine, engine):
+            logging.info(f"[TABLE_CREATOR] Criando tabela '{table_name}' com CREATE TABLE AS...")
+            records_count = _create_table_as(engine, table_name, clean_query)
+        else:
+            logging.info(f"[TABLE_CREATOR] Query de outra base: copiando para '{table_name}' em streaming...")
+            records_count = _copy_table_streaming(source_engine, engine, table_name, clean_query)
+    finally:
+        engine.dispose()
+
+    if records_count is None:
+        return {
+            "success": False,
+            "message": f"❌ Tabela '{table_name}' já existe no banco de dados."
+        }
+
+    if not records_count:
+        return {
+            "success": False,
+            "message": "❌ A query não retornou dados para criar a tabela."
+        }
+
+    logging.info(f"[TABLE_CREATOR] ✅ Tabela '{table_name}' criada com {records_count} registros")
+
+    # Nova tabela visível na poda de schema sem esperar o TTL do índice
+    from utils.schema_index import clear_schema_indexes
+    clear_schema_indexes()
+
+    return {
+        "success": True,
+        "message": f"✅ Tabela '{table_name}' criada com sucesso! {records_count} registros inseridos.",
+        "records_count": records_count
+    }
+
+
 async def create_table_from_query(
     table_name: str,
     sql_query: str,
-    postgresql_config: Dict[str, Any]
+    postgresql_config: Dict[str, Any],
+    source_engine: Optional[Engine] = None
 ) -> Dict[str, Any]:
     """
     Cria nova tabela no PostgreSQL baseada em query SQL
+
+    Na mesma base a tabela é criada com CREATE TABLE AS, sem trazer os dados
+    para a aplicação. Se a query foi executada em outra base (source_engine
+    diferente do destino), os dados são copiados em streaming, em blocos.
     
     Args:
         table_name: Nome da nova tabela
         sql_query: Query SQL para extrair dados
         postgresql_config: Configurações de conexão PostgreSQL
+        source_engine: Engine da base onde a query foi executada (None = destino)
         
     Returns:
         Dicionário com resultado da operação
@@ -96,75 +231,8 @@ async def create_table_from_query(
         
         # Remove LIMIT da query
         clean_query = remove_limit_from_query(sql_query)
-        
-        # Cria conexão PostgreSQL
-        connection_uri = f"postgresql://{postgresql_config['username']}:{postgresql_config['password']}@{postgresql_config['host']}:{postgresql_config['port']}/{postgresql_config['database']}"
-        
-        engine = create_engine(connection_uri)
-        
-        # Testa conexão
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        
-        logging.info(f"[TABLE_CREATOR] Conexão PostgreSQL estabelecida")
-        
-        # Executa query original para obter dados
-        logging.info(f"[TABLE_CREATOR] Executando query para obter dados...")
-        df = pd.read_sql_query(clean_query, engine)
-        
-        if df.empty:
-            return {
-                "success": False,
-                "message": "❌ A query não retornou dados para criar a tabela."
-            }
-        
-        logging.info(f"[TABLE_CREATOR] Query executada: {len(df)} registros obtidos")
-        
-        # Verifica se tabela já existe
-        check_table_query = """
-        SELECT EXISTS (
-            SELECT FROM information_schema.tables 
-            WHERE table_schema = 'public' 
-            AND table_name = :table_name
-        );
-        """
-        
-        with engine.connect() as conn:
-            table_exists = conn.execute(
-                text(check_table_query), 
-                {"table_name": table_name}
-            ).scalar()
-        
-        if table_exists:
-            return {
-                "success": False,
-                "message": f"❌ Tabela '{table_name}' já existe no banco de dados."
-            }
-        
-        # Cria a nova tabela
-        logging.info(f"[TABLE_CREATOR] Criando tabela '{table_name}' com {len(df)} registros...")
-        
-        df.to_sql(
-            table_name,
-            engine,
-            if_exists='fail',  # Falha se tabela já existir
-            index=False,
-            method='multi'  # Inserção em lote para performance
-        )
-        
-        # Verifica se tabela foi criada com sucesso
-        with engine.connect() as conn:
-            count_result = conn.execute(
-                text(f"SELECT COUNT(*) FROM {table_name}")
-            ).scalar()
-        
-        logging.info(f"[TABLE_CREATOR] ✅ Tabela '{table_name}' criada com {count_result} registros")
-        
-        return {
-            "success": True,
-            "message": f"✅ Tabela '{table_name}' criada com sucesso! {count_result} registros inseridos.",
-            "records_count": count_result
-        }
+
+        return await asyncio.to_thread(_create_table, table_name, clean_query, postgresql_config, source_engine)
         
     except Exception as e:
         error_msg = f"Erro ao criar tabela: {str(e)}"
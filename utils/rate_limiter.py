@@ -0,0 +1,516 @@
+"""
+Agendador de chamadas de LLM com limites proativos por provedor e modelo
+
+retry_with_backoff só reage depois que a API recusa a chamada (overloaded,
+rate_limit) e as chamadas OpenAI não tinham limite algum. Aqui toda chamada
+de um modelo real passa pelo agendador antes de ir à rede:
+
+- Token buckets de requisições (RPM) e tokens (TPM) por provedor/modelo,
+  com margem (LLM_RATE_LIMIT_HEADROOM) para o throughput ficar logo abaixo
+  da cota
+- Tokens estimados pelo tamanho do prompt (~4 caracteres por token) mais a
+  resposta esperada; ao final da chamada o bucket é ajustado pelo uso real
+- Limite de chamadas simultâneas por provedor/modelo
+- Fila justa entre sessões: a vez passa em rodízio pelas sessões com
+  chamadas pendentes, de forma que uma sessão com muitas chamadas (ex:
+  testes em massa) não atrasa as demais
+
+Os limites vêm de LLM_RATE_LIMITS (JSON por "provedor" ou "provedor:modelo")
+e valem para todos os processos juntos (app e cada worker do Celery): o saldo
+dos buckets e as chamadas em andamento ficam no Redis e são consumidos por
+um script Lua atômico (LLM_RATE_LIMIT_SHARED). Se o Redis estiver
+indisponível, cada processo aplica os limites sozinho até ele voltar. A fila
+justa entre sessões vale dentro de cada processo. Provedor/modelo sem limite
+configurado não passa pela fila.
+"""
+import asyncio
+import concurrent.futures
+import contextlib
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterator, AsyncIterator, Optional, Tuple
+
+from utils.config import (
+    LLM_RATE_LIMIT_ENABLED,
+    LLM_RATE_LIMITS,
+    LLM_RATE_LIMIT_HEADROOM,
+    LLM_RATE_LIMIT_MAX_WAIT,
+    LLM_RATE_LIMIT_SHARED,
+    LLM_ESTIMATED_COMPLETION_TOKENS
+)
+from utils.metrics import record_llm_queue_wait, set_llm_queue_depth
+
+CHARS_PER_TOKEN = 4
+DEFAULT_SESSION = "global"
+
+RATE_LIMIT_KEY_PREFIX = "agentgraph:ratelimit"
+# Vaga de concorrência de um processo que caiu sem liberar expira após este tempo (s)
+_LEASE_TTL = 600
+# Reconsulta do Redis quando o limite de concorrência global está cheio (s)
+_SHARED_POLL_INTERVAL = 0.25
+# Tempo em limites locais após uma falha do Redis (s)
+_SHARED_RETRY_AFTER = 30
+
+# Consome 1 requisição e N tokens dos buckets globais e reserva uma vaga de
+# concorrência, tudo ou nada. Retorna a espera em segundos (texto; "-1" =
+# concorrência global cheia, "0" = concedido)
+_ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local specs = {
+    {KEYS[1], tonumber(ARGV[2]), 1},
+    {KEYS[2], tonumber(ARGV[3]), tonumber(ARGV[4])}
+}
+local wait = 0
+local buckets = {}
+for _, spec in ipairs(specs) do
+    local capacity = spec[2]
+    if capacity > 0 then
+        local rate = capacity / 60
+        local values = redis.call('HMGET', spec[1], 'tokens', 'updated')
+        local tokens = tonumber(values[1]) or capacity
+        local updated = tonumber(values[2]) or now
+        tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+        local amount = math.min(spec[3], capacity)
+        if tokens < amount then
+            wait = math.max(wait, (amount - tokens) / rate)
+        end
+        table.insert(buckets, {spec[1], tokens, amount})
+    end
+end
+
+local concurrency = tonumber(ARGV[5])
+if wait == 0 and concurrency > 0 then
+    redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', now)
+    if redis.call('ZCARD', KEYS[3]) >= concurrency then
+        wait = -1
+    end
+end
+
+local granted = wait == 0
+for _, bucket in ipairs(buckets) do
+    local tokens = bucket[2]
+    if granted then
+        tokens = tokens - bucket[3]
+    end
+    redis.call('HSET', bucket[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+    redis.call('EXPIRE', bucket[1], 120)
+end
+if granted and concurrency > 0 then
+    redis.call('ZADD', KEYS[3], tostring(now + tonumber(ARGV[7])), ARGV[6])
+    redis.call('EXPIRE', KEYS[3], tonumber(ARGV[7]))
+end
+return tostring(wait)
+"""
+
+# Devolve (delta > 0) ou cobra (delta < 0) tokens do bucket global
+_ADJUST_SCRIPT = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens then
+    tokens = math.min(tonumber(ARGV[2]), tokens + tonumber(ARGV[1]))
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens))
+end
+return 1
+"""
+
+# Sessão das chamadas de LLM do contexto atual (propagada para tasks e asyncio.to_thread)
+_llm_session: contextvars.ContextVar = contextvars.ContextVar("llm_session", default=DEFAULT_SESSION)
+
+def set_llm_session(session_id: Optional[str]) -> contextvars.Token:
+    """Define a sessão usada na fila justa; retorna o token para reset_llm_session"""
+    return _llm_session.set(session_id or DEFAULT_SESSION)
+
+def reset_llm_session(token: contextvars.Token):
+    """Restaura a sessão anterior (ignora tokens de outro contexto, ex: geradores assíncronos)"""
+    try:
+        _llm_session.reset(token)
+    except ValueError:
+        pass
+
+@contextlib.contextmanager
+def llm_session(session_id: Optional[str]) -> Iterator[None]:
+    """Executa o bloco com as chamadas de LLM atribuídas à sessão"""
+    token = set_llm_session(session_id)
+    try:
+        yield
+    finally:
+        reset_llm_session(token)
+
+def estimate_tokens(prompt: str, max_tokens: Optional[int] = None) -> int:
+    """
+    Estima os tokens de uma chamada (prompt + resposta esperada)
+
+    Args:
+        prompt: Texto enviado (mensagens e ferramentas)
+        max_tokens: Limite de resposta do modelo, se configurado
+
+    Returns:
+        Tokens estimados
+    """
+    completion = LLM_ESTIMATED_COMPLETION_TOKENS
+    if max_tokens:
+        completion = min(completion, max_tokens)
+    return max(1, len(prompt or "") // CHARS_PER_TOKEN + completion)
+
+def _load_limits() -> Dict[str, Dict[str, float]]:
+    """Lê LLM_RATE_LIMITS (JSON)"""
+    try:
+        limits = json.loads(LLM_RATE_LIMITS or "{}")
+        if not isinstance(limits, dict):
+            raise ValueError("esperado um objeto JSON")
+        return {str(key).lower(): value for key, value in limits.items() if isinstance(value, dict)}
+    except Exception as e:
+        logging.error(f"[RATE_LIMITER] LLM_RATE_LIMITS inválido, chamadas sem limite: {e}")
+        return {}
+
+class TokenBucket:
+    """
+    Bucket com capacidade por minuto e reposição contínua
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Segundos até haver saldo para amount (0 se já houver)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)  # Chamada maior que a cota não fica presa para sempre
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta: float):
+        """Devolve (delta > 0) ou cobra (delta < 0) a diferença entre estimativa e uso real"""
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+class _Ticket:
+    """Chamada aguardando (ou usando) uma vaga do agendador"""
+
+    __slots__ = ("lane", "session", "tokens", "future", "enqueued_at", "granted", "usage", "shared", "lease")
+
+    def __init__(self, lane: "_Lane", session: str, tokens: int):
+        self.lane = lane
+        self.session = session
+        self.tokens = tokens
+        self.future: concurrent.futures.Future = concurrent.futures.Future()
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.usage: Optional[int] = None  # Tokens reais, preenchidos pelo chamador
+        self.shared = False  # Concedido pelos buckets globais (Redis)
+        self.lease: Optional[str] = None  # Vaga de concorrência global
+
+class _Lane:
+    """Limites, fila por sessão e chamadas em andamento de um provedor/modelo"""
+
+    def __init__(self, provider: str, model: str, limits: Dict[str, float]):
+        self.provider = provider
+        self.model = model
+        rpm = limits.get("rpm")
+        tpm = limits.get("tpm")
+        self.requests = TokenBucket(rpm * LLM_RATE_LIMIT_HEADROOM) if rpm else None
+        self.tokens = TokenBucket(tpm * LLM_RATE_LIMIT_HEADROOM) if tpm else None
+        self.concurrency = int(limits.get("concurrency") or 0)
+        self.active = 0
+        self.queues: "OrderedDict[str, Deque[_Ticket]]" = OrderedDict()
+        self.timer: Optional[threading.Timer] = None
+        self.key = f"{RATE_LIMIT_KEY_PREFIX}:{provider}:{model}"
+        self.local_until = 0.0  # Limites locais até este instante (Redis indisponível)
+
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def wait_time(self, ticket: _Ticket, now: float) -> float:
+        waits = [0.0]
+        if self.requests:
+            waits.append(self.requests.wait_time(1, now))
+        if self.tokens:
+            waits.append(self.tokens.wait_time(ticket.tokens, now))
+        return max(waits)
+
+    def take_local(self, ticket: _Ticket, now: float) -> float:
+        """Consome dos buckets deste processo (espera em segundos, 0 = concedido)"""
+        wait = self.wait_time(ticket, now)
+        if wait > 0:
+            return wait
+        if self.requests:
+            self.requests.consume(1)
+        if self.tokens:
+            self.tokens.consume(ticket.tokens)
+        return 0.0
+
+    def take_shared(self, redis_client, ticket: _Ticket) -> float:
+        """Consome dos buckets globais no Redis (espera em segundos, 0 = concedido)"""
+        lease = uuid.uuid4().hex if self.concurrency else ""
+        wait = float(redis_client.eval(
+            _ACQUIRE_SCRIPT, 3,
+            f"{self.key}:requests", f"{self.key}:tokens", f"{self.key}:active",
+            time.time(),
+            self.requests.capacity if self.requests else 0,
+            self.tokens.capacity if self.tokens else 0,
+            ticket.tokens,
+            self.concurrency,
+            lease,
+            _LEASE_TTL
+        ))
+        if wait < 0:
+            return _SHARED_POLL_INTERVAL
+        if wait == 0:
+            ticket.shared = True
+            ticket.lease = lease or None
+        return wait
+
+class LLMScheduler:
+    """
+    Fila de chamadas de LLM com token buckets por provedor/modelo
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None):
+        self._limits = limits if limits is not None else _load_limits()
+        self._lanes: Dict[Tuple[str, str], Optional[_Lane]] = {}
+        self._lock = threading.Lock()
+
+    def limits_for(self, provider: str, model: str) -> Dict[str, float]:
+        """Limites do provedor, sobrescritos pelos do modelo ("provedor:modelo")"""
+        limits = dict(self._limits.get(provider, {}))
+        limits.update(self._limits.get(f"{provider}:{model}".lower(), {}))
+        return {key: value for key, value in limits.items() if key in ("rpm", "tpm", "concurrency") and value}
+
+    def _get_lane(self, provider: str, model: str) -> Optional[_Lane]:
+        key = (provider, model)
+        if key not in self._lanes:
+            limits = self.limits_for(provider, model)
+            self._lanes[key] = _Lane(provider, model, limits) if limits else None
+            if limits:
+                logging.info(f"[RATE_LIMITER] Limites para {provider}/{model}: {limits}")
+        return self._lanes[key]
+
+    # ==================== FILA ====================
+
+    def _submit(self, provider: str, model: str, tokens: int) -> Optional[_Ticket]:
+        """Enfileira a chamada na sessão atual (None se não houver limite)"""
+        if not LLM_RATE_LIMIT_ENABLED:
+            return None
+        with self._lock:
+            lane = self._get_lane(provider, model)
+            if lane is None:
+                return None
+            ticket = _Ticket(lane, _llm_session.get(), tokens)
+            lane.queues.setdefault(ticket.session, deque()).append(ticket)
+            self._dispatch(lane)
+        return ticket
+
+    def _dispatch(self, lane: _Lane):
+        """Libera chamadas em rodízio entre sessões enquanto houver saldo (com o lock)"""
+        now = time.monotonic()
+        while lane.queues:
+            if lane.concurrency and lane.active >= lane.concurrency:
+                break  # release() redespacha
+
+            session, queue = next(iter(lane.queues.items()))
+            ticket = queue[0]
+            if not ticket.future.cancelled():
+                wait = self._take(lane, ticket, now)
+                if wait > 0:
+                    self._schedule(lane, wait)
+                    break
+
+            queue.popleft()
+            if queue:
+                lane.queues.move_to_end(session)  # Próxima sessão na vez
+            else:
+                del lane.queues[session]
+
+            if not ticket.future.set_running_or_notify_cancel():
+                self._return_shared(ticket)  # Chamador desistiu enquanto aguardava
+                continue
+
+            lane.active += 1
+            ticket.granted = True
+            ticket.future.set_result(True)
+
+        set_llm_queue_depth(lane.provider, lane.model, lane.depth(), lane.active)
+
+    def _take(self, lane: _Lane, ticket: _Ticket, now: float) -> float:
+        """Consome a vaga nos buckets globais (Redis) ou, sem Redis, nos deste processo"""
+        if LLM_RATE_LIMIT_SHARED and now >= lane.local_until:
+            try:
+                from utils.redis_client import get_redis_client
+                return lane.take_shared(get_redis_client(2), ticket)
+            except Exception as e:
+                lane.local_until = now + _SHARED_RETRY_AFTER
+                logging.warning(
+                    f"[RATE_LIMITER] Redis indisponível para {lane.provider}/{lane.model}, "
+                    f"limites por processo por {_SHARED_RETRY_AFTER}s: {e}"
+                )
+        return lane.take_local(ticket, now)
+
+    def _return_shared(self, ticket: _Ticket, token_delta: float = 0):
+        """Libera a vaga de concorrência global e ajusta o bucket global de tokens"""
+        if not ticket.shared:
+            return
+        lane = ticket.lane
+        try:
+            from utils.redis_client import get_redis_client
+            redis_client = get_redis_client(2)
+            if ticket.lease:
+                redis_client.zrem(f"{lane.key}:active", ticket.lease)
+            if token_delta and lane.tokens:
+                redis_client.eval(_ADJUST_SCRIPT, 1, f"{lane.key}:tokens", token_delta, lane.tokens.capacity)
+        except Exception as e:
+            logging.warning(f"[RATE_LIMITER] Erro ao liberar vaga global de {lane.provider}/{lane.model}: {e}")
+        ticket.shared = False
+        ticket.lease = None
+
+    def _schedule(self, lane: _Lane, wait: float):
+        """Agenda novo despacho quando os buckets tiverem saldo"""
+        if lane.timer is not None:
+            return
+        lane.timer = threading.Timer(wait, self._on_timer, args=(lane,))
+        lane.timer.daemon = True
+        lane.timer.start()
+
+    def _on_timer(self, lane: _Lane):
+        with self._lock:
+            lane.timer = None
+            self._dispatch(lane)
+
+    def _release(self, ticket: _Ticket):
+        """Devolve a vaga e ajusta o bucket de tokens pelo uso real"""
+        lane = ticket.lane
+        token_delta = ticket.tokens - ticket.usage if ticket.usage else 0
+        with self._lock:
+            if ticket.granted:
+                ticket.granted = False
+                lane.active -= 1
+                if lane.tokens and token_delta and not ticket.shared:
+                    lane.tokens.adjust(token_delta)
+        # Fora do lock: a vaga global volta antes do redespacho
+        self._return_shared(ticket, token_delta)
+        with self._lock:
+            self._dispatch(lane)
+
+    def _abandon(self, ticket: _Ticket):
+        """Remove da fila uma chamada cancelada ou expirada"""
+        ticket.future.cancel()
+        with self._lock:
+            queue = ticket.lane.queues.get(ticket.session)
+            if queue and ticket in queue:
+                queue.remove(ticket)
+                if not queue:
+                    del ticket.lane.queues[ticket.session]
+        # Vaga concedida entre o timeout e o cancelamento
+        self._release(ticket)
+
+    def _granted(self, ticket: _Ticket):
+        waited = time.monotonic() - ticket.enqueued_at
+        record_llm_queue_wait(ticket.lane.provider, ticket.lane.model, waited)
+        if waited >= 1:
+            logging.info(
+                f"[RATE_LIMITER] {ticket.lane.provider}/{ticket.lane.model} liberado após {waited:.1f}s "
+                f"na fila (sessão {ticket.session}, ~{ticket.tokens} tokens)"
+            )
+
+    def _timeout_error(self, ticket: _Ticket) -> TimeoutError:
+        return TimeoutError(
+            f"Chamada ao {ticket.lane.provider}/{ticket.lane.model} aguardou mais de "
+            f"{LLM_RATE_LIMIT_MAX_WAIT:g}s na fila de rate limit"
+        )
+
+    # ==================== API ====================
+
+    @contextlib.contextmanager
+    def slot(self, provider: str, model: str, tokens: int) -> Iterator[Optional[_Ticket]]:
+        """
+        Aguarda uma vaga (bloqueante) e a mantém durante o bloco
+
+        Args:
+            provider: Provedor (utils.metrics.get_llm_provider)
+            model: ID do modelo
+            tokens: Tokens estimados (estimate_tokens)
+
+        Yields:
+            Ticket da chamada (preencha ticket.usage com os tokens reais) ou
+            None se o provedor/modelo não tem limite
+        """
+        ticket = self._submit(provider, model, tokens)
+        if ticket is None:
+            yield None
+            return
+
+        try:
+            ticket.future.result(timeout=LLM_RATE_LIMIT_MAX_WAIT)
+        except concurrent.futures.TimeoutError:
+            self._abandon(ticket)
+            raise self._timeout_error(ticket)
+        except BaseException:
+            self._abandon(ticket)
+            raise
+
+        self._granted(ticket)
+        try:
+            yield ticket
+        finally:
+            self._release(ticket)
+
+    @contextlib.asynccontextmanager
+    async def aslot(self, provider: str, model: str, tokens: int) -> AsyncIterator[Optional[_Ticket]]:
+        """Versão assíncrona de slot (não bloqueia o event loop)"""
+        ticket = self._submit(provider, model, tokens)
+        if ticket is None:
+            yield None
+            return
+
+        try:
+            await asyncio.wait_for(asyncio.wrap_future(ticket.future), LLM_RATE_LIMIT_MAX_WAIT)
+        except asyncio.TimeoutError:
+            self._abandon(ticket)
+            raise self._timeout_error(ticket)
+        except BaseException:
+            self._abandon(ticket)
+            raise
+
+        self._granted(ticket)
+        try:
+            yield ticket
+        finally:
+            self._release(ticket)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Estado das filas por provedor/modelo (profundidade, sessões e chamadas ativas)"""
+        with self._lock:
+            return {
+                f"{provider}/{model}": {
+                    "queued": lane.depth(),
+                    "sessions": len(lane.queues),
+                    "active": lane.active,
+                    "requests_available": round(lane.requests.tokens, 1) if lane.requests else None,
+                    "tokens_available": round(lane.tokens.tokens) if lane.tokens else None
+                }
+                for (provider, model), lane in self._lanes.items() if lane is not None
+            }
+
+# Instância global (singleton)
+_llm_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Retorna o agendador de chamadas de LLM (singleton)"""
+    global _llm_scheduler
+    with _scheduler_lock:
+        if _llm_scheduler is None:
+            _llm_scheduler = LLMScheduler()
+        return _llm_scheduler
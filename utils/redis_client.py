@@ -0,0 +1,139 @@
+"""
+Cliente Redis compartilhado com pool de conexões
+
+Todos os módulos devem obter clientes por aqui em vez de criar
+redis.Redis(...) a cada chamada: o pool é criado uma vez por database
+e por processo, e as conexões são reutilizadas entre requisições.
+"""
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import redis
+
+from utils.config import REDIS_HOST, REDIS_PORT, REDIS_MAX_CONNECTIONS
+
+# Pools por database Redis (0: Celery, 1: configs de agentes, 2: sessões)
+_pools: Dict[int, redis.ConnectionPool] = {}
+_pools_pid: Optional[int] = None
+_pools_lock = threading.Lock()
+
+def get_redis_client(db: int = 0) -> redis.Redis:
+    """
+    Retorna cliente Redis ligado ao pool compartilhado do database
+
+    Args:
+        db: Número do database Redis
+
+    Returns:
+        Cliente redis.Redis (decode_responses=True)
+    """
+    global _pools_pid
+
+    pool = _pools.get(db)
+    if pool is None or _pools_pid != os.getpid():
+        with _pools_lock:
+            # Processos filhos (prefork do Celery) não herdam conexões do pai
+            if _pools_pid != os.getpid():
+                _pools.clear()
+                _pools_pid = os.getpid()
+
+            pool = _pools.get(db)
+            if pool is None:
+                pool = redis.ConnectionPool(
+                    host=REDIS_HOST,
+                    port=REDIS_PORT,
+                    db=db,
+                    decode_responses=True,
+                    max_connections=REDIS_MAX_CONNECTIONS,
+                    socket_connect_timeout=5,
+                    socket_timeout=5,
+                    health_check_interval=30
+                )
+                _pools[db] = pool
+                logging.info(f"[REDIS_POOL] Pool criado para {REDIS_HOST}:{REDIS_PORT}/db{db} (max {REDIS_MAX_CONNECTIONS} conexões)")
+
+    return redis.Redis(connection_pool=pool)
+
+def reset_redis_clients():
+    """Desconecta e descarta todos os pools (útil em testes e após fork)"""
+    global _pools_pid
+
+    with _pools_lock:
+        for pool in _pools.values():
+            try:
+                pool.disconnect()
+            except Exception:
+                pass
+        _pools.clear()
+        _pools_pid = None
+
+def encode_hash_fields(data: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Serializa valores para armazenamento em hash Redis (JSON por campo)
+
+    Args:
+        data: Dicionário com valores Python
+
+    Returns:
+        Dicionário campo -> valor JSON
+    """
+    return {key: json.dumps(value, default=str) for key, value in data.items()}
+
+def decode_hash_fields(raw: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Desserializa campos de um hash Redis gravado com encode_hash_fields
+
+    Args:
+        raw: Resultado de HGETALL
+
+    Returns:
+        Dicionário com valores Python
+    """
+    data = {}
+    for key, value in raw.items():
+        try:
+            data[key] = json.loads(value)
+        except (TypeError, ValueError):
+            data[key] = value
+    return data
+
+def load_json_hash(client: redis.Redis, key: str, ttl: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Lê um hash JSON-por-campo, migrando chaves legadas (string JSON) para hash
+
+    Args:
+        client: Cliente Redis
+        key: Chave do hash
+        ttl: TTL aplicado ao migrar chave legada (opcional)
+
+    Returns:
+        Dicionário com os dados ou None se a chave não existir
+    """
+    try:
+        raw = client.hgetall(key)
+        return decode_hash_fields(raw) if raw else None
+
+    except redis.ResponseError:
+        # WRONGTYPE: chave gravada no formato antigo (string JSON)
+        legacy = client.get(key)
+        if not legacy:
+            return None
+
+        data = json.loads(legacy)
+        if ttl is None:
+            remaining = client.ttl(key)
+            ttl = remaining if remaining and remaining > 0 else None
+
+        pipe = client.pipeline()
+        pipe.delete(key)
+        if data:
+            pipe.hset(key, mapping=encode_hash_fields(data))
+        if ttl:
+            pipe.expire(key, ttl)
+        pipe.execute()
+
+        logging.info(f"[REDIS_POOL] Chave {key} migrada de JSON para hash")
+        return data
@@ -0,0 +1,312 @@
+"""
+Leitura de resultados de queries em blocos, sem materializar o resultado inteiro
+
+pd.read_sql_query traz o resultado completo para a memória da aplicação.
+Aqui as linhas são lidas de um cursor, em blocos:
+- PostgreSQL: cursor nomeado do lado do servidor (stream_results), o servidor
+  envia as linhas sob demanda
+- SQLite: leitura incremental do cursor do sqlite3 (fetchmany)
+
+Os blocos saem como DataFrames pandas ou tabelas Arrow (pyarrow opcional).
+
+Consumidores:
+- Gráficos: apenas as primeiras RESULT_CHART_MAX_ROWS linhas (read_first_rows)
+- Interface: paginação sob demanda (ResultPager); no PostgreSQL o cursor fica
+  aberto entre páginas sequenciais e é fechado após RESULT_CURSOR_IDLE_TTL.
+  No máximo RESULT_MAX_OPEN_CURSORS cursores ficam abertos (o menos usado
+  recentemente é fechado): cada um prende uma conexão do pool compartilhado
+  com o agente SQL
+- Exportação CSV escrita direto do cursor, bloco a bloco (export_csv)
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+from sqlalchemy import text
+
+from utils.config import RESULT_CHUNK_ROWS, RESULT_PAGE_SIZE, RESULT_CURSOR_IDLE_TTL, RESULT_MAX_OPEN_CURSORS
+
+try:
+    import pyarrow as pa
+    _ARROW_AVAILABLE = True
+except ImportError:
+    _ARROW_AVAILABLE = False
+
+class ResultSet:
+    """
+    Resultado de uma query lido de um cursor em blocos
+
+    Uso:
+        with ResultSet(engine, query) as result:
+            for chunk in result.iter_chunks():
+                ...
+    """
+
+    def __init__(self, engine, sql_query: str, chunk_rows: Optional[int] = None):
+        self.engine = engine
+        self.sql_query = sql_query
+        self.chunk_rows = max(1, chunk_rows or RESULT_CHUNK_ROWS)
+        self.columns: List[str] = []
+        self.rows_read = 0
+        self.exhausted = False
+        self._conn = None
+        self._result = None
+
+    def open(self) -> "ResultSet":
+        """Executa a query e abre o cursor (sem buscar linhas)"""
+        self._conn = self.engine.connect().execution_options(
+            stream_results=True,
+            max_row_buffer=self.chunk_rows
+        )
+        try:
+            self._result = self._conn.execute(text(self.sql_query))
+            self.columns = list(self._result.keys())
+        except Exception:
+            self.close()
+            raise
+        return self
+
+    def close(self):
+        """Fecha o cursor e devolve a conexão ao pool"""
+        for resource in (self._result, self._conn):
+            if resource is not None:
+                try:
+                    resource.close()
+                except Exception as e:
+                    logging.debug(f"[RESULT_SET] Erro ao fechar cursor: {e}")
+        self._result = None
+        self._conn = None
+
+    def __enter__(self) -> "ResultSet":
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def fetch(self, rows: int) -> pd.DataFrame:
+        """
+        Lê as próximas linhas do cursor
+
+        Args:
+            rows: Máximo de linhas
+
+        Returns:
+            DataFrame (vazio, com as colunas, ao final do resultado)
+        """
+        records = [] if self.exhausted else self._result.fetchmany(rows)
+        if len(records) < rows:
+            self.exhausted = True
+        self.rows_read += len(records)
+        # Mesma conversão de pd.read_sql_query (Decimal → float)
+        return pd.DataFrame.from_records(records, columns=self.columns, coerce_float=True)
+
+    def skip(self, rows: int):
+        """Descarta linhas do cursor sem montar DataFrames"""
+        while rows > 0 and not self.exhausted:
+            step = min(rows, self.chunk_rows)
+            records = self._result.fetchmany(step)
+            if len(records) < step:
+                self.exhausted = True
+            self.rows_read += len(records)
+            rows -= step
+
+    def iter_chunks(self, as_arrow: bool = False) -> Iterator[Union[pd.DataFrame, Any]]:
+        """
+        Itera sobre o restante do resultado em blocos de chunk_rows linhas
+
+        Args:
+            as_arrow: Retorna pyarrow.Table em vez de DataFrame (requer pyarrow)
+        """
+        if as_arrow and not _ARROW_AVAILABLE:
+            raise ImportError("pyarrow não instalado")
+
+        while not self.exhausted:
+            chunk = self.fetch(self.chunk_rows)
+            if chunk.empty:
+                break
+            yield pa.Table.from_pandas(chunk, preserve_index=False) if as_arrow else chunk
+
+def read_first_rows(engine, sql_query: str, max_rows: int) -> Tuple[pd.DataFrame, bool]:
+    """
+    Lê apenas as primeiras linhas de um resultado
+
+    Args:
+        engine: SQLAlchemy Engine
+        sql_query: Query SQL
+        max_rows: Máximo de linhas
+
+    Returns:
+        (DataFrame, True se o resultado tinha mais linhas)
+    """
+    with ResultSet(engine, sql_query, chunk_rows=max_rows + 1) as result:
+        df = result.fetch(max_rows + 1)
+    truncated = len(df) > max_rows
+    return (df.iloc[:max_rows] if truncated else df), truncated
+
+def export_csv(engine, sql_query: str, file_path: str, chunk_rows: Optional[int] = None) -> int:
+    """
+    Exporta o resultado para CSV direto do cursor, bloco a bloco
+
+    Args:
+        engine: SQLAlchemy Engine
+        sql_query: Query SQL
+        file_path: Arquivo de destino
+        chunk_rows: Linhas por bloco (padrão: RESULT_CHUNK_ROWS)
+
+    Returns:
+        Linhas exportadas
+    """
+    start_time = time.time()
+    with ResultSet(engine, sql_query, chunk_rows) as result, open(file_path, "w", encoding="utf-8", newline="") as f:
+        header_written = False
+        for chunk in result.iter_chunks():
+            chunk.to_csv(f, index=False, header=not header_written)
+            header_written = True
+        if not header_written:
+            pd.DataFrame(columns=result.columns).to_csv(f, index=False)
+        rows = result.rows_read
+
+    logging.info(f"[RESULT_SET] {rows} linhas exportadas para {file_path} em {time.time() - start_time:.2f}s")
+    return rows
+
+# ==================== PAGINAÇÃO ====================
+
+class _PagerEntry:
+    """Cursor aberto de uma chave (sessão) e próxima página a ler"""
+
+    def __init__(self, result: ResultSet, page_size: int):
+        self.result = result
+        self.page_size = page_size
+        self.next_page = 0
+        self.last_used = time.time()
+
+class ResultPager:
+    """
+    Paginação sob demanda do resultado de uma query
+
+    Páginas sequenciais no PostgreSQL reaproveitam o cursor do servidor;
+    saltos (ou voltar uma página) reabrem o cursor e descartam as linhas
+    anteriores. No SQLite o cursor é fechado a cada página: um SELECT aberto
+    bloquearia escritas no arquivo (ex: upload de novo CSV).
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, _PagerEntry] = {}
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+
+    def get_page(self, key: str, engine, sql_query: str, page: int,
+                 page_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Lê uma página do resultado
+
+        Args:
+            key: Dono do cursor (ex: ID da sessão)
+            engine: SQLAlchemy Engine
+            sql_query: Query SQL
+            page: Página (a partir de 0)
+            page_size: Linhas por página (padrão: RESULT_PAGE_SIZE)
+
+        Returns:
+            Dicionário com data (DataFrame), page, page_size, first_row e has_next
+            (has_next pode ser True quando a última página está completa)
+        """
+        page_size = page_size or RESULT_PAGE_SIZE
+        self._close_idle()
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+
+        reuse = (
+            entry is not None
+            and entry.result.sql_query == sql_query
+            and entry.result.engine is engine
+            and entry.page_size == page_size
+            and entry.next_page == page
+        )
+        if not reuse:
+            if entry is not None:
+                entry.result.close()
+            entry = _PagerEntry(ResultSet(engine, sql_query, chunk_rows=page_size).open(), page_size)
+            entry.result.skip(page * page_size)
+            entry.next_page = page
+
+        try:
+            data = entry.result.fetch(page_size)
+        except Exception:
+            entry.result.close()
+            raise
+
+        entry.next_page = page + 1
+        entry.last_used = time.time()
+        has_next = not entry.result.exhausted
+
+        if has_next and engine.dialect.name != "sqlite" and RESULT_MAX_OPEN_CURSORS > 0:
+            with self._lock:
+                evicted = []
+                while len(self._entries) >= RESULT_MAX_OPEN_CURSORS:
+                    oldest = min(self._entries, key=lambda entry_key: self._entries[entry_key].last_used)
+                    evicted.append(self._entries.pop(oldest))
+                self._entries[key] = entry
+            for old_entry in evicted:
+                old_entry.result.close()
+            if evicted:
+                logging.info(f"[RESULT_SET] {len(evicted)} cursor(es) fechado(s): limite de {RESULT_MAX_OPEN_CURSORS} abertos")
+            self._ensure_sweeper()
+        else:
+            entry.result.close()
+
+        return {
+            "data": data,
+            "page": page,
+            "page_size": page_size,
+            "first_row": page * page_size,
+            "has_next": has_next
+        }
+
+    def close(self, key: str):
+        """Fecha o cursor de uma chave (ex: nova query na sessão)"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry.result.close()
+
+    def _close_idle(self):
+        """Fecha cursores sem uso há mais de RESULT_CURSOR_IDLE_TTL segundos"""
+        cutoff = time.time() - RESULT_CURSOR_IDLE_TTL
+        with self._lock:
+            idle = [key for key, entry in self._entries.items() if entry.last_used < cutoff]
+            entries = [self._entries.pop(key) for key in idle]
+        for entry in entries:
+            entry.result.close()
+        if entries:
+            logging.info(f"[RESULT_SET] {len(entries)} cursores ociosos fechados")
+
+    def _ensure_sweeper(self):
+        """Inicia a thread que fecha cursores ociosos (enquanto houver cursores abertos)"""
+        with self._lock:
+            if self._sweeper is not None and self._sweeper.is_alive():
+                return
+            self._sweeper = threading.Thread(target=self._sweep, name="result-pager-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def _sweep(self):
+        while True:
+            time.sleep(max(1, RESULT_CURSOR_IDLE_TTL / 2))
+            self._close_idle()
+            with self._lock:
+                if not self._entries:
+                    self._sweeper = None
+                    return
+
+# Instância global (singleton)
+_result_pager: Optional[ResultPager] = None
+
+def get_result_pager() -> ResultPager:
+    """Retorna o paginador de resultados (singleton)"""
+    global _result_pager
+    if _result_pager is None:
+        _result_pager = ResultPager()
+    return _result_pager
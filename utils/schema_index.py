@@ -0,0 +1,460 @@
+"""
+Índice local de relevância do schema (tabelas e colunas) para poda de prompts
+Usa BM25 sobre nomes, comentários e valores de exemplo + n-gramas de caracteres, sem rede
+"""
+import math
+import re
+import time
+import logging
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+# Palavras muito comuns em perguntas que não ajudam a escolher tabelas
+_STOPWORDS = {
+    "a", "o", "as", "os", "de", "da", "do", "das", "dos", "e", "em", "no", "na", "nos", "nas",
+    "um", "uma", "uns", "umas", "por", "para", "pra", "com", "sem", "que", "qual", "quais",
+    "quanto", "quanta", "quantos", "quantas", "como", "onde", "quando", "me", "se", "ao", "aos",
+    "mostre", "mostrar", "liste", "listar", "traga", "retorne", "exiba", "qualquer", "todos", "todas",
+    "the", "of", "and", "in", "for", "to", "by", "with", "what", "which", "how", "many", "show", "list"
+}
+
+_TOKEN_SPLIT = re.compile(r"[^a-z0-9]+")
+_CAMEL_CASE = re.compile(r"([a-z0-9])([A-Z])")
+
+# Peso dos campos: repetir tokens equivale a aumentar o tf do campo
+_NAME_WEIGHT = 3
+_COMMENT_WEIGHT = 2
+_EXAMPLE_WEIGHT = 1
+
+
+def _normalize(text: str) -> str:
+    """Remove acentos, separa camelCase e converte para minúsculas"""
+    text = _CAMEL_CASE.sub(r"\1 \2", str(text))
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return text.lower()
+
+
+def tokenize(text: str, ngram_size: int = 3) -> List[str]:
+    """
+    Tokeniza texto em palavras + n-gramas de caracteres
+
+    Os n-gramas permitem casar variações como "venda"/"vendas"/"vendedor"
+    e abreviações comuns em nomes de colunas (ex: "qtd_vend").
+
+    Args:
+        text: Texto de entrada
+        ngram_size: Tamanho dos n-gramas de caracteres
+
+    Returns:
+        Lista de tokens
+    """
+    if not text:
+        return []
+
+    tokens = []
+    for word in _TOKEN_SPLIT.split(_normalize(text)):
+        if not word or word in _STOPWORDS:
+            continue
+        tokens.append(word)
+        if len(word) > ngram_size:
+            padded = f"#{word}#"
+            tokens.extend(f"~{padded[i:i + ngram_size]}" for i in range(len(padded) - ngram_size + 1))
+    return tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimativa barata de tokens (~4 caracteres por token)
+
+    Args:
+        text: Texto
+
+    Returns:
+        Número estimado de tokens
+    """
+    return max(0, len(text or "") // 4)
+
+
+class BM25Index:
+    """
+    Índice BM25 em memória sobre documentos já tokenizados
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._doc_tf: Dict[str, Counter] = {}
+        self._doc_len: Dict[str, int] = {}
+        self._df: Counter = Counter()
+        self._avg_len = 0.0
+
+    def build(self, documents: Dict[str, List[str]]):
+        """
+        Constrói o índice
+
+        Args:
+            documents: {doc_id: lista de tokens}
+        """
+        self._doc_tf = {doc_id: Counter(tokens) for doc_id, tokens in documents.items()}
+        self._doc_len = {doc_id: len(tokens) for doc_id, tokens in documents.items()}
+        self._df = Counter()
+        for tf in self._doc_tf.values():
+            self._df.update(tf.keys())
+        self._avg_len = (sum(self._doc_len.values()) / len(self._doc_len)) if self._doc_len else 0.0
+
+    def update(self, doc_id: str, tokens: List[str]):
+        """
+        Substitui (ou adiciona) um documento sem reconstruir o índice
+
+        Args:
+            doc_id: ID do documento
+            tokens: Nova lista de tokens
+        """
+        old_tf = self._doc_tf.get(doc_id)
+        if old_tf is not None:
+            self._df.subtract(old_tf.keys())
+        tf = Counter(tokens)
+        self._doc_tf[doc_id] = tf
+        self._doc_len[doc_id] = len(tokens)
+        self._df.update(tf.keys())
+        self._avg_len = (sum(self._doc_len.values()) / len(self._doc_len)) if self._doc_len else 0.0
+
+    def score(self, query_tokens: List[str]) -> Dict[str, float]:
+        """
+        Calcula score BM25 de cada documento para a consulta
+
+        Args:
+            query_tokens: Tokens da consulta
+
+        Returns:
+            {doc_id: score}
+        """
+        total_docs = len(self._doc_tf)
+        if not total_docs or not query_tokens:
+            return {doc_id: 0.0 for doc_id in self._doc_tf}
+
+        query_tf = Counter(query_tokens)
+        scores = {}
+        for doc_id, tf in self._doc_tf.items():
+            doc_len = self._doc_len[doc_id] or 1
+            norm = self.k1 * (1 - self.b + self.b * doc_len / (self._avg_len or 1))
+            score = 0.0
+            for token, q_count in query_tf.items():
+                freq = tf.get(token)
+                if not freq:
+                    continue
+                df = self._df[token]
+                idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+                score += q_count * idf * (freq * (self.k1 + 1)) / (freq + norm)
+            scores[doc_id] = score
+        return scores
+
+
+def _column_tokens(col_info: Dict[str, Any]) -> List[str]:
+    """Tokens de uma coluna ponderados por campo"""
+    tokens = tokenize(col_info.get("column", "")) * _NAME_WEIGHT
+    tokens += tokenize(col_info.get("comment", "")) * _COMMENT_WEIGHT
+    examples = col_info.get("examples", "")
+    if examples and not str(examples).startswith("("):
+        tokens += tokenize(examples) * _EXAMPLE_WEIGHT
+    return tokens
+
+
+class SchemaIndex:
+    """
+    Índice de relevância de tabelas de um banco
+
+    Construído a partir do catálogo (nomes, tipos e comentários) e enriquecido
+    com valores de exemplo à medida que as tabelas são amostradas.
+    """
+
+    def __init__(self, catalog: Dict[str, Dict[str, Any]]):
+        """
+        Args:
+            catalog: {tabela: {"comment": str, "columns": [{"column", "type", "comment", "examples"}]}}
+        """
+        self.catalog = catalog
+        self.created_at = time.time()
+        self._bm25 = BM25Index()
+        self._lock = threading.Lock()
+        self._enriched = set()
+        self._build()
+
+    def _table_tokens(self, table_name: str) -> List[str]:
+        entry = self.catalog.get(table_name, {})
+        tokens = tokenize(table_name) * _NAME_WEIGHT
+        tokens += tokenize(entry.get("comment", "")) * _COMMENT_WEIGHT
+        for col_info in entry.get("columns", []):
+            tokens += _column_tokens(col_info)
+        return tokens
+
+    def _build(self):
+        self._bm25.build({table: self._table_tokens(table) for table in self.catalog})
+
+    def update_tables(self, columns_data: Dict[str, List[Dict[str, Any]]]):
+        """
+        Enriquece o índice com exemplos/estatísticas já extraídos das tabelas
+
+        Cada tabela é enriquecida uma única vez por índice (até o TTL ou
+        clear_schema_indexes) e apenas os documentos dessas tabelas são
+        atualizados no BM25.
+
+        Args:
+            columns_data: {tabela: colunas no formato do processing_node}
+        """
+        with self._lock:
+            for table_name, columns_info in columns_data.items():
+                if not columns_info or table_name in self._enriched:
+                    continue
+                entry = self.catalog.setdefault(table_name, {"comment": "", "columns": []})
+                comments = {c["column"]: c.get("comment", "") for c in entry.get("columns", [])}
+                entry["columns"] = [
+                    {**col_info, "comment": col_info.get("comment") or comments.get(col_info["column"], "")}
+                    for col_info in columns_info
+                ]
+                self._bm25.update(table_name, self._table_tokens(table_name))
+                self._enriched.add(table_name)
+
+    def rank_tables(self, question: str) -> List[Tuple[str, float]]:
+        """
+        Ordena todas as tabelas por relevância para a pergunta
+
+        Args:
+            question: Pergunta do usuário
+
+        Returns:
+            Lista de (tabela, score) em ordem decrescente; empates mantêm ordem alfabética
+        """
+        with self._lock:
+            scores = self._bm25.score(tokenize(question))
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def select_tables(self, question: str, top_k: int) -> List[str]:
+        """
+        Seleciona as top-k tabelas mais relevantes
+
+        Args:
+            question: Pergunta do usuário
+            top_k: Número máximo de tabelas
+
+        Returns:
+            Lista de nomes de tabelas
+        """
+        return [table for table, _ in self.rank_tables(question)[:top_k]]
+
+    def get_columns(self, table_name: str) -> List[Dict[str, Any]]:
+        """Retorna colunas conhecidas de uma tabela"""
+        return list(self.catalog.get(table_name, {}).get("columns", []))
+
+
+def select_relevant_columns(question: str, columns_info: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+    """
+    Seleciona as colunas mais relevantes de uma tabela, preservando a ordem original
+
+    Args:
+        question: Pergunta do usuário
+        columns_info: Colunas da tabela
+        top_k: Número máximo de colunas
+
+    Returns:
+        Lista de colunas selecionadas
+    """
+    if len(columns_info) <= top_k:
+        return columns_info
+
+    bm25 = BM25Index()
+    bm25.build({str(i): _column_tokens(col_info) for i, col_info in enumerate(columns_info)})
+    scores = bm25.score(tokenize(question))
+
+    # Empates (inclusive score zero) mantêm as primeiras colunas da tabela
+    ranked = sorted(range(len(columns_info)), key=lambda i: (-scores[str(i)], i))
+    keep = sorted(ranked[:top_k])
+    return [columns_info[i] for i in keep]
+
+
+def render_schema_for_estimate(columns_data: Dict[str, List[Dict[str, Any]]]) -> str:
+    """
+    Renderiza colunas no mesmo formato de prepare_processing_context para estimar tokens
+
+    Args:
+        columns_data: {tabela: [colunas]}
+
+    Returns:
+        Texto equivalente ao bloco de colunas do prompt
+    """
+    lines = []
+    for table_name, table_columns in columns_data.items():
+        lines.append(f"\n**Tabela: {table_name}**")
+        for col_info in table_columns:
+            line = f"- {col_info['column']} ({col_info.get('type', '')})"
+            if col_info.get("examples"):
+                line += f": {col_info['examples']}"
+            if col_info.get("stats"):
+                line += f"{col_info['stats']}"
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def prune_columns_data(question: str, columns_data: Dict[str, List[Dict[str, Any]]], top_k_columns: int,
+                       schema_index: Optional[SchemaIndex] = None) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, Any]]:
+    """
+    Poda as colunas de cada tabela e calcula a economia estimada de tokens
+
+    Args:
+        question: Pergunta do usuário
+        columns_data: {tabela: [colunas]} já extraídos
+        top_k_columns: Máximo de colunas por tabela
+        schema_index: Índice do banco (usado para estimar o schema completo)
+
+    Returns:
+        Tupla (columns_data podado, relatório serializável)
+    """
+    pruned = {
+        table_name: select_relevant_columns(question, table_columns, top_k_columns)
+        for table_name, table_columns in columns_data.items()
+    }
+
+    # Base de comparação: todas as tabelas do catálogo (o que iria ao prompt sem poda)
+    if schema_index is not None:
+        full_schema = {table: schema_index.get_columns(table) for table in schema_index.catalog}
+        full_schema.update(columns_data)
+    else:
+        full_schema = columns_data
+
+    tokens_full = estimate_tokens(render_schema_for_estimate(full_schema))
+    tokens_pruned = estimate_tokens(render_schema_for_estimate(pruned))
+
+    report = {
+        "tables_total": len(full_schema),
+        "tables_selected": len(pruned),
+        "columns_total": sum(len(cols) for cols in full_schema.values()),
+        "columns_selected": sum(len(cols) for cols in pruned.values()),
+        "tokens_full_estimate": tokens_full,
+        "tokens_pruned_estimate": tokens_pruned,
+        "tokens_saved_estimate": max(0, tokens_full - tokens_pruned)
+    }
+    return pruned, report
+
+
+def load_schema_catalog(engine) -> Dict[str, Dict[str, Any]]:
+    """
+    Lê o catálogo (tabelas, colunas, tipos e comentários) sem amostrar dados
+
+    Args:
+        engine: Engine SQLAlchemy
+
+    Returns:
+        Catálogo no formato esperado por SchemaIndex
+    """
+    import sqlalchemy as sa
+
+    catalog: Dict[str, Dict[str, Any]] = {}
+    dialect = str(engine.dialect.name).lower()
+
+    with engine.connect() as conn:
+        if dialect == "postgresql":
+            tables_result = conn.execute(sa.text("""
+                SELECT t.table_name, obj_description(c.oid, 'pg_class')
+                FROM information_schema.tables t
+                LEFT JOIN pg_catalog.pg_class c
+                    ON c.relname = t.table_name
+                    AND c.relnamespace = 'public'::regnamespace
+                WHERE t.table_schema = 'public'
+                ORDER BY t.table_name
+            """))
+            for table_name, comment in tables_result.fetchall():
+                catalog[table_name] = {"comment": comment or "", "columns": []}
+
+            columns_result = conn.execute(sa.text("""
+                SELECT cols.table_name, cols.column_name, cols.data_type,
+                       col_description(c.oid, cols.ordinal_position::int)
+                FROM information_schema.columns cols
+                LEFT JOIN pg_catalog.pg_class c
+                    ON c.relname = cols.table_name
+                    AND c.relnamespace = 'public'::regnamespace
+                WHERE cols.table_schema = 'public'
+                ORDER BY cols.table_name, cols.ordinal_position
+            """))
+            for table_name, column_name, data_type, comment in columns_result.fetchall():
+                catalog.setdefault(table_name, {"comment": "", "columns": []})["columns"].append({
+                    "column": column_name,
+                    "type": data_type,
+                    "comment": comment or "",
+                    "examples": "",
+                    "stats": ""
+                })
+        else:
+            tables_result = conn.execute(sa.text(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%' ORDER BY name"
+            ))
+            for (table_name,) in tables_result.fetchall():
+                pragma_result = conn.execute(sa.text(f'PRAGMA table_info("{table_name}")'))
+                catalog[table_name] = {
+                    "comment": "",
+                    "columns": [
+                        {"column": row[1], "type": row[2], "comment": "", "examples": "", "stats": ""}
+                        for row in pragma_result.fetchall()
+                    ]
+                }
+
+    return catalog
+
+
+# Cache de índices por URL de conexão (compartilhado entre sessões do mesmo banco)
+_SCHEMA_INDEXES: Dict[str, SchemaIndex] = {}
+_SCHEMA_INDEXES_LOCK = threading.Lock()
+
+
+def _cache_key(engine) -> str:
+    """Chave do cache: URL de conexão sem senha"""
+    return engine.url.render_as_string(hide_password=True) if hasattr(engine.url, "render_as_string") else str(engine.url)
+
+
+def get_schema_index(engine, ttl_seconds: Optional[int] = None) -> SchemaIndex:
+    """
+    Retorna índice do schema do banco, reconstruindo quando expirado
+
+    Args:
+        engine: Engine SQLAlchemy
+        ttl_seconds: Validade do índice (padrão: SCHEMA_INDEX_TTL)
+
+    Returns:
+        SchemaIndex do banco
+    """
+    from utils.config import SCHEMA_INDEX_TTL
+
+    ttl = SCHEMA_INDEX_TTL if ttl_seconds is None else ttl_seconds
+    cache_key = _cache_key(engine)
+
+    with _SCHEMA_INDEXES_LOCK:
+        schema_index = _SCHEMA_INDEXES.get(cache_key)
+        if schema_index and time.time() - schema_index.created_at < ttl:
+            return schema_index
+
+    start_time = time.time()
+    schema_index = SchemaIndex(load_schema_catalog(engine))
+    logging.info(
+        f"[SCHEMA_INDEX] Índice construído para {cache_key}: {len(schema_index.catalog)} tabelas "
+        f"em {(time.time() - start_time) * 1000:.0f}ms"
+    )
+
+    with _SCHEMA_INDEXES_LOCK:
+        _SCHEMA_INDEXES[cache_key] = schema_index
+    return schema_index
+
+
+def clear_schema_indexes(engine=None):
+    """
+    Descarta índices em cache (ex: após criar tabelas ou reconectar)
+
+    Args:
+        engine: Engine do banco alterado (None = todos os bancos)
+    """
+    with _SCHEMA_INDEXES_LOCK:
+        if engine is None:
+            _SCHEMA_INDEXES.clear()
+        else:
+            _SCHEMA_INDEXES.pop(_cache_key(engine), None)
@@ -0,0 +1,292 @@
+"""
+Afinidade de sessão para workers Celery
+
+Cada worker interativo ("slot") consome uma fila própria (ex: interactive.w0)
+além da fila compartilhada. As tasks de uma sessão são roteadas por hash
+consistente do session_id para o mesmo slot, mantendo o SQLAgentManager
+aquecido no registry do worker. Slots sinalizam que estão vivos via
+heartbeat no Redis; se um worker cai, o anel é recalculado só com os slots
+vivos (apenas as sessões daquele slot mudam de destino) e, sem nenhum slot
+vivo, as tasks vão para a fila compartilhada. Tasks já enfileiradas na fila
+de um slot que morreu são movidas para a fila compartilhada (drain).
+"""
+import bisect
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from utils.config import (
+    CELERY_QUEUE_INTERACTIVE,
+    CELERY_AFFINITY_SLOTS,
+    CELERY_AFFINITY_HEARTBEAT_TTL
+)
+from utils.redis_client import get_redis_client
+
+AFFINITY_KEY_PREFIX = "agentgraph:affinity"
+REGISTRY_METRICS_KEY = f"{AFFINITY_KEY_PREFIX}:registry_metrics"
+
+# Pontos virtuais por slot no anel (distribuição mais uniforme)
+_VIRTUAL_NODES = 160
+
+# Heartbeat do slot deste processo (apenas em workers com afinidade)
+_heartbeat_thread: Optional[threading.Thread] = None
+_heartbeat_stop = threading.Event()
+
+# Sub-filas de prioridade do broker (mesmos priority_steps e sep de tasks.py)
+_BROKER_PRIORITY_STEPS = range(10)
+_BROKER_QUEUE_SEP = ":"
+
+# Última verificação de filas de slots mortos neste processo
+_last_drain_check = 0.0
+
+# Move as mensagens de cada sub-fila de origem para a sub-fila de destino de mesma
+# prioridade. A mensagem segue como texto opaco (decodificar e recodificar com cjson
+# transformaria listas vazias em {}); só exchange/routing_key de delivery_info são
+# substituídos no texto, para que um restore do kombu (visibility timeout) devolva a
+# mensagem à fila compartilhada e não à fila do slot morto
+_DRAIN_SCRIPT = """
+local function pattern(value)
+    return (value:gsub('[%^%$%(%)%%%.%[%]%*%+%-%?]', '%%%0'))
+end
+local source = pattern(ARGV[2])
+local target = ARGV[1]:gsub('%%', '%%%%')
+local moved = 0
+for i = 1, #KEYS, 2 do
+    while true do
+        local raw = redis.call('RPOP', KEYS[i])
+        if not raw then break end
+        raw = raw:gsub('"routing_key":%s*"' .. source .. '"', '"routing_key": "' .. target .. '"')
+        raw = raw:gsub('"exchange":%s*"' .. source .. '"', '"exchange": "' .. target .. '"')
+        redis.call('LPUSH', KEYS[i + 1], raw)
+        moved = moved + 1
+    end
+end
+return moved
+"""
+
+def _hash(value: str) -> int:
+    """Hash estável (independe de PYTHONHASHSEED)"""
+    return int(hashlib.md5(value.encode("utf-8")).hexdigest()[:16], 16)
+
+def get_slot_queue(slot: int) -> str:
+    """
+    Retorna o nome da fila dedicada de um slot
+
+    Args:
+        slot: Índice do slot
+
+    Returns:
+        Nome da fila (ex: interactive.w0)
+    """
+    return f"{CELERY_QUEUE_INTERACTIVE}.w{slot}"
+
+def _broker_key(queue: str, priority: int) -> str:
+    """Chave Redis da sub-fila de prioridade (mesma convenção do transporte Redis do kombu)"""
+    return f"{queue}{_BROKER_QUEUE_SEP}{priority}" if priority else queue
+
+def drain_slot_queue(slot: int) -> int:
+    """
+    Move as tasks pendentes da fila de um slot para a fila compartilhada
+
+    Args:
+        slot: Índice do slot
+
+    Returns:
+        Número de tasks movidas
+    """
+    keys = []
+    for priority in _BROKER_PRIORITY_STEPS:
+        keys.append(_broker_key(get_slot_queue(slot), priority))
+        keys.append(_broker_key(CELERY_QUEUE_INTERACTIVE, priority))
+
+    try:
+        moved = int(get_redis_client(0).eval(
+            _DRAIN_SCRIPT, len(keys), *keys, CELERY_QUEUE_INTERACTIVE, get_slot_queue(slot)
+        ) or 0)
+    except Exception as e:
+        logging.warning(f"[AFFINITY] Erro ao drenar fila do slot {slot}: {e}")
+        return 0
+
+    if moved:
+        logging.warning(f"[AFFINITY] {moved} tasks movidas de {get_slot_queue(slot)} para {CELERY_QUEUE_INTERACTIVE}")
+    return moved
+
+def drain_dead_slots(live_slots: List[int]) -> int:
+    """
+    Drena as filas dos slots sem heartbeat (worker caiu sem shutdown limpo)
+
+    Verificado no máximo uma vez a cada CELERY_AFFINITY_HEARTBEAT_TTL / 3
+    segundos por processo.
+
+    Args:
+        live_slots: Slots com heartbeat ativo
+
+    Returns:
+        Número de tasks movidas
+    """
+    global _last_drain_check
+
+    now = time.monotonic()
+    if now - _last_drain_check < max(1, CELERY_AFFINITY_HEARTBEAT_TTL // 3):
+        return 0
+    _last_drain_check = now
+
+    return sum(drain_slot_queue(slot) for slot in range(CELERY_AFFINITY_SLOTS) if slot not in live_slots)
+
+class ConsistentHashRing:
+    """
+    Anel de hash consistente com nós virtuais
+    """
+
+    def __init__(self, nodes: List[int], virtual_nodes: int = _VIRTUAL_NODES):
+        self._ring: List[int] = []
+        self._owners: Dict[int, int] = {}
+
+        for node in nodes:
+            for replica in range(virtual_nodes):
+                point = _hash(f"slot-{node}#{replica}")
+                self._owners[point] = node
+                bisect.insort(self._ring, point)
+
+    def get_node(self, key: str) -> Optional[int]:
+        """
+        Retorna o nó responsável pela chave
+
+        Args:
+            key: Chave a ser roteada (session_id)
+
+        Returns:
+            Nó ou None se o anel estiver vazio
+        """
+        if not self._ring:
+            return None
+        index = bisect.bisect(self._ring, _hash(key)) % len(self._ring)
+        return self._owners[self._ring[index]]
+
+def get_live_slots() -> List[int]:
+    """
+    Retorna os slots com heartbeat ativo no Redis
+
+    Returns:
+        Lista de índices de slots vivos (vazia se Redis indisponível)
+    """
+    try:
+        keys = [f"{AFFINITY_KEY_PREFIX}:slot:{slot}" for slot in range(CELERY_AFFINITY_SLOTS)]
+        if not keys:
+            return []
+        values = get_redis_client(2).mget(keys)
+        return [slot for slot, value in enumerate(values) if value]
+    except Exception as e:
+        logging.warning(f"[AFFINITY] Erro ao consultar slots vivos: {e}")
+        return []
+
+def get_affinity_queue(session_id: str) -> str:
+    """
+    Retorna a fila de afinidade da sessão (ou a fila compartilhada como fallback)
+
+    Args:
+        session_id: ID da sessão
+
+    Returns:
+        Nome da fila
+    """
+    live_slots = get_live_slots()
+    drain_dead_slots(live_slots)
+    slot = ConsistentHashRing(live_slots).get_node(session_id)
+
+    if slot is None:
+        logging.info(f"[AFFINITY] Nenhum slot vivo, usando fila compartilhada {CELERY_QUEUE_INTERACTIVE}")
+        return CELERY_QUEUE_INTERACTIVE
+
+    queue = get_slot_queue(slot)
+    logging.info(f"[AFFINITY] Sessão {session_id} → {queue} ({len(live_slots)} slots vivos)")
+    return queue
+
+def start_affinity_heartbeat(slot: int, hostname: str = "") -> None:
+    """
+    Inicia thread de heartbeat que mantém o slot vivo no Redis
+
+    Args:
+        slot: Índice do slot deste worker
+        hostname: Nome do worker (informativo)
+    """
+    global _heartbeat_thread
+
+    if _heartbeat_thread and _heartbeat_thread.is_alive():
+        return
+
+    key = f"{AFFINITY_KEY_PREFIX}:slot:{slot}"
+    interval = max(1, CELERY_AFFINITY_HEARTBEAT_TTL // 3)
+    _heartbeat_stop.clear()
+
+    def _beat():
+        while not _heartbeat_stop.is_set():
+            try:
+                get_redis_client(2).setex(key, CELERY_AFFINITY_HEARTBEAT_TTL, hostname or "alive")
+            except Exception as e:
+                logging.warning(f"[AFFINITY] Falha no heartbeat do slot {slot}: {e}")
+            _heartbeat_stop.wait(interval)
+
+    _heartbeat_thread = threading.Thread(target=_beat, daemon=True, name=f"affinity-heartbeat-{slot}")
+    _heartbeat_thread.start()
+    logging.info(f"[AFFINITY] Heartbeat iniciado para slot {slot} ({get_slot_queue(slot)})")
+
+def stop_affinity_heartbeat(slot: int) -> None:
+    """
+    Para o heartbeat, remove o slot do anel e drena sua fila
+
+    Args:
+        slot: Índice do slot deste worker
+    """
+    _heartbeat_stop.set()
+    try:
+        get_redis_client(2).delete(f"{AFFINITY_KEY_PREFIX}:slot:{slot}")
+        logging.info(f"[AFFINITY] Slot {slot} removido do anel")
+    except Exception as e:
+        logging.warning(f"[AFFINITY] Erro ao remover slot {slot}: {e}")
+
+    # Novas tasks já não vêm para este slot; as pendentes vão para a fila compartilhada
+    drain_slot_queue(slot)
+
+def record_registry_metrics(outcomes: Dict[str, str], slot: Optional[str] = None) -> None:
+    """
+    Acumula hits/misses dos registries do worker no Redis
+
+    Args:
+        outcomes: Resultado por registry (ex: {"agent": "hit", "db": "miss"})
+        slot: Slot do worker (para métricas por slot)
+    """
+    try:
+        pipe = get_redis_client(2).pipeline()
+        for registry, outcome in outcomes.items():
+            pipe.hincrby(REGISTRY_METRICS_KEY, f"{registry}_{outcome}", 1)
+            if slot is not None:
+                pipe.hincrby(REGISTRY_METRICS_KEY, f"slot{slot}:{registry}_{outcome}", 1)
+        pipe.execute()
+    except Exception as e:
+        logging.debug(f"[AFFINITY] Métricas de registry não registradas: {e}")
+
+def get_registry_metrics() -> Dict[str, float]:
+    """
+    Retorna métricas agregadas dos registries (todos os workers)
+
+    Returns:
+        Contadores de hits/misses e hit rate por registry
+    """
+    try:
+        raw = get_redis_client(2).hgetall(REGISTRY_METRICS_KEY) or {}
+        metrics: Dict[str, float] = {field: int(value) for field, value in raw.items()}
+
+        for registry in ("agent", "db"):
+            hits = metrics.get(f"{registry}_hit", 0)
+            misses = metrics.get(f"{registry}_miss", 0)
+            total = hits + misses
+            metrics[f"{registry}_hit_rate"] = round(hits / total, 4) if total else 0.0
+
+        return metrics
+
+    except Exception as e:
+        logging.error(f"[AFFINITY] Erro ao obter métricas de registry: {e}")
+        return {}
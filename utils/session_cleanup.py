@@ -2,12 +2,15 @@
 Sistema de limpeza automática para sessões temporárias
 Jobs periódicos para limpar sessões expiradas, diretórios órfãos e cache antigo
 """
+import os
+import shutil
 import logging
 import time
 import threading
 from typing import Dict, Any
 from datetime import datetime, timedelta
 
+from utils.config import SESSION_DISK_RECONCILE_INTERVAL
 from utils.session_manager import get_session_manager
 from utils.session_paths import get_session_paths
 
@@ -21,8 +24,13 @@ class SessionCleanupService:
         self.session_manager = get_session_manager()
         self.session_paths = get_session_paths()
         self.cleanup_interval = 300  # 5 minutos
+        self.orphan_scan_interval = 6 * 60 * 60  # Reconciliação de diretórios órfãos (6 horas)
+        self.last_orphan_scan = 0.0
+        self.disk_reconcile_interval = SESSION_DISK_RECONCILE_INTERVAL  # Correção dos contadores de disco
+        self.last_disk_reconcile = 0.0
         self.running = False
         self.cleanup_thread = None
+        self.expiry_thread = None
         
     def start_cleanup_service(self):
         """Inicia o serviço de limpeza em background"""
@@ -33,6 +41,11 @@ class SessionCleanupService:
         self.running = True
         self.cleanup_thread = threading.Thread(target=self._cleanup_loop, daemon=True)
         self.cleanup_thread.start()
+
+        # Limpeza reativa: sessões são liberadas assim que o Redis expira a chave
+        if self.session_manager.enable_expiry_notifications():
+            self.expiry_thread = threading.Thread(target=self._expiry_listener_loop, daemon=True)
+            self.expiry_thread.start()
         
         logging.info(f"[SESSION_CLEANUP] Serviço iniciado (intervalo: {self.cleanup_interval}s)")
     
@@ -41,6 +54,8 @@ class SessionCleanupService:
         self.running = False
         if self.cleanup_thread:
             self.cleanup_thread.join(timeout=5)
+        if self.expiry_thread:
+            self.expiry_thread.join(timeout=5)
         
         logging.info("[SESSION_CLEANUP] Serviço parado")
     
@@ -54,6 +69,51 @@ class SessionCleanupService:
                 logging.error(f"[SESSION_CLEANUP] Erro no loop de limpeza: {e}")
                 time.sleep(60)  # Aguarda 1 minuto em caso de erro
     
+    def _expiry_listener_loop(self):
+        """Escuta eventos de expiração do Redis e libera recursos das sessões expiradas"""
+        channel = self.session_manager.get_expiry_channel()
+
+        while self.running:
+            pubsub = None
+            try:
+                pubsub = self.session_manager.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(channel)
+                logging.info(f"[SESSION_CLEANUP] Escutando expirações em {channel}")
+
+                while self.running:
+                    message = pubsub.get_message(timeout=1.0)
+                    if not message:
+                        continue
+
+                    key = message.get("data") or ""
+                    # Apenas chaves de sessão (session:<id>), ignorando outros tipos
+                    if not key.startswith("session:") or key.count(":") != 1:
+                        continue
+
+                    session_id = key.split(":", 1)[1]
+                    self._on_session_expired(session_id)
+
+            except Exception as e:
+                logging.error(f"[SESSION_CLEANUP] Erro no listener de expiração: {e}")
+                time.sleep(5)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    def _on_session_expired(self, session_id: str):
+        """Libera diretório, índice e cache do Celery de uma sessão expirada"""
+        if self.session_manager.handle_expired_session(session_id):
+            logging.info(f"[SESSION_CLEANUP] Sessão expirada liberada via notificação: {session_id}")
+
+        try:
+            from tasks import cleanup_session_cache
+            cleanup_session_cache(session_id)
+        except Exception:
+            pass  # Não é crítico se falhar
+
     def run_cleanup(self) -> Dict[str, int]:
         """
         Executa limpeza completa
@@ -66,6 +126,7 @@ class SessionCleanupService:
             "sessions_removed": 0,
             "directories_removed": 0,
             "cache_cleared": 0,
+            "disk_usage_corrected": 0,
             "errors": 0
         }
         
@@ -80,10 +141,12 @@ class SessionCleanupService:
                 logging.error(f"[SESSION_CLEANUP] Erro ao limpar sessões: {e}")
                 stats["errors"] += 1
             
-            # 2. Limpar diretórios órfãos
+            # 2. Limpar diretórios órfãos (reconciliação eventual, não a cada ciclo)
             try:
-                removed_dirs = self._cleanup_orphaned_directories()
-                stats["directories_removed"] = removed_dirs
+                if time.time() - self.last_orphan_scan >= self.orphan_scan_interval:
+                    removed_dirs = self._cleanup_orphaned_directories()
+                    stats["directories_removed"] = removed_dirs
+                    self.last_orphan_scan = time.time()
             except Exception as e:
                 logging.error(f"[SESSION_CLEANUP] Erro ao limpar diretórios: {e}")
                 stats["errors"] += 1
@@ -96,6 +159,16 @@ class SessionCleanupService:
                 logging.error(f"[SESSION_CLEANUP] Erro ao limpar cache: {e}")
                 stats["errors"] += 1
             
+            # 4. Reconciliar contadores de uso de disco (varredura lenta e rara)
+            try:
+                if time.time() - self.last_disk_reconcile >= self.disk_reconcile_interval:
+                    reconcile_stats = self.session_manager.reconcile_disk_usage()
+                    stats["disk_usage_corrected"] = reconcile_stats.get("sessions_corrected", 0)
+                    self.last_disk_reconcile = time.time()
+            except Exception as e:
+                logging.error(f"[SESSION_CLEANUP] Erro ao reconciliar uso de disco: {e}")
+                stats["errors"] += 1
+            
             execution_time = time.time() - start_time
             
             if any(stats.values()):
@@ -112,12 +185,12 @@ class SessionCleanupService:
         """
         Remove diretórios de sessões que não existem mais no Redis
         
+        Varredura completa do diretório de sessões: cobre diretórios que o
+        índice e as notificações de expiração não alcançam (ex: Redis reiniciado).
+        
         Returns:
             Número de diretórios removidos
         """
-        import os
-        import shutil
-        
         removed_count = 0
         
         try:
@@ -131,13 +204,14 @@ class SessionCleanupService:
                 
                 if os.path.isdir(item_path):
                     # Verifica se sessão ainda existe no Redis
-                    session_data = self.session_manager.get_session(item)
+                    session_exists = self.session_manager.redis_client.exists(f"session:{item}")
                     
-                    if not session_data:
+                    if not session_exists:
                         # Sessão não existe mais, remove diretório
                         try:
                             # Windows: força remoção com retry
                             self._force_remove_directory(item_path)
+                            self.session_manager.release_disk_usage(item)
                             logging.info(f"[SESSION_CLEANUP] Diretório órfão removido: {item}")
                             removed_count += 1
                         except Exception as e:
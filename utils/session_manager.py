@@ -10,14 +10,123 @@ import shutil
 import logging
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
-import redis
 
 from utils.config import (
     REDIS_HOST, 
     REDIS_PORT, 
+    SESSION_MAX_SIZE_MB,
+    SESSIONS_MAX_TOTAL_SIZE_MB,
     is_docker_environment,
     get_environment_info
 )
+from utils.redis_client import get_redis_client, encode_hash_fields, load_json_hash
+
+# TTL das sessões no Redis (24 horas em segundos)
+SESSION_TTL = 24 * 60 * 60
+
+# Campos cuja alteração invalida agentes em cache (incrementa "version")
+SESSION_CONFIG_KEYS = ["selected_model", "top_k", "connection_type", "db_uri", "include_tables_key"]
+
+# Índice de sessões: sorted set com score = last_seen (expiração e contagem sem KEYS)
+SESSIONS_INDEX_KEY = "sessions:index"
+
+# Uso de disco: hash session_id -> bytes e total global (atualizados a cada escrita)
+SESSIONS_DISK_USAGE_KEY = "sessions:disk_usage"
+SESSIONS_DISK_TOTAL_KEY = "sessions:disk_usage:total"
+
+# Reserva atômica de espaço: verifica cota da sessão e cota global antes de incrementar.
+# KEYS: hash de uso, total global
+# ARGV: session_id, bytes, limite_sessao, limite_global
+# Retorno: 1 = reservado, -1 = cota da sessão excedida, -2 = cota global excedida
+_RESERVE_SPACE_SCRIPT = """
+local session_bytes = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+local total_bytes = tonumber(redis.call('GET', KEYS[2]) or '0')
+local delta = tonumber(ARGV[2])
+if session_bytes + delta > tonumber(ARGV[3]) then
+    return -1
+end
+if total_bytes + delta > tonumber(ARGV[4]) then
+    return -2
+end
+redis.call('HINCRBY', KEYS[1], ARGV[1], delta)
+redis.call('INCRBY', KEYS[2], delta)
+return 1
+"""
+
+# Define o uso de uma sessão (ou remove, se ARGV[2] vazio) mantendo o total consistente.
+# KEYS: hash de uso, total global
+# ARGV: session_id, bytes (opcional)
+# Retorno: bytes contabilizados anteriormente
+_SET_USAGE_SCRIPT = """
+local previous = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+local current = 0
+if ARGV[2] and ARGV[2] ~= '' then
+    current = tonumber(ARGV[2])
+    redis.call('HSET', KEYS[1], ARGV[1], current)
+else
+    redis.call('HDEL', KEYS[1], ARGV[1])
+end
+if current ~= previous then
+    redis.call('INCRBY', KEYS[2], current - previous)
+end
+return previous
+"""
+
+def _directory_size_bytes(path: str) -> int:
+    """Soma o tamanho dos arquivos de um diretório (varredura completa, usada só na reconciliação)"""
+    total_size = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            filepath = os.path.join(dirpath, filename)
+            try:
+                total_size += os.path.getsize(filepath)
+            except OSError:
+                pass  # Arquivo removido durante a varredura
+    return total_size
+
+# Atualização parcial atômica da sessão em um único round-trip:
+# só atualiza se a sessão existir, incrementa "version" apenas quando um campo
+# de configuração muda de valor, aplica incrementos, renova o TTL e o índice.
+# KEYS: chave da sessão, índice de sessões
+# ARGV: ttl, n_campos, config_keys (JSON), last_seen, session_id,
+#       campo1, valor1, ..., [campo_incremento, delta]...
+_UPDATE_SESSION_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+local config_keys = {}
+for _, key in ipairs(cjson.decode(ARGV[3])) do
+    config_keys[key] = true
+end
+local n_fields = tonumber(ARGV[2])
+local changed = false
+local fields = {}
+local idx = 6
+for i = 1, n_fields do
+    local field = ARGV[idx]
+    local value = ARGV[idx + 1]
+    if config_keys[field] and redis.call('HGET', KEYS[1], field) ~= value then
+        changed = true
+    end
+    table.insert(fields, field)
+    table.insert(fields, value)
+    idx = idx + 2
+end
+if #fields > 0 then
+    redis.call('HSET', KEYS[1], unpack(fields))
+end
+while idx <= #ARGV do
+    redis.call('HINCRBY', KEYS[1], ARGV[idx], tonumber(ARGV[idx + 1]))
+    idx = idx + 2
+end
+local version = 0
+if changed then
+    version = redis.call('HINCRBY', KEYS[1], 'version', 1)
+end
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[1]))
+redis.call('ZADD', KEYS[2], tonumber(ARGV[4]), ARGV[5])
+return version
+"""
 
 class SessionManager:
     """
@@ -27,9 +136,10 @@ class SessionManager:
     
     def __init__(self):
         self.redis_client = None
-        self.session_ttl = 24 * 60 * 60  # 24 horas em segundos
+        self.session_ttl = SESSION_TTL  # 24 horas em segundos
         self.max_sessions_per_ip = 5  # Limite por IP
-        self.max_session_size_mb = 200  # Limite de espaço por sessão
+        self.max_session_size_mb = SESSION_MAX_SIZE_MB  # Limite de espaço por sessão
+        self.max_total_size_mb = SESSIONS_MAX_TOTAL_SIZE_MB  # Limite de espaço de todas as sessões
         self.sessions_db = 2  # Database Redis específico para sessões
         self._initialize_redis()
         self._setup_session_directories()
@@ -41,17 +151,14 @@ class SessionManager:
 
         for attempt in range(max_retries):
             try:
-                self.redis_client = redis.Redis(
-                    host=REDIS_HOST,
-                    port=REDIS_PORT,
-                    db=self.sessions_db,  # DB separado para sessões
-                    decode_responses=True,
-                    socket_connect_timeout=5,
-                    socket_timeout=5
-                )
+                # Cliente do pool compartilhado (DB separado para sessões)
+                self.redis_client = get_redis_client(self.sessions_db)
 
                 # Testa conexão
                 self.redis_client.ping()
+                self._update_script = self.redis_client.register_script(_UPDATE_SESSION_SCRIPT)
+                self._reserve_space_script = self.redis_client.register_script(_RESERVE_SPACE_SCRIPT)
+                self._set_usage_script = self.redis_client.register_script(_SET_USAGE_SCRIPT)
 
                 env_info = get_environment_info()
                 logging.info(f"[SESSION_MANAGER] Redis conectado para sessões em {env_info['environment']}: {REDIS_HOST}:{REDIS_PORT}/db{self.sessions_db}")
@@ -130,23 +237,22 @@ class SessionManager:
                 "session_size_mb": 0.0
             }
             
-            # Salva no Redis com TTL
+            # Salva no Redis como hash com TTL e registra IP (um round-trip)
             session_key = f"session:{session_id}"
-            self.redis_client.setex(
-                session_key, 
-                self.session_ttl, 
-                json.dumps(session_data, default=str)
-            )
+            ip_key = f"ip_sessions:{client_ip}"
+
+            pipe = self.redis_client.pipeline()
+            pipe.hset(session_key, mapping=encode_hash_fields(session_data))
+            pipe.expire(session_key, self.session_ttl)
+            pipe.zadd(SESSIONS_INDEX_KEY, {session_id: session_data["last_seen"]})
+            pipe.sadd(ip_key, session_id)
+            pipe.expire(ip_key, self.session_ttl)
+            pipe.execute()
             
             # Cria diretório da sessão
             session_dir = self._get_session_directory(session_id)
             os.makedirs(session_dir, exist_ok=True)
             
-            # Registra IP para controle de limite
-            ip_key = f"ip_sessions:{client_ip}"
-            self.redis_client.sadd(ip_key, session_id)
-            self.redis_client.expire(ip_key, self.session_ttl)
-            
             logging.info(f"[SESSION_MANAGER] Nova sessão criada: {session_id} (IP: {client_ip})")
             return session_id
             
@@ -169,51 +275,61 @@ class SessionManager:
                 return None
                 
             session_key = f"session:{session_id}"
-            session_data = self.redis_client.get(session_key)
+            session_data = load_json_hash(self.redis_client, session_key)
             
             if not session_data:
                 logging.warning(f"[SESSION_MANAGER] Sessão não encontrada ou expirada: {session_id}")
                 return None
             
-            return json.loads(session_data)
+            return session_data
             
         except Exception as e:
             logging.error(f"[SESSION_MANAGER] Erro ao recuperar sessão {session_id}: {e}")
             return None
     
-    def update_session(self, session_id: str, updates: Dict[str, Any]) -> bool:
+    def update_session(self, session_id: str, updates: Dict[str, Any], increments: Optional[Dict[str, int]] = None) -> bool:
         """
         Atualiza dados da sessão e renova TTL
         
+        Atualização parcial (HSET apenas dos campos alterados) em um único
+        round-trip; a versão só é incrementada quando um campo de configuração
+        realmente muda de valor.
+        
         Args:
             session_id: ID da sessão
             updates: Dados para atualizar
+            increments: Contadores a incrementar (ex: {"total_queries": 1})
             
         Returns:
             True se atualizou com sucesso
         """
         try:
-            session_data = self.get_session(session_id)
-            if not session_data:
+            if not session_id:
                 return False
-            
-            # Atualiza dados
-            session_data.update(updates)
-            session_data["last_seen"] = time.time()
-            
-            # Incrementa versão se houve mudança significativa
-            config_keys = ["selected_model", "top_k", "connection_type", "db_uri", "include_tables_key"]
-            if any(key in updates for key in config_keys):
-                session_data["version"] = session_data.get("version", 1) + 1
-                logging.info(f"[SESSION_MANAGER] Configuração alterada, versão incrementada para {session_data['version']}")
-            
-            # Salva com TTL renovado
+
+            now = time.time()
+            fields = encode_hash_fields({**updates, "last_seen": now})
+            args = [self.session_ttl, len(fields), json.dumps(SESSION_CONFIG_KEYS), now, session_id]
+            for field, value in fields.items():
+                args.extend([field, value])
+            for field, delta in (increments or {}).items():
+                args.extend([field, int(delta)])
+
             session_key = f"session:{session_id}"
-            self.redis_client.setex(
-                session_key, 
-                self.session_ttl, 
-                json.dumps(session_data, default=str)
-            )
+            try:
+                version = self._update_script(keys=[session_key, SESSIONS_INDEX_KEY], args=args)
+            except Exception as e:
+                if "WRONGTYPE" not in str(e):
+                    raise
+                # Sessão no formato antigo: migra para hash e tenta novamente
+                load_json_hash(self.redis_client, session_key, ttl=self.session_ttl)
+                version = self._update_script(keys=[session_key, SESSIONS_INDEX_KEY], args=args)
+
+            if version == -1:
+                return False
+
+            if version:
+                logging.info(f"[SESSION_MANAGER] Configuração alterada, versão incrementada para {version}")
             
             return True
             
@@ -232,19 +348,8 @@ class SessionManager:
             True se renovada com sucesso
         """
         try:
-            session_key = f"session:{session_id}"
-            
-            # Verifica se sessão existe
-            if not self.redis_client.exists(session_key):
-                return False
-            
-            # Renova TTL
-            self.redis_client.expire(session_key, self.session_ttl)
-            
-            # Atualiza last_seen
-            self.update_session(session_id, {"last_seen": time.time()})
-            
-            return True
+            # Renova TTL e atualiza last_seen em um round-trip (False se a sessão não existe)
+            return self.update_session(session_id, {})
             
         except Exception as e:
             logging.error(f"[SESSION_MANAGER] Erro ao renovar sessão {session_id}: {e}")
@@ -261,9 +366,13 @@ class SessionManager:
             True se removida com sucesso
         """
         try:
-            # Remove do Redis
+            # Remove do Redis (hash e índice)
             session_key = f"session:{session_id}"
-            self.redis_client.delete(session_key)
+            pipe = self.redis_client.pipeline()
+            pipe.delete(session_key)
+            pipe.zrem(SESSIONS_INDEX_KEY, session_id)
+            pipe.execute()
+            self.release_disk_usage(session_id)
 
             # Remove diretório da sessão
             session_dir = self._get_session_directory(session_id)
@@ -334,7 +443,7 @@ class SessionManager:
 
     def calculate_session_size(self, session_id: str) -> float:
         """
-        Calcula tamanho da sessão em MB
+        Retorna tamanho da sessão em MB (contador incremental no Redis, sem varrer o disco)
 
         Args:
             session_id: ID da sessão
@@ -342,65 +451,239 @@ class SessionManager:
         Returns:
             Tamanho em MB
         """
+        return self.get_session_disk_usage(session_id) / (1024 * 1024)
+
+    def get_session_disk_usage(self, session_id: str) -> int:
+        """
+        Retorna bytes contabilizados para a sessão
+
+        Args:
+            session_id: ID da sessão
+
+        Returns:
+            Uso de disco em bytes
+        """
         try:
-            session_dir = self._get_session_directory(session_id)
-            if not os.path.exists(session_dir):
-                return 0.0
+            return int(self.redis_client.hget(SESSIONS_DISK_USAGE_KEY, session_id) or 0)
+        except Exception as e:
+            logging.error(f"[SESSION_MANAGER] Erro ao obter uso de disco da sessão {session_id}: {e}")
+            return 0
 
-            total_size = 0
-            for dirpath, dirnames, filenames in os.walk(session_dir):
-                for filename in filenames:
-                    filepath = os.path.join(dirpath, filename)
-                    if os.path.exists(filepath):
-                        total_size += os.path.getsize(filepath)
+    def get_total_disk_usage(self) -> int:
+        """Retorna bytes contabilizados para todas as sessões"""
+        try:
+            return int(self.redis_client.get(SESSIONS_DISK_TOTAL_KEY) or 0)
+        except Exception as e:
+            logging.error(f"[SESSION_MANAGER] Erro ao obter uso de disco total: {e}")
+            return 0
 
-            size_mb = total_size / (1024 * 1024)
+    def reserve_session_space(self, session_id: str, size_bytes: int) -> Dict[str, Any]:
+        """
+        Reserva espaço para uma escrita, aplicando as cotas por sessão e global
+
+        Deve ser chamado ANTES de gravar o arquivo. Se a escrita falhar,
+        devolva o espaço com record_disk_usage(session_id, -size_bytes).
+
+        Args:
+            session_id: ID da sessão
+            size_bytes: Bytes a serem gravados
 
-            # Atualiza no Redis
-            self.update_session(session_id, {"session_size_mb": size_mb})
+        Returns:
+            Dicionário com "allowed" e "message"
+        """
+        try:
+            result = self._reserve_space_script(
+                keys=[SESSIONS_DISK_USAGE_KEY, SESSIONS_DISK_TOTAL_KEY],
+                args=[
+                    session_id,
+                    int(size_bytes),
+                    self.max_session_size_mb * 1024 * 1024,
+                    self.max_total_size_mb * 1024 * 1024
+                ]
+            )
 
-            return size_mb
+            if result == -1:
+                message = f"Cota da sessão excedida (máximo {self.max_session_size_mb} MB por sessão)"
+                logging.warning(f"[SESSION_MANAGER] {message}: {session_id}")
+                return {"allowed": False, "message": message}
+
+            if result == -2:
+                message = "Espaço de armazenamento do servidor esgotado. Tente novamente mais tarde."
+                logging.warning(f"[SESSION_MANAGER] Cota global excedida ({self.max_total_size_mb} MB) ao reservar para {session_id}")
+                return {"allowed": False, "message": message}
+
+            return {"allowed": True, "message": ""}
 
         except Exception as e:
-            logging.error(f"[SESSION_MANAGER] Erro ao calcular tamanho da sessão {session_id}: {e}")
-            return 0.0
+            # Falha na contabilização não deve bloquear o upload
+            logging.error(f"[SESSION_MANAGER] Erro ao reservar espaço para {session_id}: {e}")
+            return {"allowed": True, "message": ""}
 
-    def cleanup_expired_sessions(self) -> int:
+    def record_disk_usage(self, session_id: str, delta_bytes: int) -> bool:
         """
-        Remove sessões expiradas e seus recursos
+        Registra variação de uso de disco de uma sessão (sem verificar cota)
+
+        Args:
+            session_id: ID da sessão
+            delta_bytes: Bytes adicionados (negativo para liberados)
 
         Returns:
-            Número de sessões removidas
+            True se registrado com sucesso
         """
+        if not delta_bytes:
+            return True
+
         try:
-            removed_count = 0
+            pipe = self.redis_client.pipeline()
+            pipe.hincrby(SESSIONS_DISK_USAGE_KEY, session_id, int(delta_bytes))
+            pipe.incrby(SESSIONS_DISK_TOTAL_KEY, int(delta_bytes))
+            pipe.execute()
+            return True
+
+        except Exception as e:
+            logging.error(f"[SESSION_MANAGER] Erro ao registrar uso de disco da sessão {session_id}: {e}")
+            return False
+
+    def release_disk_usage(self, session_id: str) -> int:
+        """
+        Remove a contabilização de disco de uma sessão
+
+        Args:
+            session_id: ID da sessão
+
+        Returns:
+            Bytes liberados
+        """
+        try:
+            return int(self._set_usage_script(
+                keys=[SESSIONS_DISK_USAGE_KEY, SESSIONS_DISK_TOTAL_KEY],
+                args=[session_id, ""]
+            ) or 0)
+        except Exception as e:
+            logging.error(f"[SESSION_MANAGER] Erro ao liberar uso de disco da sessão {session_id}: {e}")
+            return 0
 
-            # Busca todas as chaves de sessão
-            session_keys = self.redis_client.keys("session:*")
+    def reconcile_disk_usage(self, pause_seconds: float = 0.01) -> Dict[str, int]:
+        """
+        Corrige os contadores de disco comparando com o conteúdo real dos diretórios
 
-            for session_key in session_keys:
-                # Verifica se ainda existe (não expirou)
-                if not self.redis_client.exists(session_key):
-                    # Extrai session_id da chave
-                    session_id = session_key.replace("session:", "")
+        Varredura completa e lenta (pausa entre sessões para não disputar I/O);
+        deve rodar raramente, como correção de desvios dos contadores incrementais.
 
-                    # Remove diretório órfão
-                    session_dir = self._get_session_directory(session_id)
-                    if os.path.exists(session_dir):
-                        shutil.rmtree(session_dir)
-                        logging.info(f"[SESSION_CLEANUP] Diretório órfão removido: {session_id}")
-                        removed_count += 1
+        Args:
+            pause_seconds: Pausa entre sessões
 
-            # Remove diretórios órfãos (sem sessão no Redis)
+        Returns:
+            Estatísticas da reconciliação
+        """
+        stats = {"sessions_checked": 0, "sessions_corrected": 0, "drift_bytes": 0}
+
+        try:
+            on_disk = set()
             if os.path.exists(self.sessions_base_dir):
                 for item in os.listdir(self.sessions_base_dir):
                     item_path = os.path.join(self.sessions_base_dir, item)
-                    if os.path.isdir(item_path):
-                        session_key = f"session:{item}"
-                        if not self.redis_client.exists(session_key):
-                            shutil.rmtree(item_path)
-                            logging.info(f"[SESSION_CLEANUP] Diretório órfão removido: {item}")
-                            removed_count += 1
+                    if not os.path.isdir(item_path):
+                        continue
+
+                    on_disk.add(item)
+                    measured = _directory_size_bytes(item_path)
+                    previous = int(self._set_usage_script(
+                        keys=[SESSIONS_DISK_USAGE_KEY, SESSIONS_DISK_TOTAL_KEY],
+                        args=[item, measured]
+                    ) or 0)
+
+                    stats["sessions_checked"] += 1
+                    if previous != measured:
+                        stats["sessions_corrected"] += 1
+                        stats["drift_bytes"] += abs(measured - previous)
+
+                    time.sleep(pause_seconds)
+
+            # Contadores de sessões cujo diretório não existe mais
+            for session_id in self.redis_client.hkeys(SESSIONS_DISK_USAGE_KEY):
+                if session_id not in on_disk:
+                    stats["drift_bytes"] += abs(self.release_disk_usage(session_id))
+                    stats["sessions_corrected"] += 1
+
+            if stats["sessions_corrected"]:
+                logging.info(f"[SESSION_MANAGER] Uso de disco reconciliado: {stats}")
+
+            return stats
+
+        except Exception as e:
+            logging.error(f"[SESSION_MANAGER] Erro na reconciliação de uso de disco: {e}")
+            return stats
+
+    def handle_expired_session(self, session_id: str) -> bool:
+        """
+        Libera recursos de uma sessão expirada (diretório e entrada no índice)
+
+        Chamado pelo listener de expiração do Redis ou pela varredura do índice.
+
+        Args:
+            session_id: ID da sessão expirada
+
+        Returns:
+            True se algum recurso foi removido
+        """
+        try:
+            removed = bool(self.redis_client.zrem(SESSIONS_INDEX_KEY, session_id))
+            self.release_disk_usage(session_id)
+
+            session_dir = self._get_session_directory(session_id)
+            if os.path.exists(session_dir):
+                shutil.rmtree(session_dir, ignore_errors=True)
+                logging.info(f"[SESSION_CLEANUP] Diretório de sessão expirada removido: {session_id}")
+                removed = True
+
+            return removed
+
+        except Exception as e:
+            logging.error(f"[SESSION_CLEANUP] Erro ao liberar sessão expirada {session_id}: {e}")
+            return False
+
+    def get_expired_session_ids(self, limit: int = 500) -> List[str]:
+        """
+        Retorna sessões cujo last_seen ultrapassou o TTL (ZRANGEBYSCORE no índice)
+
+        Args:
+            limit: Máximo de sessões retornadas por chamada
+
+        Returns:
+            Lista de session_ids expirados
+        """
+        cutoff = time.time() - self.session_ttl
+        return self.redis_client.zrangebyscore(SESSIONS_INDEX_KEY, "-inf", cutoff, start=0, num=limit)
+
+    def cleanup_expired_sessions(self) -> int:
+        """
+        Remove sessões expiradas e seus recursos
+
+        Usa o índice ordenado por last_seen: o custo depende apenas do número
+        de sessões expiradas, não do total de sessões.
+
+        Returns:
+            Número de sessões removidas
+        """
+        try:
+            removed_count = 0
+
+            expired_ids = self.get_expired_session_ids()
+            if not expired_ids:
+                return 0
+
+            # Confirma expiração no Redis em um round-trip (protege contra relógios divergentes)
+            pipe = self.redis_client.pipeline()
+            for session_id in expired_ids:
+                pipe.exists(f"session:{session_id}")
+            still_alive = pipe.execute()
+
+            for session_id, alive in zip(expired_ids, still_alive):
+                if alive:
+                    continue
+                if self.handle_expired_session(session_id):
+                    removed_count += 1
 
             if removed_count > 0:
                 logging.info(f"[SESSION_CLEANUP] {removed_count} sessões expiradas removidas")
@@ -411,10 +694,37 @@ class SessionManager:
             logging.error(f"[SESSION_CLEANUP] Erro na limpeza: {e}")
             return 0
 
+    def enable_expiry_notifications(self) -> bool:
+        """
+        Habilita notificações de expiração de chaves no Redis (notify-keyspace-events)
+
+        Returns:
+            True se as notificações estão habilitadas
+        """
+        try:
+            current = self.redis_client.config_get("notify-keyspace-events").get("notify-keyspace-events", "")
+            if ("E" in current and "x" in current) or ("E" in current and "A" in current):
+                return True
+
+            flags = "".join(sorted(set(current) | {"E", "x"}))
+            self.redis_client.config_set("notify-keyspace-events", flags)
+            logging.info(f"[SESSION_MANAGER] Notificações de expiração habilitadas ({flags})")
+            return True
+
+        except Exception as e:
+            # Redis gerenciado pode bloquear CONFIG SET: limpeza periódica continua funcionando
+            logging.warning(f"[SESSION_MANAGER] Não foi possível habilitar notificações de expiração: {e}")
+            return False
+
+    def get_expiry_channel(self) -> str:
+        """Retorna o canal de eventos de expiração do database de sessões"""
+        return f"__keyevent@{self.sessions_db}__:expired"
+
     def get_active_sessions_count(self) -> int:
-        """Retorna número de sessões ativas"""
+        """Retorna número de sessões ativas (last_seen dentro do TTL)"""
         try:
-            return len(self.redis_client.keys("session:*"))
+            cutoff = time.time() - self.session_ttl
+            return self.redis_client.zcount(SESSIONS_INDEX_KEY, f"({cutoff}", "+inf")
         except:
             return 0
 
@@ -428,18 +738,8 @@ class SessionManager:
         try:
             active_sessions = self.get_active_sessions_count()
 
-            # Calcula tamanho total
-            total_size_mb = 0.0
-            if os.path.exists(self.sessions_base_dir):
-                for item in os.listdir(self.sessions_base_dir):
-                    item_path = os.path.join(self.sessions_base_dir, item)
-                    if os.path.isdir(item_path):
-                        for dirpath, dirnames, filenames in os.walk(item_path):
-                            for filename in filenames:
-                                filepath = os.path.join(dirpath, filename)
-                                if os.path.exists(filepath):
-                                    total_size_mb += os.path.getsize(filepath)
-                total_size_mb = total_size_mb / (1024 * 1024)
+            # Tamanho total vem do contador incremental (sem varrer o disco)
+            total_size_mb = self.get_total_disk_usage() / (1024 * 1024)
 
             return {
                 "active_sessions": active_sessions,
@@ -447,7 +747,8 @@ class SessionManager:
                 "sessions_base_dir": self.sessions_base_dir,
                 "session_ttl_minutes": self.session_ttl // 60,
                 "max_sessions_per_ip": self.max_sessions_per_ip,
-                "max_session_size_mb": self.max_session_size_mb
+                "max_session_size_mb": self.max_session_size_mb,
+                "max_total_size_mb": self.max_total_size_mb
             }
 
         except Exception as e:
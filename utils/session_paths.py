@@ -192,7 +192,10 @@ class SessionPaths:
     
     def get_session_size(self, session_id: str) -> float:
         """
-        Calcula tamanho da sessão em MB
+        Retorna tamanho da sessão em MB
+        
+        Usa o contador incremental mantido pelo SessionManager no Redis
+        (não varre o diretório da sessão).
         
         Args:
             session_id: ID da sessão
@@ -201,18 +204,8 @@ class SessionPaths:
             Tamanho em MB
         """
         try:
-            session_dir = self.get_session_directory(session_id)
-            if not os.path.exists(session_dir):
-                return 0.0
-            
-            total_size = 0
-            for dirpath, dirnames, filenames in os.walk(session_dir):
-                for filename in filenames:
-                    filepath = os.path.join(dirpath, filename)
-                    if os.path.exists(filepath):
-                        total_size += os.path.getsize(filepath)
-            
-            return total_size / (1024 * 1024)  # Converte para MB
+            from utils.session_manager import get_session_manager
+            return get_session_manager().calculate_session_size(session_id)
             
         except Exception as e:
             logging.error(f"[SESSION_PATHS] Erro ao calcular tamanho para {session_id}: {e}")
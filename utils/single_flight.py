@@ -0,0 +1,227 @@
+"""
+Coalescência (single-flight) de perguntas idênticas em execução
+
+O check_cache_node só enxerga respostas já concluídas: N usuários (ou N
+iterações do executor de testes) que fazem a mesma pergunta ao mesmo tempo
+executam o grafo inteiro N vezes. Aqui a primeira execução de uma chave
+(dataset + pergunta normalizada + modelo/opções) vira líder; as demais
+aguardam o resultado dela.
+
+- No processo: registro de concurrent.futures.Future (funciona entre event
+  loops, como as instâncias do pool do executor de testes)
+- Entre processos: lock no Redis (SET NX) e resultado publicado em JSON com
+  TTL curto; seguidores de outros processos consultam o resultado até o lock
+  ser liberado
+
+Se o líder falhar, cada seguidor executa a própria query.
+"""
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from utils.config import (
+    SINGLE_FLIGHT_REDIS_ENABLED,
+    SINGLE_FLIGHT_TIMEOUT,
+    SINGLE_FLIGHT_RESULT_TTL,
+    SINGLE_FLIGHT_POLL_INTERVAL
+)
+from utils.metrics import record_cache_event
+
+SINGLE_FLIGHT_KEY_PREFIX = "agentgraph:singleflight"
+
+# Campos do resultado compartilhados com seguidores de outros processos (JSON)
+SHARED_RESULT_KEYS = [
+    "user_input", "response", "error", "execution_time", "query_type",
+    "sql_query_extracted", "graph_type", "graph_generated", "graph_error",
+    "refined_question", "question_refinement_applied", "cache_hit"
+]
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_question(question: str) -> str:
+    """Normaliza a pergunta (caixa, acentos, espaços e pontuação final)"""
+    text = unicodedata.normalize("NFKD", question or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _WHITESPACE.sub(" ", text.casefold()).strip().rstrip("?!. ")
+
+def build_flight_key(dataset_fingerprint: str, question: str, model: str, options: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Monta a chave de coalescência
+
+    Args:
+        dataset_fingerprint: Identifica a base consultada (ver AgentGraphManager)
+        question: Pergunta do usuário
+        model: Modelo do agente SQL
+        options: Demais opções que alteram a resposta (processing, refinamento, top_k...)
+
+    Returns:
+        Hash SHA-256 da combinação
+    """
+    payload = json.dumps({
+        "dataset": dataset_fingerprint,
+        "question": normalize_question(question),
+        "model": model,
+        "options": options or {}
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _follower_result(result: Dict[str, Any], leader: str) -> Dict[str, Any]:
+    """Cópia do resultado do líder marcada como coalescida"""
+    follower = dict(result)
+    follower.update({"coalesced": True, "coalesced_from": leader})
+    return follower
+
+class SingleFlight:
+    """
+    Registro de execuções em andamento por chave
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+        self._redis = None
+        self._redis_checked = False
+
+    def _get_redis(self):
+        """Cliente Redis (None se desabilitado ou indisponível)"""
+        if not SINGLE_FLIGHT_REDIS_ENABLED:
+            return None
+        if not self._redis_checked:
+            self._redis_checked = True
+            try:
+                from utils.redis_client import get_redis_client
+                client = get_redis_client(2)
+                client.ping()
+                self._redis = client
+            except Exception as e:
+                logging.warning(f"[SINGLE_FLIGHT] Redis indisponível, coalescência apenas local: {e}")
+        return self._redis
+
+    async def run(self, key: str, func: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Executa func como líder ou aguarda o líder da mesma chave
+
+        Args:
+            key: Chave de build_flight_key
+            func: Corrotina que executa a query
+
+        Returns:
+            Resultado da query (com coalesced=True para seguidores)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = concurrent.futures.Future()
+                self._flights[key] = flight
+
+        if not is_leader:
+            try:
+                # shield: cancelar um seguidor não cancela o resultado dos demais
+                result = await asyncio.shield(asyncio.wrap_future(flight))
+                if result.get("error"):
+                    raise RuntimeError(result["error"])
+                record_cache_event("single_flight", "hit")
+                logging.info(f"[SINGLE_FLIGHT] Resultado reaproveitado do líder local ({key[:12]})")
+                return _follower_result(result, "local")
+            except Exception as e:
+                logging.warning(f"[SINGLE_FLIGHT] Líder falhou ({e}), executando query própria")
+                return await func()
+
+        try:
+            result = await self._run_leader(key, func)
+            flight.set_result(result)
+            return result
+        except BaseException as e:
+            # Cancelamento do líder não deve cancelar os seguidores: eles executam a própria query
+            flight.set_exception(e if isinstance(e, Exception) else RuntimeError(f"Líder interrompido ({type(e).__name__})"))
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+
+    async def _run_leader(self, key: str, func: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Líder local: coordena com outros processos via Redis, se disponível"""
+        client = self._get_redis()
+        if client is None:
+            record_cache_event("single_flight", "miss")
+            return await func()
+
+        lock_key = f"{SINGLE_FLIGHT_KEY_PREFIX}:lock:{key}"
+        result_key = f"{SINGLE_FLIGHT_KEY_PREFIX}:result:{key}"
+        owner = uuid.uuid4().hex
+
+        try:
+            acquired = client.set(lock_key, owner, nx=True, ex=SINGLE_FLIGHT_TIMEOUT)
+            if acquired:
+                client.delete(result_key)  # Resultado de uma execução anterior
+        except Exception as e:
+            logging.warning(f"[SINGLE_FLIGHT] Erro no Redis, coalescência apenas local: {e}")
+            record_cache_event("single_flight", "miss")
+            return await func()
+
+        if not acquired:
+            remote = await self._wait_remote(client, lock_key, result_key)
+            if remote is not None:
+                record_cache_event("single_flight", "hit")
+                logging.info(f"[SINGLE_FLIGHT] Resultado reaproveitado de outro processo ({key[:12]})")
+                return _follower_result(remote, "redis")
+            logging.info(f"[SINGLE_FLIGHT] Líder remoto sem resultado, executando query própria ({key[:12]})")
+
+        record_cache_event("single_flight", "miss")
+        try:
+            result = await func()
+            if acquired and not result.get("error"):
+                shared = {field: result.get(field) for field in SHARED_RESULT_KEYS}
+                try:
+                    client.set(result_key, json.dumps(shared, default=str), ex=SINGLE_FLIGHT_RESULT_TTL)
+                except Exception as e:
+                    logging.warning(f"[SINGLE_FLIGHT] Erro ao publicar resultado: {e}")
+            return result
+        finally:
+            if acquired:
+                try:
+                    if client.get(lock_key) == owner:
+                        client.delete(lock_key)
+                except Exception as e:
+                    logging.warning(f"[SINGLE_FLIGHT] Erro ao liberar lock: {e}")
+
+    async def _wait_remote(self, client, lock_key: str, result_key: str) -> Optional[Dict[str, Any]]:
+        """Aguarda o resultado publicado pelo líder de outro processo"""
+        deadline = time.time() + SINGLE_FLIGHT_TIMEOUT
+        try:
+            while time.time() < deadline:
+                raw = client.get(result_key)
+                if raw:
+                    return json.loads(raw)
+                if not client.exists(lock_key):
+                    # Lock liberado: o resultado pode ter sido gravado logo antes
+                    raw = client.get(result_key)
+                    return json.loads(raw) if raw else None
+                await asyncio.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+        except Exception as e:
+            logging.warning(f"[SINGLE_FLIGHT] Erro ao aguardar líder remoto: {e}")
+        return None
+
+    def in_flight(self) -> int:
+        """Número de chaves com execução em andamento no processo"""
+        with self._lock:
+            return len(self._flights)
+
+# Instância global (singleton)
+_single_flight: Optional[SingleFlight] = None
+
+def get_single_flight() -> SingleFlight:
+    """Retorna o registro de execuções em andamento (singleton)"""
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
@@ -0,0 +1,146 @@
+"""
+Relay de streaming via Redis pub/sub
+
+Quando a etapa SQL roda em um worker Celery, os tokens gerados pelo LLM
+são publicados em um canal Redis por task. O nó de dispatch do grafo
+assina o canal e reemite os tokens como eventos customizados do LangGraph,
+de forma que o mesmo stream chegue ao chat do Gradio.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from utils.config import STREAM_CHANNEL_PREFIX
+from utils.redis_client import get_redis_client
+
+# Nome do evento customizado emitido no grafo para tokens vindos do Celery
+SQL_TOKEN_EVENT = "sql_token"
+
+def get_stream_channel(task_id: str) -> str:
+    """
+    Retorna o canal Redis de streaming de uma task
+
+    Args:
+        task_id: ID da task Celery
+
+    Returns:
+        Nome do canal
+    """
+    return f"{STREAM_CHANNEL_PREFIX}:{task_id}"
+
+class RedisStreamPublisher(BaseCallbackHandler):
+    """
+    Handler que publica os tokens do LLM em um canal Redis (lado do worker)
+    """
+
+    def __init__(self, task_id: str):
+        super().__init__()
+        self.channel = get_stream_channel(task_id)
+        self.token_count = 0
+        self._redis = None
+
+        try:
+            self._redis = get_redis_client(2)
+        except Exception as e:
+            logging.warning(f"[STREAM_RELAY] Redis indisponível para streaming: {e}")
+
+    def _publish(self, payload: Dict[str, Any]) -> None:
+        """Publica mensagem no canal, sem interromper a execução em caso de erro"""
+        if self._redis is None:
+            return
+        try:
+            self._redis.publish(self.channel, json.dumps(payload, default=str))
+        except Exception as e:
+            logging.warning(f"[STREAM_RELAY] Erro ao publicar no canal {self.channel}: {e}")
+            self._redis = None
+
+    def on_llm_new_token(self, token: str, **kwargs) -> None:
+        """Publica cada token recebido do LLM"""
+        if not token:
+            return
+        self.token_count += 1
+        self._publish({"type": "token", "content": token})
+
+    def publish_end(self) -> None:
+        """Sinaliza fim do stream para o assinante"""
+        self._publish({"type": "end", "tokens": self.token_count})
+        logging.info(f"[STREAM_RELAY] Stream finalizado em {self.channel} ({self.token_count} tokens)")
+
+def subscribe_stream(task_id: str):
+    """
+    Assina o canal de streaming de uma task (lado do grafo)
+
+    Deve ser chamado ANTES de disparar a task para não perder tokens.
+
+    Args:
+        task_id: ID da task Celery
+
+    Returns:
+        Objeto PubSub ou None se o Redis não estiver disponível
+    """
+    try:
+        pubsub = get_redis_client(2).pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(get_stream_channel(task_id))
+        return pubsub
+    except Exception as e:
+        logging.warning(f"[STREAM_RELAY] Não foi possível assinar stream da task {task_id}: {e}")
+        return None
+
+async def relay_task_stream(task, pubsub, config: Optional[Dict[str, Any]] = None, timeout: float = 900) -> int:
+    """
+    Reemite os tokens publicados pelo worker como eventos customizados do LangGraph
+
+    Retorna quando o worker sinaliza o fim do stream, quando a task termina
+    ou quando o timeout é atingido.
+
+    Args:
+        task: AsyncResult da task Celery
+        pubsub: Objeto PubSub retornado por subscribe_stream
+        config: RunnableConfig do nó (necessário para dispatch dos eventos)
+        timeout: Tempo máximo de espera em segundos
+
+    Returns:
+        Número de tokens reemitidos
+    """
+    from langchain_core.callbacks.manager import adispatch_custom_event
+
+    relayed = 0
+    start_time = time.time()
+
+    try:
+        while time.time() - start_time < timeout:
+            message = await asyncio.to_thread(pubsub.get_message, timeout=0.5)
+
+            if not message:
+                if task.ready():
+                    break
+                continue
+
+            try:
+                payload = json.loads(message.get("data") or "{}")
+            except (TypeError, ValueError):
+                continue
+
+            if payload.get("type") == "end":
+                break
+
+            if payload.get("type") == "token" and payload.get("content"):
+                relayed += 1
+                try:
+                    await adispatch_custom_event(SQL_TOKEN_EVENT, {"content": payload["content"]}, config=config)
+                except Exception as e:
+                    # Sem run pai não há para onde reemitir; segue apenas aguardando a task
+                    logging.debug(f"[STREAM_RELAY] Evento não reemitido: {e}")
+
+    finally:
+        try:
+            pubsub.close()
+        except Exception:
+            pass
+
+    logging.info(f"[STREAM_RELAY] {relayed} tokens reemitidos da task {task.id}")
+    return relayed